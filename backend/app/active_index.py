@@ -0,0 +1,145 @@
+"""In-memory index of live games for `GET /players/active`.
+
+Each mode (and all modes together) keeps its players in two sorted key lists:
+
+    by score      (-score, startedAt, id)    highest score first
+    by startedAt  (-startedAt, id)           most recent game first
+
+so a page of K players is a bisect plus a K-element slice. Keys are unique
+(they end with the player id), which makes the last key of a page a cursor
+that stays valid while players join, score and leave. The index is loaded
+during warm-up and kept current by player events from the event bus.
+"""
+from bisect import bisect_right, insort
+from datetime import datetime
+from typing import Iterable, Optional
+
+from app.models import ActivePlayer, ActivePlayerSort, GameMode
+
+
+def _micros(started_at: datetime) -> int:
+    return int(started_at.timestamp() * 1_000_000)
+
+
+class _Player:
+    __slots__ = ("id", "username", "score", "mode", "started_at", "started_us")
+
+    def __init__(self, player_id: str, username: str, score: int, mode: str, started_at: datetime) -> None:
+        self.id = player_id
+        self.username = username
+        self.score = score
+        self.mode = mode
+        self.started_at = started_at
+        self.started_us = _micros(started_at)
+
+    def score_key(self) -> tuple:
+        return (-self.score, self.started_us, self.id)
+
+    def started_key(self) -> tuple:
+        return (-self.started_us, self.id)
+
+    def to_model(self) -> ActivePlayer:
+        return ActivePlayer.model_construct(
+            id=self.id, username=self.username, score=self.score,
+            mode=GameMode(self.mode), startedAt=self.started_at
+        )
+
+
+class ActivePlayerIndex:
+    """Live games ordered by score and by start time, per mode."""
+
+    def __init__(self) -> None:
+        self.players: dict[str, _Player] = {}
+        # Partition None holds every mode
+        self.by_score: dict[Optional[str], list[tuple]] = {mode.value: [] for mode in GameMode}
+        self.by_score[None] = []
+        self.by_started: dict[Optional[str], list[tuple]] = {mode.value: [] for mode in GameMode}
+        self.by_started[None] = []
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def load(self, players: Iterable[ActivePlayer]) -> None:
+        """Replace the contents with `players`."""
+        self.clear()
+        for player in players:
+            mode = player.mode.value if isinstance(player.mode, GameMode) else player.mode
+            self.players[player.id] = _Player(player.id, player.username, player.score, mode, player.startedAt)
+        for player in self.players.values():
+            for mode in (player.mode, None):
+                self.by_score[mode].append(player.score_key())
+                self.by_started[mode].append(player.started_key())
+        for partition in (self.by_score, self.by_started):
+            for keys in partition.values():
+                keys.sort()
+        self.loaded = True
+
+    def add(self, player_id: str, username: str, score: int, mode: str, started_at: datetime) -> None:
+        """Add a live game (replacing any previous game of the same player)."""
+        self.remove(player_id)
+        player = self.players[player_id] = _Player(player_id, username, score, mode, started_at)
+        for partition in (mode, None):
+            insort(self.by_score[partition], player.score_key())
+            insort(self.by_started[partition], player.started_key())
+
+    def update_score(self, player_id: str, score: int) -> None:
+        """Move a live game to its new score."""
+        player = self.players.get(player_id)
+        if player is None or player.score == score:
+            return
+        old = player.score_key()
+        player.score = score
+        for partition in (player.mode, None):
+            keys = self.by_score[partition]
+            del keys[bisect_right(keys, old) - 1]
+            insort(keys, player.score_key())
+
+    def remove(self, player_id: str) -> None:
+        """Drop a finished game."""
+        player = self.players.pop(player_id, None)
+        if player is None:
+            return
+        for partition in (player.mode, None):
+            for keys, key in ((self.by_score[partition], player.score_key()),
+                              (self.by_started[partition], player.started_key())):
+                del keys[bisect_right(keys, key) - 1]
+
+    def page(
+        self,
+        mode: Optional[str] = None,
+        sort: ActivePlayerSort = ActivePlayerSort.SCORE,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> tuple[list[ActivePlayer], Optional[str]]:
+        """Return a page of players and the cursor of the next page (None at the end)."""
+        if sort == ActivePlayerSort.SCORE:
+            keys = self.by_score[mode]
+            id_at = 2
+        else:
+            keys = self.by_started[mode]
+            id_at = 1
+        start = bisect_right(keys, self.decode_cursor(sort, cursor)) if cursor else 0
+        stop = len(keys) if limit is None else min(len(keys), start + limit)
+        page = [self.players[key[id_at]].to_model() for key in keys[start:stop]]
+        next_cursor = self.encode_cursor(keys[stop - 1]) if stop < len(keys) and stop > start else None
+        return page, next_cursor
+
+    @staticmethod
+    def encode_cursor(key: tuple) -> str:
+        return ":".join(str(part) for part in key)
+
+    @staticmethod
+    def decode_cursor(sort: ActivePlayerSort, cursor: str) -> tuple:
+        """Parse a cursor; raises ValueError if it does not belong to `sort`."""
+        if sort == ActivePlayerSort.SCORE:
+            score, started_us, player_id = cursor.split(":", 2)
+            return (int(score), int(started_us), player_id)
+        started_us, player_id = cursor.split(":", 1)
+        return (int(started_us), player_id)
+
+
+active_player_index = ActivePlayerIndex()
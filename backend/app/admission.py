@@ -0,0 +1,244 @@
+"""Priority-aware admission control and load shedding.
+
+Requests are sorted into route classes, highest priority first:
+
+    critical  score submits and live game updates, which must not be lost
+    auth      logins and signups, few but expensive (bcrypt)
+    write     any other request that changes state, such as opening an arena room
+    read      leaderboard, active-player and game-state reads (GET and HEAD), cheap to retry
+
+Each class admits up to `limit` requests at a time and queues the rest. Queue
+waits follow CoDel (controlled delay): if even the shortest wait in the last
+ADMISSION_INTERVAL_MS stayed above ADMISSION_TARGET_MS, the queue is standing
+rather than absorbing a burst. The class is then overloaded, and new arrivals
+only wait up to the target before being shed. While a class is overloaded,
+lower-priority classes shed at once instead of queueing, so reads go first and
+submits keep their share. Shed requests get 503 with `Retry-After`.
+
+Health checks, docs and long-lived streams are not admission-controlled.
+"""
+import asyncio
+from collections import deque
+import json
+import re
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import (
+    ADMISSION_AUTH_LIMIT, ADMISSION_CRITICAL_LIMIT, ADMISSION_INTERVAL_MS, ADMISSION_READ_LIMIT,
+    ADMISSION_TARGET_MS, ADMISSION_WRITE_LIMIT, API_V1_PREFIX
+)
+
+
+class Shed(Exception):
+    """Raised when a request is turned away; `reason` is one of the shed counters."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class RouteClass:
+    """Concurrency limit, queue and CoDel state of one class of routes."""
+
+    def __init__(self, name: str, priority: int, limit: int, max_queue: int, timeout_ms: float,
+                 codel: bool = True, retry_after: int = 1, target_ms: float = ADMISSION_TARGET_MS,
+                 interval_ms: float = ADMISSION_INTERVAL_MS, clock=time.monotonic) -> None:
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout_ms / 1000
+        # Classes without CoDel keep queueing up to their timeout even when overloaded
+        self.codel = codel
+        self.retry_after = retry_after
+        self.target = target_ms / 1000
+        self.interval = interval_ms / 1000
+        self.clock = clock
+        self.active = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self._overloaded = False
+        self._min_delay: Optional[float] = None
+        self._interval_end = clock() + self.interval
+        self.stats = {"admitted": 0, "queued": 0, "shedQueueFull": 0, "shedTimeout": 0, "shedPriority": 0}
+        self.max_delay = 0.0
+
+    def _roll(self) -> None:
+        """Close the interval if it is over: overloaded if its smallest queue delay was above target."""
+        now = self.clock()
+        if now >= self._interval_end:
+            # An interval without traffic has no delay and ends the overload
+            self._overloaded = self._min_delay is not None and self._min_delay > self.target
+            self._min_delay = None
+            self._interval_end = now + self.interval
+
+    @property
+    def overloaded(self) -> bool:
+        self._roll()
+        return self._overloaded
+
+    def _record(self, delay: float) -> None:
+        """CoDel bookkeeping: track the smallest queue delay of each interval."""
+        self._roll()
+        if self._min_delay is None or delay < self._min_delay:
+            self._min_delay = delay
+        self.max_delay = max(self.max_delay, delay)
+
+    def deadline(self) -> float:
+        """How long a new arrival may wait in the queue."""
+        return self.target if self.overloaded and self.codel else self.timeout
+
+    async def acquire(self, shed_for_priority: bool = False) -> None:
+        """Wait for a slot; raises Shed instead of waiting too long."""
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            self._record(0.0)
+            return
+        if shed_for_priority:
+            self.stats["shedPriority"] += 1
+            raise Shed("shedPriority")
+        if len(self.waiters) >= self.max_queue:
+            self.stats["shedQueueFull"] += 1
+            raise Shed("shedQueueFull")
+        self.stats["queued"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        queued_at = self.clock()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.deadline())
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Handed a slot just as the deadline passed: give it back
+                self.release()
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+            self.stats["shedTimeout"] += 1
+            self._record(self.clock() - queued_at)
+            raise Shed("shedTimeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+            raise
+        self.stats["admitted"] += 1
+        self._record(self.clock() - queued_at)
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the next waiter if there is one."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def report(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queueLength": len(self.waiters),
+            "overloaded": self.overloaded,
+            "maxQueueMs": round(self.max_delay * 1000, 3),
+            **self.stats,
+        }
+
+
+# (method or None for any, path pattern under the API prefix, class); first match wins
+ROUTE_RULES: list[tuple[Optional[str], re.Pattern, Optional[str]]] = [
+    (None, re.compile(r"/(players|arena/rooms)/[^/]+/watch$|/leaderboard/(stream|export)$"), None),
+    ("POST", re.compile(r"/leaderboard/submit$"), "critical"),
+    ("PATCH", re.compile(r"/players/[^/]+/game-state$"), "critical"),
+    ("POST", re.compile(r"/players/[^/]+/heartbeat$"), "critical"),
+    (None, re.compile(r"/arena/rooms/[^/]+/(direction|join|leave)$"), "critical"),
+    ("POST", re.compile(r"/auth/(login|signup)$"), "auth"),
+    ("GET", re.compile(r"/"), "read"),
+    ("HEAD", re.compile(r"/"), "read"),
+    (None, re.compile(r"/"), "write"),
+]
+
+
+def default_classes() -> dict[str, RouteClass]:
+    return {
+        "critical": RouteClass("critical", 0, ADMISSION_CRITICAL_LIMIT, max_queue=1024, timeout_ms=2000,
+                               codel=False, retry_after=1),
+        "auth": RouteClass("auth", 1, ADMISSION_AUTH_LIMIT, max_queue=64, timeout_ms=1000, retry_after=2),
+        "write": RouteClass("write", 2, ADMISSION_WRITE_LIMIT, max_queue=64, timeout_ms=1000, retry_after=1),
+        "read": RouteClass("read", 3, ADMISSION_READ_LIMIT, max_queue=128, timeout_ms=250, retry_after=1),
+    }
+
+
+class AdmissionController:
+    """Route classification and the classes' slots."""
+
+    def __init__(self, classes: Optional[dict[str, RouteClass]] = None, prefix: str = API_V1_PREFIX,
+                 rules: list = ROUTE_RULES) -> None:
+        self.classes = classes if classes is not None else default_classes()
+        self.prefix = prefix
+        self.rules = rules
+
+    def classify(self, method: str, path: str) -> Optional[RouteClass]:
+        """The class of a request, or None if it is not admission-controlled."""
+        if not path.startswith(self.prefix + "/"):
+            return None
+        rest = path[len(self.prefix):]
+        for rule_method, pattern, name in self.rules:
+            if (rule_method is None or rule_method == method) and pattern.search(rest):
+                return None if name is None else self.classes[name]
+        return None
+
+    def higher_priority_overloaded(self, route_class: RouteClass) -> bool:
+        return any(
+            other.overloaded for other in self.classes.values() if other.priority < route_class.priority
+        )
+
+    def report(self) -> dict:
+        return {name: route_class.report() for name, route_class in self.classes.items()}
+
+
+admission = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests by route class, or shedding them with 503."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = self.controller.classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await route_class.acquire(self.controller.higher_priority_overloaded(route_class))
+        except Shed:
+            await self._reject(route_class, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release()
+
+    @staticmethod
+    async def _reject(route_class: RouteClass, send: Send) -> None:
+        body = json.dumps({"detail": "Server is overloaded, retry shortly"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(route_class.retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
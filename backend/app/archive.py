@@ -0,0 +1,272 @@
+"""Cold-storage archive of old leaderboard entries.
+
+With `ARCHIVE_HORIZON_DAYS` set, a background compaction job moves entries
+dated before the horizon out of the leaderboard table into compressed,
+read-only partitions, so the hot table (and every query and index on it)
+only grows with recent traffic:
+
+    hot table           entries newer than the horizon, plus each mode's
+                        ARCHIVE_KEEP_TOP best entries of all time
+    leaderboard_archive one row per partition: mode, date range, entry
+                        count, score sum and range, and the entries as
+                        zlib-compressed JSON sorted by score
+
+Each batch moves at most ARCHIVE_BATCH_SIZE entries with one DELETE ...
+RETURNING and one partition INSERT in a single short transaction, so
+submits only ever wait for one batch. Partitions are written once and never
+updated; workers compacting at the same time cannot archive an entry twice,
+because only the DELETE that removed a row gets it back.
+
+Only settled entries are archived: visible ones without a pending
+verification, which nothing changes any more. Since each mode's best
+ARCHIVE_KEEP_TOP settled entries stay hot, every archived entry scores below
+at least that many hot ones, and the top K <= ARCHIVE_KEEP_TOP of any mode
+(or of all modes) is exact from the hot table alone. Longer reads, the
+in-memory leaderboard and exports merge the partitions back in.
+"""
+import asyncio
+from datetime import datetime, timedelta, UTC
+import heapq
+import json
+import logging
+import time
+from typing import AsyncIterator, Iterable, Optional
+import uuid
+import zlib
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Integer, LargeBinary, String, Table, delete, func, insert, or_, select
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import ARCHIVE_BATCH_SIZE, ARCHIVE_HORIZON_DAYS, ARCHIVE_INTERVAL_SECONDS, ARCHIVE_KEEP_TOP
+from app.db_models import LeaderboardEntry as DBLeaderboardEntry
+from app.shared_data import MODE_CODES
+from app.verification import VERIFIED, verifications, visible_clause
+
+
+logger = logging.getLogger(__name__)
+
+# (id, username, score, mode, date), as returned by the leaderboard row queries
+Row = tuple[str, str, int, str, str]
+
+archive_partitions = Table(
+    "leaderboard_archive",
+    DBLeaderboardEntry.metadata,
+    Column("id", String, primary_key=True),
+    Column("mode", String, nullable=False, index=True),
+    Column("first_date", String, nullable=False),
+    Column("last_date", String, nullable=False),
+    Column("entry_count", Integer, nullable=False),
+    Column("score_sum", BigInteger, nullable=False),
+    Column("min_score", Integer, nullable=False),
+    Column("max_score", Integer, nullable=False, index=True),
+    Column("data", LargeBinary, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def encode_partition(rows: Iterable[Row]) -> bytes:
+    """Compress rows of one mode, best score first."""
+    ordered = sorted(rows, key=lambda row: row[2], reverse=True)
+    payload = [[entry_id, username, score, date] for entry_id, username, score, _, date in ordered]
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_partition(data: bytes, mode: str) -> list[Row]:
+    return [
+        (entry_id, username, score, mode, date)
+        for entry_id, username, score, date in json.loads(zlib.decompress(data))
+    ]
+
+
+def merge_rows(*sorted_rows: Iterable[Row]) -> list[Row]:
+    """Merge row lists that are each sorted by score, best first."""
+    return list(heapq.merge(*sorted_rows, key=lambda row: row[2], reverse=True))
+
+
+def partition_row(mode: str, rows: list[Row]) -> dict:
+    scores = [row[2] for row in rows]
+    dates = [row[4] for row in rows]
+    return {
+        "id": str(uuid.uuid4()), "mode": mode,
+        "first_date": min(dates), "last_date": max(dates),
+        "entry_count": len(rows), "score_sum": sum(scores),
+        "min_score": min(scores), "max_score": max(scores),
+        "data": encode_partition(rows), "created_at": datetime.now(UTC),
+    }
+
+
+def _settled_clause():
+    """Visible entries whose verification, if any, has finished: the only ones that may be archived."""
+    status = verifications.c.status
+    return visible_clause() & or_(status.is_(None), status == VERIFIED)
+
+
+async def compact_batch(
+    db: AsyncSession, mode: str, cutoff: str, keep_top: int = ARCHIVE_KEEP_TOP, batch_size: int = ARCHIVE_BATCH_SIZE
+) -> int:
+    """Move up to `batch_size` settled entries of `mode` dated before `cutoff` into a new partition."""
+    entries = DBLeaderboardEntry
+    candidates = (
+        select(entries.id)
+        .outerjoin(verifications, verifications.c.entry_id == entries.id)
+        .where(entries.mode == mode, entries.date < cutoff, _settled_clause())
+    )
+    if keep_top > 0:
+        # The keep_top-th best settled score; it only rises, as settled entries are never removed
+        threshold = await db.scalar(
+            select(entries.score)
+            .outerjoin(verifications, verifications.c.entry_id == entries.id)
+            .where(entries.mode == mode, _settled_clause())
+            .order_by(entries.score.desc())
+            .offset(keep_top - 1)
+            .limit(1)
+        )
+        if threshold is None:
+            return 0
+        candidates = candidates.where(entries.score < threshold)
+    result = await db.execute(
+        delete(entries)
+        .where(entries.id.in_(candidates.order_by(entries.date).limit(batch_size)))
+        .returning(entries.id, entries.username, entries.score, entries.mode, entries.date)
+        .execution_options(synchronize_session=False)
+    )
+    rows = [tuple(row) for row in result.all()]
+    if not rows:
+        await db.rollback()
+        return 0
+    await db.execute(delete(verifications).where(verifications.c.entry_id.in_([row[0] for row in rows])))
+    await db.execute(insert(archive_partitions), partition_row(mode, rows))
+    await db.commit()
+    return len(rows)
+
+
+async def archived_rows(db: AsyncSession, mode: Optional[str] = None, min_score: Optional[int] = None) -> list[Row]:
+    """Archived entries, best score first; partitions whose best score is below `min_score` are skipped."""
+    query = select(archive_partitions.c.mode, archive_partitions.c.data)
+    if mode:
+        query = query.where(archive_partitions.c.mode == mode)
+    if min_score is not None:
+        query = query.where(archive_partitions.c.max_score >= min_score)
+    result = await db.execute(query)
+    return merge_rows(*(decode_partition(data, partition_mode) for partition_mode, data in result.all()))
+
+
+async def stream_archived_rows(
+    db: AsyncSession, mode: Optional[str] = None, batch_size: int = 1000
+) -> AsyncIterator[list[Row]]:
+    """Archived entries in batches, one partition decompressed at a time."""
+    query = select(archive_partitions.c.id)
+    if mode:
+        query = query.where(archive_partitions.c.mode == mode)
+    partition_ids = (await db.execute(query.order_by(archive_partitions.c.first_date))).scalars().all()
+    for partition_id in partition_ids:
+        result = await db.execute(
+            select(archive_partitions.c.mode, archive_partitions.c.data)
+            .where(archive_partitions.c.id == partition_id)
+        )
+        partition_mode, data = result.one()
+        rows = decode_partition(data, partition_mode)
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+
+async def archived_checksum(db: AsyncSession) -> dict[str, tuple[int, int]]:
+    """Per-mode (entry count, score sum) of the archive, from the partition headers."""
+    result = await db.execute(
+        select(
+            archive_partitions.c.mode,
+            func.sum(archive_partitions.c.entry_count),
+            func.sum(archive_partitions.c.score_sum),
+        ).group_by(archive_partitions.c.mode)
+    )
+    return {mode: (int(count), int(total)) for mode, count, total in result.all() if count}
+
+
+async def archived_count_at_least(db: AsyncSession, mode: str, score: int) -> int:
+    """Archived entries of `mode` scoring `score` or more; only partitions straddling it are decompressed."""
+    result = await db.execute(
+        select(archive_partitions.c.min_score, archive_partitions.c.entry_count, archive_partitions.c.data)
+        .where(archive_partitions.c.mode == mode, archive_partitions.c.max_score >= score)
+    )
+    count = 0
+    for min_score, entry_count, data in result.all():
+        if min_score >= score:
+            count += entry_count
+        else:
+            count += sum(1 for row in decode_partition(data, mode) if row[2] >= score)
+    return count
+
+
+class ArchiveCompactor:
+    """Background job archiving old entries of every mode, one bounded batch per transaction."""
+
+    def __init__(self, horizon_days: int = ARCHIVE_HORIZON_DAYS, keep_top: int = ARCHIVE_KEEP_TOP,
+                 batch_size: int = ARCHIVE_BATCH_SIZE, interval: float = ARCHIVE_INTERVAL_SECONDS) -> None:
+        self.horizon_days = horizon_days
+        self.keep_top = keep_top
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.last_run_ms: Optional[float] = None
+        self.stats = {"runs": 0, "batches": 0, "archived": 0, "errors": 0}
+
+    def cutoff(self) -> str:
+        """Entries dated before this day are old enough to archive."""
+        return (datetime.now(UTC) - timedelta(days=self.horizon_days)).strftime("%Y-%m-%d")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.compact()
+            except Exception:
+                self.stats["errors"] += 1
+                logger.exception("leaderboard archive compaction failed")
+            await asyncio.sleep(self.interval)
+
+    async def compact(self) -> int:
+        """Archive everything currently past the horizon; returns how many entries moved."""
+        from app.database import async_session
+
+        started = time.perf_counter()
+        cutoff = self.cutoff()
+        archived = 0
+        for mode in MODE_CODES:
+            while True:
+                async with async_session() as db:
+                    moved = await compact_batch(db, mode, cutoff, self.keep_top, self.batch_size)
+                if moved:
+                    self.stats["batches"] += 1
+                    archived += moved
+                if moved < self.batch_size:
+                    break
+                # Let queued requests at the table between batches
+                await asyncio.sleep(0)
+        self.stats["runs"] += 1
+        self.stats["archived"] += archived
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        return archived
+
+    def report(self) -> dict:
+        last_run_ms = round(self.last_run_ms, 1) if self.last_run_ms is not None else None
+        return {
+            "horizonDays": self.horizon_days, "keepTop": self.keep_top,
+            "lastRunMs": last_run_ms, **self.stats,
+        }
+
+
+# Set by the app lifespan when ARCHIVE_HORIZON_DAYS is set
+compactor: Optional[ArchiveCompactor] = None
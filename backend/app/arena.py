@@ -0,0 +1,367 @@
+"""Multiplayer arena rooms: dozens of snakes on one large grid.
+
+Every room keeps a single occupancy grid for all its snakes, a bytearray of
+segment counts indexed by cell (`y * size + x`), so checking a head against
+every other snake is one lookup however many snakes and segments there are.
+A tick is O(snakes); nothing compares segments pairwise. A `FreeCells` index
+of the cells holding neither a snake nor food makes placing food one seeded
+uniform draw, however full the grid is.
+
+All snakes move at once. Each tick:
+
+    - direction changes requested since the last tick apply (reversing is ignored)
+    - in walls mode leaving the grid kills; in pass-through mode heads wrap
+    - tails that move away this tick are not obstacles
+    - a head entering any segment kills, and heads meeting in one cell all die
+    - eating grows the snake by one and scores FOOD_POINTS; eaten food respawns
+
+Dead snakes leave the grid at once; their players join again to respawn.
+Rooms live in the worker that created them, so they can only be served by a
+single worker (WEB_CONCURRENCY=1): requests reaching another worker would not
+find the room. Each worker holds at most ARENA_MAX_ROOMS rooms and each user
+may open ARENA_MAX_ROOMS_PER_USER; a room with no live snake for
+ARENA_IDLE_SECONDS is closed.
+"""
+import asyncio
+from collections import deque
+import logging
+import random
+import time
+from typing import Callable, Optional
+import uuid
+
+from app.config import (
+    ARENA_FOOD_COUNT, ARENA_GRID_SIZE, ARENA_IDLE_SECONDS, ARENA_MAX_ROOMS, ARENA_MAX_ROOMS_PER_USER, ARENA_TICK_MS,
+    WORKERS
+)
+from app.game_logic import FOOD_POINTS, INITIAL_SNAKE_LENGTH, FreeCells
+from app.models import Direction, GameMode
+from app.spectators import SpectatorHub, spectator_hub
+
+
+logger = logging.getLogger(__name__)
+
+_DELTAS = {
+    Direction.UP.value: (0, -1),
+    Direction.DOWN.value: (0, 1),
+    Direction.LEFT.value: (-1, 0),
+    Direction.RIGHT.value: (1, 0),
+}
+_OPPOSITES = {
+    Direction.UP.value: Direction.DOWN.value,
+    Direction.DOWN.value: Direction.UP.value,
+    Direction.LEFT.value: Direction.RIGHT.value,
+    Direction.RIGHT.value: Direction.LEFT.value,
+}
+SPAWN_ATTEMPTS = 100
+
+
+class ArenaFull(Exception):
+    """Raised when no free spot is left to spawn a snake."""
+
+
+class TooManyRooms(Exception):
+    """Raised when the worker or the user already has as many rooms open as allowed."""
+
+
+class ArenaUnavailable(Exception):
+    """Raised when rooms can't be served because requests are spread over several workers."""
+
+
+class ArenaSnake:
+    """One player's snake; the body holds cell indexes, head first."""
+
+    __slots__ = ("player_id", "username", "body", "direction", "requested", "score", "alive")
+
+    def __init__(self, player_id: str, username: str, body: deque, direction: str) -> None:
+        self.player_id = player_id
+        self.username = username
+        self.body = body
+        self.direction = direction
+        self.requested: Optional[str] = None
+        self.score = 0
+        self.alive = True
+
+
+class ArenaRoom:
+    """The snakes, food and occupancy grid of one room."""
+
+    def __init__(self, room_id: str, mode: str, grid_size: int = ARENA_GRID_SIZE,
+                 food_count: int = ARENA_FOOD_COUNT, seed: Optional[int] = None,
+                 owner: Optional[str] = None) -> None:
+        self.room_id = room_id
+        self.mode = mode
+        self.owner = owner
+        self.grid_size = grid_size
+        self.wrap = mode == GameMode.PASS_THROUGH.value
+        self.rng = random.Random(seed)
+        self.cells = bytearray(grid_size * grid_size)
+        self.food: set[int] = set()
+        self.free = FreeCells(grid_size)
+        self.snakes: dict[str, ArenaSnake] = {}
+        self.tick_count = 0
+        for _ in range(food_count):
+            self._spawn_food()
+
+    def _cell(self, x: int, y: int) -> int:
+        return y * self.grid_size + x
+
+    def _position(self, cell: int) -> dict:
+        return {"x": cell % self.grid_size, "y": cell // self.grid_size}
+
+    def _spawn_food(self) -> Optional[int]:
+        """Put food on a uniformly drawn free cell; None if the grid is full."""
+        cell = self.free.take(self.rng)
+        if cell is not None:
+            self.food.add(cell)
+        return cell
+
+    def _occupy(self, cell: int) -> None:
+        self.cells[cell] += 1
+        self.free.occupy(cell)
+
+    def _vacate(self, cell: int) -> None:
+        self.cells[cell] -= 1
+        if not self.cells[cell]:
+            self.free.release(cell)
+
+    # Players
+    def join(self, player_id: str, username: str) -> ArenaSnake:
+        """Spawn (or respawn) a player's snake facing right on a free stretch of the grid."""
+        self.leave(player_id)
+        size = self.grid_size
+        length = INITIAL_SNAKE_LENGTH
+        for _ in range(SPAWN_ATTEMPTS):
+            # Room to move right for a few ticks as well
+            x = self.rng.randrange(length - 1, size - length)
+            y = self.rng.randrange(size)
+            cells = [self._cell(x + dx, y) for dx in range(length, -length, -1)]
+            if any(self.cells[cell] for cell in cells):
+                continue
+            body = deque(self._cell(x - i, y) for i in range(length))
+            for cell in body:
+                self._occupy(cell)
+            # Food under the new snake moves elsewhere, so the room keeps its food count
+            for cell in body:
+                if cell in self.food:
+                    self.food.discard(cell)
+                    self._spawn_food()
+            snake = self.snakes[player_id] = ArenaSnake(player_id, username, body, Direction.RIGHT.value)
+            return snake
+        raise ArenaFull(f"no room to spawn in arena {self.room_id}")
+
+    def leave(self, player_id: str) -> None:
+        snake = self.snakes.pop(player_id, None)
+        if snake is not None:
+            self._clear(snake)
+
+    def change_direction(self, player_id: str, direction: str) -> None:
+        """Request a turn for the next tick."""
+        snake = self.snakes.get(player_id)
+        if snake is not None and snake.alive:
+            snake.requested = direction
+
+    def _clear(self, snake: ArenaSnake) -> None:
+        for cell in snake.body:
+            self._vacate(cell)
+        snake.body.clear()
+        snake.alive = False
+
+    # Simulation
+    def tick(self) -> dict:
+        """Advance every snake one step and return what changed, as a spectator delta."""
+        self.tick_count += 1
+        size = self.grid_size
+        cells = self.cells
+        food = self.food
+        died: list[ArenaSnake] = []
+        moves: list[tuple[ArenaSnake, int, bool]] = []
+        targets: dict[int, int] = {}
+
+        for snake in self.snakes.values():
+            if not snake.alive:
+                continue
+            if snake.requested is not None:
+                if snake.requested != _OPPOSITES[snake.direction]:
+                    snake.direction = snake.requested
+                snake.requested = None
+            head = snake.body[0]
+            dx, dy = _DELTAS[snake.direction]
+            x, y = head % size + dx, head // size + dy
+            if self.wrap:
+                x %= size
+                y %= size
+            elif x < 0 or x >= size or y < 0 or y >= size:
+                died.append(snake)
+                continue
+            cell = y * size + x
+            moves.append((snake, cell, cell in food))
+            targets[cell] = targets.get(cell, 0) + 1
+
+        # Tails that move away free their cell before any head moves in
+        for snake, _, ate in moves:
+            if not ate:
+                self._vacate(snake.body.pop())
+
+        moved = []
+        survivors = []
+        for snake, cell, ate in moves:
+            if cells[cell] or targets[cell] > 1:
+                died.append(snake)
+            else:
+                survivors.append((snake, cell, ate))
+        for snake, cell, ate in survivors:
+            snake.body.appendleft(cell)
+            self._occupy(cell)
+            if ate:
+                food.discard(cell)
+                snake.score += FOOD_POINTS
+            moved.append([snake.player_id, cell % size, cell // size, ate])
+        for snake in died:
+            self._clear(snake)
+
+        spawned = []
+        for _ in range(sum(1 for move in moved if move[3])):
+            cell = self._spawn_food()
+            if cell is not None:
+                spawned.append([cell % size, cell // size])
+        return {
+            "tick": self.tick_count,
+            "moves": moved,
+            "died": [snake.player_id for snake in died],
+            "food": spawned,
+        }
+
+    # Output
+    def state(self) -> dict:
+        """The whole room in the shape of the API `ArenaState` model."""
+        return {
+            "roomId": self.room_id,
+            "mode": self.mode,
+            "gridSize": self.grid_size,
+            "tick": self.tick_count,
+            "snakes": [
+                {
+                    "id": snake.player_id,
+                    "username": snake.username,
+                    "snake": [self._position(cell) for cell in snake.body],
+                    "direction": snake.direction,
+                    "score": snake.score,
+                    "alive": snake.alive,
+                }
+                for snake in self.snakes.values()
+            ],
+            "food": [self._position(cell) for cell in self.food],
+        }
+
+    def info(self) -> dict:
+        """Summary in the shape of the API `ArenaRoomInfo` model."""
+        return {
+            "roomId": self.room_id,
+            "mode": self.mode,
+            "gridSize": self.grid_size,
+            "tick": self.tick_count,
+            "players": len(self.snakes),
+            "alive": sum(snake.alive for snake in self.snakes.values()),
+        }
+
+
+class ArenaManager:
+    """The rooms of this worker and the loop that ticks them every ARENA_TICK_MS."""
+
+    def __init__(self, tick_ms: float = ARENA_TICK_MS, hub: SpectatorHub = spectator_hub,
+                 max_rooms: int = ARENA_MAX_ROOMS, max_rooms_per_user: int = ARENA_MAX_ROOMS_PER_USER,
+                 idle_seconds: float = ARENA_IDLE_SECONDS, clock: Callable[[], float] = time.monotonic) -> None:
+        self.interval = tick_ms / 1000
+        self.hub = hub
+        self.max_rooms = max_rooms
+        self.max_rooms_per_user = max_rooms_per_user
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self.rooms: dict[str, ArenaRoom] = {}
+        # Last time each room had a live snake (or was opened)
+        self.active_at: dict[str, float] = {}
+        self.stats = {"ticks": 0, "lastTickMs": 0.0, "maxTickMs": 0.0, "overruns": 0, "expired": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def channel_id(room_id: str) -> str:
+        return f"arena:{room_id}"
+
+    def create(self, mode: str, grid_size: Optional[int] = None, owner: Optional[str] = None) -> ArenaRoom:
+        """
+        Open a room for `owner` and make sure the tick loop is running. Raises ArenaUnavailable with
+        several workers and TooManyRooms when this worker or the owner is at its room limit.
+        """
+        if WORKERS > 1:
+            raise ArenaUnavailable("arena rooms need a single worker (WEB_CONCURRENCY=1)")
+        if len(self.rooms) >= self.max_rooms:
+            raise TooManyRooms(f"{self.max_rooms} arena rooms are open already")
+        if owner is not None and sum(room.owner == owner for room in self.rooms.values()) >= self.max_rooms_per_user:
+            raise TooManyRooms(f"you have {self.max_rooms_per_user} arena rooms open already")
+        room_id = uuid.uuid4().hex[:8]
+        room = self.rooms[room_id] = ArenaRoom(room_id, mode, grid_size or ARENA_GRID_SIZE, owner=owner)
+        self.active_at[room_id] = self.clock()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return room
+
+    def close(self, room_id: str) -> None:
+        self.rooms.pop(room_id, None)
+        self.active_at.pop(room_id, None)
+        self.hub.close(self.channel_id(room_id))
+
+    def tick(self) -> None:
+        """
+        Tick every room with a live snake, publishing to its watchers if it has any,
+        and close the rooms that had none for `idle_seconds`.
+        """
+        now = self.clock()
+        for room in list(self.rooms.values()):
+            if not any(snake.alive for snake in room.snakes.values()):
+                if now - self.active_at.get(room.room_id, now) >= self.idle_seconds:
+                    self.close(room.room_id)
+                    self.stats["expired"] += 1
+                continue
+            self.active_at[room.room_id] = now
+            delta = room.tick()
+            channel = self.hub.channels.get(self.channel_id(room.room_id))
+            if channel is not None and channel.subscribers:
+                channel.publish(room.state(), delta)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            started = time.perf_counter()
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("arena tick failed")
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stats["ticks"] += 1
+            self.stats["lastTickMs"] = round(elapsed_ms, 3)
+            self.stats["maxTickMs"] = round(max(self.stats["maxTickMs"], elapsed_ms), 3)
+            next_tick += self.interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # Over budget: skip the missed ticks instead of bursting to catch up
+                self.stats["overruns"] += 1
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def report(self) -> dict:
+        return {"rooms": len(self.rooms), "tickMs": self.interval * 1000, **self.stats}
+
+
+arena = ArenaManager()
@@ -0,0 +1,277 @@
+"""NumPy batch simulator: many independent snake games stepped in lockstep.
+
+Used to generate spectator load and to verify replays in bulk. Game `i` is
+row `i` of every array:
+
+    body       (n, cells, 2) int16   ring buffer of segment (x, y), head at `head[i]`
+    grid       (n, size, size) bool  occupancy, indexed [game, y, x]
+    head       (n,) int32            ring index of the head segment
+    length     (n,) int32
+    direction  (n,) int8             index into DIRECTIONS
+    food       (n, 2) int16
+    score      (n,) int32
+    alive      (n,) bool             still stepping (not over and not rejected)
+
+The rules are those of `app.game_logic` (and so the frontend): walls kill in
+walls mode and wrap in pass-through mode, the tail is not an obstacle because
+it moves away, eating grows the snake by one and scores FOOD_POINTS. Requires
+numpy, which is only needed by load tools and benchmarks.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.game_logic import FOOD_POINTS, GRID_SIZE, initial_snake
+from app.models import Direction, GameMode
+
+
+# Clockwise, so the opposite of direction d is (d + 2) % 4
+DIRECTIONS = (Direction.UP.value, Direction.RIGHT.value, Direction.DOWN.value, Direction.LEFT.value)
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+NO_MOVE = -1
+
+_DELTAS = np.array([(0, -1), (1, 0), (0, 1), (-1, 0)], dtype=np.int32)
+
+
+class BatchSimulator:
+    """`count` games of one mode, stepped together."""
+
+    def __init__(self, count: int, mode: str, grid_size: int = GRID_SIZE, seed: Optional[int] = None,
+                 food_log: Optional[np.ndarray] = None, food_counts: Optional[np.ndarray] = None) -> None:
+        """
+        Food is drawn uniformly from the free cells unless `food_log` (n, k, 2)
+        gives each game its food positions in spawn order, `food_counts` of them.
+        """
+        cells = grid_size * grid_size
+        self.count = count
+        self.mode = mode
+        self.grid_size = grid_size
+        self.wrap = mode == GameMode.PASS_THROUGH.value
+        self.rng = np.random.default_rng(seed)
+
+        start = np.array(initial_snake(grid_size), dtype=np.int16)
+        self.body = np.zeros((count, cells, 2), dtype=np.int16)
+        self.body[:, :len(start)] = start[::-1]  # tail first, head last
+        self.head = np.full(count, len(start) - 1, dtype=np.int32)
+        self.length = np.full(count, len(start), dtype=np.int32)
+        self.grid = np.zeros((count, grid_size, grid_size), dtype=bool)
+        self.grid[:, start[:, 1], start[:, 0]] = True
+        self.direction = np.full(count, DIRECTION_CODES[Direction.RIGHT.value], dtype=np.int8)
+        self.food = np.zeros((count, 2), dtype=np.int16)
+        self.score = np.zeros(count, dtype=np.int32)
+        self.ticks = np.zeros(count, dtype=np.int32)
+        self.alive = np.ones(count, dtype=bool)
+        self.game_over = np.zeros(count, dtype=bool)
+        # Replays only: why a game was rejected (None if it was not)
+        self.rejected: list[Optional[str]] = [None] * count
+
+        self.food_log = food_log
+        self.food_counts = food_counts
+        self.food_next = np.zeros(count, dtype=np.int32)
+        self.spawn_food(np.arange(count))
+
+    # Food
+    def spawn_food(self, games: np.ndarray) -> None:
+        """Place new food for `games` (from the food log when there is one)."""
+        if self.food_log is None:
+            self._random_food(games)
+        else:
+            self._logged_food(games)
+
+    def _random_food(self, games: np.ndarray) -> None:
+        # Uniform over free cells: the largest random key among unoccupied cells
+        free = ~self.grid[games].reshape(len(games), -1)
+        keys = self.rng.random(free.shape)
+        keys[~free] = -1.0
+        cells = keys.argmax(axis=1)
+        self.food[games, 0] = cells % self.grid_size
+        self.food[games, 1] = cells // self.grid_size
+        # A snake filling the whole grid has nowhere left to go
+        full = games[~free.any(axis=1)]
+        self.alive[full] = False
+        self.game_over[full] = True
+
+    def _logged_food(self, games: np.ndarray) -> None:
+        spawned = self.food_next[games]
+        exhausted = spawned >= self.food_counts[games]
+        self.reject(games[exhausted], "ran out of food positions")
+        games, spawned = games[~exhausted], spawned[~exhausted]
+        food = self.food_log[games, spawned].astype(np.int32)
+        off_grid = ((food < 0) | (food >= self.grid_size)).any(axis=1)
+        clipped = np.clip(food, 0, self.grid_size - 1)
+        bad = off_grid | self.grid[games, clipped[:, 1], clipped[:, 0]]
+        for game, index in zip(games[bad], spawned[bad]):
+            self.reject(np.array([game]), f"food {index} spawned off the grid or on the snake")
+        self.food[games] = clipped
+        self.food_next[games] += 1
+
+    def reject(self, games: np.ndarray, reason: str) -> None:
+        """Stop replaying `games`, recording the first reason for each."""
+        for game in games.tolist():
+            if self.rejected[game] is None:
+                self.rejected[game] = reason
+        self.alive[games] = False
+
+    # Movement
+    def change_direction(self, requested: np.ndarray) -> None:
+        """Apply requested direction codes (NO_MOVE to keep going); reversing is ignored."""
+        valid = (requested != NO_MOVE) & self.alive & (requested != (self.direction + 2) % 4)
+        self.direction[valid] = requested[valid]
+
+    def step(self, requested: Optional[np.ndarray] = None, active: Optional[np.ndarray] = None) -> None:
+        """Advance every live game (restricted to the `active` mask) by one tick."""
+        if requested is not None:
+            self.change_direction(requested)
+        live = self.alive if active is None else self.alive & active
+        games = np.flatnonzero(live)
+        if not games.size:
+            return
+        self.ticks[games] += 1
+        size = self.grid_size
+        cells = size * size
+
+        heads = self.body[games, self.head[games]].astype(np.int32)
+        new = heads + _DELTAS[self.direction[games]]
+        if self.wrap:
+            new %= size
+            hit = np.zeros(len(games), dtype=bool)
+        else:
+            hit = ((new < 0) | (new >= size)).any(axis=1)
+            np.clip(new, 0, size - 1, out=new)
+        x, y = new[:, 0], new[:, 1]
+
+        # The tail moves out of the way, so running into it is not a collision
+        tail_slots = (self.head[games] - self.length[games] + 1) % cells
+        tails = self.body[games, tail_slots]
+        on_tail = (tails[:, 0] == x) & (tails[:, 1] == y)
+        hit |= self.grid[games, y, x] & ~on_tail
+
+        dead = games[hit]
+        self.alive[dead] = False
+        self.game_over[dead] = True
+        moving = ~hit
+        games, x, y, tails = games[moving], x[moving], y[moving], tails[moving]
+
+        ate = (x == self.food[games, 0]) & (y == self.food[games, 1])
+        shrink = ~ate
+        self.grid[games[shrink], tails[shrink, 1], tails[shrink, 0]] = False
+        slots = (self.head[games] + 1) % cells
+        self.body[games, slots, 0] = x
+        self.body[games, slots, 1] = y
+        self.head[games] = slots
+        self.grid[games, y, x] = True
+        self.length[games] += ate
+        self.score[games] += FOOD_POINTS * ate
+        if ate.any():
+            self.spawn_food(games[ate])
+
+    def bot_directions(self) -> np.ndarray:
+        """Greedy bot moves for every game: toward the food, avoiding immediate death."""
+        requested = np.full(self.count, NO_MOVE, dtype=np.int8)
+        games = np.flatnonzero(self.alive)
+        if not games.size:
+            return requested
+        size = self.grid_size
+        heads = self.body[games, self.head[games]].astype(np.int32)
+        options = heads[:, None, :] + _DELTAS[None, :, :]  # (k, 4, 2)
+        if self.wrap:
+            options %= size
+            blocked = np.zeros(options.shape[:2], dtype=bool)
+        else:
+            blocked = ((options < 0) | (options >= size)).any(axis=2)
+        clipped = np.clip(options, 0, size - 1)
+        tail_slots = (self.head[games] - self.length[games] + 1) % (size * size)
+        tails = self.body[games, tail_slots][:, None, :]
+        on_tail = (clipped == tails).all(axis=2)
+        blocked |= self.grid[games[:, None], clipped[..., 1], clipped[..., 0]] & ~on_tail
+        blocked[np.arange(len(games)), (self.direction[games] + 2) % 4] = True
+
+        distance = np.abs(options - self.food[games][:, None, :]).sum(axis=2)
+        cost = np.where(blocked, np.inf, distance + self.rng.random(distance.shape))
+        choice = cost.argmin(axis=1)
+        safe = ~blocked.all(axis=1)
+        requested[games[safe]] = choice[safe]
+        return requested
+
+    def run(self, max_ticks: int) -> None:
+        """Play every game with the bot until it ends or reaches `max_ticks`."""
+        for _ in range(max_ticks):
+            if not self.alive.any():
+                break
+            self.step(self.bot_directions())
+
+    # Output
+    def snake(self, game: int) -> np.ndarray:
+        """Segments of one game, head first, as an (length, 2) array."""
+        slots = (self.head[game] - np.arange(self.length[game])) % (self.grid_size * self.grid_size)
+        return self.body[game, slots]
+
+    def game_state(self, game: int) -> dict:
+        """One game in the shape of the API `GameState` model."""
+        return {
+            "snake": [{"x": x, "y": y} for x, y in self.snake(game).tolist()],
+            "food": {"x": int(self.food[game, 0]), "y": int(self.food[game, 1])},
+            "direction": DIRECTIONS[self.direction[game]],
+            "score": int(self.score[game]),
+        }
+
+    def game_states(self) -> list[dict]:
+        return [self.game_state(game) for game in range(self.count)]
+
+
+def verify_replays(mode: str, scores: Sequence[int], replays: Sequence[dict],
+                   grid_size: int = GRID_SIZE) -> list[tuple[bool, Optional[str]]]:
+    """Batch version of `app.verification.replay_game` for games of one mode."""
+    count = len(replays)
+    ticks = np.array([replay["ticks"] for replay in replays], dtype=np.int64)
+    food_counts = np.array([len(replay["foods"]) for replay in replays], dtype=np.int32)
+    food_log = np.zeros((count, max(food_counts, default=1), 2), dtype=np.int32)
+    for game, replay in enumerate(replays):
+        food_log[game, :food_counts[game]] = [(food["x"], food["y"]) for food in replay["foods"]]
+    sim = BatchSimulator(count, mode, grid_size, food_log=food_log, food_counts=food_counts)
+
+    # Moves as parallel (tick, slot within the tick, game, direction) arrays sorted by tick
+    move_rows = []
+    for game, replay in enumerate(replays):
+        last = -1
+        slot = 0
+        for move in replay["moves"]:
+            tick = move["tick"]
+            if tick < last:
+                sim.reject(np.array([game]), "moves are not in tick order")
+                break
+            if tick >= replay["ticks"]:
+                sim.reject(np.array([game]), "moves after the last tick")
+                break
+            slot = slot + 1 if tick == last else 0
+            last = tick
+            move_rows.append((tick, slot, game, DIRECTION_CODES[move["direction"]]))
+    moves = np.array(sorted(move_rows), dtype=np.int64).reshape(-1, 4)
+    requested = np.full(count, NO_MOVE, dtype=np.int8)
+    checked = np.zeros(count, dtype=bool)
+
+    for tick in range(int(ticks.max(initial=0))):
+        running = tick < ticks
+        ended = sim.game_over & running & ~checked
+        if ended.any():
+            sim.reject(np.flatnonzero(ended), f"game ended before tick {tick}")
+            checked |= ended
+        start, stop = np.searchsorted(moves[:, 0], [tick, tick + 1])
+        for slot in np.unique(moves[start:stop, 1]):
+            batch = moves[start:stop][moves[start:stop, 1] == slot]
+            requested[batch[:, 2]] = batch[:, 3]
+            sim.change_direction(requested)
+            requested[batch[:, 2]] = NO_MOVE
+        sim.step(active=running)
+
+    results = []
+    for game in range(count):
+        if sim.rejected[game] is not None:
+            results.append((False, sim.rejected[game]))
+        elif sim.food_next[game] != food_counts[game]:
+            results.append((False, "unused food positions"))
+        elif sim.score[game] != scores[game]:
+            results.append((False, f"replay scores {sim.score[game]}, submitted {scores[game]}"))
+        else:
+            results.append((True, None))
+    return results
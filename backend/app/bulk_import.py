@@ -0,0 +1,328 @@
+"""Bulk import and seeding pipeline for users and leaderboard entries.
+
+Reads NDJSON or CSV in chunks, validates every row against the API models,
+writes each chunk with a single executemany insert and defers the high-score
+rebuild until the whole file is in. Imported leaderboard entries go through
+the same paths as submits: a row with a `replay` is stored with a pending
+verification, and with SCORE_LOG_DIR set every entry is appended to the score
+log. Running servers keep their in-memory leaderboard and verification queue,
+so restart them to serve the imported entries and verify their replays.
+
+    python -m app.bulk_import leaderboard entries.ndjson
+    python -m app.bulk_import users users.csv --format csv
+    python -m app.bulk_import seed --users 1000 --entries 1000000
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import random
+import time
+from datetime import date, datetime, timedelta, UTC
+from typing import Any, Callable, Iterable, Iterator, Optional, TextIO
+import uuid
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import score_log
+from app.config import SCORE_LOG_DIR
+from app.database import append_to_score_log, async_session, create_leaderboard_tables
+from app.db_models import User as DBUser, LeaderboardEntry as DBLeaderboardEntry
+from app.models import ExportFormat, GameMode, LeaderboardEntry, ReplayLog, User
+from app.verification import verification_row, verifications, visible_clause
+
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# User id recorded in the score log for entries whose username has no account
+UNKNOWN_USER_ID = str(uuid.UUID(int=0))
+
+# Hash of "password123", shared by generated seed users
+SEED_PASSWORD_HASH = "$2b$12$.1JnDJOdOylnBX4sdJM88ezzIwGqkshQ94XdYZJBK.exL6eBJz7D2"
+
+
+class RowValidator:
+    """Validates raw rows against an API model and maps them to table columns."""
+
+    def __init__(
+        self,
+        model: type[BaseModel],
+        to_columns: Callable[[BaseModel, dict], dict],
+        defaults: Optional[Callable[[], dict]] = None,
+        required: tuple[str, ...] = (),
+    ) -> None:
+        self.model = model
+        self.to_columns = to_columns
+        self.defaults = defaults
+        self.required = required
+        self.errors: list[tuple[int, str]] = []
+
+    def validate(self, line: int, row: Any) -> Optional[dict]:
+        """Return the table columns for `row`, or None (recording the error) if it is invalid."""
+        if not isinstance(row, dict):
+            self.errors.append((line, "row is not an object"))
+            return None
+        missing = [field for field in self.required if not row.get(field)]
+        if missing:
+            self.errors.append((line, f"missing {', '.join(missing)}"))
+            return None
+        data = {**self.defaults(), **row} if self.defaults else row
+        try:
+            return self.to_columns(self.model.model_validate(data), row)
+        except ValidationError as exc:
+            self.errors.append((line, str(exc.errors(include_url=False))))
+        except ValueError as exc:
+            self.errors.append((line, str(exc)))
+        return None
+
+
+def _replay(row: dict) -> Optional[dict]:
+    """The validated replay log of a row, if it has one (a JSON string in CSV)."""
+    replay = row.get("replay")
+    if replay is None:
+        return None
+    if isinstance(replay, str):
+        return ReplayLog.model_validate_json(replay).model_dump()
+    return ReplayLog.model_validate(replay).model_dump()
+
+
+def leaderboard_validator() -> RowValidator:
+    """Validator for leaderboard rows: id (optional), username, score, mode, date, replay (optional)."""
+    return RowValidator(
+        LeaderboardEntry,
+        lambda entry, row: {
+            "id": entry.id, "username": entry.username, "score": entry.score,
+            "mode": entry.mode.value, "date": date.fromisoformat(entry.date).isoformat(),
+            "replay": _replay(row),
+        },
+        defaults=lambda: {"id": str(uuid.uuid4())},
+    )
+
+
+def user_validator() -> RowValidator:
+    """Validator for user rows: id, highScore, createdAt (optional), username, email, password_hash."""
+    return RowValidator(
+        User,
+        lambda user, row: {
+            "id": user.id, "username": user.username, "email": user.email,
+            "password_hash": row["password_hash"], "high_score": user.highScore,
+            "created_at": user.createdAt,
+        },
+        defaults=lambda: {"id": str(uuid.uuid4()), "highScore": 0, "createdAt": datetime.now(UTC)},
+        required=("password_hash",),
+    )
+
+
+# Readers
+def read_rows(source: TextIO, format: ExportFormat) -> Iterator[tuple[int, dict]]:
+    """Yield (line number, raw row) pairs from an NDJSON or CSV stream."""
+    if format == ExportFormat.CSV:
+        # Line 1 is the header; CSV has no types, so the model coerces the strings
+        for line, row in enumerate(csv.DictReader(source), 2):
+            yield line, {key: value for key, value in row.items() if value != ""}
+        return
+    for line, text in enumerate(source, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError:
+            # Reported by the validator like any other bad row
+            yield line, text
+
+
+def chunked(rows: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """Split an iterable into lists of at most `size` items."""
+    it = iter(rows)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+# Import
+async def _drop_indexes(db: AsyncSession, table) -> list:
+    indexes = list(table.indexes)
+    conn = await db.connection()
+    for index in indexes:
+        await conn.run_sync(lambda sync_conn, index=index: index.drop(sync_conn))
+    return indexes
+
+
+async def _create_indexes(db: AsyncSession, indexes: list) -> None:
+    conn = await db.connection()
+    for index in indexes:
+        await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn))
+
+
+async def _rebuild_high_scores(db: AsyncSession) -> None:
+    """Raise every user's high score to their best visible leaderboard score (verified, where needed)."""
+    best = (
+        select(func.max(DBLeaderboardEntry.score))
+        .outerjoin(verifications, verifications.c.entry_id == DBLeaderboardEntry.id)
+        .where(DBLeaderboardEntry.username == DBUser.username, visible_clause())
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(DBUser).where(best > DBUser.high_score).values(high_score=best)
+    )
+
+
+async def _insert_entries(db: AsyncSession, values: list[dict]) -> None:
+    """Insert a chunk of leaderboard entries with their pending verifications, then log them."""
+    await db.execute(
+        insert(DBLeaderboardEntry),
+        [{key: value for key, value in columns.items() if key != "replay"} for columns in values]
+    )
+    replays = [verification_row(columns["id"], columns["replay"]) for columns in values if columns["replay"]]
+    if replays:
+        await db.execute(insert(verifications), replays)
+    pending = None
+    if score_log.score_log is not None:
+        result = await db.execute(
+            select(DBUser.username, DBUser.id).where(DBUser.username.in_({columns["username"] for columns in values}))
+        )
+        user_ids = dict(result.all())
+        pending = [
+            score_log.score_log.pending_row(
+                columns["id"], user_ids.get(columns["username"], UNKNOWN_USER_ID), columns["score"], columns["mode"]
+            )
+            for columns in values
+        ]
+        await db.execute(insert(score_log.pending), pending)
+    await db.commit()
+    if pending:
+        await append_to_score_log(db, pending)
+
+
+async def import_rows(
+    db: AsyncSession,
+    table,
+    rows: Iterable[tuple[int, dict]],
+    validator: RowValidator,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    drop_indexes: bool = False,
+) -> dict:
+    """
+    Validate and insert rows chunk by chunk. Returns a report with rows/s.
+
+    Index drops (optional) and the high-score rebuild happen once, after the last chunk.
+    """
+    started = time.perf_counter()
+    read = inserted = 0
+    indexes = await _drop_indexes(db, table) if drop_indexes else []
+    try:
+        for chunk in chunked(rows, chunk_size):
+            read += len(chunk)
+            values = [columns for line, row in chunk if (columns := validator.validate(line, row))]
+            if values:
+                if table is DBLeaderboardEntry.__table__:
+                    await _insert_entries(db, values)
+                else:
+                    await db.execute(insert(table), values)
+                    await db.commit()
+                inserted += len(values)
+    finally:
+        if indexes:
+            await _create_indexes(db, indexes)
+            await db.commit()
+
+    rebuild_started = time.perf_counter()
+    if table is DBLeaderboardEntry.__table__:
+        await _rebuild_high_scores(db)
+        await db.commit()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "read": read,
+        "inserted": inserted,
+        "rejected": len(validator.errors),
+        "errors": validator.errors[:20],
+        "seconds": round(elapsed, 3),
+        "rebuildSeconds": round(time.perf_counter() - rebuild_started, 3),
+        "rowsPerSecond": round(inserted / elapsed, 1) if elapsed else None,
+    }
+
+
+# Seed data
+def generate_users(count: int) -> Iterator[tuple[int, dict]]:
+    """Yield synthetic user rows for load testing."""
+    for i in range(count):
+        yield i + 1, {
+            "username": f"seed{i:07d}",
+            "email": f"seed{i:07d}@seed.example.com",
+            "password_hash": SEED_PASSWORD_HASH,
+        }
+
+
+def generate_entries(count: int, users: int, seed: int = 0) -> Iterator[tuple[int, dict]]:
+    """Yield synthetic leaderboard rows spread over `users` seed users."""
+    rng = random.Random(seed)
+    modes = [mode.value for mode in GameMode]
+    today = date.today()
+    for i in range(count):
+        yield i + 1, {
+            "username": f"seed{rng.randrange(max(users, 1)):07d}",
+            "score": int(rng.paretovariate(1.5) * 100),
+            "mode": rng.choice(modes),
+            "date": (today - timedelta(days=rng.randrange(365))).isoformat(),
+        }
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if SCORE_LOG_DIR:
+        score_log.score_log = score_log.ScoreEventLog()
+        score_log.score_log.open()
+    try:
+        await _run(args)
+    finally:
+        if score_log.score_log is not None:
+            score_log.score_log.close()
+            score_log.score_log = None
+
+
+async def _run(args: argparse.Namespace) -> None:
+    await create_leaderboard_tables()
+    async with async_session() as db:
+        if args.command == "seed":
+            reports = {
+                "users": await import_rows(
+                    db, DBUser.__table__, generate_users(args.users), user_validator(), args.chunk_size
+                ),
+                "entries": await import_rows(
+                    db, DBLeaderboardEntry.__table__, generate_entries(args.entries, args.users),
+                    leaderboard_validator(), args.chunk_size, args.drop_indexes,
+                ),
+            }
+            print(json.dumps(reports, indent=2))
+            return
+
+        table, validator = {
+            "leaderboard": (DBLeaderboardEntry.__table__, leaderboard_validator()),
+            "users": (DBUser.__table__, user_validator()),
+        }[args.command]
+        with open(args.path, newline="") as source:
+            rows = read_rows(source, args.format)
+            report = await import_rows(db, table, rows, validator, args.chunk_size, args.drop_indexes)
+        print(json.dumps(report, indent=2))
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.bulk_import", description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--drop-indexes", action="store_true",
+                        help="drop leaderboard indexes during the import and recreate them at the end")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("leaderboard", "users"):
+        command = commands.add_parser(name, help=f"import {name} rows from a file")
+        command.add_argument("path")
+        command.add_argument("--format", type=ExportFormat, default=ExportFormat.NDJSON)
+    seed = commands.add_parser("seed", help="generate load-test users and leaderboard entries")
+    seed.add_argument("--users", type=int, default=1000)
+    seed.add_argument("--entries", type=int, default=100000)
+    asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
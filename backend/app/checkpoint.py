@@ -0,0 +1,358 @@
+"""Checkpointed in-memory leaderboard for fast restarts.
+
+Loading the leaderboard from the database reads and parses every entry ever
+submitted, so worker start-up grows with the history. With
+`LEADERBOARD_CHECKPOINT_DIR` set, one worker (the holder of the directory's
+lock) periodically writes the in-memory leaderboard to a checkpoint file and
+appends every later change to a tail log:
+
+    leaderboard.<generation>.ckpt   column and histogram bytes, CRC32-checked
+    leaderboard.<generation>.log    NDJSON leaderboard changes since that checkpoint
+
+A checkpoint rotates to a new generation's log in the same step that copies
+the columns, so no change falls between the two; older files are deleted
+once the new checkpoint is in place. On start, workers map the newest
+checkpoint, copy its columns straight into the store and replay the logs of
+that generation and later. The cost follows the number of recent changes, not
+the history. The result is then checked against the database's per-mode entry
+count and score sum (one aggregate query), and any mismatch, such as a
+change that never reached the log, falls back to a full load.
+"""
+from array import array
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from typing import Optional
+import zlib
+
+from app.config import LEADERBOARD_CHECKPOINT_DIR, LEADERBOARD_CHECKPOINT_INTERVAL_SECONDS
+from app import events
+from app.leaderboard_store import LeaderboardStore
+from app.score_histogram import BUCKETS
+from app.shared_data import MODES_BY_CODE
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = "checkpoint.lock"
+_FILE_RE = re.compile(r"^leaderboard\.(\d+)\.(ckpt|log)$")
+
+# Checkpoint file
+#
+# Header (with a CRC32 of everything after it), then 8-byte aligned sections:
+#   counts      uint32[modes]   entries per mode, in MODES_BY_CODE order
+#   per mode    scores int32[n], days int32[n], names uint32[n], ids 16 bytes[n]
+#   histograms  int64[BUCKETS + 3] each (Fenwick tree, count, total), all modes first
+#   offsets     uint32[m+1]     username start offsets into the blob
+#   blob        utf-8           usernames in store order
+CHECKPOINT_MAGIC = b"SALC"
+CHECKPOINT_VERSION = 1
+_CHECKPOINT_HEADER = struct.Struct("<4sHBxQII")
+_BYTE_ORDERS = {"little": 0, "big": 1}
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _checkpoint_layout(counts: list[int], m: int) -> list[tuple[str, int, int]]:
+    """Return (section, byte offset, size) for a checkpoint with these mode counts and m names."""
+    sizes = [("counts", 4 * len(counts))]
+    for mode, n in zip(MODES_BY_CODE, counts):
+        sizes += [
+            (f"{mode}.scores", 4 * n), (f"{mode}.days", 4 * n), (f"{mode}.names", 4 * n), (f"{mode}.ids", 16 * n)
+        ]
+    for key in ["", *MODES_BY_CODE]:
+        sizes.append((f"histogram.{key}", 8 * (BUCKETS + 3)))
+    sizes.append(("offsets", 4 * (m + 1)))
+    layout = []
+    offset = _align(_CHECKPOINT_HEADER.size)
+    for name, size in sizes:
+        layout.append((name, offset, size))
+        offset = _align(offset + size)
+    layout.append(("blob", offset, 0))
+    return layout
+
+
+def checkpoint_sections(store: LeaderboardStore) -> dict[str, bytes]:
+    """Copy the store into checkpoint sections; cheap enough to run on the event loop."""
+    sections = {"counts": array("I", (len(store.partitions[mode]) for mode in MODES_BY_CODE)).tobytes()}
+    for mode in MODES_BY_CODE:
+        columns = store.partitions[mode].to_columns()
+        sections[f"{mode}.scores"] = columns.scores.tobytes()
+        sections[f"{mode}.days"] = columns.days.tobytes()
+        sections[f"{mode}.names"] = columns.names.tobytes()
+        sections[f"{mode}.ids"] = bytes(columns.ids)
+    for mode, histogram in store.histograms.items():
+        totals = array("q", (histogram.count, histogram.total))
+        sections[f"histogram.{mode or ''}"] = histogram.tree.tobytes() + totals.tobytes()
+    encoded = [name.encode("utf-8") for name in store.usernames]
+    offsets = array("I", [0])
+    for raw in encoded:
+        offsets.append(offsets[-1] + len(raw))
+    sections["offsets"] = offsets.tobytes()
+    sections["blob"] = b"".join(encoded)
+    return sections
+
+
+def write_checkpoint(path: str, generation: int, sections: dict[str, bytes]) -> None:
+    """Write checkpoint sections to `path` (through a temporary file and a rename)."""
+    counts = array("I")
+    counts.frombytes(sections["counts"])
+    m = len(sections["offsets"]) // 4 - 1
+    body = bytearray()
+    base = _align(_CHECKPOINT_HEADER.size)
+    for name, offset, _ in _checkpoint_layout(list(counts), m):
+        body += bytes(offset - base - len(body))
+        body += sections[name]
+    header = _CHECKPOINT_HEADER.pack(
+        CHECKPOINT_MAGIC, CHECKPOINT_VERSION, _BYTE_ORDERS[sys.byteorder], generation, m, zlib.crc32(body)
+    )
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header + bytes(base - len(header)))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str, store: LeaderboardStore) -> int:
+    """Replace the store's contents with a mapped checkpoint and return its generation."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        view = memoryview(mapped)
+        try:
+            magic, version, byte_order, generation, m, crc = _CHECKPOINT_HEADER.unpack_from(view)
+            if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+                raise ValueError(f"{path} is not a version {CHECKPOINT_VERSION} leaderboard checkpoint")
+            if byte_order != _BYTE_ORDERS[sys.byteorder]:
+                raise ValueError(f"{path} was written on a machine with a different byte order")
+            base = _align(_CHECKPOINT_HEADER.size)
+            if zlib.crc32(view[base:]) != crc:
+                raise ValueError(f"{path} is corrupt (checksum mismatch)")
+            counts = list(view[base:base + 4 * len(MODES_BY_CODE)].cast("I"))
+            sections = {name: (offset, size) for name, offset, size in _checkpoint_layout(counts, m)}
+
+            def section(name: str) -> memoryview:
+                offset, size = sections[name]
+                return view[offset:offset + size]
+
+            store.clear()
+            for mode in MODES_BY_CODE:
+                columns = store.partitions[mode]
+                columns.scores.frombytes(section(f"{mode}.scores"))
+                columns.days.frombytes(section(f"{mode}.days"))
+                columns.names.frombytes(section(f"{mode}.names"))
+                columns.ids += section(f"{mode}.ids")
+            for mode, histogram in store.histograms.items():
+                raw = array("q")
+                raw.frombytes(section(f"histogram.{mode or ''}"))
+                histogram.tree = raw[:BUCKETS + 1]
+                histogram.count, histogram.total = raw[BUCKETS + 1], raw[BUCKETS + 2]
+            offsets = section("offsets").cast("I")
+            blob = bytes(view[sections["blob"][0]:sections["blob"][0] + offsets[m]])
+            # Interned in order, so the name indexes of the columns stay valid
+            for i in range(m):
+                store.intern(blob[offsets[i]:offsets[i + 1]].decode("utf-8"))
+            offsets.release()
+        finally:
+            view.release()
+    finally:
+        mapped.close()
+    store.loaded = True
+    return generation
+
+
+def apply_change(store: LeaderboardStore, change: dict) -> None:
+    """Apply a LEADERBOARD_CHANGED payload to the store."""
+    entry = change["entry"]
+    if change["op"] == "add":
+        store.add(entry["id"], entry["username"], entry["score"], entry["mode"], entry["date"])
+    else:
+        store.remove(entry["id"], entry["score"], entry["mode"])
+
+
+def replay_log(path: str, store: LeaderboardStore) -> int:
+    """Apply the changes in a tail log and return how many there were."""
+    replayed = 0
+    with open(path) as f:
+        for line in f:
+            try:
+                change = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn final write, or the owner is appending right now
+                break
+            apply_change(store, change)
+            replayed += 1
+    return replayed
+
+
+def store_checksum(store: LeaderboardStore) -> dict[str, tuple[int, int]]:
+    """Per-mode (entry count, score sum) of the store, for comparison with the database."""
+    return {
+        mode: (len(store.histograms[mode]), store.histograms[mode].total)
+        for mode in MODES_BY_CODE if len(store.histograms[mode])
+    }
+
+
+class LeaderboardCheckpointer:
+    """Checkpoint and tail-log writer (in the lock-holding worker) and restore on start (in every worker)."""
+
+    def __init__(self, directory: str = LEADERBOARD_CHECKPOINT_DIR,
+                 interval: float = LEADERBOARD_CHECKPOINT_INTERVAL_SECONDS) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.owner = False
+        self.generation = 0
+        self.store: Optional[LeaderboardStore] = None
+        self._lock_fd: Optional[int] = None
+        self._log_fd: Optional[int] = None
+        self._unsubscribe = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"logged": 0, "checkpoints": 0, "replayed": 0, "restoreMs": None, "checkpointMs": None}
+
+    def path(self, generation: int, kind: str) -> str:
+        return os.path.join(self.directory, f"leaderboard.{generation}.{kind}")
+
+    def _generations(self, kind: str) -> list[int]:
+        found = []
+        for name in os.listdir(self.directory):
+            match = _FILE_RE.match(name)
+            if match and match.group(2) == kind:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    async def start(self) -> None:
+        """Take the directory lock if no other worker holds it; the holder writes checkpoints."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.owner = True
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def restore(self, store: LeaderboardStore) -> bool:
+        """Load the newest checkpoint and replay the logs after it. Returns False if there is none to use."""
+        started = time.perf_counter()
+        replayed = 0
+        try:
+            checkpoints = self._generations("ckpt")
+            if not checkpoints:
+                return False
+            generation = load_checkpoint(self.path(checkpoints[-1], "ckpt"), store)
+            for log_generation in self._generations("log"):
+                if log_generation >= generation:
+                    replayed += replay_log(self.path(log_generation, "log"), store)
+                    generation = log_generation
+        except (OSError, ValueError, KeyError):
+            # Deleted by a newer checkpoint while we read it, or damaged
+            logger.exception("restoring the leaderboard checkpoint failed")
+            store.clear()
+            return False
+        self.generation = generation
+        self.stats["replayed"] = replayed
+        self.stats["restoreMs"] = round((time.perf_counter() - started) * 1000, 3)
+        return True
+
+    def resume(self, store: LeaderboardStore, restored: bool) -> None:
+        """Start logging changes to the loaded store; a store loaded from the database is checkpointed first.
+
+        Called again with `restored=False` if a restored store failed its check against the database.
+        """
+        self.store = store
+        if not self.owner:
+            return
+        if restored:
+            self._open_log(self.generation)
+        else:
+            # Number past every file on disk, so a stale checkpoint is never the newest
+            self.generation = max([self.generation, *self._generations("ckpt"), *self._generations("log")])
+            self._write_checkpoint(self._rotate())
+        if self._unsubscribe is None:
+            self._unsubscribe = events.event_bus.subscribe(events.LEADERBOARD_CHANGED, self.on_change)
+            self._task = asyncio.create_task(self._run())
+
+    def on_change(self, event: events.Event) -> None:
+        """LEADERBOARD_CHANGED handler: append every change this worker's store applies."""
+        if self._log_fd is None or not self.store.loaded:
+            return
+        os.write(self._log_fd, (json.dumps(event.payload, separators=(",", ":")) + "\n").encode("utf-8"))
+        self.stats["logged"] += 1
+
+    def _open_log(self, generation: int) -> None:
+        if self._log_fd is not None:
+            os.close(self._log_fd)
+        self._log_fd = os.open(self.path(generation, "log"), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        self.generation = generation
+
+    def _rotate(self) -> tuple[int, dict[str, bytes]]:
+        """Copy the store and switch to the next generation's log in one step."""
+        sections = checkpoint_sections(self.store)
+        self._open_log(self.generation + 1)
+        return self.generation, sections
+
+    def _write_checkpoint(self, rotated: tuple[int, dict[str, bytes]]) -> None:
+        generation, sections = rotated
+        started = time.perf_counter()
+        write_checkpoint(self.path(generation, "ckpt"), generation, sections)
+        # Everything older is covered by the new checkpoint
+        for kind in ("ckpt", "log"):
+            for old in self._generations(kind):
+                if old < generation:
+                    os.remove(self.path(old, kind))
+        self.stats["checkpoints"] += 1
+        self.stats["checkpointMs"] = round((time.perf_counter() - started) * 1000, 3)
+
+    async def checkpoint(self) -> None:
+        """Write a checkpoint of the store, off the event loop."""
+        await asyncio.to_thread(self._write_checkpoint, self._rotate())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if os.fstat(self._log_fd).st_size == 0:
+                continue
+            try:
+                await self.checkpoint()
+            except Exception:
+                logger.exception("leaderboard checkpoint failed")
+
+    async def stop(self) -> None:
+        """Write a final checkpoint, so the next start has no log to replay, and release the lock."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self._log_fd is not None:
+            if os.fstat(self._log_fd).st_size:
+                await self.checkpoint()
+            os.close(self._log_fd)
+            self._log_fd = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            self.owner = False
+
+    def report(self) -> dict:
+        return {"owner": self.owner, "generation": self.generation, **self.stats}
+
+
+# Set by the app lifespan when LEADERBOARD_CHECKPOINT_DIR is set
+checkpointer: Optional[LeaderboardCheckpointer] = None
@@ -17,3 +17,144 @@ CORS_ORIGINS = [
 
 # API Settings
 API_V1_PREFIX = "/api/v1"
+LAZY_ROUTERS = os.getenv("LAZY_ROUTERS", "1") == "1"
+
+# Admission Control Settings
+# Concurrent requests per route class (critical submits, auth, other writes, reads); the rest
+# queue, and queues whose delay stays above ADMISSION_TARGET_MS for a whole
+# ADMISSION_INTERVAL_MS shed new arrivals, lower priorities first.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_CRITICAL_LIMIT = int(os.getenv("ADMISSION_CRITICAL_LIMIT", "64"))
+ADMISSION_AUTH_LIMIT = int(os.getenv("ADMISSION_AUTH_LIMIT", "8"))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", "16"))
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", "32"))
+ADMISSION_TARGET_MS = float(os.getenv("ADMISSION_TARGET_MS", "5"))
+ADMISSION_INTERVAL_MS = float(os.getenv("ADMISSION_INTERVAL_MS", "100"))
+
+# Worker Settings
+# Number of server worker processes (uvicorn's --workers defaults to
+# WEB_CONCURRENCY). What a worker keeps in memory, such as the in-memory
+# leaderboard, only sees other workers' changes over the unix event bus.
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Database Settings
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./snake_arena.db")
+
+# Warm-up Settings
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", "5"))
+
+# Shared Data Settings (pre-fork mode, see `make prod-shared`)
+# Directory for the read-only leaderboard snapshot and the sessions segment;
+# use a tmpfs such as /dev/shm. Unset disables shared mode.
+SHARED_DATA_DIR = os.getenv("SHARED_DATA_DIR")
+SHARED_SESSIONS_CAPACITY = int(os.getenv("SHARED_SESSIONS_CAPACITY", "65536"))
+
+# Leaderboard Checkpoint Settings
+# Directory for the checkpointed in-memory leaderboard and its tail log, so
+# restarts replay recent changes instead of reading the whole table. Unset
+# disables checkpoints.
+LEADERBOARD_CHECKPOINT_DIR = os.getenv("LEADERBOARD_CHECKPOINT_DIR")
+LEADERBOARD_CHECKPOINT_INTERVAL_SECONDS = float(os.getenv("LEADERBOARD_CHECKPOINT_INTERVAL_SECONDS", "60"))
+
+# Score Event Log Settings
+# Directory of the append-only log of submitted scores (fixed-size records in
+# rotating segments). Unset disables the log.
+SCORE_LOG_DIR = os.getenv("SCORE_LOG_DIR")
+SCORE_LOG_SEGMENT_RECORDS = int(os.getenv("SCORE_LOG_SEGMENT_RECORDS", "1048576"))
+SCORE_LOG_INDEX_INTERVAL = int(os.getenv("SCORE_LOG_INDEX_INTERVAL", "4096"))
+
+# Archive Settings
+# Entries dated more than ARCHIVE_HORIZON_DAYS ago move from the leaderboard
+# table into compressed, read-only archive partitions, except each mode's
+# ARCHIVE_KEEP_TOP best. A background job moves ARCHIVE_BATCH_SIZE entries per
+# transaction every ARCHIVE_INTERVAL_SECONDS. Unset disables archival.
+ARCHIVE_HORIZON_DAYS = int(os.environ["ARCHIVE_HORIZON_DAYS"]) if os.getenv("ARCHIVE_HORIZON_DAYS") else None
+ARCHIVE_KEEP_TOP = int(os.getenv("ARCHIVE_KEEP_TOP", "1000"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Score Ingestion Settings
+# "sync" commits every submit; "write-behind" acknowledges from the in-memory
+# leaderboard once the submit is in the local journal and group-commits to the DB.
+INGEST_MODE = os.getenv("INGEST_MODE", "sync")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_INTERVAL_MS = float(os.getenv("INGEST_FLUSH_INTERVAL_MS", "5"))
+INGEST_ENQUEUE_TIMEOUT_MS = float(os.getenv("INGEST_ENQUEUE_TIMEOUT_MS", "50"))
+INGEST_JOURNAL_PATH = os.getenv("INGEST_JOURNAL_PATH", "./ingest.journal")
+
+# Idempotency Settings
+# Submits with an Idempotency-Key header are remembered for
+# IDEMPOTENCY_TTL_SECONDS in a table of IDEMPOTENCY_CAPACITY entries that the
+# workers share through a memory-mapped file (ideally on a tmpfs).
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "1") == "1"
+IDEMPOTENCY_PATH = os.getenv("IDEMPOTENCY_PATH", "/tmp/snake-arena-idempotency.shm")
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "3600"))
+IDEMPOTENCY_CAPACITY = int(os.getenv("IDEMPOTENCY_CAPACITY", "65536"))
+
+# Score Verification Settings
+# Submits with a replay log are re-simulated by a process pool off the request
+# path. Scores above the threshold stay hidden until verified; unset shows
+# unverified scores and only hides rejected ones.
+VERIFY_ENABLED = os.getenv("VERIFY_ENABLED", "1") == "1"
+VERIFY_SCORE_THRESHOLD = int(os.environ["VERIFY_SCORE_THRESHOLD"]) if os.getenv("VERIFY_SCORE_THRESHOLD") else None
+VERIFY_WORKERS = int(os.getenv("VERIFY_WORKERS", str(os.cpu_count() or 1)))
+VERIFY_BATCH_SIZE = int(os.getenv("VERIFY_BATCH_SIZE", "256"))
+VERIFY_QUEUE_SIZE = int(os.getenv("VERIFY_QUEUE_SIZE", "10000"))
+
+# Query Instrumentation Settings
+# Every statement is timed and tagged with the app function that issued it.
+# Statements taking SLOW_QUERY_MS or more are logged with their EXPLAIN plan
+# (the newest SLOW_QUERY_LOG_SIZE are kept), and requests issuing more than
+# QUERY_N_PLUS_ONE_THRESHOLD statements are flagged as likely N+1 patterns.
+# Off by default, as it adds work to every statement. /debug/queries shows
+# statement text and plans, so it is served only with QUERY_DEBUG_ENABLED on.
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "0") == "1"
+QUERY_DEBUG_ENABLED = os.getenv("QUERY_DEBUG_ENABLED", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_N_PLUS_ONE_THRESHOLD", "20"))
+
+# Read Coalescing Settings
+# Concurrent identical reads share one query. Results are fresh for *_TTL_MS,
+# then served stale for up to *_STALE_MS more while one refresh runs.
+LEADERBOARD_READ_TTL_MS = float(os.getenv("LEADERBOARD_READ_TTL_MS", "1000"))
+LEADERBOARD_READ_STALE_MS = float(os.getenv("LEADERBOARD_READ_STALE_MS", "10000"))
+GAME_STATE_READ_TTL_MS = float(os.getenv("GAME_STATE_READ_TTL_MS", "100"))
+GAME_STATE_READ_STALE_MS = float(os.getenv("GAME_STATE_READ_STALE_MS", "1000"))
+
+# Spectator Settings
+# Frames queued per watcher before its pending deltas are replaced by a keyframe
+SPECTATOR_QUEUE_SIZE = int(os.getenv("SPECTATOR_QUEUE_SIZE", "32"))
+# A full game state is sent at least every this many updates
+SPECTATOR_KEYFRAME_INTERVAL = int(os.getenv("SPECTATOR_KEYFRAME_INTERVAL", "50"))
+
+# Game State Settings
+# Live game states are kept in memory and saved to the database at most this often
+GAME_STATE_FLUSH_INTERVAL_MS = float(os.getenv("GAME_STATE_FLUSH_INTERVAL_MS", "1000"))
+
+# Arena Settings
+# Multiplayer rooms tick every ARENA_TICK_MS; each keeps ARENA_FOOD_COUNT food items
+ARENA_TICK_MS = float(os.getenv("ARENA_TICK_MS", "100"))
+ARENA_GRID_SIZE = int(os.getenv("ARENA_GRID_SIZE", "64"))
+ARENA_FOOD_COUNT = int(os.getenv("ARENA_FOOD_COUNT", "32"))
+# Open rooms per worker and per user; rooms with no live snake for ARENA_IDLE_SECONDS are closed
+ARENA_MAX_ROOMS = int(os.getenv("ARENA_MAX_ROOMS", "64"))
+ARENA_MAX_ROOMS_PER_USER = int(os.getenv("ARENA_MAX_ROOMS_PER_USER", "2"))
+ARENA_IDLE_SECONDS = float(os.getenv("ARENA_IDLE_SECONDS", "300"))
+
+# Event Bus Settings
+# "memory" delivers events within one worker; "unix" also fans them out to the
+# other workers on this host through datagram sockets in EVENT_BUS_DIR.
+EVENT_BUS = os.getenv("EVENT_BUS", "memory")
+EVENT_BUS_DIR = os.getenv("EVENT_BUS_DIR", "/tmp/snake-arena-events")
+
+# Active Player Reaper Settings
+# Games with no heartbeat or game-state update for ACTIVE_PLAYER_TTL_SECONDS are
+# removed, checked every REAPER_INTERVAL_SECONDS with one DELETE per batch. Off by
+# default: clients must send heartbeats, and with several workers the reaper needs
+# EVENT_BUS=unix so every worker sees them.
+REAPER_ENABLED = os.getenv("REAPER_ENABLED", "0") == "1"
+ACTIVE_PLAYER_TTL_SECONDS = float(os.getenv("ACTIVE_PLAYER_TTL_SECONDS", "30"))
+REAPER_INTERVAL_SECONDS = float(os.getenv("REAPER_INTERVAL_SECONDS", "1"))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "500"))
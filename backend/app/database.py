@@ -1,12 +1,107 @@
 """Database operations for the Snake Arena Live API using SQLAlchemy."""
+import asyncio
 from datetime import datetime, UTC
-from typing import Optional
-from sqlalchemy import select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+from typing import AsyncIterator, Optional
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 import uuid
 
+from app.config import (
+    ARCHIVE_KEEP_TOP, DATABASE_URL, GAME_STATE_READ_STALE_MS, GAME_STATE_READ_TTL_MS, LEADERBOARD_READ_STALE_MS,
+    LEADERBOARD_READ_TTL_MS, QUERY_STATS_ENABLED, SHARED_DATA_DIR
+)
 from app.db_models import User as DBUser, LeaderboardEntry as DBLeaderboardEntry, ActivePlayer as DBActivePlayer
-from app.models import User, LeaderboardEntry, ActivePlayer, GameState
+from app.models import User, LeaderboardEntry, ActivePlayer, GameState, GameStateDelta
+from app.leaderboard_store import leaderboard_store
+from app.single_flight import SingleFlight
+from app.archive import (
+    archive_partitions, archived_checksum, archived_count_at_least, archived_rows, merge_rows, stream_archived_rows
+)
+from app import events
+from app.game_states import apply_delta, game_states
+from app import score_log
+from app import verification
+from app.verification import needs_verification, verification_row, verifications, visible_clause
+
+
+logger = logging.getLogger(__name__)
+
+# Engine and session factory
+engine = create_async_engine(DATABASE_URL)
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+if QUERY_STATS_ENABLED:
+    from app.query_stats import query_stats
+    query_stats.instrument(engine)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency yielding a database session."""
+    async with async_session() as session:
+        yield session
+
+
+async def create_leaderboard_tables() -> None:
+    """Create the tables kept next to the leaderboard (verifications, archive partitions, pending score log records) if they are missing."""
+    async with engine.begin() as conn:
+        for table in (verifications, archive_partitions, score_log.pending):
+            await conn.run_sync(table.create, checkfirst=True)
+
+
+# Score log (see app.score_log)
+async def append_to_score_log(db: AsyncSession, pending: list[dict]) -> None:
+    """
+    Append committed entries to the score log on a thread, then delete their `pending` rows.
+    The entries are committed already, so a failure is only logged; the rows stay for the backfill.
+    """
+    try:
+        await score_log.score_log.append_async(
+            score_log.encode(row["entry_id"], row["user_id"], row["score"], row["mode"]) for row in pending
+        )
+        await db.execute(
+            delete(score_log.pending).where(score_log.pending.c.entry_id.in_([row["entry_id"] for row in pending]))
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        logger.exception("appending %d committed entries to the score log failed", len(pending))
+
+
+async def backfill_score_log() -> int:
+    """
+    Append the pending entries of writers that exited between their commit and their append,
+    unless the log has them already; returns how many were appended.
+    """
+    log = score_log.score_log
+    async with async_session() as db:
+        writers = (await db.execute(select(score_log.pending.c.writer).distinct())).scalars().all()
+        gone = [writer for writer in writers if await asyncio.to_thread(log.writer_gone, writer)]
+        if not gone:
+            return 0
+        # Claimed in one transaction: another worker starting meanwhile finds them gone
+        result = await db.execute(
+            delete(score_log.pending).where(score_log.pending.c.writer.in_(gone)).returning(*score_log.pending.c)
+        )
+        rows = [dict(row._mapping) for row in result]
+        missing = []
+        if rows:
+            reader = score_log.ScoreLogReader(log.directory)
+            logged = await asyncio.to_thread(reader.entry_ids_since, min(row["created_us"] for row in rows))
+            missing = sorted((row for row in rows if row["entry_id"] not in logged), key=lambda row: row["created_us"])
+            if missing:
+                await log.append_async(
+                    score_log.encode(row["entry_id"], row["user_id"], row["score"], row["mode"]) for row in missing
+                )
+            logger.info("score log backfill: %d pending entries, %d appended", len(rows), len(missing))
+        await db.commit()
+        return len(missing)
+
+
+# Coalesced hot reads (see app.single_flight); the loaders open their own sessions
+leaderboard_reads: SingleFlight[list[LeaderboardEntry]] = SingleFlight(
+    LEADERBOARD_READ_TTL_MS, LEADERBOARD_READ_STALE_MS
+)
+game_state_reads: SingleFlight[Optional[GameState]] = SingleFlight(GAME_STATE_READ_TTL_MS, GAME_STATE_READ_STALE_MS)
 
 
 # User operations
@@ -58,6 +153,12 @@ async def get_user_by_username(db: AsyncSession, username: str) -> Optional[dict
     return None
 
 
+async def get_username_index_rows(db: AsyncSession) -> list[tuple[str, str]]:
+    """Get (username, user id) pairs for every user."""
+    result = await db.execute(select(DBUser.username, DBUser.id))
+    return [tuple(row) for row in result.all()]
+
+
 async def create_user(db: AsyncSession, email: str, username: str, password_hash: str) -> dict:
     """Create a new user."""
     user_id = str(uuid.uuid4())
@@ -92,32 +193,117 @@ async def update_user_high_score(db: AsyncSession, user_id: str, score: int) ->
 
 
 # Leaderboard operations
-async def get_leaderboard(db: AsyncSession, mode: Optional[str] = None) -> list[LeaderboardEntry]:
-    """Get leaderboard entries, optionally filtered by mode."""
-    query = select(DBLeaderboardEntry)
+async def get_leaderboard(
+    db: AsyncSession, mode: Optional[str] = None, limit: Optional[int] = None
+) -> list[LeaderboardEntry]:
+    """
+    Get leaderboard entries, optionally filtered by mode. Rejected and not-yet-verified high scores are hidden.
+    Up to ARCHIVE_KEEP_TOP entries come from the hot table alone; longer reads merge in the archive.
+    """
+    rows = await _hot_leaderboard_rows(db, mode, limit)
+    if limit is None or limit > ARCHIVE_KEEP_TOP:
+        # Archived entries below the limit-th hot score cannot make the page
+        floor = rows[limit - 1][2] if limit is not None and len(rows) >= limit else None
+        rows = merge_rows(rows, await archived_rows(db, mode, floor))[:limit]
+    return [
+        LeaderboardEntry(id=entry_id, username=username, score=score, mode=entry_mode, date=date)
+        for entry_id, username, score, entry_mode, date in rows
+    ]
+
+
+async def read_leaderboard(mode: Optional[str] = None, limit: Optional[int] = None) -> list[LeaderboardEntry]:
+    """
+    `get_leaderboard`, shared by concurrent callers and briefly cached.
+    Limits up to ARCHIVE_KEEP_TOP share one cached top list, which the caller slices.
+    """
+    if limit is not None and limit <= ARCHIVE_KEEP_TOP:
+        limit = ARCHIVE_KEEP_TOP
+    else:
+        limit = None
+    
+    async def load() -> list[LeaderboardEntry]:
+        async with async_session() as db:
+            return await get_leaderboard(db, mode, limit)
+    return await leaderboard_reads.do((mode, limit), load)
+
+
+async def _hot_leaderboard_rows(
+    db: AsyncSession, mode: Optional[str] = None, limit: Optional[int] = None
+) -> list[tuple[str, str, int, str, str]]:
+    """Visible (id, username, score, mode, date) rows of the hot table, best score first."""
+    query = (
+        select(
+            DBLeaderboardEntry.id, DBLeaderboardEntry.username, DBLeaderboardEntry.score,
+            DBLeaderboardEntry.mode, DBLeaderboardEntry.date
+        )
+        .outerjoin(verifications, verifications.c.entry_id == DBLeaderboardEntry.id)
+        .where(visible_clause())
+    )
     if mode:
         query = query.where(DBLeaderboardEntry.mode == mode)
-    
-    # Sort by score descending
     query = query.order_by(DBLeaderboardEntry.score.desc())
-    
+    if limit is not None:
+        query = query.limit(limit)
     result = await db.execute(query)
-    entries = result.scalars().all()
-    
-    return [
-        LeaderboardEntry(
-            id=entry.id,
-            username=entry.username,
-            score=entry.score,
-            mode=entry.mode,
-            date=entry.date
-        )
-        for entry in entries
-    ]
+    return [tuple(row) for row in result.all()]
+
 
+async def get_leaderboard_rows(db: AsyncSession) -> list[tuple[str, str, int, str, str]]:
+    """Get every visible leaderboard entry, archived ones included, as a raw (id, username, score, mode, date) row."""
+    return merge_rows(await _hot_leaderboard_rows(db), await archived_rows(db))
 
-async def add_leaderboard_entry(db: AsyncSession, user_id: str, score: int, mode: str) -> int:
-    """Add a leaderboard entry and return the rank."""
+
+async def get_leaderboard_checksum(db: AsyncSession) -> dict[str, tuple[int, int]]:
+    """Per-mode (entry count, score sum) of the visible leaderboard, to check an in-memory copy against."""
+    query = (
+        select(DBLeaderboardEntry.mode, func.count(DBLeaderboardEntry.id), func.sum(DBLeaderboardEntry.score))
+        .outerjoin(verifications, verifications.c.entry_id == DBLeaderboardEntry.id)
+        .where(visible_clause())
+        .group_by(DBLeaderboardEntry.mode)
+    )
+    result = await db.execute(query)
+    checksum = {mode: (count, total or 0) for mode, count, total in result.all() if count}
+    for mode, (count, total) in (await archived_checksum(db)).items():
+        hot_count, hot_total = checksum.get(mode, (0, 0))
+        checksum[mode] = (hot_count + count, hot_total + total)
+    return checksum
+
+
+async def stream_leaderboard_rows(
+    db: AsyncSession, mode: Optional[str] = None, batch_size: int = 1000
+) -> AsyncIterator[list[tuple[str, str, int, str, str]]]:
+    """
+    Stream visible (id, username, score, mode, date) rows in batches from a server-side cursor,
+    then the archived rows one partition at a time.
+    """
+    query = (
+        select(
+            DBLeaderboardEntry.id, DBLeaderboardEntry.username, DBLeaderboardEntry.score,
+            DBLeaderboardEntry.mode, DBLeaderboardEntry.date
+        )
+        .outerjoin(verifications, verifications.c.entry_id == DBLeaderboardEntry.id)
+        .where(visible_clause())
+        .execution_options(yield_per=batch_size)
+    )
+    if mode:
+        query = query.where(DBLeaderboardEntry.mode == mode)
+    query = query.order_by(DBLeaderboardEntry.score.desc())
+    
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+    async for batch in stream_archived_rows(db, mode, batch_size):
+        yield batch
+
+
+async def add_leaderboard_entry(
+    db: AsyncSession, user_id: str, score: int, mode: str, replay: Optional[dict] = None
+) -> int:
+    """
+    Add a leaderboard entry and return the rank.
+    A replay log queues the entry for verification; scores that need it rank without being shown,
+    and the user's high score is only raised once it is verified.
+    """
     user = await get_user_by_id(db, user_id)
     if not user:
         return -1
@@ -131,22 +317,102 @@ async def add_leaderboard_entry(db: AsyncSession, user_id: str, score: int, mode
         date=datetime.now(UTC).strftime("%Y-%m-%d")
     )
     db.add(db_entry)
-    
-    # Update user's high score
-    await update_user_high_score(db, user_id, score)
+    if replay is not None:
+        await db.execute(insert(verifications), verification_row(entry_id, replay))
+    else:
+        # Update user's high score
+        await update_user_high_score(db, user_id, score)
+    pending = None
+    if score_log.score_log is not None:
+        pending = [score_log.score_log.pending_row(entry_id, user_id, score, mode)]
+        await db.execute(insert(score_log.pending), pending)
     
     await db.commit()
+    leaderboard_reads.invalidate()
+    if pending:
+        await append_to_score_log(db, pending)
+    if replay is not None and verification.pipeline is not None:
+        verification.pipeline.enqueue((entry_id, db_entry.username, score, mode, db_entry.date, replay))
     
-    # Calculate rank
-    query = select(DBLeaderboardEntry).where(DBLeaderboardEntry.mode == mode).order_by(DBLeaderboardEntry.score.desc())
-    result = await db.execute(query)
-    mode_entries = result.scalars().all()
+    # Rank from the in-memory leaderboard when it is loaded and current
+    rank = None
+    if leaderboard_store.loaded:
+        if needs_verification(score):
+            rank = leaderboard_store.rank_of(score, mode)
+        else:
+            rank = leaderboard_store.add(entry_id, db_entry.username, score, mode, db_entry.date)
+        if not leaderboard_store.is_current():
+            # Other workers' entries are missing from it
+            rank = None
+    if not needs_verification(score):
+        events.event_bus.publish(events.LEADERBOARD_CHANGED, events.leaderboard_change(
+            "add", entry_id, db_entry.username, score, mode, db_entry.date
+        ))
+    if rank is not None:
+        return rank
     
-    for idx, e in enumerate(mode_entries, 1):
-        if e.id == entry_id:
-            return idx
+    # Calculate rank among the visible entries: placed after those with an equal score, as in the
+    # in-memory leaderboard, whether or not this entry is shown yet
+    query = (
+        select(func.count(DBLeaderboardEntry.id))
+        .outerjoin(verifications, verifications.c.entry_id == DBLeaderboardEntry.id)
+        .where(
+            visible_clause(), DBLeaderboardEntry.id != entry_id,
+            DBLeaderboardEntry.mode == mode, DBLeaderboardEntry.score >= score
+        )
+    )
+    return await db.scalar(query) + await archived_count_at_least(db, mode, score) + 1
+
+
+async def add_leaderboard_entries_bulk(db: AsyncSession, entries: list[dict]) -> None:
+    """
+    Insert many leaderboard entries and raise the owners' high scores in one transaction.
+    Each entry has id, user_id, username, score, mode, date and optionally a replay to verify,
+    which defers its high score to the verification; ids already stored are skipped.
+    """
+    if not entries:
+        return
+    ids = [entry["id"] for entry in entries]
+    result = await db.execute(select(DBLeaderboardEntry.id).where(DBLeaderboardEntry.id.in_(ids)))
+    existing = set(result.scalars().all())
+    rows = [
+        {key: entry[key] for key in ("id", "username", "score", "mode", "date")}
+        for entry in entries if entry["id"] not in existing
+    ]
+    if rows:
+        await db.execute(insert(DBLeaderboardEntry), rows)
+    pending = None
+    if score_log.score_log is not None and rows:
+        pending = [
+            score_log.score_log.pending_row(entry["id"], entry["user_id"], entry["score"], entry["mode"])
+            for entry in entries if entry["id"] not in existing
+        ]
+        await db.execute(insert(score_log.pending), pending)
+    replays = [entry for entry in entries if entry.get("replay") is not None and entry["id"] not in existing]
+    if replays:
+        await db.execute(insert(verifications), [verification_row(entry["id"], entry["replay"]) for entry in replays])
     
-    return len(mode_entries)
+    best: dict[str, int] = {}
+    for entry in entries:
+        if entry.get("replay") is None:
+            best[entry["user_id"]] = max(best.get(entry["user_id"], 0), entry["score"])
+    users = DBUser.__table__
+    if best:
+        await db.execute(
+            update(users)
+            .where(users.c.id == bindparam("user_id"), users.c.high_score < bindparam("score"))
+            .values(high_score=bindparam("score")),
+            [{"user_id": user_id, "score": score} for user_id, score in best.items()]
+        )
+    await db.commit()
+    leaderboard_reads.invalidate()
+    if pending:
+        await append_to_score_log(db, pending)
+    if verification.pipeline is not None:
+        for entry in replays:
+            verification.pipeline.enqueue(
+                (entry["id"], entry["username"], entry["score"], entry["mode"], entry["date"], entry["replay"])
+            )
 
 
 # Active players operations
@@ -169,12 +435,72 @@ async def get_active_players(db: AsyncSession) -> list[ActivePlayer]:
 
 async def get_player_game_state(db: AsyncSession, player_id: str) -> Optional[GameState]:
     """Get a specific player's game state."""
+    # The live copy is ahead of the database by up to one flush interval
+    state = game_states.get(player_id)
+    if state is not None:
+        return GameState(**state)
     player = await db.get(DBActivePlayer, player_id)
     if player and player.game_state:
         return GameState(**player.game_state)
     return None
 
 
+async def read_player_game_state(player_id: str) -> Optional[GameState]:
+    """`get_player_game_state`, with database reads shared by concurrent callers and briefly cached."""
+    state = game_states.get(player_id)
+    if state is not None:
+        return GameState(**state)
+
+    async def load() -> Optional[GameState]:
+        async with async_session() as db:
+            return await get_player_game_state(db, player_id)
+    return await game_state_reads.do(player_id, load)
+
+
+async def update_game_state(db: AsyncSession, player_id: str, delta: GameStateDelta, username: str) -> Optional[dict]:
+    """Apply `username`'s delta to their live game state; None if the player is not active.
+    Raises PermissionError for another user's game and ValueError for a delta that would leave no snake.
+    
+    When events reach every worker, the live copy here is authoritative and the database copy is
+    saved later by the game-state store, in a batch. Otherwise other workers' deltas never reach
+    this copy, so the delta is applied to the database row and saved at once.
+    """
+    if not events.reaches_all_workers():
+        player = await get_owned_active_player(db, player_id, username)
+        if player is None or not player.game_state:
+            return None
+        state = apply_delta(player.game_state, delta)
+        await save_game_states(db, [(player_id, state)])
+        game_state_reads.invalidate(player_id)
+    else:
+        owner = game_states.owner(player_id)
+        if owner is None:
+            player = await get_owned_active_player(db, player_id, username)
+            if player is None or not player.game_state:
+                return None
+            game_states.load(player_id, player.game_state, player.username)
+        elif owner != username:
+            raise PermissionError(f"{username} does not play {player_id}")
+        state = game_states.apply(player_id, delta)
+    events.event_bus.publish(events.GAME_TICK, {
+        "id": player_id, "username": username, "gameState": state,
+        "delta": delta.model_dump(mode="json", exclude_unset=True)
+    })
+    return state
+
+
+async def save_game_states(db: AsyncSession, rows: list[tuple[str, dict]]) -> None:
+    """Save several game states (and their scores) with one executemany UPDATE."""
+    players = DBActivePlayer.__table__
+    await db.execute(
+        update(players)
+        .where(players.c.id == bindparam("b_id"))
+        .values(game_state=bindparam("b_state"), score=bindparam("b_score")),
+        [{"b_id": player_id, "b_state": state, "b_score": state["score"]} for player_id, state in rows]
+    )
+    await db.commit()
+
+
 async def add_active_player(db: AsyncSession, player_id: str, username: str, mode: str) -> None:
     """Add an active player."""
     db_player = DBActivePlayer(
@@ -192,6 +518,10 @@ async def add_active_player(db: AsyncSession, player_id: str, username: str, mod
     )
     db.add(db_player)
     await db.commit()
+    events.event_bus.publish(events.PLAYER_JOINED, {
+        "id": player_id, "username": username, "mode": mode,
+        "startedAt": db_player.started_at.isoformat(), "gameState": db_player.game_state
+    })
 
 
 async def remove_active_player(db: AsyncSession, player_id: str) -> None:
@@ -200,12 +530,55 @@ async def remove_active_player(db: AsyncSession, player_id: str) -> None:
     if player:
         await db.delete(player)
         await db.commit()
+    game_state_reads.invalidate(player_id)
+    events.event_bus.publish(events.PLAYER_LEFT, {"id": player_id})
+
+
+async def remove_active_players(db: AsyncSession, player_ids: list[str]) -> list[str]:
+    """Remove several active players with one DELETE; returns the ids that were still there."""
+    result = await db.execute(
+        delete(DBActivePlayer)
+        .where(DBActivePlayer.id.in_(player_ids))
+        .returning(DBActivePlayer.id)
+        .execution_options(synchronize_session=False)
+    )
+    removed = list(result.scalars())
+    await db.commit()
+    for player_id in removed:
+        game_state_reads.invalidate(player_id)
+    for player_id in removed:
+        events.event_bus.publish(events.PLAYER_LEFT, {"id": player_id})
+    return removed
+
+
+async def get_owned_active_player(db: AsyncSession, player_id: str, username: str) -> Optional[DBActivePlayer]:
+    """The active player row, None if it is not an active game; raises PermissionError if `username` does not play it."""
+    player = await db.get(DBActivePlayer, player_id)
+    if player is not None and player.username != username:
+        raise PermissionError(f"{username} does not play {player_id}")
+    return player
+
+
+async def heartbeat_active_player(db: AsyncSession, player_id: str, username: str) -> bool:
+    """
+    Record that `username`'s game is still running; False if it is not an active game.
+    Checked against the database, as the reaper may not track the player (yet) in this worker.
+    """
+    if await get_owned_active_player(db, player_id, username) is None:
+        return False
+    events.event_bus.publish(events.PLAYER_HEARTBEAT, {"id": player_id})
+    return True
 
 
 # Session operations (In-memory for simplicity, or could be Redis/DB)
 # For now, keeping sessions in memory as they are just token->user_id mappings
+# In shared mode they live in a shared-memory segment so every worker sees them
 # In a production app, use Redis or a DB table for sessions
-sessions_db: dict[str, str] = {}
+if SHARED_DATA_DIR:
+    from app.shared_data import SESSIONS_FILE, SharedSessions, shared_path
+    sessions_db: dict[str, str] = SharedSessions(shared_path(SESSIONS_FILE))
+else:
+    sessions_db: dict[str, str] = {}
 
 async def create_session(token: str, user_id: str) -> None:
     """Create a session."""
@@ -258,9 +631,7 @@ async def initialize_sample_data(db: AsyncSession):
         }
     ]
     
-    for user_data in sample_users:
-        db_user = DBUser(**user_data)
-        db.add(db_user)
+    await db.execute(insert(DBUser), sample_users)
     
     # Sample leaderboard entries
     sample_entries = [
@@ -296,8 +667,6 @@ async def initialize_sample_data(db: AsyncSession):
         }
     ]
     
-    for entry_data in sample_entries:
-        db_entry = DBLeaderboardEntry(**entry_data)
-        db.add(db_entry)
+    await db.execute(insert(DBLeaderboardEntry), sample_entries)
         
     await db.commit()
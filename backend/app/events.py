@@ -0,0 +1,339 @@
+"""Event bus for active-player, heartbeat, game-tick and leaderboard events.
+
+Events are published once and delivered to every subscriber, in this worker
+and, with `EVENT_BUS=unix`, in every other worker on the host:
+
+    InProcessBus    handlers in this process only (the default, single worker)
+    UnixSocketBus   also sends each event as one datagram to every other
+                    worker's socket in EVENT_BUS_DIR; no broker to run
+
+Handlers are plain callables taking an `Event`, called in subscription order.
+State that every worker keeps its own copy of (the in-memory leaderboard)
+subscribes with `remote_only=True`, since the publishing worker applies the
+change itself before publishing.
+
+A datagram is dropped rather than block the publisher when a peer's socket
+buffer is full, so every datagram carries its sender's sequence number. A
+receiver that sees a gap publishes EVENTS_MISSED locally: the in-memory
+leaderboard is then served from the database while it reloads.
+"""
+import asyncio
+from datetime import datetime
+import json
+import logging
+import os
+import socket
+import time
+from typing import Callable, Optional
+
+from app.config import EVENT_BUS, EVENT_BUS_DIR, WORKERS
+
+
+logger = logging.getLogger(__name__)
+
+PLAYER_JOINED = "players.joined"
+PLAYER_LEFT = "players.left"
+PLAYER_HEARTBEAT = "players.heartbeat"
+GAME_TICK = "game.tick"
+LEADERBOARD_CHANGED = "leaderboard.changed"
+# Local only: events from another worker were lost
+EVENTS_MISSED = "bus.missed"
+
+# Datagrams larger than this are not sent to other workers
+MAX_DATAGRAM = 64 * 1024
+PEER_REFRESH_SECONDS = 1.0
+
+
+class Event:
+    """A published event; `local` is True in the worker that published it."""
+
+    __slots__ = ("topic", "payload", "origin", "local")
+
+    def __init__(self, topic: str, payload: dict, origin: str, local: bool) -> None:
+        self.topic = topic
+        self.payload = payload
+        self.origin = origin
+        self.local = local
+
+
+Handler = Callable[[Event], None]
+
+
+class EventBus:
+    """In-process bus; also the base class of the cross-process buses."""
+
+    def __init__(self, name: Optional[str] = None) -> None:
+        self.name = name or str(os.getpid())
+        self.handlers: dict[str, list[tuple[Handler, bool]]] = {}
+        self.stats = {"published": 0, "received": 0, "sent": 0, "dropped": 0, "missed": 0, "handlerErrors": 0}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def subscribe(self, topic: str, handler: Handler, remote_only: bool = False) -> Callable[[], None]:
+        """Call `handler` for every event on `topic`. Returns a function that unsubscribes."""
+        entry = (handler, remote_only)
+        self.handlers.setdefault(topic, []).append(entry)
+        return lambda: self.handlers[topic].remove(entry)
+
+    def publish(self, topic: str, payload: dict) -> None:
+        """Deliver an event to local subscribers (and, in subclasses, to other workers)."""
+        self.stats["published"] += 1
+        self.dispatch(Event(topic, payload, self.name, True))
+
+    def dispatch(self, event: Event) -> None:
+        for handler, remote_only in list(self.handlers.get(event.topic, ())):
+            if remote_only and event.local:
+                continue
+            try:
+                handler(event)
+            except Exception:
+                self.stats["handlerErrors"] += 1
+                logger.exception("event handler for %s failed", event.topic)
+
+    def report(self) -> dict:
+        return {"type": type(self).__name__, "name": self.name, **self.stats}
+
+
+class InProcessBus(EventBus):
+    """Single-process bus: publish calls the subscribers directly."""
+
+
+class UnixSocketBus(EventBus):
+    """Cross-worker bus over Unix datagram sockets, one per worker, in a shared directory."""
+
+    def __init__(self, directory: str = EVENT_BUS_DIR, name: Optional[str] = None) -> None:
+        super().__init__(name)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{self.name}.sock")
+        self._sock: Optional[socket.socket] = None
+        self._peers: list[str] = []
+        self._peers_at = 0.0
+        self._seq = 0
+        # Last sequence number received from each other worker
+        self._received_seq: dict[str, int] = {}
+
+    async def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._receive)
+
+    async def stop(self) -> None:
+        if self._sock is not None:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def peers(self) -> list[str]:
+        """Socket paths of the other workers, rescanned at most every PEER_REFRESH_SECONDS."""
+        now = time.monotonic()
+        if now - self._peers_at > PEER_REFRESH_SECONDS:
+            self._peers = [
+                entry.path for entry in os.scandir(self.directory)
+                if entry.name.endswith(".sock") and entry.path != self.path
+            ]
+            self._peers_at = now
+        return self._peers
+
+    def publish(self, topic: str, payload: dict) -> None:
+        super().publish(topic, payload)
+        if self._sock is None:
+            return
+        self._seq += 1
+        data = json.dumps(
+            {"t": topic, "o": self.name, "s": self._seq, "p": payload}, separators=(",", ":")
+        ).encode("utf-8")
+        if len(data) > MAX_DATAGRAM:
+            self.stats["dropped"] += 1
+            logger.warning("%s event of %d bytes is too large to send to other workers", topic, len(data))
+            return
+        for peer in self.peers():
+            try:
+                self._sock.sendto(data, peer)
+                self.stats["sent"] += 1
+            except BlockingIOError:
+                # The peer is not keeping up; never block the publisher
+                self.stats["dropped"] += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # A worker that exited without cleaning up
+                self._forget(peer)
+
+    def _forget(self, peer: str) -> None:
+        if peer in self._peers:
+            self._peers.remove(peer)
+        try:
+            os.unlink(peer)
+        except OSError:
+            pass
+
+    def _receive(self) -> None:
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            message = json.loads(data)
+            self.stats["received"] += 1
+            origin, seq = message["o"], message["s"]
+            last = self._received_seq.get(origin)
+            self._received_seq[origin] = seq
+            if last is not None and seq != last + 1:
+                # Lost datagrams (or a restarted worker reusing the name); before this event is applied
+                self.stats["missed"] += max(1, seq - last - 1)
+                self.dispatch(Event(EVENTS_MISSED, {"origin": origin, "after": last, "next": seq}, origin, False))
+            self.dispatch(Event(message["t"], message["p"], origin, False))
+
+
+def reaches_all_workers() -> bool:
+    """Whether events published here reach every worker: there is only one, or the bus crosses processes."""
+    return WORKERS == 1 or isinstance(event_bus, UnixSocketBus)
+
+
+def create_event_bus(kind: str = EVENT_BUS) -> EventBus:
+    """Build the configured bus with the default handlers attached."""
+    bus = UnixSocketBus() if kind == "unix" else InProcessBus()
+    connect_handlers(bus)
+    return bus
+
+
+class LeaderboardResync:
+    """Reloads this worker's in-memory leaderboard from the database after it missed changes."""
+
+    def __init__(self, store) -> None:
+        self.store = store
+        self.stats = {"resyncs": 0, "failures": 0}
+        self._task: Optional[asyncio.Task] = None
+        self._again = False
+        # Changes received while the database is read, applied on top of what it returned
+        self._changes: Optional[list[dict]] = None
+
+    def on_missed(self, event: Event) -> None:
+        if not self.store.loaded:
+            # Not loaded yet; the load will read the database anyway
+            return
+        self.store.stale = True
+        if self._task is None:
+            self._changes = []
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        else:
+            self._again = True
+
+    def on_change(self, event: Event) -> None:
+        if self._changes is not None:
+            self._changes.append(event.payload)
+
+    async def _run(self) -> None:
+        from app import checkpoint, ingest
+        from app.database import async_session, get_leaderboard_rows
+
+        try:
+            while True:
+                self._again = False
+                # Write-behind entries shown but not committed yet; some may commit during the read
+                uncommitted = dict(ingest.ingestor.uncommitted) if ingest.ingestor is not None else {}
+                async with async_session() as db:
+                    rows = await get_leaderboard_rows(db)
+                if ingest.ingestor is not None:
+                    uncommitted.update(ingest.ingestor.uncommitted)
+                ids = {row[0] for row in rows}
+                self.store.load(rows)
+                for entry in uncommitted.values():
+                    if entry["id"] not in ids:
+                        ids.add(entry["id"])
+                        self.store.add(entry["id"], entry["username"], entry["score"], entry["mode"], entry["date"])
+                for change in self._changes:
+                    entry = change["entry"]
+                    if change["op"] == "remove":
+                        self.store.remove(entry["id"], entry["score"], entry["mode"])
+                    elif entry["id"] not in ids:
+                        ids.add(entry["id"])
+                        self.store.add(entry["id"], entry["username"], entry["score"], entry["mode"], entry["date"])
+                self._changes = []
+                self.stats["resyncs"] += 1
+                if not self._again:
+                    break
+                self.store.stale = True
+            if checkpoint.checkpointer is not None:
+                # The checkpoint log missed the lost changes too
+                checkpoint.checkpointer.resume(self.store, restored=False)
+        except Exception:
+            # Stays stale, so reads keep going to the database; the next gap retries
+            self.stats["failures"] += 1
+            logger.exception("reloading the leaderboard after missed events failed")
+        finally:
+            self._changes = None
+            self._task = None
+
+
+def connect_handlers(bus: EventBus) -> None:
+    """Attach this worker's spectator hub, live-games index, game states, in-memory leaderboard and top-N feed to the bus."""
+    from app.active_index import active_player_index
+    from app.game_states import game_states
+    from app.leaderboard_feed import leaderboard_feed
+    from app.leaderboard_store import leaderboard_store
+    from app.spectators import spectator_hub
+
+    def on_player_joined(event: Event) -> None:
+        player = event.payload
+        spectator_hub.publish(player["id"], player["gameState"])
+        active_player_index.add(
+            player["id"], player["username"], player["gameState"]["score"], player["mode"],
+            datetime.fromisoformat(player["startedAt"])
+        )
+
+    def on_game_tick(event: Event) -> None:
+        spectator_hub.publish(event.payload["id"], event.payload["gameState"], event.payload.get("delta"))
+        active_player_index.update_score(event.payload["id"], event.payload["gameState"]["score"])
+
+    def on_remote_game_tick(event: Event) -> None:
+        # The next delta for this game may arrive here
+        game_states.load(event.payload["id"], event.payload["gameState"], event.payload.get("username"))
+
+    def on_player_left(event: Event) -> None:
+        spectator_hub.close(event.payload["id"])
+        active_player_index.remove(event.payload["id"])
+        game_states.discard(event.payload["id"])
+
+    def on_leaderboard_changed(event: Event) -> None:
+        if not leaderboard_store.loaded:
+            return
+        entry = event.payload["entry"]
+        if event.payload["op"] == "add":
+            leaderboard_store.add(entry["id"], entry["username"], entry["score"], entry["mode"], entry["date"])
+        else:
+            leaderboard_store.remove(entry["id"], entry["score"], entry["mode"])
+
+    bus.subscribe(PLAYER_JOINED, on_player_joined)
+    bus.subscribe(GAME_TICK, on_game_tick)
+    bus.subscribe(GAME_TICK, on_remote_game_tick, remote_only=True)
+    bus.subscribe(PLAYER_LEFT, on_player_left)
+    bus.subscribe(LEADERBOARD_CHANGED, on_leaderboard_changed, remote_only=True)
+    resync = LeaderboardResync(leaderboard_store)
+    bus.subscribe(EVENTS_MISSED, resync.on_missed)
+    # This worker's own submits during a reload too, as the database read may predate them
+    bus.subscribe(LEADERBOARD_CHANGED, resync.on_change)
+    # After the leaderboard handler, so the feed sees the change applied
+    bus.subscribe(LEADERBOARD_CHANGED, leaderboard_feed.on_change)
+
+
+def leaderboard_change(op: str, entry_id: str, username: str, score: int, mode: str, day: str) -> dict:
+    """Payload of a LEADERBOARD_CHANGED event (`op` is "add" or "remove")."""
+    return {
+        "op": op,
+        "entry": {"id": entry_id, "username": username, "score": score, "mode": mode, "date": day},
+    }
+
+
+# Replaced by the app lifespan when EVENT_BUS is "unix"
+event_bus: EventBus = create_event_bus("memory")
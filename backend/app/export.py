@@ -0,0 +1,60 @@
+"""Streaming encoders for leaderboard exports.
+
+Rows arrive in batches from a server-side cursor and leave as one encoded
+chunk per batch, so memory stays bounded by the batch size whatever the
+table size.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterable, AsyncIterator
+
+from app.models import ExportFormat
+
+
+Row = tuple[str, str, int, str, str]
+
+EXPORT_FIELDS = ("id", "username", "score", "mode", "date")
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+async def encode_ndjson(batches: AsyncIterable[list[Row]]) -> AsyncIterator[bytes]:
+    """Encode batches as newline-delimited JSON objects."""
+    async for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), separators=(",", ":")) + "\n" for row in batch
+        ).encode("utf-8")
+
+
+async def encode_csv(batches: AsyncIterable[list[Row]]) -> AsyncIterator[bytes]:
+    """Encode batches as CSV with a header row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue().encode("utf-8")
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+ENCODERS = {
+    ExportFormat.NDJSON: encode_ndjson,
+    ExportFormat.CSV: encode_csv,
+}
+
+
+async def gzip_stream(chunks: AsyncIterable[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip a byte stream chunk by chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
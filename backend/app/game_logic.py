@@ -0,0 +1,293 @@
+"""Server-side port of the snake rules in `frontend/src/lib/gameLogic.ts`.
+
+Positions are `(x, y)` tuples and the state is mutated in place, which keeps
+replays cheap enough to run thousands of games per second per core. The
+rules (movement, wrap-around, collisions, growth and scoring) match the
+frontend exactly; only food placement is pluggable so a replay can feed the
+positions the client recorded.
+
+The frontend places food by rejection sampling against the snake, which
+slows down without bound as the board fills. Server-side games track the
+free cells instead (`FreeCells`): placing food is one uniform draw and
+every move updates the index in O(1). With a seeded RNG the placements
+are reproducible.
+"""
+import random
+from typing import Callable, Optional
+
+from app.models import Direction, GameMode
+
+
+GRID_SIZE = 20
+INITIAL_SNAKE_LENGTH = 3
+FOOD_POINTS = 10
+
+Pos = tuple[int, int]
+# Returns None when no cell is free, which ends the game
+FoodSource = Callable[[list[Pos]], Optional[Pos]]
+
+_DELTAS: dict[str, Pos] = {
+    Direction.UP.value: (0, -1),
+    Direction.DOWN.value: (0, 1),
+    Direction.LEFT.value: (-1, 0),
+    Direction.RIGHT.value: (1, 0),
+}
+_OPPOSITES = {
+    Direction.UP.value: Direction.DOWN.value,
+    Direction.DOWN.value: Direction.UP.value,
+    Direction.LEFT.value: Direction.RIGHT.value,
+    Direction.RIGHT.value: Direction.LEFT.value,
+}
+
+
+class FreeCells:
+    """The free cells of a grid, as cell indexes `y * grid_size + x`.
+
+    The first `len(self)` entries of `cells` are the free cells in no
+    particular order and `slots` maps each cell to its index in `cells`, so
+    occupying a cell swaps it with the last free one, releasing swaps it
+    back in, and a uniform draw is one `randrange`.
+    """
+
+    __slots__ = ("grid_size", "cells", "slots", "free")
+
+    def __init__(self, grid_size: int = GRID_SIZE) -> None:
+        self.grid_size = grid_size
+        self.cells = list(range(grid_size * grid_size))
+        self.slots = list(range(grid_size * grid_size))
+        self.free = len(self.cells)
+
+    def __len__(self) -> int:
+        return self.free
+
+    def __contains__(self, cell: int) -> bool:
+        return self.slots[cell] < self.free
+
+    def occupy(self, cell: int) -> None:
+        slot = self.slots[cell]
+        if slot >= self.free:
+            return
+        self.free -= 1
+        self._swap(slot, self.free)
+
+    def release(self, cell: int) -> None:
+        slot = self.slots[cell]
+        if slot < self.free:
+            return
+        self._swap(slot, self.free)
+        self.free += 1
+
+    def _swap(self, i: int, j: int) -> None:
+        cells, slots = self.cells, self.slots
+        a, b = cells[i], cells[j]
+        cells[i], cells[j] = b, a
+        slots[a], slots[b] = j, i
+
+    def take(self, rng: random.Random) -> Optional[int]:
+        """Occupy and return a uniformly drawn free cell, or None if the grid is full."""
+        if not self.free:
+            return None
+        cell = self.cells[rng.randrange(self.free)]
+        self.occupy(cell)
+        return cell
+
+    def cell(self, position: Pos) -> int:
+        return position[1] * self.grid_size + position[0]
+
+    def position(self, cell: int) -> Pos:
+        return cell % self.grid_size, cell // self.grid_size
+
+
+class SnakeState:
+    """Mutable single-player game state (the frontend `GameState`)."""
+
+    __slots__ = ("snake", "food", "direction", "score", "is_game_over", "is_paused", "mode", "grid_size", "free")
+
+    def __init__(self, snake: list[Pos], food: Pos, direction: str, mode: str,
+                 grid_size: int = GRID_SIZE, score: int = 0, free: Optional[FreeCells] = None) -> None:
+        self.snake = snake
+        self.food = food
+        self.direction = direction
+        self.score = score
+        self.is_game_over = False
+        self.is_paused = False
+        self.mode = mode
+        self.grid_size = grid_size
+        # Cells covered by neither the snake nor the food, when tracked
+        self.free = free
+
+    def to_game_state(self) -> dict:
+        """Return the state in the shape of the API `GameState` model."""
+        return {
+            "snake": [{"x": x, "y": y} for x, y in self.snake],
+            "food": {"x": self.food[0], "y": self.food[1]},
+            "direction": self.direction,
+            "score": self.score,
+        }
+
+
+def initial_snake(grid_size: int = GRID_SIZE) -> list[Pos]:
+    """Snake of INITIAL_SNAKE_LENGTH segments at the center, facing right."""
+    center_x = grid_size // 2
+    center_y = grid_size // 2
+    return [(center_x - i, center_y) for i in range(INITIAL_SNAKE_LENGTH)]
+
+
+def generate_food(snake: list[Pos], rng: Optional[random.Random] = None, grid_size: int = GRID_SIZE) -> Pos:
+    """Pick a random cell not covered by the snake (rejection sampling, as in the frontend)."""
+    rng = rng or random
+    occupied = set(snake)
+    while True:
+        food = (rng.randrange(grid_size), rng.randrange(grid_size))
+        if food not in occupied:
+            return food
+
+
+def free_cell_food(free: FreeCells, rng: random.Random) -> FoodSource:
+    """Food source drawing uniformly from `free` (and occupying the cell it picks)."""
+    def food_source(snake: list[Pos]) -> Optional[Pos]:
+        cell = free.take(rng)
+        return None if cell is None else free.position(cell)
+    return food_source
+
+
+def create_initial_state(mode: str, food_source: Optional[FoodSource] = None,
+                         grid_size: int = GRID_SIZE, free: Optional[FreeCells] = None) -> SnakeState:
+    """
+    New game. With `free`, the state keeps it up to date on every move; the
+    food source must then occupy the cells it returns (see `free_cell_food`).
+    """
+    snake = initial_snake(grid_size)
+    if free is not None:
+        for segment in snake:
+            free.occupy(free.cell(segment))
+    food = food_source(snake) if food_source else generate_food(snake, grid_size=grid_size)
+    return SnakeState(snake, food, Direction.RIGHT.value, mode, grid_size, free=free)
+
+
+def get_next_head_position(head: Pos, direction: str, grid_size: int, mode: str) -> Pos:
+    dx, dy = _DELTAS[direction]
+    x, y = head[0] + dx, head[1] + dy
+    # Handle pass-through mode (wrap around)
+    if mode == GameMode.PASS_THROUGH.value:
+        x %= grid_size
+        y %= grid_size
+    return x, y
+
+
+def check_wall_collision(position: Pos, grid_size: int) -> bool:
+    return position[0] < 0 or position[0] >= grid_size or position[1] < 0 or position[1] >= grid_size
+
+
+def check_self_collision(head: Pos, body: list[Pos]) -> bool:
+    return head in body
+
+
+def check_food_collision(head: Pos, food: Pos) -> bool:
+    return head == food
+
+
+def is_opposite_direction(dir1: str, dir2: str) -> bool:
+    return _OPPOSITES[dir1] == dir2
+
+
+def move_snake(state: SnakeState, food_source: Optional[FoodSource] = None) -> bool:
+    """Advance one tick. Returns True if food was eaten."""
+    if state.is_game_over or state.is_paused:
+        return False
+
+    new_head = get_next_head_position(state.snake[0], state.direction, state.grid_size, state.mode)
+
+    # Check wall collision (only in walls mode)
+    if state.mode == GameMode.WALLS.value and check_wall_collision(new_head, state.grid_size):
+        state.is_game_over = True
+        return False
+
+    # Check self collision (excluding tail which will move)
+    if check_self_collision(new_head, state.snake[:-1]):
+        state.is_game_over = True
+        return False
+
+    ate_food = check_food_collision(new_head, state.food)
+    if state.free is not None:
+        # Release the tail first: the head may move into the cell it leaves
+        if not ate_food:
+            state.free.release(state.free.cell(state.snake[-1]))
+        state.free.occupy(state.free.cell(new_head))
+    state.snake.insert(0, new_head)
+    if ate_food:
+        state.score += FOOD_POINTS
+        food = (
+            food_source(state.snake) if food_source
+            else generate_food(state.snake, grid_size=state.grid_size)
+        )
+        if food is None:
+            # The snake fills the whole grid
+            state.is_game_over = True
+        else:
+            state.food = food
+    else:
+        state.snake.pop()  # Remove tail if didn't eat
+    return ate_food
+
+
+def change_direction(state: SnakeState, new_direction: str) -> None:
+    if state.is_game_over or state.is_paused:
+        return
+    # Prevent reversing direction
+    if is_opposite_direction(state.direction, new_direction):
+        return
+    state.direction = new_direction
+
+
+def toggle_pause(state: SnakeState) -> None:
+    if state.is_game_over:
+        return
+    state.is_paused = not state.is_paused
+
+
+def simulate_bot_game(mode: str, rng: random.Random, max_ticks: int = 2000,
+                      grid_size: int = GRID_SIZE) -> tuple[SnakeState, dict]:
+    """
+    Play a game with a greedy bot (heads for the food, avoids immediate death)
+    and return the final state plus its replay log, in the `ReplayLog` shape.
+    Used to generate load and verification traffic.
+    """
+    foods: list[Pos] = []
+    free = FreeCells(grid_size)
+    place_food = free_cell_food(free, rng)
+
+    def food_source(snake: list[Pos]) -> Optional[Pos]:
+        food = place_food(snake)
+        if food is not None:
+            foods.append(food)
+        return food
+
+    state = create_initial_state(mode, food_source, grid_size, free)
+    moves = []
+    ticks = 0
+    while not state.is_game_over and ticks < max_ticks:
+        head = state.snake[0]
+        body = state.snake[:-1]
+        options = []
+        for direction in _DELTAS:
+            if is_opposite_direction(state.direction, direction):
+                continue
+            nxt = get_next_head_position(head, direction, grid_size, mode)
+            if (mode == GameMode.WALLS.value and check_wall_collision(nxt, grid_size)) or nxt in body:
+                continue
+            distance = abs(nxt[0] - state.food[0]) + abs(nxt[1] - state.food[1])
+            options.append((distance, rng.random(), direction))
+        if options:
+            direction = min(options)[2]
+            if direction != state.direction:
+                moves.append({"tick": ticks, "direction": direction})
+                change_direction(state, direction)
+        move_snake(state, food_source)
+        ticks += 1
+    replay = {
+        "ticks": ticks,
+        "moves": moves,
+        "foods": [{"x": x, "y": y} for x, y in foods],
+    }
+    return state, replay
@@ -0,0 +1,161 @@
+"""Authoritative in-memory game states fed by `PATCH /players/{playerId}/game-state`.
+
+Clients send compact deltas (new head, tail pops, food, direction, score). They
+are applied to the live copy here; only the delta is validated, never the
+whole `GameState`. The database copy is written behind: games changed since
+the last flush are saved together, with one executemany UPDATE at most every
+GAME_STATE_FLUSH_INTERVAL_MS.
+
+Each update is published as a GAME_TICK event with the full state, the
+delta and the player's username. Other workers adopt the state from the
+event, so a game's next delta can arrive at any worker; the worker that
+applied the latest delta saves it. That needs a bus reaching every worker:
+without one, `app.database.update_game_state` applies each delta to the
+database row instead, with `apply_delta`.
+"""
+import asyncio
+from collections import deque
+import logging
+from typing import Awaitable, Callable, Optional
+
+from app.config import GAME_STATE_FLUSH_INTERVAL_MS
+from app.models import GameStateDelta
+
+
+logger = logging.getLogger(__name__)
+
+
+class LiveGame:
+    """One game's state, with the snake as a deque of positions (head first), and its player's username."""
+
+    __slots__ = ("snake", "food", "direction", "score", "owner")
+
+    def __init__(self, state: dict, owner: Optional[str] = None) -> None:
+        self.snake = deque(state["snake"])
+        self.food = state["food"]
+        self.direction = state["direction"]
+        self.score = state["score"]
+        self.owner = owner
+
+    def apply(self, delta: GameStateDelta) -> None:
+        """Apply a validated delta; raises ValueError if it would leave no snake."""
+        length = len(self.snake) + (delta.head is not None)
+        if delta.tailPops >= length:
+            raise ValueError(f"tailPops {delta.tailPops} would remove the whole snake of length {length}")
+        if delta.head is not None:
+            self.snake.appendleft({"x": delta.head.x, "y": delta.head.y})
+        for _ in range(delta.tailPops):
+            self.snake.pop()
+        if delta.food is not None:
+            self.food = {"x": delta.food.x, "y": delta.food.y}
+        if delta.direction is not None:
+            self.direction = delta.direction.value
+        if delta.score is not None:
+            self.score = delta.score
+
+    def state(self) -> dict:
+        """The game in the shape of the API `GameState` model."""
+        return {"snake": list(self.snake), "food": self.food, "direction": self.direction, "score": self.score}
+
+
+def apply_delta(state: dict, delta: GameStateDelta) -> dict:
+    """A game state with a delta applied; raises ValueError if it would leave no snake."""
+    game = LiveGame(state)
+    game.apply(delta)
+    return game.state()
+
+
+class GameStateStore:
+    """Live games by player id, saved to the database in coalesced batches."""
+
+    def __init__(self, interval_ms: float = GAME_STATE_FLUSH_INTERVAL_MS) -> None:
+        self.interval = interval_ms / 1000
+        self.games: dict[str, LiveGame] = {}
+        self.dirty: set[str] = set()
+        self.stats = {"updates": 0, "flushes": 0, "saved": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self.games
+
+    def get(self, player_id: str) -> Optional[dict]:
+        game = self.games.get(player_id)
+        return None if game is None else game.state()
+
+    def owner(self, player_id: str) -> Optional[str]:
+        """Username playing a loaded game, if known."""
+        game = self.games.get(player_id)
+        return None if game is None else game.owner
+
+    def load(self, player_id: str, state: dict, owner: Optional[str] = None) -> None:
+        """Adopt a state read from the database or published by another worker."""
+        self.games[player_id] = LiveGame(state, owner or self.owner(player_id))
+        # Whoever applied the newer state saves it
+        self.dirty.discard(player_id)
+
+    def apply(self, player_id: str, delta: GameStateDelta) -> dict:
+        """Apply a delta to a loaded game and return its new full state."""
+        game = self.games[player_id]
+        game.apply(delta)
+        self.dirty.add(player_id)
+        self.stats["updates"] += 1
+        return game.state()
+
+    def discard(self, player_id: str) -> None:
+        """Forget a finished game (its row is gone, so pending changes are dropped too)."""
+        self.games.pop(player_id, None)
+        self.dirty.discard(player_id)
+
+    async def flush(self, save: Callable[[list[tuple[str, dict]]], Awaitable[None]]) -> int:
+        """Save every game changed since the last flush with one `save` call; returns how many."""
+        if not self.dirty:
+            return 0
+        player_ids, self.dirty = self.dirty, set()
+        rows = [(player_id, self.games[player_id].state()) for player_id in player_ids if player_id in self.games]
+        if not rows:
+            return 0
+        try:
+            await save(rows)
+        except Exception:
+            # Keep them for the next flush unless they ended in the meantime
+            self.dirty.update(player_id for player_id, _ in rows if player_id in self.games)
+            raise
+        self.stats["flushes"] += 1
+        self.stats["saved"] += len(rows)
+        return len(rows)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and save what is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._flush_to_database()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._flush_to_database()
+            except Exception:
+                logger.exception("saving game states failed")
+
+    async def _flush_to_database(self) -> None:
+        from app.database import async_session, save_game_states
+
+        if not self.dirty:
+            return
+        async with async_session() as db:
+            await self.flush(lambda rows: save_game_states(db, rows))
+
+    def report(self) -> dict:
+        return {"games": len(self.games), "pending": len(self.dirty), **self.stats}
+
+
+game_states = GameStateStore()
@@ -0,0 +1,202 @@
+"""Deduplication of retried score submits by `Idempotency-Key`.
+
+Clients retry `POST /leaderboard/submit` when a response times out. A submit
+carrying an `Idempotency-Key` header reserves the key before it runs and
+stores its response afterwards; a retry with the same key gets the stored
+response back without touching the database, and one arriving while the
+first is still running gets a 409.
+
+Keys are scoped to the submitting user and live in a fixed-size,
+set-associative table in a memory-mapped file, so all workers on the host
+share it (put IDEMPOTENCY_PATH on a tmpfs). A key hashes to one bucket of
+WAYS slots, which makes every operation O(1):
+
+    header  magic, version, ways, bucket count
+    slot    state, expiry (unix time, float64), key digest (16 bytes),
+            request fingerprint (8 bytes), response length, response JSON
+
+Entries expire after IDEMPOTENCY_TTL_SECONDS and reservations after
+PENDING_TTL_SECONDS, in case a worker dies mid-submit. A full bucket evicts
+its stored response closest to expiry, never a live reservation: a bucket
+full of submits in progress turns new keys away (FULL, a 503), since evicting
+one would let its retry run the submit twice. Each operation reads at most one
+bucket under an exclusive flock; the flock can wait on another worker, so
+async callers run the operations on a thread.
+"""
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Iterator, Optional
+
+from app.config import IDEMPOTENCY_CAPACITY, IDEMPOTENCY_PATH, IDEMPOTENCY_TTL_SECONDS
+
+
+MAGIC = b"SAIK"
+VERSION = 1
+WAYS = 8
+_HEADER = struct.Struct("<4sHHI4x")  # magic, version, ways, buckets
+_SLOT = struct.Struct("<BxHd16s8s220s")  # state, response length, expiry, key digest, fingerprint, response
+MAX_RESPONSE = 220
+# A reservation outlives any submit; it only expires early if its worker died
+PENDING_TTL_SECONDS = 30.0
+
+_EMPTY, _PENDING, _DONE = 0, 1, 2
+
+# Outcomes of `IdempotencyStore.begin`
+NEW = "new"
+REPLAY = "replay"
+IN_PROGRESS = "in-progress"
+MISMATCH = "mismatch"
+FULL = "full"
+
+
+def fingerprint(body: str) -> bytes:
+    """Digest of a request body, to tell a retry from a different request reusing the key."""
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=8).digest()
+
+
+class IdempotencyStore:
+    """(user, key) -> response table shared by all workers through a memory-mapped file."""
+
+    def __init__(self, path: str = IDEMPOTENCY_PATH, capacity: int = IDEMPOTENCY_CAPACITY,
+                 ttl: float = IDEMPOTENCY_TTL_SECONDS) -> None:
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        buckets = max(1, capacity // WAYS)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            # First worker to get here initializes the table
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, _HEADER.size + buckets * WAYS * _SLOT.size)
+                os.pwrite(self._fd, _HEADER.pack(MAGIC, VERSION, WAYS, buckets), 0)
+            self._mmap = mmap.mmap(self._fd, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        magic, version, ways, self.buckets = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or ways != WAYS:
+            raise ValueError(f"{path} is not a version {VERSION} idempotency table")
+        # flock is held per open file, so threads of one process take turns on this lock first
+        self._thread_lock = threading.Lock()
+        self.stats = {
+            "new": 0, "replayed": 0, "inProgress": 0, "mismatched": 0, "released": 0, "evicted": 0, "full": 0
+        }
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _digest(user_id: str, key: str) -> bytes:
+        return hashlib.blake2b(f"{user_id}\0{key}".encode("utf-8"), digest_size=16).digest()
+
+    def _slots(self, digest: bytes) -> range:
+        bucket = int.from_bytes(digest[:8], "little") % self.buckets
+        start = _HEADER.size + bucket * WAYS * _SLOT.size
+        return range(start, start + WAYS * _SLOT.size, _SLOT.size)
+
+    def _find(self, digest: bytes, now: float) -> tuple[Optional[int], tuple]:
+        """Offset and fields of the live slot holding `digest`."""
+        for offset in self._slots(digest):
+            fields = _SLOT.unpack_from(self._mmap, offset)
+            state, _, expires, slot_digest, _, _ = fields
+            if state != _EMPTY and slot_digest == digest and expires > now:
+                return offset, fields
+        return None, ()
+
+    def _victim(self, digest: bytes, now: float) -> Optional[int]:
+        """A free or expired slot of the bucket, else the stored response closest to expiry; None if all are reserved."""
+        victim = None
+        victim_expires = None
+        for offset in self._slots(digest):
+            state, _, expires, _, _, _ = _SLOT.unpack_from(self._mmap, offset)
+            if state == _EMPTY or expires <= now:
+                return offset
+            if state == _DONE and (victim is None or expires < victim_expires):
+                victim, victim_expires = offset, expires
+        if victim is not None:
+            self.stats["evicted"] += 1
+        return victim
+
+    def begin(self, user_id: str, key: str, request_fingerprint: bytes) -> tuple[str, Optional[bytes]]:
+        """
+        Reserve `key` for a new submit (NEW), or report a stored response (REPLAY with the JSON),
+        a submit still running (IN_PROGRESS), a different request under the same key (MISMATCH)
+        or a bucket whose every slot is reserved by a running submit (FULL).
+        """
+        digest = self._digest(user_id, key)
+        now = time.time()
+        with self._locked():
+            offset, fields = self._find(digest, now)
+            if offset is None:
+                victim = self._victim(digest, now)
+                if victim is None:
+                    self.stats["full"] += 1
+                    return FULL, None
+                _SLOT.pack_into(
+                    self._mmap, victim, _PENDING, 0, now + PENDING_TTL_SECONDS, digest, request_fingerprint, b""
+                )
+                self.stats["new"] += 1
+                return NEW, None
+        state, length, _, _, stored_fingerprint, response = fields
+        if stored_fingerprint != request_fingerprint:
+            self.stats["mismatched"] += 1
+            return MISMATCH, None
+        if state == _PENDING:
+            self.stats["inProgress"] += 1
+            return IN_PROGRESS, None
+        self.stats["replayed"] += 1
+        return REPLAY, response[:length]
+
+    def complete(self, user_id: str, key: str, request_fingerprint: bytes, response: bytes) -> None:
+        """Store the response of a reserved key for IDEMPOTENCY_TTL_SECONDS."""
+        if len(response) > MAX_RESPONSE:
+            self.release(user_id, key)
+            return
+        digest = self._digest(user_id, key)
+        now = time.time()
+        with self._locked():
+            offset, _ = self._find(digest, now)
+            if offset is None:
+                # The reservation expired meanwhile; the response is not kept if no slot is free
+                offset = self._victim(digest, now)
+                if offset is None:
+                    return
+            _SLOT.pack_into(
+                self._mmap, offset, _DONE, len(response), now + self.ttl, digest, request_fingerprint, response
+            )
+
+    def release(self, user_id: str, key: str) -> None:
+        """Drop a reservation whose submit failed, so a retry runs again."""
+        digest = self._digest(user_id, key)
+        with self._locked():
+            offset, fields = self._find(digest, time.time())
+            if offset is not None and fields[0] == _PENDING:
+                _SLOT.pack_into(self._mmap, offset, _EMPTY, 0, 0.0, b"", b"", b"")
+                self.stats["released"] += 1
+
+    def clear(self) -> None:
+        with self._locked():
+            self._mmap[_HEADER.size:] = bytes(len(self._mmap) - _HEADER.size)
+
+    def close(self) -> None:
+        self._mmap.close()
+        os.close(self._fd)
+
+    def report(self) -> dict:
+        return {"path": self.path, "capacity": self.buckets * WAYS, "ttlSeconds": self.ttl, **self.stats}
+
+
+# Set by the app lifespan when IDEMPOTENCY_ENABLED is on
+store: Optional[IdempotencyStore] = None
@@ -0,0 +1,316 @@
+"""Write-behind score ingestion with group commit.
+
+With `INGEST_MODE=write-behind`, `/leaderboard/submit` no longer commits per
+request. Submits go into a bounded asyncio queue; a single writer task takes
+up to `INGEST_BATCH_SIZE` of them (or whatever arrived within
+`INGEST_FLUSH_INTERVAL_MS`), appends the batch to a local journal with one
+fsync, acknowledges every submit in the batch and then writes the batch to
+the database in one transaction. The rank returned to the client is
+provisional, taken from the in-memory leaderboard, so it is only used while
+that leaderboard is current: with several workers it needs `EVENT_BUS=unix`,
+and submits made while it is loading or resyncing take the sync path.
+
+Journal entries not yet marked committed are replayed on start, so a crash
+between acknowledging and committing loses nothing. Every worker keeps its own
+journal, `<INGEST_JOURNAL_PATH>.<slot>`, claimed with an flock for as long as
+the worker runs: sequence numbers and compaction are per journal, so workers
+never overwrite or truncate each other's entries. On start, a worker also
+replays and empties the journals no running worker holds, left by workers
+that died or by a larger worker count.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from datetime import datetime, UTC
+from typing import Awaitable, Callable, Optional
+import uuid
+
+from app.config import (
+    INGEST_BATCH_SIZE, INGEST_ENQUEUE_TIMEOUT_MS, INGEST_FLUSH_INTERVAL_MS,
+    INGEST_JOURNAL_PATH, INGEST_QUEUE_SIZE
+)
+from app import events
+from app.leaderboard_store import leaderboard_store
+from app.verification import needs_verification
+
+
+logger = logging.getLogger(__name__)
+
+CommitBatch = Callable[[list[dict]], Awaitable[None]]
+
+# Compact the journal once it is fully committed and bigger than this
+JOURNAL_COMPACT_BYTES = 16 * 1024 * 1024
+COMMIT_RETRY_SECONDS = 1.0
+
+
+class IngestBackpressure(Exception):
+    """Raised when the ingestion queue stays full past the enqueue timeout."""
+
+
+class SpillJournal:
+    """Append-only NDJSON journal of accepted submits and commit markers."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.last_seq = 0
+        self.committed_seq = 0
+        self._fd: Optional[int] = None
+
+    def lock(self) -> bool:
+        """Take the journal's flock without waiting; False if another worker holds it."""
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.close()
+            return False
+        return True
+
+    def open(self) -> list[dict]:
+        """Open the journal and return the entries that were never committed."""
+        pending: dict[int, dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final write from a crash; it was never acknowledged
+                        break
+                    if record["op"] == "entry":
+                        pending[record["seq"]] = record["entry"]
+                        self.last_seq = max(self.last_seq, record["seq"])
+                    elif record["op"] == "commit":
+                        self.committed_seq = max(self.committed_seq, record["through"])
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        return [entry for seq, entry in sorted(pending.items()) if seq > self.committed_seq]
+
+    def _write(self, records: list[dict]) -> None:
+        data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        os.write(self._fd, data.encode("utf-8"))
+        os.fsync(self._fd)
+
+    def append(self, entries: list[dict]) -> int:
+        """Durably append entries and return the sequence number of the last one."""
+        records = []
+        for entry in entries:
+            self.last_seq += 1
+            records.append({"op": "entry", "seq": self.last_seq, "entry": entry})
+        self._write(records)
+        return self.last_seq
+
+    def mark_committed(self, seq: int) -> None:
+        """Record that every entry up to `seq` is in the database."""
+        self._write([{"op": "commit", "through": seq}])
+        self.committed_seq = seq
+        if seq == self.last_seq and os.fstat(self._fd).st_size > JOURNAL_COMPACT_BYTES:
+            os.ftruncate(self._fd, 0)
+
+    def empty(self) -> None:
+        """Drop every entry, once they are all in the database."""
+        os.ftruncate(self._fd, 0)
+        self.last_seq = self.committed_seq = 0
+
+    def close(self) -> None:
+        if self._fd is not None:
+            # Closing the descriptor releases the flock
+            os.close(self._fd)
+            self._fd = None
+
+
+def claim_journal(base: str) -> SpillJournal:
+    """Lock the lowest-numbered journal slot of `base` no other worker holds."""
+    os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+    slot = 0
+    while True:
+        journal = SpillJournal(f"{base}.{slot}")
+        if journal.lock():
+            return journal
+        slot += 1
+
+
+def orphaned_journals(base: str) -> list[SpillJournal]:
+    """Lock the journals of `base` no running worker holds, including a pre-slot journal at `base` itself."""
+    directory, prefix = os.path.split(base)
+    candidates = [base] if os.path.exists(base) else []
+    candidates += sorted(
+        os.path.join(directory, name) for name in os.listdir(directory or ".")
+        if name.startswith(prefix + ".") and name[len(prefix) + 1:].isdigit()
+    )
+    journals = []
+    for path in candidates:
+        journal = SpillJournal(path)
+        if journal.lock():
+            journals.append(journal)
+    return journals
+
+
+class ScoreIngestor:
+    """Bounded queue plus a group-committing background writer."""
+
+    def __init__(
+        self,
+        commit: CommitBatch,
+        journal_path: str = INGEST_JOURNAL_PATH,
+        max_queue: int = INGEST_QUEUE_SIZE,
+        batch_size: int = INGEST_BATCH_SIZE,
+        interval_ms: float = INGEST_FLUSH_INTERVAL_MS,
+        enqueue_timeout_ms: float = INGEST_ENQUEUE_TIMEOUT_MS,
+    ) -> None:
+        self.commit = commit
+        self.journal_path = journal_path
+        self.journal: Optional[SpillJournal] = None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.stats = {"accepted": 0, "rejected": 0, "batches": 0, "committed": 0, "commitFailures": 0}
+        # Entries shown in the in-memory leaderboard but not committed yet, which a reload re-applies
+        self.uncommitted: dict[str, dict] = {}
+        self._writer: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Claim a journal, replay its and orphaned journals' uncommitted entries and start the writer."""
+        if not events.reaches_all_workers():
+            # Ranks come from this worker's leaderboard, which would miss the other workers' entries
+            raise RuntimeError("write-behind ingestion needs EVENT_BUS=unix with several workers")
+        self.journal = await asyncio.to_thread(claim_journal, self.journal_path)
+        pending = self.journal.open()
+        if pending:
+            logger.info("replaying %d uncommitted submits from %s", len(pending), self.journal.path)
+            await self._commit(pending, self.journal, self.journal.last_seq)
+        for orphan in await asyncio.to_thread(orphaned_journals, self.journal_path):
+            try:
+                pending = orphan.open()
+                if pending:
+                    logger.info("replaying %d uncommitted submits from %s", len(pending), orphan.path)
+                    await self._commit(pending, orphan, orphan.last_seq)
+                orphan.empty()
+            finally:
+                orphan.close()
+        self._writer = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Drain the queue, commit what is left and close the journal."""
+        if self._writer is not None:
+            await self.queue.put(None)
+            await self._writer
+            self._writer = None
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    async def submit(self, user_id: str, username: str, score: int, mode: str,
+                     replay: Optional[dict] = None) -> int:
+        """
+        Queue a submit and return its provisional rank once it is durable in the journal.
+        The in-memory leaderboard and the other workers only see it after the journal write.
+        """
+        entry = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "username": username,
+            "score": score,
+            "mode": mode,
+            "date": datetime.now(UTC).strftime("%Y-%m-%d"),
+            "replay": replay,
+        }
+        acked = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self.queue.put((entry, acked)), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            raise IngestBackpressure("score ingestion queue is full")
+        # Raises the journal's write error, before anything shows the entry
+        await acked
+        self.stats["accepted"] += 1
+        if needs_verification(score):
+            # Shown once the verification pipeline has replayed it
+            return leaderboard_store.rank_of(score, mode)
+        rank = leaderboard_store.add(entry["id"], username, score, mode, entry["date"])
+        self.uncommitted[entry["id"]] = entry
+        events.event_bus.publish(events.LEADERBOARD_CHANGED, events.leaderboard_change(
+            "add", entry["id"], username, score, mode, entry["date"]
+        ))
+        return rank
+
+    async def _next_batch(self) -> tuple[list, bool]:
+        """Wait for a submit, then gather more until the batch is full or the interval ends."""
+        loop = asyncio.get_running_loop()
+        first = await self.queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = loop.time() + self.interval
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _commit(self, entries: list[dict], journal: SpillJournal, through: int) -> None:
+        """Commit entries of `journal` to the database, retrying until it succeeds."""
+        while True:
+            try:
+                await self.commit(entries)
+                break
+            except Exception:
+                self.stats["commitFailures"] += 1
+                logger.exception("group commit of %d submits failed, retrying", len(entries))
+                await asyncio.sleep(COMMIT_RETRY_SECONDS)
+        for entry in entries:
+            self.uncommitted.pop(entry["id"], None)
+        await asyncio.to_thread(journal.mark_committed, through)
+        self.stats["committed"] += len(entries)
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if not batch:
+                continue
+            entries = [entry for entry, _ in batch]
+            try:
+                through = await asyncio.to_thread(self.journal.append, entries)
+            except OSError as exc:
+                for _, acked in batch:
+                    acked.set_exception(exc)
+                continue
+            for _, acked in batch:
+                if not acked.done():
+                    acked.set_result(None)
+            # Let the acknowledged submits show their entries (and list them uncommitted) before the commit
+            await asyncio.sleep(0)
+            self.stats["batches"] += 1
+            await self._commit(entries, self.journal, through)
+
+    def report(self) -> dict:
+        return {
+            **self.stats, "queued": self.queue.qsize(), "maxQueue": self.queue.maxsize,
+            "journal": self.journal.path if self.journal is not None else None,
+        }
+
+
+async def commit_to_database(entries: list[dict]) -> None:
+    """Default group-commit target: one transaction per batch."""
+    from app.database import add_leaderboard_entries_bulk, async_session
+
+    async with async_session() as db:
+        await add_leaderboard_entries_bulk(db, entries)
+
+
+# Set by the app lifespan when INGEST_MODE is "write-behind"
+ingestor: Optional[ScoreIngestor] = None
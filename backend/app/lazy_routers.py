@@ -0,0 +1,67 @@
+"""Deferred router registration to keep worker import time low.
+
+Router modules pull in SQLAlchemy, `jose`, `bcrypt` and the e-mail validator.
+Instead of importing them when `main` is imported, each router is included
+into the app the first time a request hits its path prefix (or when the docs
+are requested, or when the warm-up stage loads them all).
+"""
+import importlib
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class RouterLoader:
+    """Imports router modules on demand and includes them into the app."""
+
+    def __init__(self, app: FastAPI, prefix: str, modules: dict[str, str]) -> None:
+        # Maps a path segment (e.g. "/auth") to the module defining its `router`
+        self.app = app
+        self.prefix = prefix
+        self.modules = modules
+        self.loaded: set[str] = set()
+
+    def load(self, segment: str) -> None:
+        """Include the router registered for `segment` if it isn't loaded yet."""
+        if segment in self.loaded:
+            return
+        module = importlib.import_module(self.modules[segment])
+        self.app.include_router(module.router, prefix=self.prefix)
+        self.loaded.add(segment)
+        # Routes changed, so a previously generated schema is stale
+        self.app.openapi_schema = None
+
+    def load_all(self) -> None:
+        """Include every registered router."""
+        for segment in self.modules:
+            self.load(segment)
+
+    def load_for_path(self, path: str) -> None:
+        """Include whichever routers are needed to serve `path`."""
+        if path in (self.app.openapi_url, self.app.docs_url, self.app.redoc_url):
+            self.load_all()
+            return
+        if not path.startswith(self.prefix):
+            return
+        rest = path[len(self.prefix):]
+        for segment in self.modules:
+            if segment not in self.loaded and (rest == segment or rest.startswith(segment + "/")):
+                self.load(segment)
+
+    @property
+    def pending(self) -> bool:
+        """Whether some routers have not been loaded yet."""
+        return len(self.loaded) < len(self.modules)
+
+
+class LazyRouterMiddleware:
+    """ASGI middleware that loads routers before the request reaches routing."""
+
+    def __init__(self, app: ASGIApp, loader: RouterLoader) -> None:
+        self.app = app
+        self.loader = loader
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket") and self.loader.pending:
+            self.loader.load_for_path(scope["path"])
+        await self.app(scope, receive, send)
@@ -0,0 +1,125 @@
+"""Live top-N leaderboard change feed for `GET /leaderboard/stream`.
+
+Every distinct (mode, N) that someone watches is one view, shared by all its
+clients and published through a `SpectatorHub` channel. The feed listens to
+LEADERBOARD_CHANGED events on the event bus, after the in-memory leaderboard
+has applied them. A change only costs a score comparison per view unless it
+reaches that view's top N; then the view re-reads its top N from the store
+and sends the difference as ops:
+
+    {"op": "insert", "position": p, "entry": {...}}   insert before position p
+    {"op": "remove", "position": p}                    remove the entry at p
+    {"op": "drop", "position": n}                      drop the tail entry at n
+
+Changes that are not a single insert or removal resend the whole view as a
+keyframe, as do clients that fall behind.
+"""
+from typing import Optional, TYPE_CHECKING
+
+from app.leaderboard_store import leaderboard_store
+from app.spectators import SpectatorHub, Subscriber
+
+if TYPE_CHECKING:
+    # app.events attaches the feed to the bus, so it imports this module
+    from app.events import Event
+
+
+def _entries(mode: Optional[str], top: int) -> list[dict]:
+    return [entry.model_dump(mode="json") for entry in leaderboard_store.entries(mode, top)]
+
+
+class TopView:
+    """The current top `top` entries of one mode (or of all modes)."""
+
+    def __init__(self, mode: Optional[str], top: int) -> None:
+        self.mode = mode
+        self.top = top
+        self.entries = _entries(mode, top)
+
+    def state(self) -> dict:
+        return {"mode": self.mode, "top": self.top, "entries": self.entries}
+
+    def affected_by(self, entry: dict) -> bool:
+        """Whether a change to `entry` can alter this view."""
+        if self.mode is not None and entry["mode"] != self.mode:
+            return False
+        if len(self.entries) < self.top or entry["score"] >= self.entries[-1]["score"]:
+            return True
+        return any(current["id"] == entry["id"] for current in self.entries)
+
+    def refresh(self) -> Optional[list[dict]]:
+        """Re-read the top N; return the ops from the old list to the new one, or None to send a keyframe."""
+        old, new = self.entries, _entries(self.mode, self.top)
+        self.entries = new
+        return diff(old, new, self.top)
+
+
+def diff(old: list[dict], new: list[dict], top: int) -> Optional[list[dict]]:
+    """Ops turning `old` into `new` if they differ by one insert or one removal, else None."""
+    old_ids = [entry["id"] for entry in old]
+    new_ids = [entry["id"] for entry in new]
+    if old_ids == new_ids:
+        return []
+    i = next((i for i, (a, b) in enumerate(zip(old_ids, new_ids)) if a != b), min(len(old_ids), len(new_ids)))
+
+    if i < len(new_ids) and (old_ids[:i] + [new_ids[i]] + old_ids[i:])[:top] == new_ids:
+        ops = [{"op": "insert", "position": i, "entry": new[i]}]
+        if len(old_ids) == top:
+            ops.append({"op": "drop", "position": top})
+        return ops
+
+    if i < len(old_ids):
+        remaining = old_ids[:i] + old_ids[i + 1:]
+        if new_ids[:len(remaining)] == remaining and len(new_ids) - len(remaining) <= 1:
+            ops = [{"op": "remove", "position": i}]
+            if len(new_ids) > len(remaining):
+                # The entry that moved up into the last place
+                ops.append({"op": "insert", "position": len(remaining), "entry": new[-1]})
+            return ops
+    return None
+
+
+class TopNFeed:
+    """Shared views of the leaderboard top N, updated from the event bus."""
+
+    def __init__(self, hub: Optional[SpectatorHub] = None) -> None:
+        self.hub = hub or SpectatorHub()
+        self.views: dict[str, TopView] = {}
+
+    @staticmethod
+    def channel_id(mode: Optional[str], top: int) -> str:
+        return f"{mode or 'all'}:{top}"
+
+    def subscribe(self, mode: Optional[str], top: int) -> Subscriber:
+        """Watch the top `top` of `mode`; the first frame is a keyframe with the whole view."""
+        channel_id = self.channel_id(mode, top)
+        if channel_id not in self.views:
+            view = self.views[channel_id] = TopView(mode, top)
+            self.hub.publish(channel_id, view.state())
+        return self.hub.subscribe(channel_id)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Stop watching; views nobody watches are dropped."""
+        self.hub.unsubscribe(subscriber)
+        channel = subscriber.channel
+        if not channel.subscribers:
+            self.views.pop(channel.channel_id, None)
+            self.hub.close(channel.channel_id)
+
+    def on_change(self, event: "Event") -> None:
+        """LEADERBOARD_CHANGED handler; the in-memory leaderboard already reflects the change."""
+        entry = event.payload["entry"]
+        for channel_id, view in self.views.items():
+            if not view.affected_by(entry):
+                continue
+            ops = view.refresh()
+            if ops is None:
+                self.hub.publish(channel_id, view.state())
+            elif ops:
+                self.hub.publish(channel_id, view.state(), {"ops": ops})
+
+    def stats(self) -> dict:
+        return self.hub.stats()
+
+
+leaderboard_feed = TopNFeed()
@@ -0,0 +1,520 @@
+"""Columnar in-memory leaderboard.
+
+Holding the leaderboard as `LeaderboardEntry` models costs roughly a kilobyte
+per entry. Here each mode is a partition of parallel arrays kept sorted by
+score descending:
+
+    scores  array('i')   score
+    days    array('i')   date as a day ordinal
+    names   array('I')   index into the interned username table
+    ids     bytearray    16-byte entry UUIDs
+
+The mode itself is the partition key (its one-byte `MODE_CODES` value), and
+usernames are interned once per store. Pages are zero-copy memoryview slices
+of the arrays and only become `LeaderboardEntry` models at the serialization
+edge (`LeaderboardSlice.to_models`).
+
+Loaded from the shared snapshot (shared mode), a partition is
+`SnapshotColumns`: its entries stay in the mapped file, whose pages every
+worker shares, and only the entries added or removed since are private.
+
+Every change also updates a score histogram per mode (and one for all modes),
+which answers percentile and distribution queries without scanning a partition.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+import heapq
+from typing import Iterable, Iterator, Optional, Sequence
+import sys
+import uuid
+
+from app.models import GameMode, LeaderboardEntry
+from app.score_histogram import ScoreHistogram
+from app.shared_data import MODES_BY_CODE, SharedSnapshot
+
+
+def _descending(score: int) -> int:
+    return -score
+
+
+# Cursors are "<score>:<n>": resume at the n-th entry with that score.
+# Equal scores keep insertion order, so a cursor stays valid across inserts.
+def parse_cursor(cursor: str) -> tuple[int, int]:
+    """Split a cursor into its score and tie; ValueError if it is malformed."""
+    score, tie = (int(part) for part in cursor.split(":"))
+    if tie < 0:
+        raise ValueError(f"negative tie in cursor {cursor!r}")
+    return score, tie
+
+
+def cursor_offset(scores: Sequence[int], cursor: str) -> int:
+    """Translate a cursor to an offset in `scores` (sorted descending)."""
+    score, tie = parse_cursor(cursor)
+    return bisect_left(scores, _descending(score), key=_descending) + tie
+
+
+def cursor_at(scores: Sequence[int], position: int) -> Optional[str]:
+    """Cursor for the entry at `position` of `scores` (sorted descending), or None past the end."""
+    if position >= len(scores):
+        return None
+    score = scores[position]
+    return f"{score}:{position - bisect_left(scores, _descending(score), key=_descending)}"
+
+
+class LeaderboardSlice:
+    """A zero-copy window over one partition.
+
+    Holds memoryviews into the partition arrays, which cannot grow while a
+    view is alive; convert with `to_models` (which releases the views) before
+    the next insert.
+    """
+
+    __slots__ = ("store", "mode", "start", "scores", "days", "names", "ids")
+
+    def __init__(self, store: "LeaderboardStore", mode: str, columns: "LeaderboardColumns",
+                 start: int, stop: int) -> None:
+        self.store = store
+        self.mode = mode
+        self.start = start
+        self.scores = memoryview(columns.scores)[start:stop]
+        self.days = memoryview(columns.days)[start:stop]
+        self.names = memoryview(columns.names)[start:stop]
+        self.ids = memoryview(columns.ids)[16 * start:16 * stop]
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def rows(self) -> Iterator[tuple[str, str, int, str, str]]:
+        """Yield (id, username, score, mode, date) rows."""
+        usernames = self.store.usernames
+        for i in range(len(self.scores)):
+            yield (
+                str(uuid.UUID(bytes=bytes(self.ids[16 * i:16 * i + 16]))),
+                usernames[self.names[i]],
+                self.scores[i],
+                self.mode,
+                date.fromordinal(self.days[i]).isoformat(),
+            )
+
+    def release(self) -> None:
+        """Release the views so the partition can be modified again."""
+        for view in (self.scores, self.days, self.names, self.ids):
+            view.release()
+
+    def to_models(self) -> list[LeaderboardEntry]:
+        """Convert to API models and release the views."""
+        return _to_models(self)
+
+
+class LeaderboardPage:
+    """Consecutive slices of a snapshot-backed partition (shared and private runs), in rank order."""
+
+    __slots__ = ("slices",)
+
+    def __init__(self, slices: list[LeaderboardSlice]) -> None:
+        self.slices = slices
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self.slices)
+
+    def rows(self) -> Iterator[tuple[str, str, int, str, str]]:
+        for part in self.slices:
+            yield from part.rows()
+
+    def release(self) -> None:
+        for part in self.slices:
+            part.release()
+
+    def to_models(self) -> list[LeaderboardEntry]:
+        return _to_models(self)
+
+
+def _to_models(page) -> list[LeaderboardEntry]:
+    try:
+        return [
+            LeaderboardEntry.model_construct(
+                id=entry_id, username=username, score=score, mode=GameMode(mode), date=day
+            )
+            for entry_id, username, score, mode, day in page.rows()
+        ]
+    finally:
+        page.release()
+
+
+class LeaderboardColumns:
+    """One mode's entries as parallel arrays sorted by score descending."""
+
+    __slots__ = ("scores", "days", "names", "ids")
+
+    def __init__(self) -> None:
+        self.scores = array("i")
+        self.days = array("i")
+        self.names = array("I")
+        self.ids = bytearray()
+
+    @classmethod
+    def view(cls, scores: memoryview, days: memoryview, names: memoryview, ids: memoryview) -> "LeaderboardColumns":
+        """Read-only columns over existing buffers (such as a mapped snapshot's)."""
+        columns = cls.__new__(cls)
+        columns.scores, columns.days, columns.names, columns.ids = scores, days, names, ids
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def insert(self, entry_id: bytes, name: int, score: int, day: int) -> int:
+        """Insert after every entry with a score >= `score` and return the 0-based position."""
+        pos = bisect_right(self.scores, _descending(score), key=_descending)
+        self.scores.insert(pos, score)
+        self.days.insert(pos, day)
+        self.names.insert(pos, name)
+        self.ids[16 * pos:16 * pos] = entry_id
+        return pos
+
+    def append_sorted(self, entry_id: bytes, name: int, score: int, day: int) -> None:
+        """Append an entry known to sort last (bulk loading in score order)."""
+        self.scores.append(score)
+        self.days.append(day)
+        self.names.append(name)
+        self.ids += entry_id
+
+    def remove(self, entry_id: bytes, score: int) -> bool:
+        """Remove the entry with `entry_id` among those scoring `score`. Returns whether it was found."""
+        for pos in range(self.first_with(score), self.count_at_least(score)):
+            if self.ids[16 * pos:16 * pos + 16] == entry_id:
+                del self.scores[pos]
+                del self.days[pos]
+                del self.names[pos]
+                del self.ids[16 * pos:16 * pos + 16]
+                return True
+        return False
+
+    def count_at_least(self, score: int) -> int:
+        """Number of entries with a score >= `score`."""
+        return bisect_right(self.scores, _descending(score), key=_descending)
+
+    def first_with(self, score: int) -> int:
+        """Index of the first entry with a score <= `score`."""
+        return bisect_left(self.scores, _descending(score), key=_descending)
+
+    def score_at(self, position: int) -> int:
+        return self.scores[position]
+
+    def runs(self, offset: int, limit: Optional[int]) -> list[tuple["LeaderboardColumns", int, int]]:
+        """(columns, start, stop) runs holding the entries from `offset`, at most `limit` of them."""
+        stop = len(self) if limit is None else min(len(self), offset + limit)
+        return [(self, min(offset, len(self)), stop)]
+
+    def to_columns(self) -> "LeaderboardColumns":
+        """The entries as plain columns."""
+        return self
+
+    def iter_scores(self) -> Iterable[int]:
+        return self.scores
+
+    def nbytes(self) -> int:
+        """Bytes held by the column buffers (excluding over-allocation)."""
+        return (
+            self.scores.itemsize * len(self.scores) + self.days.itemsize * len(self.days)
+            + self.names.itemsize * len(self.names) + len(self.ids)
+        )
+
+
+class SnapshotColumns:
+    """One mode's entries: a run of the mapped snapshot, plus the changes made since.
+
+    The snapshot run is only read, so its pages stay shared between the
+    workers. Added entries go to private `LeaderboardColumns`, and removed
+    snapshot entries are recorded by position. Equal scores keep insertion
+    order, so snapshot entries sort before added ones with the same score.
+    """
+
+    __slots__ = ("base", "added", "removed")
+
+    def __init__(self, base: LeaderboardColumns) -> None:
+        self.base = base
+        self.added = LeaderboardColumns()
+        # Sorted positions in `base` of removed entries
+        self.removed = array("I")
+
+    def __len__(self) -> int:
+        return len(self.base) - len(self.removed) + len(self.added)
+
+    def _kept(self, position: int) -> int:
+        """Snapshot entries before `position` that were not removed."""
+        return position - bisect_left(self.removed, position)
+
+    def insert(self, entry_id: bytes, name: int, score: int, day: int) -> int:
+        return self._kept(self.base.count_at_least(score)) + self.added.insert(entry_id, name, score, day)
+
+    def remove(self, entry_id: bytes, score: int) -> bool:
+        if self.added.remove(entry_id, score):
+            return True
+        base = self.base
+        for pos in range(base.first_with(score), base.count_at_least(score)):
+            if base.ids[16 * pos:16 * pos + 16] == entry_id:
+                i = bisect_left(self.removed, pos)
+                if i < len(self.removed) and self.removed[i] == pos:
+                    return False
+                self.removed.insert(i, pos)
+                return True
+        return False
+
+    def count_at_least(self, score: int) -> int:
+        return self._kept(self.base.count_at_least(score)) + self.added.count_at_least(score)
+
+    def first_with(self, score: int) -> int:
+        return self._kept(self.base.first_with(score)) + self.added.first_with(score)
+
+    def score_at(self, position: int) -> int:
+        columns, start, _ = self.runs(position, 1)[0]
+        return columns.scores[start]
+
+    def runs(self, offset: int, limit: Optional[int]) -> list[tuple[LeaderboardColumns, int, int]]:
+        base, added, removed = self.base, self.added, self.removed
+        remaining = max(0, len(self) - offset)
+        if limit is not None:
+            remaining = min(remaining, limit)
+        # First snapshot position b whose merged position is at least `offset`;
+        # the added entries before it are those scoring above it
+        lo, hi = 0, len(base)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._kept(mid) + added.first_with(base.scores[mid]) >= offset:
+                hi = mid
+            else:
+                lo = mid + 1
+        b = lo
+        a = max(0, offset - self._kept(b))
+        r = bisect_left(removed, b)
+        runs = []
+        while remaining > 0:
+            while r < len(removed) and removed[r] == b:
+                b += 1
+                r += 1
+            if b < len(base) and (a >= len(added) or base.scores[b] >= added.scores[a]):
+                stop = min(len(base), b + remaining)
+                if r < len(removed):
+                    stop = min(stop, removed[r])
+                if a < len(added):
+                    stop = min(stop, base.count_at_least(added.scores[a]))
+                runs.append((base, b, stop))
+                remaining -= stop - b
+                b = stop
+            else:
+                stop = min(len(added), a + remaining)
+                if b < len(base):
+                    stop = min(stop, added.first_with(base.scores[b]))
+                runs.append((added, a, stop))
+                remaining -= stop - a
+                a = stop
+        return runs or [(added, 0, 0)]
+
+    def to_columns(self) -> LeaderboardColumns:
+        """The entries copied into plain columns (for checkpoints)."""
+        columns = LeaderboardColumns()
+        for part, start, stop in self.runs(0, None):
+            columns.scores += array("i", part.scores[start:stop])
+            columns.days += array("i", part.days[start:stop])
+            columns.names += array("I", part.names[start:stop])
+            columns.ids += part.ids[16 * start:16 * stop]
+        return columns
+
+    def iter_scores(self) -> Iterator[int]:
+        for part, start, stop in self.runs(0, None):
+            yield from part.scores[start:stop]
+
+    def nbytes(self) -> int:
+        """Private bytes; the snapshot run is shared."""
+        return self.added.nbytes() + self.removed.itemsize * len(self.removed)
+
+
+class UsernameTable:
+    """Interned usernames by index: the snapshot's username table first (decoded on access), then added ones."""
+
+    __slots__ = ("snapshot", "shared", "added", "_ids")
+
+    def __init__(self, snapshot: Optional[SharedSnapshot] = None) -> None:
+        self.snapshot = snapshot
+        self.shared = snapshot.name_count if snapshot is not None else 0
+        self.added: list[str] = []
+        self._ids: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.shared + len(self.added)
+
+    def __getitem__(self, index: int) -> str:
+        if index < self.shared:
+            return self.snapshot.username(index)
+        return self.added[index - self.shared]
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (UsernameTable, list)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def index(self, username: str) -> Optional[int]:
+        """Index of `username`, or None if it is not in the table."""
+        name = self._ids.get(username)
+        if name is None and self.snapshot is not None:
+            name = self.snapshot.find_username(username)
+        return name
+
+    def add(self, username: str) -> int:
+        name = len(self)
+        self.added.append(sys.intern(username))
+        self._ids[username] = name
+        return name
+
+
+class LeaderboardStore:
+    """Per-mode columnar leaderboard with interned usernames."""
+
+    def __init__(self) -> None:
+        self.partitions: dict[str, LeaderboardColumns | SnapshotColumns] = {
+            mode: LeaderboardColumns() for mode in MODES_BY_CODE
+        }
+        self.usernames = UsernameTable()
+        # Keyed by mode, None for all modes together
+        self.histograms: dict[Optional[str], ScoreHistogram] = {
+            mode: ScoreHistogram() for mode in [None, *MODES_BY_CODE]
+        }
+        self.loaded = False
+        # Set when this worker missed changes published by another, until it has reloaded
+        self.stale = False
+
+    def __len__(self) -> int:
+        return sum(len(columns) for columns in self.partitions.values())
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def intern(self, username: str) -> int:
+        """Return the index of `username` in the username table, adding it if needed."""
+        name = self.usernames.index(username)
+        if name is None:
+            name = self.usernames.add(username)
+        return name
+
+    def add(self, entry_id: str, username: str, score: int, mode: str, day: str) -> int:
+        """Add an entry and return its 1-based rank within its mode."""
+        columns = self.partitions[mode]
+        pos = columns.insert(
+            uuid.UUID(entry_id).bytes, self.intern(username), score, date.fromisoformat(day).toordinal()
+        )
+        self.histograms[mode].add(score)
+        self.histograms[None].add(score)
+        return pos + 1
+
+    def remove(self, entry_id: str, score: int, mode: str) -> bool:
+        """Remove an entry (e.g. a rejected score). Returns whether it was present."""
+        if not self.partitions[mode].remove(uuid.UUID(entry_id).bytes, score):
+            return False
+        self.histograms[mode].remove(score)
+        self.histograms[None].remove(score)
+        return True
+
+    def _load_histograms(self) -> None:
+        """Rebuild the histograms from the partitions."""
+        self.histograms[None] = ScoreHistogram()
+        for mode, columns in self.partitions.items():
+            self.histograms[mode].load(columns.iter_scores())
+            self.histograms[None].merge(self.histograms[mode])
+
+    def load(self, rows: Iterable[tuple[str, str, int, str, str]]) -> None:
+        """Replace the contents with (id, username, score, mode, date) rows."""
+        self.clear()
+        for entry_id, username, score, mode, day in sorted(rows, key=lambda row: row[2], reverse=True):
+            self.partitions[mode].append_sorted(
+                uuid.UUID(entry_id).bytes, self.intern(username), score, date.fromisoformat(day).toordinal()
+            )
+        self._load_histograms()
+        self.loaded = True
+
+    def load_snapshot(self, snapshot: SharedSnapshot) -> None:
+        """Serve from a mapped shared snapshot: its columns are read in place, changes are kept privately."""
+        self.clear()
+        # The snapshot's name indexes are the first store name indexes
+        self.usernames = UsernameTable(snapshot)
+        for mode in MODES_BY_CODE:
+            start, stop = snapshot.mode_range(mode)
+            self.partitions[mode] = SnapshotColumns(LeaderboardColumns.view(
+                snapshot.scores[start:stop], snapshot.days[start:stop],
+                snapshot.names[start:stop], snapshot.ids[16 * start:16 * stop]
+            ))
+        self._load_histograms()
+        self.loaded = True
+
+    def is_current(self) -> bool:
+        """Whether reads can be served from this copy: it is loaded, missed no change and every worker's changes reach it."""
+        # The event bus attaches this store, so it is imported late
+        from app.events import reaches_all_workers
+        return self.loaded and not self.stale and reaches_all_workers()
+
+    def rank_of(self, score: int, mode: str) -> int:
+        """Rank a new entry with `score` would get (it sorts after equal scores)."""
+        return self.partitions[mode].count_at_least(score) + 1
+
+    def percentile(self, score: int, mode: Optional[str] = None) -> Optional[float]:
+        """Share of entries of `mode` (all modes if None) scoring below `score`, in percent."""
+        return self.histograms[mode].percentile(score)
+
+    def score_range(self, mode: Optional[str] = None) -> tuple[Optional[int], Optional[int]]:
+        """Exact lowest and highest scores of `mode` (all modes if None), read off the sorted partitions."""
+        partitions = [self.partitions[mode]] if mode is not None else list(self.partitions.values())
+        partitions = [columns for columns in partitions if len(columns)]
+        if not partitions:
+            return None, None
+        return (
+            min(columns.score_at(len(columns) - 1) for columns in partitions),
+            max(columns.score_at(0) for columns in partitions),
+        )
+
+    def page(self, mode: str, offset: int = 0, limit: Optional[int] = None) -> LeaderboardSlice | LeaderboardPage:
+        """Zero-copy slice of `mode` starting at `offset`."""
+        slices = [
+            LeaderboardSlice(self, mode, columns, start, stop)
+            for columns, start, stop in self.partitions[mode].runs(offset, limit)
+        ]
+        return slices[0] if len(slices) == 1 else LeaderboardPage(slices)
+
+    def top(self, mode: str, k: int) -> LeaderboardSlice | LeaderboardPage:
+        """Zero-copy slice of the top `k` entries of `mode`."""
+        return self.page(mode, 0, k)
+
+    def cursor_position(self, mode: str, cursor: str) -> int:
+        """Translate a cursor to an offset in `mode`."""
+        score, tie = parse_cursor(cursor)
+        return self.partitions[mode].first_with(score) + tie
+
+    def cursor_after(self, mode: str, position: int) -> Optional[str]:
+        """Cursor for the entry at `position`, or None past the end."""
+        columns = self.partitions[mode]
+        if position >= len(columns):
+            return None
+        score = columns.score_at(position)
+        return f"{score}:{position - columns.first_with(score)}"
+
+    def entries(self, mode: Optional[str] = None, limit: Optional[int] = None) -> list[LeaderboardEntry]:
+        """Entries of `mode` (or all modes merged by score) as API models."""
+        if mode is not None:
+            return self.page(mode, 0, limit).to_models()
+        merged = heapq.merge(
+            *(self.page(m, 0, limit).to_models() for m in MODES_BY_CODE),
+            key=lambda entry: entry.score, reverse=True,
+        )
+        return list(merged)[:limit]
+
+    def nbytes(self) -> int:
+        """Approximate private bytes held, including the interned usernames (a mapped snapshot is shared)."""
+        return (
+            sum(columns.nbytes() for columns in self.partitions.values())
+            + sum(sys.getsizeof(name) for name in self.usernames.added)
+        )
+
+
+leaderboard_store = LeaderboardStore()
@@ -1,6 +1,6 @@
 """Pydantic models for the Snake Arena Live API."""
 from datetime import datetime
-from typing import Literal
+from typing import Literal, Optional
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from enum import Enum
 
@@ -12,6 +12,18 @@ class GameMode(str, Enum):
     PASS_THROUGH = "pass-through"
 
 
+class ExportFormat(str, Enum):
+    """Leaderboard export format enumeration."""
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class ActivePlayerSort(str, Enum):
+    """Active players sort order enumeration."""
+    SCORE = "score"
+    STARTED_AT = "startedAt"
+
+
 class Direction(str, Enum):
     """Snake direction enumeration."""
     UP = "UP"
@@ -30,6 +42,8 @@ class Position(BaseModel):
 class User(BaseModel):
     """User profile model."""
     model_config = ConfigDict(
+        # Build the validator and schema on first use rather than when the module is imported
+        defer_build=True,
         json_schema_extra={
             "example": {
                 "id": "550e8400-e29b-41d4-a716-446655440000",
@@ -109,10 +123,50 @@ class GameState(BaseModel):
     score: int = Field(..., ge=0)
 
 
+class GameStateDelta(BaseModel):
+    """Changes since the previous game state; omitted fields are unchanged."""
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "head": {"x": 11, "y": 10},
+                "tailPops": 1,
+                "direction": "RIGHT"
+            }
+        }
+    )
+    
+    head: Optional[Position] = Field(None, description="New head segment, added in front of the snake")
+    tailPops: int = Field(0, ge=0, description="Number of segments removed from the tail")
+    food: Optional[Position] = None
+    direction: Optional[Direction] = None
+    score: Optional[int] = Field(None, ge=0)
+
+
+class ArenaSnakeState(BaseModel):
+    """One snake in an arena room."""
+    id: str
+    username: str
+    snake: list[Position]
+    direction: Direction
+    score: int = Field(..., ge=0)
+    alive: bool
+
+
+class ArenaState(BaseModel):
+    """Every snake and food item of an arena room."""
+    roomId: str
+    mode: GameMode
+    gridSize: int = Field(..., ge=1)
+    tick: int = Field(..., ge=0)
+    snakes: list[ArenaSnakeState]
+    food: list[Position]
+
+
 # Request Models
 class LoginRequest(BaseModel):
     """Login request model."""
     model_config = ConfigDict(
+        defer_build=True,
         json_schema_extra={
             "example": {
                 "email": "player1@test.com",
@@ -128,6 +182,7 @@ class LoginRequest(BaseModel):
 class SignupRequest(BaseModel):
     """Signup request model."""
     model_config = ConfigDict(
+        defer_build=True,
         json_schema_extra={
             "example": {
                 "email": "newuser@test.com",
@@ -142,6 +197,29 @@ class SignupRequest(BaseModel):
     password: str = Field(..., min_length=6)
 
 
+class ReplayMove(BaseModel):
+    """A direction change applied before the given tick."""
+    tick: int = Field(..., ge=0)
+    direction: Direction
+
+
+class ReplayLog(BaseModel):
+    """Input log of a finished game, used to verify the submitted score."""
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "ticks": 42,
+                "moves": [{"tick": 5, "direction": "UP"}, {"tick": 9, "direction": "RIGHT"}],
+                "foods": [{"x": 15, "y": 12}, {"x": 3, "y": 7}]
+            }
+        }
+    )
+    
+    ticks: int = Field(..., ge=0, le=1_000_000, description="Number of moves the game ran for")
+    moves: list[ReplayMove] = Field(default_factory=list, description="Direction changes in tick order")
+    foods: list[Position] = Field(..., min_length=1, description="Food positions in spawn order, starting with the initial food")
+
+
 class SubmitScoreRequest(BaseModel):
     """Submit score request model."""
     model_config = ConfigDict(
@@ -155,16 +233,33 @@ class SubmitScoreRequest(BaseModel):
     
     score: int = Field(..., ge=0)
     mode: GameMode
+    replay: Optional[ReplayLog] = Field(None, description="Input log used to verify the score off the request path")
+
+
+class CreateArenaRoomRequest(BaseModel):
+    """Create arena room request model."""
+    mode: GameMode
+    gridSize: Optional[int] = Field(None, ge=16, le=256, description="Defaults to ARENA_GRID_SIZE")
+
+
+class ArenaDirectionRequest(BaseModel):
+    """Turn request for the caller's snake in an arena room."""
+    direction: Direction
 
 
 # Response Models
+# The models holding `User` are built on first use, like `User`
 class LoginResponse(BaseModel):
     """Login response model."""
+    model_config = ConfigDict(defer_build=True)
+    
     user: User
 
 
 class SignupResponse(BaseModel):
     """Signup response model."""
+    model_config = ConfigDict(defer_build=True)
+    
     user: User
 
 
@@ -174,13 +269,103 @@ class SubmitScoreResponse(BaseModel):
         json_schema_extra={
             "example": {
                 "success": True,
-                "rank": 5
+                "rank": 5,
+                "percentile": 93.4
             }
         }
     )
     
     success: bool
     rank: int = Field(..., description="The player's rank on the leaderboard")
+    percentile: Optional[float] = Field(
+        None, ge=0, le=100, description="Share of the mode's leaderboard entries scoring below this score, in percent"
+    )
+
+
+class ScoreDistribution(BaseModel):
+    """Score distribution of one mode (or all modes), from its histogram."""
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "mode": "walls",
+                "count": 1200,
+                "mean": 412.5,
+                "min": 0,
+                "max": 2450,
+                "quantiles": {"p50": 380, "p90": 880, "p99": 1792},
+                "bins": [[0, 310], [123, 402]]
+            }
+        }
+    )
+    
+    mode: Optional[GameMode] = None
+    count: int = Field(..., ge=0)
+    mean: Optional[float] = None
+    min: Optional[int] = Field(None, description="Exact lowest score")
+    max: Optional[int] = Field(None, description="Exact highest score")
+    quantiles: dict[str, int] = Field(..., description="Scores at p50, p75, p90, p95, p99 and p99.9 (bucket lower bounds, under 1% error)")
+    bins: list[tuple[int, int]] = Field(..., description="Equal-width [lower bound, count] bins from min to max")
+
+
+class SpectatorChannelStats(BaseModel):
+    """Fan-out statistics of one watched game."""
+    subscribers: int = Field(..., ge=0)
+    published: int = Field(..., ge=0)
+    dropped: int = Field(..., ge=0, description="Frames dropped from lagging subscribers' queues")
+    dropRate: float = Field(..., ge=0, description="Dropped frames per frame offered to a subscriber")
+
+
+class SpectatorStats(BaseModel):
+    """Spectator hub statistics."""
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "channels": 1,
+                "subscribers": 120,
+                "perChannel": {
+                    "ap1": {"subscribers": 120, "published": 400, "dropped": 36, "dropRate": 0.0008}
+                }
+            }
+        }
+    )
+    
+    channels: int = Field(..., ge=0)
+    subscribers: int = Field(..., ge=0)
+    perChannel: dict[str, SpectatorChannelStats]
+
+
+class ArenaRoomInfo(BaseModel):
+    """Summary of an arena room."""
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "roomId": "3f9c2a1b",
+                "mode": "walls",
+                "gridSize": 64,
+                "tick": 1520,
+                "players": 40,
+                "alive": 37
+            }
+        }
+    )
+    
+    roomId: str
+    mode: GameMode
+    gridSize: int = Field(..., ge=1)
+    tick: int = Field(..., ge=0)
+    players: int = Field(..., ge=0)
+    alive: int = Field(..., ge=0)
+
+
+class ArenaStats(BaseModel):
+    """Tick loop statistics of the arena rooms in this worker."""
+    rooms: int = Field(..., ge=0)
+    tickMs: float = Field(..., description="Tick interval")
+    ticks: int = Field(..., ge=0)
+    lastTickMs: float = Field(..., ge=0, description="Time spent ticking every room, last tick")
+    maxTickMs: float = Field(..., ge=0)
+    overruns: int = Field(..., ge=0, description="Ticks that took longer than the interval")
+    expired: int = Field(..., ge=0, description="Rooms closed after ARENA_IDLE_SECONDS with no live snake")
 
 
 class ErrorResponse(BaseModel):
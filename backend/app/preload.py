@@ -0,0 +1,52 @@
+"""Pre-fork preload step for shared mode.
+
+Run once before starting the workers (see `make prod-shared`):
+
+    SHARED_DATA_DIR=/dev/shm/snake-arena python -m app.preload
+
+Seeds the sample data if the database is empty, writes the leaderboard
+snapshot and username index that every worker maps read-only, and creates
+the shared sessions segment.
+"""
+import asyncio
+import os
+import time
+
+from app.config import SHARED_DATA_DIR
+from app.database import (
+    async_session, create_leaderboard_tables, get_leaderboard_rows, get_username_index_rows, initialize_sample_data
+)
+from app.shared_data import (
+    SESSIONS_FILE, SNAPSHOT_FILE, SharedSessions, shared_path, write_snapshot
+)
+
+
+async def preload() -> dict:
+    """Build the shared data files and return a short report."""
+    started = time.perf_counter()
+    os.makedirs(SHARED_DATA_DIR, exist_ok=True)
+
+    await create_leaderboard_tables()
+    async with async_session() as db:
+        await initialize_sample_data(db)
+        entries = await get_leaderboard_rows(db)
+        users = await get_username_index_rows(db)
+
+    write_snapshot(shared_path(SNAPSHOT_FILE), entries, users)
+    # Start every deployment with an empty sessions segment, recreated in case its layout changed
+    if os.path.exists(shared_path(SESSIONS_FILE)):
+        os.unlink(shared_path(SESSIONS_FILE))
+    SharedSessions(shared_path(SESSIONS_FILE)).close()
+
+    return {
+        "entries": len(entries),
+        "users": len(users),
+        "snapshotBytes": os.path.getsize(shared_path(SNAPSHOT_FILE)),
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    if not SHARED_DATA_DIR:
+        raise SystemExit("SHARED_DATA_DIR must be set to run the preload step")
+    print(asyncio.run(preload()))
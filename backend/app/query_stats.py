@@ -0,0 +1,283 @@
+"""Instrumentation of the database statements issued by the app.
+
+Engine events time every statement and count its rows, tagged with the app
+function that issued it: the innermost caller in `app.database` (e.g.
+`get_leaderboard`), or `<module>.<function>` for other app modules. With the
+async engine, statements run in a greenlet whose parent is suspended inside
+the awaiting coroutine, so the caller is found by walking the parent's frames.
+
+    slow-query log   statements taking SLOW_QUERY_MS or more, with the plan
+                     from EXPLAIN (sqlite and postgresql), newest
+                     SLOW_QUERY_LOG_SIZE kept
+    N+1 detection    requests issuing more than QUERY_N_PLUS_ONE_THRESHOLD
+                     statements, with their most repeated statement
+
+`GET /metrics` exposes the counters in the Prometheus text format and
+`GET /debug/queries` the per-function table and both logs, for this worker.
+Parameters are never stored, as they may hold credentials.
+"""
+import bisect
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, UTC
+import logging
+import sys
+import time
+from typing import Optional, TYPE_CHECKING
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import QUERY_N_PLUS_ONE_THRESHOLD, SLOW_QUERY_LOG_SIZE, SLOW_QUERY_MS
+
+# SQLAlchemy (and greenlet) are imported on use, so the middleware keeps them off the `main` import path
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Prefix and plan line of each row, per dialect with a usable plain EXPLAIN
+_EXPLAIN = {
+    "sqlite": ("EXPLAIN QUERY PLAN ", lambda row: str(row[-1])),
+    "postgresql": ("EXPLAIN ", lambda row: str(row[0])),
+}
+_STATEMENT_CHARS = 2000
+_START_KEY = "query_stats_start"
+
+
+def caller() -> str:
+    """Name of the app function that issued the statement being executed."""
+    import greenlet
+
+    current = greenlet.getcurrent()
+    frame = current.parent.gr_frame if current.parent is not None else sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module == "app.database":
+            return frame.f_code.co_name
+        if module.startswith("app.") and module != __name__:
+            return f"{module[4:]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "other"
+
+
+def row_count(cursor) -> Optional[int]:
+    """Rows changed by a DML statement, or rows returned by a query the async driver has buffered."""
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        return cursor.rowcount
+    # Async adapters fetch a non-streamed result at execute time
+    rows = getattr(cursor, "_rows", None)
+    return len(rows) if rows is not None else None
+
+
+class OperationStats:
+    """Counters of the statements of one calling function."""
+    __slots__ = ("calls", "seconds", "max_seconds", "rows", "slow", "buckets")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds: float, rows: Optional[int]) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if rows is not None:
+            self.rows += rows
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+class RequestQueries:
+    """Statements issued while serving one request."""
+    __slots__ = ("count", "statements", "operations")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.statements: Counter[str] = Counter()
+        self.operations: Counter[str] = Counter()
+
+
+_request: ContextVar[Optional[RequestQueries]] = ContextVar("query_stats_request", default=None)
+
+
+class QueryStats:
+    """Per-function statement counters, the slow-query log and the N+1 log of this worker."""
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, log_size: int = SLOW_QUERY_LOG_SIZE,
+                 n_plus_one_threshold: int = QUERY_N_PLUS_ONE_THRESHOLD) -> None:
+        self.slow_ms = slow_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.operations: dict[str, OperationStats] = {}
+        self.slow_queries: deque[dict] = deque(maxlen=log_size)
+        self.n_plus_one: deque[dict] = deque(maxlen=log_size)
+        self.n_plus_one_routes: Counter[str] = Counter()
+
+    def instrument(self, engine: "AsyncEngine") -> None:
+        """Time every statement of `engine`."""
+        from sqlalchemy import event
+
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine.sync_engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        seconds = time.perf_counter() - conn.info[_START_KEY].pop()
+        operation = caller()
+        rows = row_count(cursor)
+        self.record(operation, statement, seconds, rows)
+        if seconds * 1000 >= self.slow_ms:
+            plan = None if executemany else explain(conn, statement, parameters)
+            self.record_slow(operation, statement, seconds, rows, plan)
+
+    def _handle_error(self, context) -> None:
+        # A failed statement never reaches after_cursor_execute
+        starts = context.connection.info.get(_START_KEY) if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    def record(self, operation: str, statement: str, seconds: float, rows: Optional[int]) -> None:
+        stats = self.operations.get(operation)
+        if stats is None:
+            stats = self.operations[operation] = OperationStats()
+        stats.add(seconds, rows)
+        request = _request.get()
+        if request is not None:
+            request.count += 1
+            request.statements[statement] += 1
+            request.operations[operation] += 1
+
+    def record_slow(self, operation: str, statement: str, seconds: float, rows: Optional[int],
+                    plan: Optional[list[str]]) -> None:
+        self.operations[operation].slow += 1
+        self.slow_queries.append({
+            "at": datetime.now(UTC).isoformat(), "operation": operation, "ms": round(seconds * 1000, 2),
+            "rows": rows, "statement": statement[:_STATEMENT_CHARS], "plan": plan,
+        })
+        logger.warning("slow query in %s took %.1f ms: %s", operation, seconds * 1000, " / ".join(plan or ()))
+
+    def finish_request(self, route: str, path: str, request: RequestQueries) -> None:
+        """Flag a request that issued more statements than the N+1 threshold."""
+        if request.count <= self.n_plus_one_threshold:
+            return
+        statement, repeats = request.statements.most_common(1)[0]
+        self.n_plus_one_routes[route] += 1
+        self.n_plus_one.append({
+            "at": datetime.now(UTC).isoformat(), "route": route, "path": path, "queries": request.count,
+            "operations": dict(request.operations), "mostRepeated": statement[:_STATEMENT_CHARS],
+            "repeats": repeats,
+        })
+        logger.warning("possible N+1: %s issued %d queries (%d x %s)", path, request.count, repeats,
+                       statement[:200])
+
+    def clear(self) -> None:
+        self.operations.clear()
+        self.slow_queries.clear()
+        self.n_plus_one.clear()
+        self.n_plus_one_routes.clear()
+
+    def report(self) -> dict:
+        operations = {
+            name: {
+                "calls": stats.calls, "totalMs": round(stats.seconds * 1000, 2),
+                "meanMs": round(stats.seconds * 1000 / stats.calls, 3), "maxMs": round(stats.max_seconds * 1000, 2),
+                "rows": stats.rows, "slow": stats.slow,
+            }
+            for name, stats in sorted(self.operations.items(), key=lambda item: item[1].seconds, reverse=True)
+        }
+        return {
+            "slowQueryMs": self.slow_ms, "nPlusOneThreshold": self.n_plus_one_threshold,
+            "operations": operations,
+            "slowQueries": list(reversed(self.slow_queries)),
+            "nPlusOne": list(reversed(self.n_plus_one)),
+        }
+
+    def render(self) -> str:
+        """The counters in the Prometheus text exposition format."""
+        lines = [
+            "# HELP snake_db_query_duration_seconds Database statement latency by calling function.",
+            "# TYPE snake_db_query_duration_seconds histogram",
+        ]
+        for name, stats in sorted(self.operations.items()):
+            label = _label(name)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'snake_db_query_duration_seconds_bucket{{operation="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'snake_db_query_duration_seconds_bucket{{operation="{label}",le="+Inf"}} {stats.calls}')
+            lines.append(f'snake_db_query_duration_seconds_sum{{operation="{label}"}} {stats.seconds:.6f}')
+            lines.append(f'snake_db_query_duration_seconds_count{{operation="{label}"}} {stats.calls}')
+        lines += [
+            "# HELP snake_db_query_rows_total Rows returned or changed by database statements.",
+            "# TYPE snake_db_query_rows_total counter",
+        ]
+        lines += [f'snake_db_query_rows_total{{operation="{_label(name)}"}} {stats.rows}'
+                  for name, stats in sorted(self.operations.items())]
+        lines += [
+            f"# HELP snake_db_slow_queries_total Statements taking {self.slow_ms:g} ms or more.",
+            "# TYPE snake_db_slow_queries_total counter",
+        ]
+        lines += [f'snake_db_slow_queries_total{{operation="{_label(name)}"}} {stats.slow}'
+                  for name, stats in sorted(self.operations.items())]
+        lines += [
+            f"# HELP snake_db_n_plus_one_requests_total Requests issuing more than "
+            f"{self.n_plus_one_threshold} statements.",
+            "# TYPE snake_db_n_plus_one_requests_total counter",
+        ]
+        lines += [f'snake_db_n_plus_one_requests_total{{route="{_label(route)}"}} {count}'
+                  for route, count in sorted(self.n_plus_one_routes.items())]
+        return "\n".join(lines) + "\n"
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def explain(conn, statement: str, parameters) -> Optional[list[str]]:
+    """Plan of a statement, read on a separate DBAPI cursor so the statement's own result is untouched."""
+    dialect = _EXPLAIN.get(conn.dialect.name)
+    if dialect is None:
+        return None
+    prefix, line = dialect
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [line(row) for row in cursor.fetchall()]
+    except Exception as exc:
+        return [f"EXPLAIN failed: {exc}"]
+    finally:
+        cursor.close()
+
+
+class QueryCountMiddleware:
+    """Counts the statements of each HTTP request, for N+1 detection."""
+
+    def __init__(self, app: ASGIApp, stats: Optional[QueryStats] = None) -> None:
+        self.app = app
+        self.stats = stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = RequestQueries()
+        token = _request.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request.reset(token)
+            # Routing stores the matched route in the scope; its template keeps the metric labels bounded
+            route = scope.get("route")
+            (self.stats or query_stats).finish_request(
+                getattr(route, "path", "unmatched"), scope["path"], request
+            )
+
+
+query_stats = QueryStats()
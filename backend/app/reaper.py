@@ -0,0 +1,183 @@
+"""Heartbeat tracking and eviction of abandoned active-player games.
+
+A game stays active while its player shows signs of life: a heartbeat
+(`POST /players/{playerId}/heartbeat`) or a game-state update. Each sign of
+life pushes the player's deadline ACTIVE_PLAYER_TTL_SECONDS ahead. Deadlines
+live in a timing wheel of REAPER_INTERVAL_SECONDS slots, so rescheduling is
+O(1) and a sweep only visits the slots that came due. The reaper deletes the
+expired players with one bulk DELETE per REAPER_BATCH_SIZE of them, and the
+sweep costs nothing for players that are still alive.
+
+Every worker tracks every player from the event bus. When several workers
+expire the same player, only the one whose DELETE removed the row publishes
+PLAYER_LEFT. With several workers that only holds on a bus that crosses
+processes: over the in-process bus a heartbeat reaches one worker, and the
+others would evict a live game, so the reaper refuses to start there.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Iterable, Optional
+
+from app import events
+from app.config import ACTIVE_PLAYER_TTL_SECONDS, REAPER_BATCH_SIZE, REAPER_INTERVAL_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryWheel:
+    """Keys bucketed by deadline slot; a key never expires before its deadline."""
+
+    def __init__(self, resolution: float, now: float = 0.0) -> None:
+        self.resolution = resolution
+        self.buckets: dict[int, set[str]] = {}
+        self.slots: dict[str, int] = {}
+        # First slot not swept yet
+        self.cursor = int(now // resolution)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.slots
+
+    def touch(self, key: str, deadline: float) -> None:
+        """Schedule (or reschedule) `key` to expire at `deadline`."""
+        slot = max(int(deadline // self.resolution) + 1, self.cursor)
+        old = self.slots.get(key)
+        if old == slot:
+            return
+        if old is not None:
+            self.buckets[old].discard(key)
+        self.slots[key] = slot
+        self.buckets.setdefault(slot, set()).add(key)
+
+    def discard(self, key: str) -> None:
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            self.buckets[slot].discard(key)
+
+    def expired(self, now: float, limit: Optional[int] = None) -> list[str]:
+        """Remove and return up to `limit` keys whose deadline has passed."""
+        due = int(now // self.resolution)
+        keys: list[str] = []
+        while self.cursor <= due:
+            if due - self.cursor > len(self.buckets):
+                # Idle for longer than there are buckets: jump to the next one instead of stepping
+                self.cursor = min(self.buckets, default=due + 1)
+                if self.cursor > due:
+                    break
+            bucket = self.buckets.get(self.cursor)
+            while bucket and (limit is None or len(keys) < limit):
+                key = bucket.pop()
+                del self.slots[key]
+                keys.append(key)
+            if bucket:
+                return keys
+            self.buckets.pop(self.cursor, None)
+            self.cursor += 1
+        return keys
+
+
+class ActivePlayerReaper:
+    """Tracks the last sign of life of every active player and evicts the silent ones."""
+
+    def __init__(self, ttl: float = ACTIVE_PLAYER_TTL_SECONDS, interval: float = REAPER_INTERVAL_SECONDS,
+                 batch_size: int = REAPER_BATCH_SIZE, clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttl = ttl
+        self.interval = interval
+        self.batch_size = batch_size
+        self.clock = clock
+        self.wheel = ExpiryWheel(interval, clock())
+        self.stats = {"sweeps": 0, "expired": 0, "reaped": 0, "deletes": 0}
+        self._unsubscribe: list[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self.wheel
+
+    def attach(self, bus: events.EventBus) -> None:
+        """Follow player events on `bus`: joins, ticks and heartbeats extend, leaves stop tracking."""
+        seen = lambda event: self.seen(event.payload["id"])
+        left = lambda event: self.wheel.discard(event.payload["id"])
+        self._unsubscribe = [
+            bus.subscribe(events.PLAYER_JOINED, seen),
+            bus.subscribe(events.GAME_TICK, seen),
+            bus.subscribe(events.PLAYER_HEARTBEAT, seen),
+            bus.subscribe(events.PLAYER_LEFT, left),
+        ]
+
+    def detach(self) -> None:
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
+
+    def track(self, player_ids: Iterable[str]) -> None:
+        """Start tracking players that are already active, giving each a full TTL."""
+        for player_id in player_ids:
+            self.seen(player_id)
+
+    def seen(self, player_id: str) -> None:
+        self.wheel.touch(player_id, self.clock() + self.ttl)
+
+    async def start(self) -> None:
+        """Track the players already in the database and start sweeping."""
+        from sqlalchemy import select
+        from app.database import async_session
+        from app.db_models import ActivePlayer as DBActivePlayer
+
+        if not events.reaches_all_workers():
+            raise RuntimeError("the active player reaper needs EVENT_BUS=unix with several workers")
+        self.attach(events.event_bus)
+        async with async_session() as db:
+            self.track((await db.execute(select(DBActivePlayer.id))).scalars())
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.detach()
+
+    async def _run(self) -> None:
+        from app.database import async_session, remove_active_players
+
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with async_session() as db:
+                    await self.sweep(lambda player_ids: remove_active_players(db, player_ids))
+            except Exception:
+                logger.exception("active player sweep failed")
+
+    async def sweep(self, remove: Callable[[list[str]], Awaitable[list[str]]]) -> int:
+        """Evict every expired player, `batch_size` per `remove` call; returns how many were removed."""
+        self.stats["sweeps"] += 1
+        reaped = 0
+        while True:
+            player_ids = self.wheel.expired(self.clock(), self.batch_size)
+            if not player_ids:
+                return reaped
+            self.stats["expired"] += len(player_ids)
+            try:
+                removed = await remove(player_ids)
+            except Exception:
+                # Retry them on the next sweep
+                for player_id in player_ids:
+                    self.wheel.touch(player_id, self.clock())
+                raise
+            self.stats["deletes"] += 1
+            self.stats["reaped"] += len(removed)
+            reaped += len(removed)
+
+    def report(self) -> dict:
+        return {"tracked": len(self.wheel), "ttlSeconds": self.ttl, **self.stats}
+
+
+# Set by the app lifespan when REAPER_ENABLED is on
+reaper: Optional[ActivePlayerReaper] = None
@@ -0,0 +1,152 @@
+"""Multiplayer arena rooms router."""
+from fastapi import APIRouter, Depends, HTTPException, Path, Response, status
+from fastapi.responses import StreamingResponse
+from app.models import (
+    ArenaDirectionRequest, ArenaRoomInfo, ArenaState, ArenaStats, CreateArenaRoomRequest, User
+)
+from app.arena import ArenaFull, ArenaRoom, ArenaUnavailable, TooManyRooms, arena
+from app.auth import get_current_user
+
+router = APIRouter(prefix="/arena", tags=["Arena"])
+
+
+def get_room(roomId: str = Path(..., description="The ID of the arena room")) -> ArenaRoom:
+    """Dependency resolving a room of this worker."""
+    room = arena.rooms.get(roomId)
+    if room is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Room not found"
+        )
+    return room
+
+
+@router.get("/rooms", response_model=list[ArenaRoomInfo])
+async def list_rooms():
+    """
+    List the open arena rooms.
+    """
+    return [room.info() for room in arena.rooms.values()]
+
+
+@router.post("/rooms", response_model=ArenaRoomInfo, status_code=status.HTTP_201_CREATED, responses={
+    429: {"description": "Too many rooms open"},
+    503: {"description": "Arena rooms need a single worker"}
+})
+async def create_room(
+    request: CreateArenaRoomRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Open a new arena room. Rooms with no live snake for ARENA_IDLE_SECONDS are closed.
+    """
+    try:
+        room = arena.create(request.mode.value, request.gridSize, current_user.id)
+    except TooManyRooms as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    except ArenaUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    return room.info()
+
+
+@router.get("/stats", response_model=ArenaStats)
+async def get_arena_stats():
+    """
+    Tick timings of the arena rooms in this worker.
+    """
+    return arena.report()
+
+
+@router.get("/rooms/{roomId}", response_model=ArenaState, responses={
+    404: {"description": "Room not found"}
+})
+async def get_room_state(room: ArenaRoom = Depends(get_room)):
+    """
+    Retrieve every snake and food item of a room.
+    """
+    return room.state()
+
+
+@router.post("/rooms/{roomId}/join", response_model=ArenaRoomInfo, responses={
+    404: {"description": "Room not found"},
+    409: {"description": "No free spot to spawn"}
+})
+async def join_room(
+    room: ArenaRoom = Depends(get_room),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Spawn the current user's snake in a room, or respawn it after it died.
+    """
+    try:
+        room.join(current_user.id, current_user.username)
+    except ArenaFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    return room.info()
+
+
+@router.put("/rooms/{roomId}/direction", status_code=status.HTTP_204_NO_CONTENT, responses={
+    404: {"description": "Room not found"}
+})
+async def change_direction(
+    request: ArenaDirectionRequest,
+    room: ArenaRoom = Depends(get_room),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Turn the current user's snake on the next tick.
+    """
+    room.change_direction(current_user.id, request.direction.value)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/rooms/{roomId}/leave", status_code=status.HTTP_204_NO_CONTENT, responses={
+    404: {"description": "Room not found"}
+})
+async def leave_room(
+    room: ArenaRoom = Depends(get_room),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Remove the current user's snake from a room.
+    """
+    room.leave(current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/rooms/{roomId}/watch", response_class=StreamingResponse, responses={
+    200: {"description": "Server-Sent Events: a `keyframe` with the `ArenaState`, then one `delta` per tick"},
+    404: {"description": "Room not found"}
+})
+async def watch_room(room: ArenaRoom = Depends(get_room)):
+    """
+    Stream a room live. Rooms are only serialized for streaming while someone watches.
+    """
+    channel_id = arena.channel_id(room.room_id)
+    channel = arena.hub.channels.get(channel_id)
+    if channel is None or not channel.subscribers:
+        # Nobody was watching, so the channel's last state is stale
+        arena.hub.publish(channel_id, room.state())
+    subscriber = arena.hub.subscribe(channel_id)
+
+    async def frames():
+        try:
+            async for frame in subscriber.frames():
+                yield frame
+        finally:
+            arena.hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,13 +1,15 @@
 """Authentication endpoints router."""
 from fastapi import APIRouter, HTTPException, status, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import (
     LoginRequest, LoginResponse, SignupRequest, SignupResponse,
     User, ErrorResponse
 )
 from app.database import (
-    get_user_by_email, get_user_by_username, create_user,
+    get_db, get_user_by_email, get_user_by_username, create_user,
     create_session
 )
+from app.shared_data import get_snapshot
 from app.auth import (
     verify_password, get_password_hash, create_access_token,
     get_current_user
@@ -20,13 +22,13 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
     401: {"model": ErrorResponse, "description": "Authentication failed"},
     404: {"model": ErrorResponse, "description": "User not found"}
 })
-async def login(request: LoginRequest):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     """
     Authenticate a user with email and password.
     Returns user information and sets authentication token.
     """
     # Get user by email
-    user_data = get_user_by_email(request.email)
+    user_data = await get_user_by_email(db, request.email)
     
     if not user_data:
         raise HTTPException(
@@ -45,7 +47,7 @@ async def login(request: LoginRequest):
     access_token = create_access_token(data={"sub": user_data["id"]})
     
     # Create session
-    create_session(access_token, user_data["id"])
+    await create_session(access_token, user_data["id"])
     
     # Create user response
     user = User(
@@ -62,20 +64,23 @@ async def login(request: LoginRequest):
 @router.post("/signup", response_model=SignupResponse, status_code=status.HTTP_201_CREATED, responses={
     400: {"model": ErrorResponse, "description": "Invalid input or user already exists"}
 })
-async def signup(request: SignupRequest):
+async def signup(request: SignupRequest, db: AsyncSession = Depends(get_db)):
     """
     Create a new user account.
     Returns the created user information.
     """
     # Check if email already exists
-    if get_user_by_email(request.email):
+    if await get_user_by_email(db, request.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Check if username already exists
-    if get_user_by_username(request.username):
+    # Check if username already exists; in shared mode the preloaded username index
+    # answers for every account that existed at preload without a query
+    snapshot = get_snapshot()
+    taken = snapshot is not None and snapshot.user_id_for(request.username) is not None
+    if taken or await get_user_by_username(db, request.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
@@ -85,7 +90,7 @@ async def signup(request: SignupRequest):
     password_hash = get_password_hash(request.password)
     
     # Create user
-    user_data = create_user(request.email, request.username, password_hash)
+    user_data = await create_user(db, request.email, request.username, password_hash)
     
     # Create user response
     user = User(
@@ -1,44 +1,282 @@
 """Leaderboard endpoints router."""
+import asyncio
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import (
     LeaderboardEntry, SubmitScoreRequest, SubmitScoreResponse,
-    User, GameMode
+    User, GameMode, ExportFormat, ScoreDistribution
 )
-from app.database import get_leaderboard, add_leaderboard_entry
+from app.database import (
+    async_session, get_db, read_leaderboard, add_leaderboard_entry, stream_leaderboard_rows
+)
+from app.export import ENCODERS, MEDIA_TYPES, gzip_stream
+from app import idempotency, ingest
+from app.leaderboard_feed import leaderboard_feed
+from app.leaderboard_store import cursor_at, cursor_offset, leaderboard_store
 from app.auth import get_current_user
 
 router = APIRouter(prefix="/leaderboard", tags=["Leaderboard"])
 
 
-@router.get("", response_model=list[LeaderboardEntry])
+@router.get("", response_model=list[LeaderboardEntry], responses={
+    400: {"description": "Cursor given without a mode"}
+})
 async def get_leaderboard_entries(
-    mode: Optional[GameMode] = Query(None, description="Filter by game mode")
+    response: Response,
+    mode: Optional[GameMode] = Query(None, description="Filter by game mode"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of entries to return"),
+    cursor: Optional[str] = Query(None, description="Resume after a previous page (requires mode)")
 ):
     """
     Retrieve the game leaderboard, optionally filtered by game mode.
+    With `limit` and `mode`, the `X-Next-Cursor` response header holds the cursor of the next page.
     """
     mode_str = mode.value if mode else None
-    entries = get_leaderboard(mode_str)
+    if cursor is not None and mode_str is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor requires mode"
+        )
+    
+    # Read the database until the in-memory leaderboard is loaded, and for good when other
+    # workers' submits cannot reach it (several workers on the in-process event bus)
+    if not leaderboard_store.is_current():
+        entries = await read_leaderboard(mode_str, limit if cursor is None else None)
+        if mode_str is None:
+            return entries[:limit]
+        scores = [entry.score for entry in entries]
+        try:
+            offset = cursor_offset(scores, cursor) if cursor is not None else 0
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        entries = entries[offset:None if limit is None else offset + limit]
+        next_cursor = cursor_at(scores, offset + len(entries))
+    elif mode_str is None:
+        return leaderboard_store.entries(limit=limit)
+    else:
+        try:
+            offset = leaderboard_store.cursor_position(mode_str, cursor) if cursor is not None else 0
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        page = leaderboard_store.page(mode_str, offset, limit)
+        next_cursor = leaderboard_store.cursor_after(mode_str, offset + len(page))
+        entries = page.to_models()
+    if limit is not None and next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
     return entries
 
 
+QUANTILES = {"p50": 0.5, "p75": 0.75, "p90": 0.9, "p95": 0.95, "p99": 0.99, "p99.9": 0.999}
+
+
+@router.get("/distribution", response_model=ScoreDistribution, responses={
+    503: {"description": "The in-memory leaderboard is still loading"}
+})
+async def get_score_distribution(
+    mode: Optional[GameMode] = Query(None, description="Filter by game mode"),
+    bins: int = Query(20, ge=1, le=100, description="Number of histogram bins")
+):
+    """
+    Score quantiles and histogram of a mode (all modes if omitted).
+    Served from a per-mode histogram, so the cost does not grow with the leaderboard.
+    """
+    if not leaderboard_store.loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Leaderboard is loading, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    histogram = leaderboard_store.histograms[mode.value if mode else None]
+    # The extremes are exact, from the sorted entries, rather than their buckets' lower bounds
+    low, high = leaderboard_store.score_range(mode.value if mode else None)
+    return ScoreDistribution(
+        mode=mode,
+        count=len(histogram),
+        mean=histogram.mean(),
+        min=low,
+        max=high,
+        quantiles={
+            name: value for name, q in QUANTILES.items()
+            if (value := histogram.quantile(q)) is not None
+        },
+        bins=histogram.bins(bins, low, high)
+    )
+
+
+def score_percentile(score: int, mode: str) -> Optional[float]:
+    """Percentile of a submitted score, once the in-memory leaderboard is loaded."""
+    if not leaderboard_store.loaded:
+        return None
+    percentile = leaderboard_store.percentile(score, mode)
+    return round(percentile, 1) if percentile is not None else None
+
+
+@router.get("/export", response_class=StreamingResponse, responses={
+    200: {"description": "Leaderboard rows as NDJSON or CSV, optionally gzipped"}
+})
+async def export_leaderboard(
+    format: ExportFormat = Query(ExportFormat.NDJSON, description="Export format"),
+    mode: Optional[GameMode] = Query(None, description="Filter by game mode"),
+    gzip: bool = Query(False, description="Gzip the stream"),
+    batch_size: int = Query(1000, ge=1, le=10000, description="Rows fetched per cursor batch")
+):
+    """
+    Stream the full leaderboard, sorted by score, for analytics exports; archived entries follow,
+    sorted within each archive partition.
+    Rows are read from a server-side cursor, so memory use does not grow with the table.
+    """
+    mode_str = mode.value if mode else None
+    
+    async def rows():
+        # The session must outlive the endpoint, so the stream opens its own
+        async with async_session() as db:
+            async for batch in stream_leaderboard_rows(db, mode_str, batch_size):
+                yield batch
+    
+    body = ENCODERS[format](rows())
+    filename = f"leaderboard.{format.value}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/stream", response_class=StreamingResponse, responses={
+    200: {"description": "Server-Sent Events: a `keyframe` with the top N, then `delta` events with rank changes"},
+    503: {"description": "The in-memory leaderboard is still loading"}
+})
+async def stream_leaderboard(
+    mode: Optional[GameMode] = Query(None, description="Filter by game mode"),
+    top: int = Query(10, ge=1, le=100, description="Number of top entries to follow")
+):
+    """
+    Follow the top N live. Sends the current top N, then only the changes
+    (`insert` at a position, `remove`, `drop` from the tail) when a submit changes it.
+    """
+    if not leaderboard_store.loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Leaderboard is loading, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    subscriber = leaderboard_feed.subscribe(mode.value if mode else None, top)
+    
+    async def frames():
+        try:
+            async for frame in subscriber.frames():
+                yield frame
+        finally:
+            leaderboard_feed.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/submit", response_model=SubmitScoreResponse, responses={
-    401: {"description": "Unauthorized"}
+    401: {"description": "Unauthorized"},
+    409: {"description": "A submit with this Idempotency-Key is still in progress"},
+    422: {"description": "Idempotency-Key reused for a different submit"},
+    503: {"description": "Write-behind ingestion queue is full, or too many Idempotency-Key submits in progress"}
 })
 async def submit_score(
     request: SubmitScoreRequest,
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(
+        None, max_length=255, description="Retries with the same key return the first submit's response"
+    )
 ):
     """
     Submit a game score to the leaderboard.
     Requires authentication.
+    In write-behind mode the rank is provisional and the entry is committed shortly after.
+    With a `replay`, the score is verified in the background; scores above the
+    verification threshold appear on the leaderboard once verified.
+    With an `Idempotency-Key`, a retry returns the original response (marked `Idempotent-Replayed: true`).
     """
+    store = idempotency.store
+    if idempotency_key is None or store is None:
+        return await _submit_score(request, current_user, db)
+    
+    request_fingerprint = idempotency.fingerprint(request.model_dump_json())
+    # The store's flock may wait on another worker, so it is taken off the event loop
+    outcome, stored = await asyncio.to_thread(store.begin, current_user.id, idempotency_key, request_fingerprint)
+    if outcome == idempotency.REPLAY:
+        response.headers["Idempotent-Replayed"] = "true"
+        return SubmitScoreResponse.model_validate_json(stored)
+    if outcome == idempotency.IN_PROGRESS:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A submit with this Idempotency-Key is in progress",
+            headers={"Retry-After": "1"}
+        )
+    if outcome == idempotency.MISMATCH:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Idempotency-Key was used for a different submit"
+        )
+    if outcome == idempotency.FULL:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many submits in progress, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        result = await _submit_score(request, current_user, db)
+    except BaseException:
+        await asyncio.to_thread(store.release, current_user.id, idempotency_key)
+        raise
+    await asyncio.to_thread(
+        store.complete, current_user.id, idempotency_key, request_fingerprint,
+        result.model_dump_json().encode("utf-8")
+    )
+    return result
+
+
+async def _submit_score(request: SubmitScoreRequest, current_user: User, db: AsyncSession) -> SubmitScoreResponse:
+    replay = request.replay.model_dump(mode="json") if request.replay else None
+    # Write-behind ranks come from the in-memory leaderboard, so only while it holds every entry
+    if ingest.ingestor is not None and leaderboard_store.is_current():
+        try:
+            rank = await ingest.ingestor.submit(
+                current_user.id, current_user.username, request.score, request.mode.value, replay
+            )
+        except ingest.IngestBackpressure:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Score ingestion is busy, retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        return SubmitScoreResponse(
+            success=True, rank=rank, percentile=score_percentile(request.score, request.mode.value)
+        )
+    
     # Add leaderboard entry
-    rank = add_leaderboard_entry(
+    rank = await add_leaderboard_entry(
+        db,
         user_id=current_user.id,
         score=request.score,
-        mode=request.mode.value
+        mode=request.mode.value,
+        replay=replay
     )
     
     if rank == -1:
@@ -47,4 +285,6 @@ async def submit_score(
             detail="Failed to submit score"
         )
     
-    return SubmitScoreResponse(success=True, rank=rank)
+    return SubmitScoreResponse(
+        success=True, rank=rank, percentile=score_percentile(request.score, request.mode.value)
+    )
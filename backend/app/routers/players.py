@@ -1,21 +1,67 @@
 """Players and spectator mode endpoints router."""
 from typing import Optional
-from fastapi import APIRouter, Path
-from app.models import ActivePlayer, GameState
-from app.database import get_active_players, get_player_game_state
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import ActivePlayer, ActivePlayerSort, GameMode, GameState, GameStateDelta, SpectatorStats, User
+from app.active_index import active_player_index
+from app.auth import get_current_user
+from app.database import (
+    get_db, get_active_players, heartbeat_active_player, read_player_game_state, update_game_state
+)
+from app.spectators import spectator_hub
 
 router = APIRouter(prefix="/players", tags=["Players"])
 
 
-@router.get("/active", response_model=list[ActivePlayer])
-async def get_active_players_list():
+@router.get("/active", response_model=list[ActivePlayer], responses={
+    400: {"description": "Invalid cursor"}
+})
+async def get_active_players_list(
+    response: Response,
+    mode: Optional[GameMode] = Query(None, description="Filter by game mode"),
+    sort: ActivePlayerSort = Query(ActivePlayerSort.SCORE, description="Highest score or most recently started first"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of players to return"),
+    cursor: Optional[str] = Query(None, description="Resume after a previous page"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Retrieve a list of currently active players for spectator mode.
+    With `limit`, the `X-Next-Cursor` response header holds the cursor of the next page.
     """
-    players = get_active_players()
+    mode_str = mode.value if mode else None
+    
+    # Fall back to the database until the live-games index has been loaded
+    if not active_player_index.loaded:
+        players = await get_active_players(db)
+        if mode_str:
+            players = [player for player in players if player.mode.value == mode_str]
+        if sort == ActivePlayerSort.SCORE:
+            players.sort(key=lambda player: player.score, reverse=True)
+        else:
+            players.sort(key=lambda player: player.startedAt, reverse=True)
+        return players[:limit]
+    
+    try:
+        players, next_cursor = active_player_index.page(mode_str, sort, limit, cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
     return players
 
 
+@router.get("/spectators", response_model=SpectatorStats)
+async def get_spectator_stats():
+    """
+    Subscriber counts and drop rates of the live spectator streams in this worker.
+    """
+    return spectator_hub.stats()
+
+
 @router.get("/{playerId}/game-state", response_model=Optional[GameState], responses={
     404: {"description": "Player not found"}
 })
@@ -26,5 +72,108 @@ async def get_player_game_state_endpoint(
     Retrieve the current game state for a specific player (for spectator mode).
     Returns null if player is not found.
     """
-    game_state = get_player_game_state(playerId)
+    game_state = await read_player_game_state(playerId)
     return game_state
+
+
+@router.patch("/{playerId}/game-state", status_code=status.HTTP_204_NO_CONTENT, responses={
+    401: {"description": "Unauthorized"},
+    403: {"description": "Not your game"},
+    404: {"description": "Player not found"},
+    422: {"description": "Invalid delta"}
+})
+async def patch_player_game_state(
+    delta: GameStateDelta,
+    playerId: str = Path(..., description="The ID of the playing player"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Push the changes of one or more ticks of the current user's game: a new head, tail pops, food,
+    direction and score. With EVENT_BUS=unix (or one worker) the state is saved to the database at
+    most every GAME_STATE_FLUSH_INTERVAL_MS; otherwise each delta is saved at once.
+    """
+    try:
+        state = await update_game_state(db, playerId, delta, current_user.username)
+    except PermissionError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not your game"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=str(e)
+        )
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/{playerId}/heartbeat", status_code=status.HTTP_204_NO_CONTENT, responses={
+    401: {"description": "Unauthorized"},
+    403: {"description": "Not your game"},
+    404: {"description": "Player not found"}
+})
+async def heartbeat(
+    playerId: str = Path(..., description="The ID of the playing player"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Keep the current user's game active. With the reaper enabled, games with no
+    heartbeat or game-state update for ACTIVE_PLAYER_TTL_SECONDS are removed from the active players.
+    """
+    try:
+        active = await heartbeat_active_player(db, playerId, current_user.username)
+    except PermissionError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not your game"
+        )
+    if not active:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{playerId}/watch", response_class=StreamingResponse, responses={
+    200: {"description": "Server-Sent Events: a `keyframe` with the full game state, then `delta` events"},
+    404: {"description": "Player not found"}
+})
+async def watch_player(
+    playerId: str = Path(..., description="The ID of the player to watch")
+):
+    """
+    Stream a player's game live. Slow clients skip intermediate deltas and
+    resume from the latest keyframe instead of buffering on the server.
+    """
+    channel = spectator_hub.channels.get(playerId)
+    initial_state = None
+    if channel is None or channel.state is None:
+        game_state = await read_player_game_state(playerId)
+        if game_state is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Player not found"
+            )
+        initial_state = game_state.model_dump(mode="json")
+    subscriber = spectator_hub.subscribe(playerId, initial_state)
+    
+    async def frames():
+        try:
+            async for frame in subscriber.frames():
+                yield frame
+        finally:
+            spectator_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
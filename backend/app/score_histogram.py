@@ -0,0 +1,155 @@
+"""Per-mode score distribution as a log-linear (HDR-style) histogram.
+
+Scores below 2 * SUB_BUCKETS each get their own bucket; above that, every
+power of two is split into SUB_BUCKETS equal buckets, so a bucket is never
+wider than 1/SUB_BUCKETS of its scores (under 1% error). The bucket count is
+fixed by the largest storable score (the leaderboard's 32-bit column), so a
+histogram is a few kilobytes however many entries it counts.
+
+Counts live in a Fenwick tree over the buckets: adding a score, the number of
+scores below one and any quantile each take log2(BUCKETS), about a dozen
+steps, independent of the number of entries. Histograms are mergeable (the
+counts just add up), which is how the all-modes distribution is built.
+"""
+from array import array
+from typing import Iterable, Optional
+
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_SCORE = 2 ** 31 - 1
+
+
+def bucket_of(score: int) -> int:
+    """Index of the bucket holding `score`."""
+    score = min(max(score, 0), MAX_SCORE)
+    shift = max(0, score.bit_length() - SUB_BUCKET_BITS - 1)
+    return (shift << SUB_BUCKET_BITS) + (score >> shift)
+
+
+def bucket_floor(index: int) -> int:
+    """Smallest score in bucket `index`."""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    return (index - (shift << SUB_BUCKET_BITS)) << shift
+
+
+BUCKETS = bucket_of(MAX_SCORE) + 1
+# Largest power of two <= BUCKETS, where the Fenwick descent starts
+_TOP_STEP = 1 << (BUCKETS.bit_length() - 1)
+
+
+class ScoreHistogram:
+    """Counts of scores by bucket, with rank and quantile queries."""
+
+    __slots__ = ("tree", "count", "total")
+
+    def __init__(self) -> None:
+        # Fenwick tree, 1-based: tree[i] sums the buckets (i - (i & -i), i]
+        self.tree = array("q", bytes(8 * (BUCKETS + 1)))
+        self.count = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, score: int, n: int = 1) -> None:
+        """Count `score` `n` times (negative `n` removes it)."""
+        tree = self.tree
+        i = bucket_of(score) + 1
+        while i <= BUCKETS:
+            tree[i] += n
+            i += i & -i
+        self.count += n
+        self.total += n * score
+
+    def remove(self, score: int) -> None:
+        self.add(score, -1)
+
+    def load(self, scores: Iterable[int]) -> None:
+        """Replace the counts with `scores`, building the tree in one pass."""
+        tree = array("q", bytes(8 * (BUCKETS + 1)))
+        count = total = 0
+        for score in scores:
+            tree[bucket_of(score) + 1] += 1
+            count += 1
+            total += score
+        for i in range(1, BUCKETS + 1):
+            parent = i + (i & -i)
+            if parent <= BUCKETS:
+                tree[parent] += tree[i]
+        self.tree, self.count, self.total = tree, count, total
+
+    def merge(self, other: "ScoreHistogram") -> None:
+        """Add the counts of `other` (Fenwick trees of two histograms add up element-wise)."""
+        tree = self.tree
+        for i, n in enumerate(other.tree):
+            if n:
+                tree[i] += n
+        self.count += other.count
+        self.total += other.total
+
+    def _below_bucket(self, index: int) -> int:
+        """Number of scores in the buckets before `index`."""
+        tree = self.tree
+        below = 0
+        while index > 0:
+            below += tree[index]
+            index -= index & -index
+        return below
+
+    def count_below(self, score: int) -> int:
+        """Number of scores lower than `score` (same-bucket scores count as ties)."""
+        return self._below_bucket(bucket_of(score))
+
+    def percentile(self, score: int) -> Optional[float]:
+        """Share of scores below `score`, in percent; None while empty."""
+        if self.count <= 0:
+            return None
+        return 100.0 * self.count_below(score) / self.count
+
+    def quantile(self, q: float) -> Optional[int]:
+        """Lower bound of the bucket holding the score at fraction `q` (0..1); None while empty."""
+        if self.count <= 0:
+            return None
+        # Find the first bucket whose cumulative count exceeds the target rank
+        rank = min(self.count - 1, max(0, int(q * self.count)))
+        tree = self.tree
+        position = 0
+        step = _TOP_STEP
+        while step:
+            nxt = position + step
+            if nxt <= BUCKETS and tree[nxt] <= rank:
+                position = nxt
+                rank -= tree[nxt]
+            step >>= 1
+        return bucket_floor(position)
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count > 0 else None
+
+    def bins(self, n: int, low: Optional[int] = None, high: Optional[int] = None) -> list[tuple[int, int]]:
+        """
+        `n` equal-width (lower bound, count) bins from the lowest to the highest score. Pass the exact
+        `low` and `high` scores when known; the bucket floors holding them are used otherwise.
+        """
+        if self.count <= 0:
+            return []
+        if low is None:
+            low = self.quantile(0.0)
+        if high is None:
+            high = self.quantile(1.0)
+        width = max(1, -(-(high + 1 - low) // n))
+        bins = []
+        previous = 0
+        for k in range(n):
+            lower = low + k * width
+            if lower > high:
+                break
+            # The last bin takes the rest, including the highest score's (possibly wider) bucket
+            last = k == n - 1 or lower + width > high
+            below = self.count if last else self.count_below(lower + width)
+            bins.append((lower, below - previous))
+            previous = below
+        return bins
@@ -0,0 +1,377 @@
+"""Append-only log of submitted scores in fixed-size binary records.
+
+With `SCORE_LOG_DIR` set, every submit appends one record after its database
+commit, on a thread so the event loop never waits on the lock or the disk. The
+log is a sequential feed for analytics, replication and cache rebuilds, which
+can read it instead of querying the database:
+
+    <base offset>.seg   header, then 48-byte records:
+                        entry id, user id (16-byte UUIDs), score int32,
+                        mode uint8, 3 pad bytes, timestamp int64 (microseconds)
+    <base offset>.idx   (timestamp, offset) of every SCORE_LOG_INDEX_INTERVAL-th record
+
+Offsets number records from the start of the log. A segment holds
+SCORE_LOG_SEGMENT_RECORDS records, so an offset maps to a file position by
+arithmetic after a bisect over the segments' base offsets. The sparse .idx
+files find the first offset at or after a time. Workers append batches under
+an flock on the directory's lock file, so they can share one log. Records are
+stamped once the lock is held, never earlier than the record before them, so
+timestamps rise with offsets across workers. Readers need no lock: they mmap
+whole segments and stop at the last complete record.
+
+An entry reaches the log after its commit, so a worker dying in between would
+lose it. Each entry therefore also gets a `score_log_pending` row in its own
+transaction, naming its writer, and the row is deleted once the record is
+appended. Every writer holds an flock on `writers/<id>.lock` while it runs. At
+startup, `app.database.backfill_score_log` appends the pending entries of
+writers whose lock is free, skipping any already in the log.
+
+    python -m app.score_log tail [--offset N] [--since ISO-TIME] [--limit N]
+"""
+import argparse
+from array import array
+import asyncio
+from bisect import bisect_right
+from datetime import datetime
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Iterable, Iterator, NamedTuple, Optional
+import uuid
+
+from sqlalchemy import BigInteger, Column, Integer, String, Table
+
+from app.config import SCORE_LOG_DIR, SCORE_LOG_INDEX_INTERVAL, SCORE_LOG_SEGMENT_RECORDS
+from app.db_models import LeaderboardEntry as DBLeaderboardEntry
+from app.shared_data import MODE_CODES, MODES_BY_CODE
+
+
+SEGMENT_MAGIC = b"SASL"
+SEGMENT_VERSION = 1
+_SEGMENT_HEADER = struct.Struct("<4sHHQ")  # magic, version, record size, base offset
+RECORD = struct.Struct("<16s16siB3xq")
+_INDEX_ENTRY = struct.Struct("<qQ")  # timestamp, offset
+_TIMESTAMP = struct.Struct("<q")
+# Timestamp of an encoded record that `ScoreEventLog.append` stamps as it writes it
+UNSTAMPED = -1
+LOCK_FILE = "score-log.lock"
+WRITERS_DIR = "writers"
+# Records copied out of the mapping at a time by readers
+CHUNK_RECORDS = 8192
+
+
+# Entries committed but not yet appended, by the writer that will append them
+pending = Table(
+    "score_log_pending",
+    DBLeaderboardEntry.metadata,
+    Column("entry_id", String, primary_key=True),
+    Column("user_id", String, nullable=False),
+    Column("score", Integer, nullable=False),
+    Column("mode", String, nullable=False),
+    Column("writer", String, nullable=False, index=True),
+    Column("created_us", BigInteger, nullable=False),
+)
+
+
+class ScoreEvent(NamedTuple):
+    offset: int
+    entry_id: str
+    user_id: str
+    mode: str
+    score: int
+    timestamp_us: int
+
+
+def _segment_name(base: int, kind: str) -> str:
+    return f"{base:020d}.{kind}"
+
+
+def segment_bases(directory: str) -> list[int]:
+    """Base offsets of the segments in `directory`, oldest first."""
+    return sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith(".seg"))
+
+
+def encode(entry_id: str, user_id: str, score: int, mode: str, timestamp_us: Optional[int] = None) -> bytes:
+    """One record; with no timestamp, `ScoreEventLog.append` stamps it when it is written."""
+    if timestamp_us is None:
+        timestamp_us = UNSTAMPED
+    return RECORD.pack(uuid.UUID(entry_id).bytes, uuid.UUID(user_id).bytes, score, MODE_CODES[mode], timestamp_us)
+
+
+def _stamp(record: bytes, timestamp_us: int) -> bytes:
+    return record[:-8] + _TIMESTAMP.pack(timestamp_us)
+
+
+class ScoreEventLog:
+    """Writer: appends record batches to the active segment, rotating when it is full."""
+
+    def __init__(self, directory: str = SCORE_LOG_DIR, segment_records: int = SCORE_LOG_SEGMENT_RECORDS,
+                 index_interval: int = SCORE_LOG_INDEX_INTERVAL) -> None:
+        self.directory = directory
+        self.segment_records = segment_records
+        self.index_interval = index_interval
+        self._lock_fd: Optional[int] = None
+        self._base: Optional[int] = None
+        self._segment_fd: Optional[int] = None
+        self._index_fd: Optional[int] = None
+        self._writer_fd: Optional[int] = None
+        # Names this process's pending rows; its lock file is locked while the process lives
+        self.writer = uuid.uuid4().hex
+        # flock is held per open file, so threads of one process take turns on this lock first
+        self._thread_lock = threading.Lock()
+        self.stats = {"appended": 0, "batches": 0, "segments": 0}
+
+    def open(self) -> None:
+        os.makedirs(os.path.join(self.directory, WRITERS_DIR), exist_ok=True)
+        self._lock_fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+        self._writer_fd = os.open(self._writer_path(self.writer), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._writer_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _writer_path(self, writer: str) -> str:
+        return os.path.join(self.directory, WRITERS_DIR, f"{writer}.lock")
+
+    def pending_row(self, entry_id: str, user_id: str, score: int, mode: str) -> dict:
+        """The `pending` row written with an entry, until this writer has appended it."""
+        return {
+            "entry_id": entry_id, "user_id": user_id, "score": score, "mode": mode,
+            "writer": self.writer, "created_us": time.time_ns() // 1000,
+        }
+
+    def writer_gone(self, writer: str) -> bool:
+        """Whether the process of `writer` has exited, leaving its pending rows to backfill."""
+        if writer == self.writer:
+            return False
+        path = self._writer_path(writer)
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        finally:
+            os.close(fd)
+        os.unlink(path)
+        return True
+
+    def _path(self, base: int, kind: str) -> str:
+        return os.path.join(self.directory, _segment_name(base, kind))
+
+    def _open_segment(self, base: int) -> None:
+        self._close_segment()
+        path = self._path(base, "seg")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        if os.fstat(fd).st_size == 0:
+            os.write(fd, _SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, RECORD.size, base))
+        self._base = base
+        self._segment_fd = fd
+        self._index_fd = os.open(self._path(base, "idx"), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _close_segment(self) -> None:
+        for fd in (self._segment_fd, self._index_fd):
+            if fd is not None:
+                os.close(fd)
+        self._segment_fd = self._index_fd = self._base = None
+
+    def _segment_count(self) -> int:
+        """Records in the active segment, after dropping one torn by a writer that crashed mid-append."""
+        size = os.fstat(self._segment_fd).st_size
+        torn = (size - _SEGMENT_HEADER.size) % RECORD.size
+        if torn:
+            os.ftruncate(self._segment_fd, size - torn)
+        return (size - _SEGMENT_HEADER.size) // RECORD.size
+
+    def _last_timestamp(self, count: int) -> int:
+        """Timestamp of the last record of the active segment holding `count` records, 0 if it is empty."""
+        if not count:
+            return 0
+        position = _SEGMENT_HEADER.size + count * RECORD.size - _TIMESTAMP.size
+        return _TIMESTAMP.unpack(os.pread(self._segment_fd, _TIMESTAMP.size, position))[0]
+
+    def append(self, records: Iterable[bytes]) -> int:
+        """
+        Append encoded records and return the offset of the first one. Blocks on the lock and the
+        disk, so async code runs it in a thread (`append_async`).
+        """
+        records = list(records)
+        with self._thread_lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                return self._append_locked(records)
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    async def append_async(self, records: Iterable[bytes]) -> int:
+        """`append` on a worker thread."""
+        return await asyncio.to_thread(self.append, list(records))
+
+    def _append_locked(self, records: list[bytes]) -> int:
+        if self._base is None:
+            bases = segment_bases(self.directory)
+            self._open_segment(bases[-1] if bases else 0)
+        # Stamped now that no other writer can append, and never before the record they follow
+        now = time.time_ns() // 1000
+        last = 0
+        written = 0
+        first = None
+        while written < len(records):
+            count = self._segment_count()
+            if count >= self.segment_records:
+                last = max(last, self._last_timestamp(count))
+                # Segments only rotate when full: step to the next one, which
+                # another worker may already have created and filled
+                self._open_segment(self._base + self.segment_records)
+                self.stats["segments"] += 1
+                continue
+            if first is None:
+                first = self._base + count
+            stamp = max(now, last, self._last_timestamp(count))
+            take = [
+                _stamp(record, stamp) if _TIMESTAMP.unpack_from(record, RECORD.size - _TIMESTAMP.size)[0] == UNSTAMPED
+                else record
+                for record in records[written:written + self.segment_records - count]
+            ]
+            os.write(self._segment_fd, b"".join(take))
+            offset = self._base + count
+            index = [
+                _INDEX_ENTRY.pack(RECORD.unpack(record)[4], offset + i)
+                for i, record in enumerate(take) if (offset + i) % self.index_interval == 0
+            ]
+            if index:
+                os.write(self._index_fd, b"".join(index))
+            written += len(take)
+        self.stats["appended"] += len(records)
+        self.stats["batches"] += 1
+        return first
+
+    def close(self) -> None:
+        self._close_segment()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        if self._writer_fd is not None:
+            # Pending rows left behind (a failed append) are backfilled by the next start
+            os.unlink(self._writer_path(self.writer))
+            os.close(self._writer_fd)
+            self._writer_fd = None
+
+    def report(self) -> dict:
+        return {"directory": self.directory, **self.stats}
+
+
+class ScoreLogReader:
+    """Sequential reads from any offset, over memory-mapped segments."""
+
+    def __init__(self, directory: str = SCORE_LOG_DIR) -> None:
+        self.directory = directory
+
+    def _path(self, base: int, kind: str) -> str:
+        return os.path.join(self.directory, _segment_name(base, kind))
+
+    def end_offset(self) -> int:
+        """Offset the next appended record will get."""
+        bases = segment_bases(self.directory)
+        if not bases:
+            return 0
+        size = os.path.getsize(self._path(bases[-1], "seg"))
+        return bases[-1] + max(0, size - _SEGMENT_HEADER.size) // RECORD.size
+
+    def offset_for_time(self, timestamp_us: int) -> int:
+        """An offset at or before the first record at `timestamp_us` or later (timestamps rise with offsets)."""
+        start = 0
+        for base in segment_bases(self.directory):
+            try:
+                with open(self._path(base, "idx"), "rb") as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                # Segment just created; its index follows
+                break
+            entries = array("q", raw[:len(raw) - len(raw) % _INDEX_ENTRY.size])
+            # Even positions hold timestamps, odd ones offsets
+            if not entries or entries[0] >= timestamp_us:
+                break
+            for i in range(0, len(entries), 2):
+                if entries[i] >= timestamp_us:
+                    return start
+                start = entries[i + 1]
+        return start
+
+    def batches(self, offset: int = 0, chunk_records: int = CHUNK_RECORDS) -> Iterator[tuple[int, bytes]]:
+        """Yield (first offset, raw records) chunks from `offset` on, read from the mapped segments."""
+        bases = segment_bases(self.directory)
+        i = max(0, bisect_right(bases, offset) - 1)
+        for base in bases[i:]:
+            with open(self._path(base, "seg"), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size <= _SEGMENT_HEADER.size:
+                    continue
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                magic, version, record_size, _ = _SEGMENT_HEADER.unpack_from(mapped)
+                if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION or record_size != RECORD.size:
+                    raise ValueError(f"{base} is not a version {SEGMENT_VERSION} score log segment")
+                # Records appended after the mapping was made are read on the next call
+                count = (size - _SEGMENT_HEADER.size) // RECORD.size
+                for start in range(max(0, offset - base), count, chunk_records):
+                    stop = min(count, start + chunk_records)
+                    position = _SEGMENT_HEADER.size + start * RECORD.size
+                    yield base + start, mapped[position:position + (stop - start) * RECORD.size]
+            finally:
+                mapped.close()
+
+    def entry_ids_since(self, timestamp_us: int) -> set[str]:
+        """Entry ids of the records stamped at `timestamp_us` or later (and a few before)."""
+        return {
+            str(uuid.UUID(bytes=entry_id))
+            for _, view in self.batches(self.offset_for_time(timestamp_us))
+            for entry_id, *_ in RECORD.iter_unpack(view)
+        }
+
+    def scan(self, offset: int = 0, limit: Optional[int] = None) -> Iterator[ScoreEvent]:
+        """Decoded events from `offset` on."""
+        remaining = limit
+        for first, view in self.batches(offset):
+            for i, (entry_id, user_id, score, mode, timestamp_us) in enumerate(RECORD.iter_unpack(view)):
+                if remaining is not None:
+                    if remaining <= 0:
+                        return
+                    remaining -= 1
+                yield ScoreEvent(
+                    first + i, str(uuid.UUID(bytes=entry_id)), str(uuid.UUID(bytes=user_id)),
+                    MODES_BY_CODE[mode], score, timestamp_us
+                )
+
+
+# Set by the app lifespan when SCORE_LOG_DIR is set
+score_log: Optional[ScoreEventLog] = None
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.score_log", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    tail = commands.add_parser("tail", help="print events as NDJSON")
+    tail.add_argument("--offset", type=int, default=0)
+    tail.add_argument("--since", type=datetime.fromisoformat, help="start at the first event at or after this time")
+    tail.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+    if not SCORE_LOG_DIR:
+        raise SystemExit("SCORE_LOG_DIR must be set")
+    reader = ScoreLogReader()
+    offset = args.offset
+    since_us = None
+    if args.since is not None:
+        since_us = int(args.since.timestamp() * 1_000_000)
+        offset = max(offset, reader.offset_for_time(since_us))
+    for event in reader.scan(offset, args.limit):
+        if since_us is not None and event.timestamp_us < since_us:
+            continue
+        print(json.dumps(event._asdict(), separators=(",", ":")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Read-only and shared-memory data used by every worker in pre-fork mode.
+
+`make prod` starts several uvicorn workers, each with its own copy of every
+in-memory structure. In shared mode (`SHARED_DATA_DIR` set) the preload step
+(`python -m app.preload`) writes the leaderboard snapshot and username index
+once as compact, fixed-width arrays into a single file. Every worker maps that
+file read-only, so all of them share the same page-cache pages instead of
+holding private Python objects. Mutable data (sessions) lives in a
+shared-memory segment in the same directory.
+"""
+from array import array
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left
+from datetime import date
+from typing import Iterable, Optional
+import uuid
+
+from app.config import ACCESS_TOKEN_EXPIRE_DELTA, SHARED_DATA_DIR, SHARED_SESSIONS_CAPACITY
+from app.models import GameMode
+
+
+# Mode enum stored as one byte per entry
+MODE_CODES: dict[str, int] = {mode.value: code for code, mode in enumerate(GameMode)}
+MODES_BY_CODE: tuple[str, ...] = tuple(mode.value for mode in GameMode)
+
+SNAPSHOT_FILE = "leaderboard.snap"
+SESSIONS_FILE = "sessions.shm"
+
+
+def shared_path(name: str) -> str:
+    """Return the path of a shared data file."""
+    if not SHARED_DATA_DIR:
+        raise RuntimeError("SHARED_DATA_DIR is not set")
+    return os.path.join(SHARED_DATA_DIR, name)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+# Leaderboard snapshot
+#
+# Header, then 8-byte aligned sections:
+#   scores    int32[n]    grouped by mode (in MODE_CODES order), each mode sorted by score descending
+#   days      int32[n]    date as proleptic Gregorian ordinal
+#   names     uint32[n]   index into the username table
+#   modes     uint8[n]    MODE_CODES
+#   ids       16 bytes[n] entry UUIDs
+#   offsets   uint32[m+1] username start offsets into the blob
+#   user_ids  16 bytes[m] owning user UUID, zero if the name has no account
+#   blob      utf-8       usernames, sorted, concatenated
+SNAPSHOT_MAGIC = b"SALS"
+SNAPSHOT_VERSION = 2
+_SNAPSHOT_HEADER = struct.Struct("<4sHBxII")
+_BYTE_ORDERS = {"little": 0, "big": 1}
+_NO_USER = bytes(16)
+
+
+def _snapshot_layout(n: int, m: int) -> list[tuple[str, int]]:
+    """Return (section, byte offset) pairs for a snapshot with n entries and m names."""
+    sizes = [
+        ("scores", 4 * n), ("days", 4 * n), ("names", 4 * n), ("modes", n),
+        ("ids", 16 * n), ("offsets", 4 * (m + 1)), ("user_ids", 16 * m), ("blob", 0),
+    ]
+    layout = []
+    offset = _align(_SNAPSHOT_HEADER.size)
+    for name, size in sizes:
+        layout.append((name, offset))
+        offset = _align(offset + size)
+    return layout
+
+
+def write_snapshot(
+    path: str,
+    entries: Iterable[tuple[str, str, int, str, str]],
+    users: Iterable[tuple[str, str]] = (),
+) -> None:
+    """
+    Write a leaderboard snapshot file.
+
+    `entries` are (id, username, score, mode, date) rows and `users` are
+    (username, user id) pairs for the username index. The file is written
+    next to `path` and renamed into place, so workers that already mapped the
+    previous snapshot keep a consistent view.
+    """
+    # Each mode is one contiguous run, which the in-memory leaderboard serves pages from
+    rows = sorted(entries, key=lambda row: (MODE_CODES[row[3]], -row[2]))
+    user_ids = {username: user_id for username, user_id in users}
+    names = sorted({row[1] for row in rows} | set(user_ids), key=lambda s: s.encode("utf-8"))
+    name_index = {name: i for i, name in enumerate(names)}
+
+    scores = array("i", (row[2] for row in rows))
+    days = array("i", (date.fromisoformat(row[4]).toordinal() for row in rows))
+    name_refs = array("I", (name_index[row[1]] for row in rows))
+    modes = bytes(MODE_CODES[row[3]] for row in rows)
+    ids = b"".join(uuid.UUID(row[0]).bytes for row in rows)
+
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = array("I", [0])
+    for raw in encoded:
+        offsets.append(offsets[-1] + len(raw))
+    owners = b"".join(
+        uuid.UUID(user_ids[name]).bytes if name in user_ids else _NO_USER for name in names
+    )
+    blob = b"".join(encoded)
+
+    sections = {
+        "scores": scores.tobytes(), "days": days.tobytes(), "names": name_refs.tobytes(),
+        "modes": modes, "ids": ids, "offsets": offsets.tobytes(), "user_ids": owners, "blob": blob,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _BYTE_ORDERS[sys.byteorder], len(rows), len(names)
+        ))
+        for name, offset in _snapshot_layout(len(rows), len(names)):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(sections[name])
+    os.replace(tmp_path, path)
+
+
+class SharedSnapshot:
+    """Read-only, memory-mapped view of a leaderboard snapshot file."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, byte_order, n, m = _SNAPSHOT_HEADER.unpack_from(view)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} leaderboard snapshot")
+        if byte_order != _BYTE_ORDERS[sys.byteorder]:
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+
+        self.path = path
+        self.entry_count = n
+        self.name_count = m
+        layout = dict(_snapshot_layout(n, m))
+        # Zero-copy typed views over the mapped file
+        self.scores = view[layout["scores"]:layout["scores"] + 4 * n].cast("i")
+        self.days = view[layout["days"]:layout["days"] + 4 * n].cast("i")
+        self.names = view[layout["names"]:layout["names"] + 4 * n].cast("I")
+        self.modes = view[layout["modes"]:layout["modes"] + n]
+        self.ids = view[layout["ids"]:layout["ids"] + 16 * n]
+        self.offsets = view[layout["offsets"]:layout["offsets"] + 4 * (m + 1)].cast("I")
+        self.user_ids = view[layout["user_ids"]:layout["user_ids"] + 16 * m]
+        self.blob = view[layout["blob"]:layout["blob"] + self.offsets[m]]
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def username(self, name_index: int) -> str:
+        """Return the username stored at `name_index` in the username table."""
+        return bytes(self.blob[self.offsets[name_index]:self.offsets[name_index + 1]]).decode("utf-8")
+
+    def entry_id(self, i: int) -> str:
+        """Return the UUID string of entry `i`."""
+        return str(uuid.UUID(bytes=bytes(self.ids[16 * i:16 * i + 16])))
+
+    def entry(self, i: int) -> tuple[str, str, int, str, str]:
+        """Return entry `i` as an (id, username, score, mode, date) row."""
+        return (
+            self.entry_id(i),
+            self.username(self.names[i]),
+            self.scores[i],
+            MODES_BY_CODE[self.modes[i]],
+            date.fromordinal(self.days[i]).isoformat(),
+        )
+
+    def mode_range(self, mode: str) -> tuple[int, int]:
+        """Return the (start, stop) entry indexes of `mode`, whose entries are sorted by score descending."""
+        code = MODE_CODES[mode]
+        return bisect_left(self.modes, code), bisect_left(self.modes, code + 1)
+
+    def find_username(self, username: str) -> Optional[int]:
+        """Binary search the username table. Returns the name index or None."""
+        raw = username.encode("utf-8")
+        key = lambda i: bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+        i = bisect_left(range(self.name_count), raw, key=key)
+        if i < self.name_count and key(i) == raw:
+            return i
+        return None
+
+    def user_id_for(self, username: str) -> Optional[str]:
+        """Return the user ID owning `username`, or None if it is not a known account."""
+        i = self.find_username(username)
+        if i is None:
+            return None
+        raw = bytes(self.user_ids[16 * i:16 * i + 16])
+        return None if raw == _NO_USER else str(uuid.UUID(bytes=raw))
+
+    def close(self) -> None:
+        """Release the views and unmap the file."""
+        for name in ("scores", "days", "names", "modes", "ids", "offsets", "user_ids", "blob"):
+            getattr(self, name).release()
+        self._mmap.close()
+
+
+# Sessions segment
+#
+# Fixed-size, set-associative hash table in a file under SHARED_DATA_DIR (use
+# a tmpfs such as /dev/shm). A token hashes to one bucket of SESSION_WAYS
+# slots, so every operation reads at most one bucket. Tokens are stored as
+# 16-byte digests with the session's expiry, that of the token issued with it;
+# an insert takes a free or expired slot of the bucket, else evicts the session
+# closest to expiry. Writers take an exclusive flock, readers a shared one.
+SESSIONS_MAGIC = b"SAS2"
+SESSION_WAYS = 8
+_SESSIONS_HEADER = struct.Struct("<4sII")  # magic, capacity, stored count
+_SLOT = struct.Struct("<B7xd16s36s")  # state, expiry (unix time), token digest, user id
+_EMPTY, _USED = 0, 1
+
+
+class SharedSessions:
+    """Token -> user ID mapping shared by all workers through a memory-mapped file."""
+
+    def __init__(self, path: str, capacity: int = SHARED_SESSIONS_CAPACITY,
+                 ttl: float = ACCESS_TOKEN_EXPIRE_DELTA.total_seconds()) -> None:
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        capacity = max(1, capacity // SESSION_WAYS) * SESSION_WAYS
+        size = _SESSIONS_HEADER.size + capacity * _SLOT.size
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            # First worker to get here initializes the segment
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, _SESSIONS_HEADER.pack(SESSIONS_MAGIC, capacity, 0), 0)
+            self._mmap = mmap.mmap(self._fd, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        magic, self.capacity, _ = _SESSIONS_HEADER.unpack_from(self._mmap)
+        if magic != SESSIONS_MAGIC:
+            raise ValueError(f"{path} is not a sessions segment")
+        self.evicted = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+    def _slots(self, digest: bytes) -> range:
+        bucket = int.from_bytes(digest[:8], "little") % (self.capacity // SESSION_WAYS)
+        start = _SESSIONS_HEADER.size + bucket * SESSION_WAYS * _SLOT.size
+        return range(start, start + SESSION_WAYS * _SLOT.size, _SLOT.size)
+
+    def _find(self, digest: bytes, now: float) -> Optional[int]:
+        """Offset of the live slot holding `digest`."""
+        for offset in self._slots(digest):
+            state, expires, key, _ = _SLOT.unpack_from(self._mmap, offset)
+            if state == _USED and key == digest and expires > now:
+                return offset
+        return None
+
+    def _victim(self, digest: bytes, now: float) -> tuple[int, bool]:
+        """A free or expired slot of the bucket, else the session closest to expiry; and whether it was empty."""
+        victim = victim_expires = None
+        for offset in self._slots(digest):
+            state, expires, _, _ = _SLOT.unpack_from(self._mmap, offset)
+            if state == _EMPTY:
+                return offset, True
+            if expires <= now:
+                return offset, False
+            if victim is None or expires < victim_expires:
+                victim, victim_expires = offset, expires
+        self.evicted += 1
+        return victim, False
+
+    def _set_count(self, delta: int) -> None:
+        magic, capacity, count = _SESSIONS_HEADER.unpack_from(self._mmap)
+        _SESSIONS_HEADER.pack_into(self._mmap, 0, magic, capacity, count + delta)
+
+    def get(self, token: str, default: Optional[str] = None) -> Optional[str]:
+        fcntl.flock(self._fd, fcntl.LOCK_SH)
+        try:
+            offset = self._find(self._digest(token), time.time())
+            if offset is None:
+                return default
+            _, _, _, user_id = _SLOT.unpack_from(self._mmap, offset)
+            return user_id.rstrip(b"\0").decode("ascii")
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def __getitem__(self, token: str) -> str:
+        user_id = self.get(token)
+        if user_id is None:
+            raise KeyError(token)
+        return user_id
+
+    def __contains__(self, token: str) -> bool:
+        return self.get(token) is not None
+
+    def set(self, token: str, user_id: str, expires_at: Optional[float] = None) -> None:
+        """Store a session until `expires_at` (unix time), by default `ttl` seconds from now."""
+        digest = self._digest(token)
+        now = time.time()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            offset = self._find(digest, now)
+            if offset is None:
+                offset, empty = self._victim(digest, now)
+                if empty:
+                    self._set_count(1)
+            _SLOT.pack_into(
+                self._mmap, offset, _USED, expires_at if expires_at is not None else now + self.ttl,
+                digest, user_id.encode("ascii")
+            )
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def __setitem__(self, token: str, user_id: str) -> None:
+        self.set(token, user_id)
+
+    def __delitem__(self, token: str) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            offset = self._find(self._digest(token), time.time())
+            if offset is None:
+                raise KeyError(token)
+            _SLOT.pack_into(self._mmap, offset, _EMPTY, 0.0, b"", b"")
+            self._set_count(-1)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        """Stored sessions, including expired ones not yet reused."""
+        return _SESSIONS_HEADER.unpack_from(self._mmap)[2]
+
+    def clear(self) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._mmap[_SESSIONS_HEADER.size:] = bytes(len(self._mmap) - _SESSIONS_HEADER.size)
+            _SESSIONS_HEADER.pack_into(self._mmap, 0, SESSIONS_MAGIC, self.capacity, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        self._mmap.close()
+        os.close(self._fd)
+
+
+# Worker-side access
+_snapshot: Optional[SharedSnapshot] = None
+
+
+def open_snapshot() -> Optional[SharedSnapshot]:
+    """Map the leaderboard snapshot written by the preload step, if shared mode is on."""
+    global _snapshot
+    if SHARED_DATA_DIR and _snapshot is None and os.path.exists(shared_path(SNAPSHOT_FILE)):
+        _snapshot = SharedSnapshot(shared_path(SNAPSHOT_FILE))
+    return _snapshot
+
+
+def get_snapshot() -> Optional[SharedSnapshot]:
+    """Return the mapped leaderboard snapshot, or None outside shared mode."""
+    return _snapshot
@@ -0,0 +1,114 @@
+"""Request coalescing for hot database reads.
+
+Concurrent reads of the same key share one in-flight query: the first caller
+starts it and later callers await the same task instead of each running the
+query (the thundering herd when a popular entry expires). Results are then
+served from memory:
+
+    age < ttl            fresh, returned as is
+    age < ttl + stale    returned as is while one background refresh runs
+    older                read again, coalesced
+
+The shared query must not use a caller's session, since callers may go away
+before it finishes; loaders open their own.
+
+Each key's in-flight read is its current generation. `invalidate()` retires
+it: callers arriving afterwards start a new read instead of joining one that
+may predate the change, and the retired read's result goes to its own callers
+only, without being cached.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Coalesced, briefly cached results of one kind of read, by key."""
+
+    def __init__(self, ttl_ms: float, stale_ms: float = 0, max_entries: int = 10000,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttl = ttl_ms / 1000
+        self.stale = stale_ms / 1000
+        self.max_entries = max_entries
+        self.clock = clock
+        # Oldest first: refreshed entries move to the end
+        self.cache: dict[Hashable, tuple[T, float]] = {}
+        # The current read of each key; invalidate() removes the reads it retires
+        self.inflight: dict[Hashable, asyncio.Task] = {}
+        self.stats = {
+            "calls": 0, "hits": 0, "staleHits": 0, "coalesced": 0, "loads": 0, "errors": 0, "retired": 0
+        }
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        """Return the value for `key`, running `load` only if no fresh or in-flight result exists."""
+        self.stats["calls"] += 1
+        cached = self.cache.get(key)
+        if cached is not None:
+            value, loaded_at = cached
+            age = self.clock() - loaded_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return value
+            if age < self.ttl + self.stale:
+                self.stats["staleHits"] += 1
+                if key not in self.inflight:
+                    self._start(key, load)
+                return value
+        task = self.inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = self._start(key, load)
+        # A caller that gives up must not cancel the query the others are waiting for
+        return await asyncio.shield(task)
+
+    def _start(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> asyncio.Task:
+        task = self.inflight[key] = asyncio.create_task(self._load(key, load))
+        # Background refreshes have no awaiting caller to collect their errors
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        task = asyncio.current_task()
+        self.stats["loads"] += 1
+        current = False
+        try:
+            value = await load()
+        except Exception:
+            self.stats["errors"] += 1
+            if key in self.cache:
+                # A failed background refresh keeps serving the stale value until it expires
+                logger.exception("refreshing %r failed", key)
+            raise
+        finally:
+            # A retired read must not unregister the read that replaced it
+            current = self.inflight.get(key) is task
+            if current:
+                del self.inflight[key]
+        if not current:
+            return value
+        self.cache.pop(key, None)
+        self.cache[key] = (value, self.clock())
+        while len(self.cache) > self.max_entries:
+            del self.cache[next(iter(self.cache))]
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop the cached value of `key` (of every key if None) and retire its read in flight."""
+        if key is None:
+            self.stats["retired"] += len(self.inflight)
+            self.cache.clear()
+            self.inflight.clear()
+        else:
+            self.cache.pop(key, None)
+            if self.inflight.pop(key, None) is not None:
+                self.stats["retired"] += 1
+
+    def report(self) -> dict:
+        return {"cached": len(self.cache), "inflight": len(self.inflight), **self.stats}
@@ -0,0 +1,170 @@
+"""Broadcast hub for live spectator streams.
+
+Every game-state update is serialized once, as a ready-to-send Server-Sent
+Events frame, and the same bytes object is queued for every watcher of that
+player. Each subscriber has a small bounded queue. A subscriber that falls
+behind does not grow it: its pending deltas are dropped and replaced by the
+channel's latest keyframe (a full `GameState`), after which it continues with
+the deltas that follow.
+"""
+import asyncio
+from collections import deque
+import json
+from typing import AsyncIterator, Optional
+
+from app.config import SPECTATOR_KEYFRAME_INTERVAL, SPECTATOR_QUEUE_SIZE
+
+
+def encode_event(event: str, seq: int, data: dict) -> bytes:
+    """Encode one SSE frame; `seq` is sent as the event id."""
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"id: {seq}\nevent: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class Frame:
+    """An encoded update shared by every subscriber of a channel."""
+
+    __slots__ = ("seq", "keyframe", "data")
+
+    def __init__(self, seq: int, keyframe: bool, data: bytes) -> None:
+        self.seq = seq
+        self.keyframe = keyframe
+        self.data = data
+
+
+class Subscriber:
+    """One watcher's bounded send queue."""
+
+    def __init__(self, channel: "Channel", max_queue: int) -> None:
+        self.channel = channel
+        self.max_queue = max_queue
+        self.queue: deque[Frame] = deque()
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def offer(self, frame: Frame) -> int:
+        """Queue a frame and return how many pending frames were dropped to make room."""
+        dropped = 0
+        if frame.keyframe:
+            # A keyframe supersedes everything still pending
+            dropped = len(self.queue)
+            self.queue.clear()
+        elif len(self.queue) >= self.max_queue:
+            # Lagging: skip the intermediate deltas and resync from the latest state
+            dropped = len(self.queue) + 1
+            self.queue.clear()
+            frame = self.channel.keyframe()
+        self.queue.append(frame)
+        self._ready.set()
+        return dropped
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def frames(self) -> AsyncIterator[bytes]:
+        """Yield encoded frames until the channel closes."""
+        while True:
+            while self.queue:
+                yield self.queue.popleft().data
+            if self.closed:
+                return
+            self._ready.clear()
+            await self._ready.wait()
+
+
+class Channel:
+    """Subscribers and latest state of one player's game."""
+
+    def __init__(self, channel_id: str, keyframe_interval: int) -> None:
+        self.channel_id = channel_id
+        self.keyframe_interval = keyframe_interval
+        self.subscribers: set[Subscriber] = set()
+        self.seq = 0
+        self.state: Optional[dict] = None
+        self._keyframe: Optional[Frame] = None
+        self._last_keyframe_seq = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def keyframe(self) -> Frame:
+        """Frame with the full current state, encoded at most once per update."""
+        if self._keyframe is None or self._keyframe.seq != self.seq:
+            self._keyframe = Frame(self.seq, True, encode_event("keyframe", self.seq, self.state))
+        return self._keyframe
+
+    def publish(self, state: dict, delta: Optional[dict] = None) -> None:
+        """Publish the new full state, sent as `delta` when given unless a keyframe is due."""
+        self.seq += 1
+        self.state = state
+        self.published += 1
+        if delta is None or self.seq - self._last_keyframe_seq >= self.keyframe_interval:
+            frame = self.keyframe()
+            self._last_keyframe_seq = self.seq
+        else:
+            frame = Frame(self.seq, False, encode_event("delta", self.seq, delta))
+        for subscriber in self.subscribers:
+            self.dropped += subscriber.offer(frame)
+        self.delivered += len(self.subscribers)
+
+    def stats(self) -> dict:
+        offered = self.delivered or 1
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "dropRate": round(self.dropped / offered, 4),
+        }
+
+
+class SpectatorHub:
+    """Channels by player id."""
+
+    def __init__(self, max_queue: int = SPECTATOR_QUEUE_SIZE,
+                 keyframe_interval: int = SPECTATOR_KEYFRAME_INTERVAL) -> None:
+        self.max_queue = max_queue
+        self.keyframe_interval = keyframe_interval
+        self.channels: dict[str, Channel] = {}
+
+    def _channel(self, channel_id: str) -> Channel:
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = Channel(channel_id, self.keyframe_interval)
+        return channel
+
+    def publish(self, channel_id: str, state: dict, delta: Optional[dict] = None) -> None:
+        """Publish a game-state update. Channels nobody watches only keep the latest state."""
+        self._channel(channel_id).publish(state, delta)
+
+    def subscribe(self, channel_id: str, initial_state: Optional[dict] = None) -> Subscriber:
+        """Watch a channel; the subscriber starts from the latest (or given) full state."""
+        channel = self._channel(channel_id)
+        if channel.state is None and initial_state is not None:
+            channel.state = initial_state
+        subscriber = Subscriber(channel, self.max_queue)
+        if channel.state is not None:
+            subscriber.offer(channel.keyframe())
+        channel.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscriber.channel.subscribers.discard(subscriber)
+
+    def close(self, channel_id: str) -> None:
+        """End a channel (the game is over), closing every subscriber's stream."""
+        channel = self.channels.pop(channel_id, None)
+        if channel is not None:
+            for subscriber in channel.subscribers:
+                subscriber.close()
+
+    def stats(self) -> dict:
+        channels = {channel_id: channel.stats() for channel_id, channel in self.channels.items()}
+        return {
+            "channels": len(channels),
+            "subscribers": sum(stats["subscribers"] for stats in channels.values()),
+            "perChannel": channels,
+        }
+
+
+spectator_hub = SpectatorHub()
@@ -0,0 +1,347 @@
+"""Asynchronous anti-cheat verification of submitted scores.
+
+A submit may carry a `ReplayLog` (the direction changes and food positions of
+the game). The submit is stored as usual together with a `pending`
+verification row; the pipeline then replays the log with the server-side
+port of the game rules (`app.game_logic`) in a process pool, off the request
+path, and marks the entry `verified` or `rejected`.
+
+Visibility on the leaderboard:
+
+    rejected                         always hidden
+    score > VERIFY_SCORE_THRESHOLD   hidden until verified
+    otherwise                        visible
+
+Entries without a verification row have no replay and count as unverified.
+A replayed submit only raises the user's high score once it is verified.
+
+Every worker queues the pending rows on start, so a batch is claimed before
+it is replayed: one UPDATE moves its rows from `pending` to `verifying` and
+only the rows it changed are verified. A claim left by a worker that died
+mid-batch can be taken again after CLAIM_SECONDS.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, UTC
+import logging
+import multiprocessing
+from typing import Optional
+
+from sqlalchemy import JSON, Column, DateTime, String, Table, and_, bindparam, or_, select, update
+
+from app import events
+from app.config import VERIFY_BATCH_SIZE, VERIFY_QUEUE_SIZE, VERIFY_SCORE_THRESHOLD, VERIFY_WORKERS
+from app.db_models import LeaderboardEntry as DBLeaderboardEntry, User as DBUser
+from app.game_logic import (
+    GRID_SIZE, FreeCells, change_direction, check_wall_collision, create_initial_state, move_snake
+)
+from app.leaderboard_store import leaderboard_store
+
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+VERIFYING = "verifying"
+VERIFIED = "verified"
+REJECTED = "rejected"
+# A claimed batch is replayed well within this; older claims belong to a dead worker
+CLAIM_SECONDS = 300.0
+
+# Kept next to the leaderboard table rather than as extra columns, so entries
+# without a replay cost nothing and the hot leaderboard rows stay unchanged
+verifications = Table(
+    "leaderboard_verifications",
+    DBLeaderboardEntry.metadata,
+    Column("entry_id", String, primary_key=True),
+    Column("status", String, nullable=False, index=True),
+    Column("reason", String, nullable=True),
+    Column("replay", JSON, nullable=True),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+# (entry id, username, score, mode, date, replay)
+Job = tuple[str, str, int, str, str, dict]
+
+
+class ReplayError(Exception):
+    """Raised when a replay log cannot have produced the submitted game."""
+
+
+def replay_game(score: int, mode: str, replay: dict) -> tuple[bool, Optional[str]]:
+    """Replay a `ReplayLog` dict and check it ends with `score`. Returns (verified, reason)."""
+    foods = [(food["x"], food["y"]) for food in replay["foods"]]
+    moves = replay["moves"]
+    ticks = replay["ticks"]
+    spawned = 0
+    free = FreeCells(GRID_SIZE)
+
+    def food_source(snake: list) -> tuple[int, int]:
+        nonlocal spawned
+        if spawned >= len(foods):
+            raise ReplayError("ran out of food positions")
+        food = foods[spawned]
+        if check_wall_collision(food, GRID_SIZE) or free.cell(food) not in free:
+            raise ReplayError(f"food {spawned} spawned off the grid or on the snake")
+        free.occupy(free.cell(food))
+        spawned += 1
+        return food
+
+    try:
+        state = create_initial_state(mode, food_source, free=free)
+        next_move = 0
+        for tick in range(ticks):
+            if state.is_game_over:
+                raise ReplayError(f"game ended before tick {tick}")
+            # Direction changes queued before a tick are applied in order, as in GameBoard
+            while next_move < len(moves) and moves[next_move]["tick"] == tick:
+                change_direction(state, moves[next_move]["direction"])
+                next_move += 1
+            if next_move < len(moves) and moves[next_move]["tick"] < tick:
+                raise ReplayError("moves are not in tick order")
+            move_snake(state, food_source)
+    except ReplayError as exc:
+        return False, str(exc)
+
+    if next_move < len(moves):
+        return False, "moves after the last tick"
+    if spawned != len(foods):
+        return False, "unused food positions"
+    if state.score != score:
+        return False, f"replay scores {state.score}, submitted {score}"
+    return True, None
+
+
+def verify_batch(jobs: list[tuple[str, int, str, dict]]) -> list[tuple[str, bool, Optional[str]]]:
+    """Process-pool entry point: verify (entry id, score, mode, replay) jobs."""
+    return [(entry_id, *replay_game(score, mode, replay)) for entry_id, score, mode, replay in jobs]
+
+
+def needs_verification(score: int) -> bool:
+    """Whether a score stays hidden from the leaderboard until it is verified."""
+    return VERIFY_SCORE_THRESHOLD is not None and score > VERIFY_SCORE_THRESHOLD
+
+
+def visible_clause():
+    """WHERE clause for leaderboard queries outer-joined to `verifications`."""
+    status = verifications.c.status
+    clause = or_(status.is_(None), status != REJECTED)
+    if VERIFY_SCORE_THRESHOLD is not None:
+        clause = and_(clause, or_(DBLeaderboardEntry.score <= VERIFY_SCORE_THRESHOLD, status == VERIFIED))
+    return clause
+
+
+def claimable_clause(now: datetime):
+    """WHERE clause for verification rows no live worker is replaying."""
+    status = verifications.c.status
+    return or_(
+        status == PENDING,
+        and_(status == VERIFYING, verifications.c.updated_at < now - timedelta(seconds=CLAIM_SECONDS))
+    )
+
+
+def verification_row(entry_id: str, replay: dict) -> dict:
+    return {
+        "entry_id": entry_id, "status": PENDING, "reason": None,
+        "replay": replay, "updated_at": datetime.now(UTC),
+    }
+
+
+class VerificationPipeline:
+    """Queue of pending replays verified in batches by a process pool."""
+
+    def __init__(
+        self,
+        workers: int = VERIFY_WORKERS,
+        batch_size: int = VERIFY_BATCH_SIZE,
+        max_queue: int = VERIFY_QUEUE_SIZE,
+    ) -> None:
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.stats = {"verified": 0, "rejected": 0, "deferred": 0, "batches": 0, "seconds": 0.0}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # Created on first use; spawn keeps the workers free of the server's threads and sockets
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def start(self) -> None:
+        """Queue entries still pending (or claimed by a dead worker) and start verifying."""
+        from app.database import async_session
+
+        async with async_session() as db:
+            result = await db.execute(
+                select(
+                    DBLeaderboardEntry.id, DBLeaderboardEntry.username, DBLeaderboardEntry.score,
+                    DBLeaderboardEntry.mode, DBLeaderboardEntry.date, verifications.c.replay
+                )
+                .join(verifications, verifications.c.entry_id == DBLeaderboardEntry.id)
+                .where(claimable_clause(datetime.now(UTC)))
+                .limit(self.queue.maxsize)
+            )
+            for row in result.all():
+                self.queue.put_nowait(tuple(row))
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop verifying; queued entries stay pending and are picked up on the next start."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def enqueue(self, job: Job) -> None:
+        """Queue a stored entry for verification (it stays pending if the queue is full)."""
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["deferred"] += 1
+
+    async def _next_batch(self) -> list[Job]:
+        batch = [await self.queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    @staticmethod
+    async def claim(jobs: list[Job]) -> list[Job]:
+        """Claim the jobs no other worker is replaying, in one UPDATE; returns the claimed ones."""
+        from app.database import async_session
+
+        now = datetime.now(UTC)
+        async with async_session() as db:
+            result = await db.execute(
+                update(verifications)
+                .where(verifications.c.entry_id.in_([job[0] for job in jobs]), claimable_clause(now))
+                .values(status=VERIFYING, updated_at=now)
+                .returning(verifications.c.entry_id)
+            )
+            claimed = set(result.scalars().all())
+            await db.commit()
+        return [job for job in jobs if job[0] in claimed]
+
+    async def verify(self, jobs: list[Job]) -> list[tuple[str, bool, Optional[str]]]:
+        """Replay jobs across the pool, one chunk per worker."""
+        loop = asyncio.get_running_loop()
+        work = [(entry_id, score, mode, replay) for entry_id, _, score, mode, _, replay in jobs]
+        size = -(-len(work) // self.workers)
+        chunks = [work[i:i + size] for i in range(0, len(work), size)]
+        results = await asyncio.gather(*(loop.run_in_executor(self.pool, verify_batch, chunk) for chunk in chunks))
+        return [outcome for chunk in results for outcome in chunk]
+
+    async def _run(self) -> None:
+        from app.database import async_session
+
+        while True:
+            jobs = await self._next_batch()
+            started = asyncio.get_running_loop().time()
+            try:
+                jobs = await self.claim(jobs)
+            except Exception:
+                logger.exception("claiming %d entries for verification failed", len(jobs))
+                continue
+            if not jobs:
+                continue
+            try:
+                outcomes = await self.verify(jobs)
+            except Exception:
+                # A broken pool is recreated on the next batch; the entries stay pending
+                logger.exception("verification of %d entries failed", len(jobs))
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                continue
+            try:
+                async with async_session() as db:
+                    await db.execute(
+                        update(verifications)
+                        .where(verifications.c.entry_id == bindparam("b_entry_id"), verifications.c.status == VERIFYING)
+                        .values(
+                            status=bindparam("b_status"), reason=bindparam("b_reason"),
+                            replay=None, updated_at=datetime.now(UTC)
+                        ),
+                        [
+                            {"b_entry_id": entry_id, "b_status": VERIFIED if ok else REJECTED, "b_reason": reason}
+                            for entry_id, ok, reason in outcomes
+                        ]
+                    )
+                    await self._raise_high_scores(db, jobs, outcomes)
+                    await db.commit()
+            except Exception:
+                logger.exception("saving %d verification results failed", len(outcomes))
+                continue
+            self._apply(jobs, outcomes)
+            self.stats["batches"] += 1
+            self.stats["seconds"] += asyncio.get_running_loop().time() - started
+
+    @staticmethod
+    async def _raise_high_scores(db, jobs: list[Job], outcomes: list[tuple[str, bool, Optional[str]]]) -> None:
+        """Raise the owners' high scores to their verified scores, which submits left for verification."""
+        by_id = {job[0]: job for job in jobs}
+        best: dict[str, int] = {}
+        for entry_id, ok, _ in outcomes:
+            if ok:
+                _, username, score, _, _, _ = by_id[entry_id]
+                best[username] = max(best.get(username, 0), score)
+        if not best:
+            return
+        users = DBUser.__table__
+        await db.execute(
+            update(users)
+            .where(users.c.username == bindparam("b_username"), users.c.high_score < bindparam("b_score"))
+            .values(high_score=bindparam("b_score")),
+            [{"b_username": username, "b_score": score} for username, score in best.items()]
+        )
+
+    def _apply(self, jobs: list[Job], outcomes: list[tuple[str, bool, Optional[str]]]) -> None:
+        """Show newly verified hidden entries and drop rejected visible ones in the in-memory leaderboard."""
+        by_id = {job[0]: job for job in jobs}
+        for entry_id, ok, reason in outcomes:
+            _, username, score, mode, day, _ = by_id[entry_id]
+            if ok:
+                self.stats["verified"] += 1
+                if needs_verification(score):
+                    self._publish("add", entry_id, username, score, mode, day)
+            else:
+                self.stats["rejected"] += 1
+                logger.info("rejected score %d by %s: %s", score, username, reason)
+                if not needs_verification(score):
+                    self._publish("remove", entry_id, username, score, mode, day)
+
+    @staticmethod
+    def _publish(op: str, entry_id: str, username: str, score: int, mode: str, day: str) -> None:
+        """Apply a visibility change to this worker's leaderboard and announce it to the others."""
+        if leaderboard_store.loaded:
+            if op == "add":
+                leaderboard_store.add(entry_id, username, score, mode, day)
+            else:
+                leaderboard_store.remove(entry_id, score, mode)
+        events.event_bus.publish(events.LEADERBOARD_CHANGED, events.leaderboard_change(
+            op, entry_id, username, score, mode, day
+        ))
+
+    def report(self) -> dict:
+        done = self.stats["verified"] + self.stats["rejected"]
+        return {
+            **self.stats,
+            "queued": self.queue.qsize(),
+            "workers": self.workers,
+            "gamesPerSecond": round(done / self.stats["seconds"], 1) if self.stats["seconds"] else None,
+        }
+
+
+# Set by the app lifespan
+pipeline: Optional[VerificationPipeline] = None
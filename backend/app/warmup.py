@@ -0,0 +1,149 @@
+"""Startup warm-up stages and readiness tracking."""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.config import ARCHIVE_KEEP_TOP, WARMUP_POOL_CONNECTIONS
+from app.models import (
+    ActivePlayer, GameState, LeaderboardEntry, SubmitScoreResponse, User
+)
+
+
+logger = logging.getLogger(__name__)
+
+WarmupStage = Callable[[], Awaitable[None]]
+
+
+class WarmupState:
+    """Runs registered warm-up stages in order and records their timings."""
+
+    def __init__(self) -> None:
+        self.stages: list[tuple[str, WarmupStage]] = []
+        self.timings: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.running = False
+        self.ready = False
+        self.total_ms: Optional[float] = None
+
+    def register(self, name: str, stage: WarmupStage) -> None:
+        """Register a warm-up stage. Stages run in registration order."""
+        self.stages.append((name, stage))
+
+    async def run(self) -> None:
+        """Run every stage once. The state becomes ready only if all stages succeed."""
+        self.running = True
+        self.ready = False
+        self.timings.clear()
+        self.errors.clear()
+        started = time.perf_counter()
+        try:
+            for name, stage in self.stages:
+                stage_started = time.perf_counter()
+                try:
+                    await stage()
+                except Exception as exc:  # keep warming the remaining stages
+                    self.errors[name] = f"{type(exc).__name__}: {exc}"
+                self.timings[name] = round((time.perf_counter() - stage_started) * 1000, 3)
+        finally:
+            self.total_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.running = False
+        self.ready = not self.errors
+
+    def report(self) -> dict:
+        """Return the readiness report served by `/ready`."""
+        if self.ready:
+            status = "ready"
+        elif self.running:
+            status = "warming"
+        elif self.errors:
+            status = "failed"
+        else:
+            status = "pending"
+        return {
+            "status": status,
+            "ready": self.ready,
+            "totalMs": self.total_ms,
+            "stages": dict(self.timings),
+            "errors": dict(self.errors),
+        }
+
+
+# Default stages
+# app.database is imported inside the stages so SQLAlchemy stays off the `main` import path
+async def warm_database_pool() -> None:
+    """Open pooled connections up front so first requests don't pay for the handshake."""
+    from sqlalchemy import text
+    from app.database import engine
+
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Hold the connections concurrently so the pool actually grows to the target size
+    await asyncio.gather(*(ping() for _ in range(WARMUP_POOL_CONNECTIONS)))
+
+
+async def warm_models() -> None:
+    """Exercise validators and JSON serializers of the hot response models."""
+    for model in (LeaderboardEntry, GameState, ActivePlayer, User, SubmitScoreResponse):
+        example = (model.model_config.get("json_schema_extra") or {}).get("example")
+        if example is None:
+            continue
+        model.model_validate(example).model_dump_json()
+
+
+async def warm_leaderboard() -> None:
+    """Load the in-memory leaderboard from the checkpoint (if it matches the database), the shared snapshot or the database."""
+    from app import checkpoint
+    from app.database import async_session, get_leaderboard_checksum, get_leaderboard_rows, read_leaderboard
+    from app.leaderboard_store import leaderboard_store
+    from app.shared_data import MODES_BY_CODE, get_snapshot
+
+    saver = checkpoint.checkpointer
+    if saver is not None and saver.restore(leaderboard_store):
+        # Log changes from here on, also while the check below runs
+        saver.resume(leaderboard_store, restored=True)
+        async with async_session() as db:
+            expected = await get_leaderboard_checksum(db)
+        if checkpoint.store_checksum(leaderboard_store) == expected:
+            return
+        logger.warning("leaderboard checkpoint does not match the database, loading it in full")
+        leaderboard_store.clear()
+
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        leaderboard_store.load_snapshot(snapshot)
+    else:
+        async with async_session() as db:
+            leaderboard_store.load(await get_leaderboard_rows(db))
+    if saver is not None:
+        saver.resume(leaderboard_store, restored=False)
+    if not leaderboard_store.is_current():
+        # GET /leaderboard pages are read from the database here; fill the top lists they are cut from
+        for mode in (None, *MODES_BY_CODE):
+            await read_leaderboard(mode, ARCHIVE_KEEP_TOP)
+
+
+async def warm_active_players() -> None:
+    """Load the live-games index behind the active players list."""
+    from app.active_index import active_player_index
+    from app.database import async_session, get_active_players
+
+    async with async_session() as db:
+        active_player_index.load(await get_active_players(db))
+
+
+async def warm_shared_data() -> None:
+    """Map the read-only snapshot written by the preload step (shared mode only)."""
+    from app.shared_data import open_snapshot
+
+    open_snapshot()
+
+
+warmup = WarmupState()
+warmup.register("shared_data", warm_shared_data)
+warmup.register("database", warm_database_pool)
+warmup.register("models", warm_models)
+warmup.register("leaderboard", warm_leaderboard)
+warmup.register("active_players", warm_active_players)
@@ -0,0 +1,22 @@
+"""Benchmark suite for the Snake Arena Live backend.
+
+Each `bench_*` module exposes a `run()` function returning a dict of metrics.
+Modules enforce their budgets with `check_budget`; `python -m benchmarks`
+runs them all and exits non-zero if any budget is exceeded.
+"""
+import os
+
+
+class BudgetExceeded(AssertionError):
+    """Raised when a benchmark metric is over its budget."""
+
+
+def budget(name: str, default: float) -> float:
+    """Read a budget from the `BENCH_<NAME>` environment variable."""
+    return float(os.getenv(f"BENCH_{name.upper()}", default))
+
+
+def check_budget(name: str, value: float, limit: float) -> None:
+    """Fail the benchmark if `value` is over `limit`."""
+    if value > limit:
+        raise BudgetExceeded(f"{name}: {value:.2f} is over budget {limit:.2f}")
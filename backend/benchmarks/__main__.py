@@ -0,0 +1,34 @@
+"""Run the benchmark suite: `python -m benchmarks [name ...]`."""
+import importlib
+import pkgutil
+import sys
+from pathlib import Path
+
+from benchmarks import BudgetExceeded
+
+
+def main(argv: list[str]) -> int:
+    names = sorted(
+        info.name for info in pkgutil.iter_modules([str(Path(__file__).parent)])
+        if info.name.startswith("bench_")
+    )
+    if argv:
+        names = [name for name in names if any(arg in name for arg in argv)]
+
+    failures = 0
+    for name in names:
+        module = importlib.import_module(f"benchmarks.{name}")
+        try:
+            metrics = module.run()
+        except BudgetExceeded as exc:
+            print(f"{name}: FAIL {exc}")
+            failures += 1
+            continue
+        print(f"{name}: ok")
+        for key, value in metrics.items():
+            print(f"  {key} = {value}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
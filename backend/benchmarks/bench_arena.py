@@ -0,0 +1,80 @@
+"""Arena tick cost with 100 bot snakes in one room, against a pairwise collision check."""
+import os
+import random
+import time
+
+from benchmarks import budget, check_budget
+
+SNAKES = int(os.getenv("BENCH_ARENA_SNAKES", "100"))
+TICKS = int(os.getenv("BENCH_ARENA_TICKS", "1000"))
+GRID = int(os.getenv("BENCH_ARENA_GRID", "96"))
+
+
+def steer(room, rng: random.Random) -> None:
+    """Bots: respawn when dead, otherwise turn at random or when about to hit something."""
+    from app.arena import _DELTAS, _OPPOSITES, ArenaFull
+
+    size = room.grid_size
+    for player_id, snake in list(room.snakes.items()):
+        if not snake.alive:
+            try:
+                room.join(player_id, player_id)
+            except ArenaFull:
+                pass
+            continue
+        head = snake.body[0]
+        x, y = head % size, head // size
+        options = []
+        for direction, (dx, dy) in _DELTAS.items():
+            nx, ny = x + dx, y + dy
+            if direction != _OPPOSITES[snake.direction] and 0 <= nx < size and 0 <= ny < size \
+                    and not room.cells[ny * size + nx]:
+                options.append(direction)
+        if options and (snake.direction not in options or rng.random() < 0.1):
+            room.change_direction(player_id, rng.choice(options))
+
+
+def pairwise_collisions(room) -> int:
+    """What the tick avoids: every head against every segment of every snake."""
+    segments = [cell for snake in room.snakes.values() for cell in snake.body]
+    return sum(
+        1 for snake in room.snakes.values() if snake.body
+        for cell in segments if cell == snake.body[0]
+    )
+
+
+def run() -> dict:
+    from app.arena import ArenaRoom
+
+    rng = random.Random(0)
+    room = ArenaRoom("bench", "walls", GRID, food_count=SNAKES, seed=0)
+    for i in range(SNAKES):
+        room.join(f"bot{i}", f"bot{i}")
+
+    tick_ms = []
+    for _ in range(TICKS):
+        steer(room, rng)
+        started = time.perf_counter()
+        room.tick()
+        tick_ms.append((time.perf_counter() - started) * 1000)
+    tick_ms.sort()
+    p99 = tick_ms[int(len(tick_ms) * 0.99) - 1]
+
+    started = time.perf_counter()
+    pairwise_collisions(room)
+    pairwise_ms = (time.perf_counter() - started) * 1000
+
+    metrics = {
+        "snakes": SNAKES,
+        "alive": sum(snake.alive for snake in room.snakes.values()),
+        "segments": sum(len(snake.body) for snake in room.snakes.values()),
+        "tick_ms_mean": round(sum(tick_ms) / len(tick_ms), 4),
+        "tick_ms_p99": round(p99, 4),
+        "pairwise_check_ms": round(pairwise_ms, 4),
+    }
+    check_budget("arena_tick_ms", p99, budget("arena_tick_ms", 2))
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
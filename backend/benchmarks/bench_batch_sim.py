@@ -0,0 +1,54 @@
+"""Batch simulation throughput: game ticks per second, NumPy lockstep vs one game at a time."""
+import os
+import random
+import time
+
+from benchmarks import budget, check_budget
+
+GAMES = int(os.getenv("BENCH_SIM_GAMES", "2000"))
+TICKS = int(os.getenv("BENCH_SIM_TICKS", "200"))
+
+
+def run() -> dict:
+    from app.batch_sim import BatchSimulator, verify_replays
+    from app.game_logic import simulate_bot_game
+    from app.verification import replay_game
+
+    rng = random.Random(0)
+    scalar_games = GAMES
+    started = time.perf_counter()
+    played = [simulate_bot_game("walls", rng, max_ticks=TICKS) for _ in range(scalar_games)]
+    scalar_ticks = sum(replay["ticks"] for _, replay in played)
+    scalar_rate = scalar_ticks / (time.perf_counter() - started)
+
+    sim = BatchSimulator(GAMES, "walls", seed=0)
+    started = time.perf_counter()
+    sim.run(TICKS)
+    batch_rate = int(sim.ticks.sum()) / (time.perf_counter() - started)
+
+    scores = [state.score for state, _ in played]
+    replays = [replay for _, replay in played]
+    started = time.perf_counter()
+    for score, replay in zip(scores, replays):
+        replay_game(score, "walls", replay)
+    scalar_verify = time.perf_counter() - started
+    started = time.perf_counter()
+    verify_replays("walls", scores, replays)
+    batch_verify = time.perf_counter() - started
+
+    batch_us = 1e6 / batch_rate
+    metrics = {
+        "games": GAMES,
+        "scalar_bot_ticks_per_second": round(scalar_rate),
+        "batch_bot_ticks_per_second": round(batch_rate),
+        "batch_us_per_game_tick": round(batch_us, 3),
+        "verify_games": scalar_games,
+        "scalar_verify_games_per_second": round(scalar_games / scalar_verify, 1),
+        "batch_verify_games_per_second": round(scalar_games / batch_verify, 1),
+    }
+    check_budget("batch_us_per_game_tick", batch_us, budget("batch_us_per_game_tick", 5))
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
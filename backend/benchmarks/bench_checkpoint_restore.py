@@ -0,0 +1,64 @@
+"""Leaderboard start-up: loading every row vs a checkpoint plus a short tail log."""
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from benchmarks import budget, check_budget
+
+ENTRIES = int(os.getenv("BENCH_CHECKPOINT_ENTRIES", "100000"))
+TAIL = int(os.getenv("BENCH_CHECKPOINT_TAIL", "1000"))
+
+
+def rows(rng: random.Random, n: int, start: int = 0) -> list[tuple[str, str, int, str, str]]:
+    return [
+        (str(uuid.UUID(int=start + i)), f"player{rng.randrange(n // 4 + 1)}", rng.randrange(5000),
+         rng.choice(("walls", "pass-through")), f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}")
+        for i in range(n)
+    ]
+
+
+def run() -> dict:
+    from app.checkpoint import LeaderboardCheckpointer, checkpoint_sections, write_checkpoint
+    from app.events import leaderboard_change
+    from app.leaderboard_store import LeaderboardStore
+
+    rng = random.Random(0)
+    history = rows(rng, ENTRIES)
+    tail = rows(rng, TAIL, start=ENTRIES)
+
+    # Only the in-memory part of a full load; the query and row decoding come on top
+    started = time.perf_counter()
+    store = LeaderboardStore()
+    store.load(history)
+    full_ms = (time.perf_counter() - started) * 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        reader = LeaderboardCheckpointer(directory)
+        write_checkpoint(reader.path(1, "ckpt"), 1, checkpoint_sections(store))
+        with open(reader.path(1, "log"), "w") as f:
+            for row in tail:
+                f.write(json.dumps(leaderboard_change("add", *row), separators=(",", ":")) + "\n")
+        checkpoint_bytes = os.path.getsize(reader.path(1, "ckpt"))
+
+        restored = LeaderboardStore()
+        started = time.perf_counter()
+        assert reader.restore(restored)
+        restore_ms = (time.perf_counter() - started) * 1000
+    assert len(restored) == ENTRIES + TAIL and reader.stats["replayed"] == TAIL
+
+    metrics = {
+        "entries": ENTRIES,
+        "tail": TAIL,
+        "full_load_ms": round(full_ms, 1),
+        "restore_ms": round(restore_ms, 1),
+        "checkpoint_bytes_per_entry": round(checkpoint_bytes / ENTRIES, 1),
+    }
+    check_budget("checkpoint_restore_ms", restore_ms, budget("checkpoint_restore_ms", 100))
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
@@ -0,0 +1,94 @@
+"""Cold start to first response, per worker process.
+
+Spawns one single-worker uvicorn process per simulated worker, on a seeded
+SQLite database, and measures the time from process spawn until `/health`
+first answers 200 and until a first API request (`ROUTE`, which loads its
+router, opens a database connection and serializes entries) succeeds.
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks import budget, check_budget
+from benchmarks.importtime import BACKEND_DIR, profile
+
+WORKERS = int(os.getenv("BENCH_WORKERS", "4"))
+TIMEOUT_S = 30.0
+ROUTE = "/api/v1/leaderboard?mode=walls&limit=10"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _seed(database_url: str) -> None:
+    """Create the tables and sample data in a fresh database."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from app.database import initialize_sample_data
+    from app.db_models import Base
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine)() as db:
+        await initialize_sample_data(db)
+    await engine.dispose()
+
+
+def _wait_for(url: str, started: float) -> float:
+    """Poll `url` until it answers 200; return milliseconds since `started`."""
+    while time.perf_counter() - started < TIMEOUT_S:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return (time.perf_counter() - started) * 1000
+        except OSError:
+            time.sleep(0.005)
+    raise TimeoutError(f"{url} did not answer within {TIMEOUT_S}s")
+
+
+def cold_start_ms(database_url: str) -> tuple[float, float]:
+    """Spawn a worker and return milliseconds until its first `/health` and first `ROUTE` responses."""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": database_url},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        health = _wait_for(f"http://127.0.0.1:{port}/health", started)
+        return health, _wait_for(f"http://127.0.0.1:{port}{ROUTE}", started)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite+aiosqlite:///{tmp}/bench.db"
+        asyncio.run(_seed(database_url))
+        timings = [cold_start_ms(database_url) for _ in range(WORKERS)]
+    health = [h for h, _ in timings]
+    route = [r for _, r in timings]
+    import_ms = max(cumulative for _, _, cumulative in profile()) / 1000
+    metrics = {
+        "workers": WORKERS,
+        "import_main_ms": round(import_ms, 1),
+        "route": ROUTE,
+        "health_ms": [round(t, 1) for t in health],
+        "cold_start_ms": [round(t, 1) for t in route],
+        "cold_start_median_ms": round(statistics.median(route), 1),
+        "cold_start_max_ms": round(max(route), 1),
+    }
+    check_budget("cold_start_max_ms", max(route), budget("cold_start_ms", 2000))
+    return metrics
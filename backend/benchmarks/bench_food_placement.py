@@ -0,0 +1,46 @@
+"""Food placement on a nearly full grid: rejection sampling vs the free-cell index."""
+import os
+import random
+import time
+
+from benchmarks import budget, check_budget
+
+GRID = int(os.getenv("BENCH_FOOD_GRID", "64"))
+FILL = float(os.getenv("BENCH_FOOD_FILL", "0.95"))
+PLACEMENTS = int(os.getenv("BENCH_FOOD_PLACEMENTS", "2000"))
+
+
+def run() -> dict:
+    from app.game_logic import FreeCells, generate_food
+
+    rng = random.Random(0)
+    cells = GRID * GRID
+    occupied_cells = rng.sample(range(cells), int(cells * FILL))
+    snake = [(cell % GRID, cell // GRID) for cell in occupied_cells]
+
+    started = time.perf_counter()
+    for _ in range(PLACEMENTS // 20):
+        generate_food(snake, rng, GRID)
+    rejection_us = (time.perf_counter() - started) / (PLACEMENTS // 20) * 1e6
+
+    free = FreeCells(GRID)
+    for cell in occupied_cells:
+        free.occupy(cell)
+    started = time.perf_counter()
+    for _ in range(PLACEMENTS):
+        # Place, then eat it: one draw plus the update of a move
+        free.release(free.take(rng))
+    free_cells_us = (time.perf_counter() - started) / PLACEMENTS * 1e6
+
+    metrics = {
+        "grid": GRID,
+        "fill": FILL,
+        "rejection_us_per_food": round(rejection_us, 2),
+        "free_cells_us_per_food": round(free_cells_us, 2),
+    }
+    check_budget("food_us_per_placement", free_cells_us, budget("food_us_per_placement", 5))
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
@@ -0,0 +1,63 @@
+"""Memory per leaderboard entry: `LeaderboardEntry` models vs the columnar store."""
+import gc
+import os
+import time
+import tracemalloc
+import uuid
+
+from benchmarks import budget, check_budget
+
+ENTRIES = int(os.getenv("BENCH_MEMORY_ENTRIES", "100000"))
+
+
+def _rows(count: int) -> list[tuple[str, str, int, str, str]]:
+    return [
+        (str(uuid.UUID(int=i + 1)), f"player{i % 5000}", (i * 7919) % 100000,
+         "walls" if i % 2 else "pass-through", "2024-11-28")
+        for i in range(count)
+    ]
+
+
+def _allocated(build) -> tuple[object, int]:
+    """Return what `build()` made and the bytes it still holds."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, after - before
+
+
+def run() -> dict:
+    from app.leaderboard_store import LeaderboardStore
+    from app.models import LeaderboardEntry
+
+    rows = _rows(ENTRIES)
+    models, model_bytes = _allocated(lambda: [
+        LeaderboardEntry(id=i, username=u, score=s, mode=m, date=d) for i, u, s, m, d in rows
+    ])
+    del models
+
+    def build_store():
+        store = LeaderboardStore()
+        store.load(rows)
+        return store
+
+    store, store_bytes = _allocated(build_store)
+
+    started = time.perf_counter()
+    for _ in range(100):
+        store.top("walls", 100).to_models()
+    top_us = (time.perf_counter() - started) / 100 * 1e6
+
+    per_entry = store_bytes / ENTRIES
+    metrics = {
+        "entries": ENTRIES,
+        "model_bytes_per_entry": round(model_bytes / ENTRIES, 1),
+        "columnar_bytes_per_entry": round(per_entry, 1),
+        "top100_to_models_us": round(top_us, 1),
+    }
+    check_budget("columnar_bytes_per_entry", per_entry, budget("columnar_bytes_per_entry", 48))
+    return metrics
@@ -0,0 +1,100 @@
+"""Submit latency while reads arrive at twice the server's capacity, with and without admission control.
+
+The server is simulated: a shared semaphore of CAPACITY slots, each request
+holding one for SERVICE_MS. Without admission control every request queues on
+it first come, first served, so submits wait behind the read backlog.
+"""
+import asyncio
+import os
+import time
+
+from benchmarks import budget, check_budget
+
+CAPACITY = int(os.getenv("BENCH_SHED_CAPACITY", "8"))
+SERVICE_MS = float(os.getenv("BENCH_SHED_SERVICE_MS", "4"))
+SECONDS = float(os.getenv("BENCH_SHED_SECONDS", "1.5"))
+READ_LOAD = float(os.getenv("BENCH_SHED_READ_LOAD", "2"))
+SUBMITS_PER_SECOND = float(os.getenv("BENCH_SHED_SUBMITS_PER_SECOND", "100"))
+
+READ = {"type": "http", "method": "GET", "path": "/api/v1/leaderboard"}
+SUBMIT = {"type": "http", "method": "POST", "path": "/api/v1/leaderboard/submit"}
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def scenario(shedding: bool) -> dict:
+    from app.admission import AdmissionController, AdmissionMiddleware, RouteClass
+
+    capacity = asyncio.Semaphore(CAPACITY)
+
+    async def app(scope, receive, send):
+        async with capacity:
+            await asyncio.sleep(SERVICE_MS / 1000)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    if shedding:
+        # Reads may use most of the capacity; the rest is headroom for submits
+        controller = AdmissionController({
+            "critical": RouteClass("critical", 0, CAPACITY, max_queue=1024, timeout_ms=2000, codel=False),
+            "read": RouteClass("read", 2, max(1, CAPACITY * 3 // 4), max_queue=128, timeout_ms=250),
+        })
+        app = AdmissionMiddleware(app, controller)
+
+    latencies = {"read": [], "submit": []}
+    statuses = {"read": {}, "submit": {}}
+
+    async def request(kind: str, scope: dict) -> None:
+        started = time.perf_counter()
+        status = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        await app(scope, None, send)
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+        statuses[kind][status[0]] = statuses[kind].get(status[0], 0) + 1
+
+    reads_per_second = READ_LOAD * CAPACITY * 1000 / SERVICE_MS
+    tasks = []
+    started = time.perf_counter()
+    reads = submits = 0
+    while (elapsed := time.perf_counter() - started) < SECONDS:
+        while reads < elapsed * reads_per_second:
+            tasks.append(asyncio.create_task(request("read", READ)))
+            reads += 1
+        while submits < elapsed * SUBMITS_PER_SECOND:
+            tasks.append(asyncio.create_task(request("submit", SUBMIT)))
+            submits += 1
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+
+    return {
+        "submit_p99_ms": round(percentile(latencies["submit"], 0.99), 2),
+        "submit_shed": sum(n for status, n in statuses["submit"].items() if status != 200),
+        "read_p99_ms": round(percentile(latencies["read"], 0.99), 2),
+        "reads_shed": statuses["read"].get(503, 0),
+        "reads": reads,
+    }
+
+
+def run() -> dict:
+    unshed = asyncio.run(scenario(shedding=False))
+    shed = asyncio.run(scenario(shedding=True))
+    metrics = {
+        "capacity_rps": round(CAPACITY * 1000 / SERVICE_MS),
+        "read_load": READ_LOAD,
+        **{f"fifo_{name}": value for name, value in unshed.items()},
+        **{f"shed_{name}": value for name, value in shed.items()},
+    }
+    check_budget("shed_submit_p99_ms", shed["submit_p99_ms"], budget("shed_submit_p99_ms", 50))
+    check_budget("shed_submits_shed", shed["submit_shed"], 0)
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
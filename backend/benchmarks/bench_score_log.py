@@ -0,0 +1,48 @@
+"""Score event log: cost of one submit's append, and sequential read rates."""
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from benchmarks import budget, check_budget
+
+RECORDS = int(os.getenv("BENCH_SCORE_LOG_RECORDS", "200000"))
+
+
+def run() -> dict:
+    from app.score_log import RECORD, ScoreEventLog, ScoreLogReader, encode
+
+    rng = random.Random(0)
+    users = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(1000)]
+    with tempfile.TemporaryDirectory() as directory:
+        log = ScoreEventLog(directory, segment_records=RECORDS // 4)
+        log.open()
+        started = time.perf_counter()
+        for i in range(RECORDS):
+            # One append per submit, as on the sync submit path
+            log.append([encode(str(uuid.UUID(int=i)), users[i % 1000], rng.randrange(5000), "walls")])
+        append_us = (time.perf_counter() - started) / RECORDS * 1e6
+        log.close()
+
+        reader = ScoreLogReader(directory)
+        started = time.perf_counter()
+        total = sum(score for _, chunk in reader.batches() for _, _, score, _, _ in RECORD.iter_unpack(chunk))
+        raw_s = time.perf_counter() - started
+        started = time.perf_counter()
+        decoded = sum(1 for _ in reader.scan())
+        decoded_s = time.perf_counter() - started
+    assert decoded == RECORDS and total > 0
+
+    metrics = {
+        "records": RECORDS,
+        "append_us": round(append_us, 2),
+        "raw_scan_records_per_s": round(RECORDS / raw_s),
+        "decoded_scan_records_per_s": round(RECORDS / decoded_s),
+    }
+    check_budget("score_log_append_us", append_us, budget("score_log_append_us", 50))
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
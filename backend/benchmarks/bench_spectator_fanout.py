@@ -0,0 +1,45 @@
+"""Spectator fan-out cost: publishing one update to many watchers of one game."""
+import os
+import random
+import time
+
+from benchmarks import budget, check_budget
+
+SUBSCRIBERS = int(os.getenv("BENCH_FANOUT_SUBSCRIBERS", "10000"))
+UPDATES = int(os.getenv("BENCH_FANOUT_UPDATES", "200"))
+
+
+def run() -> dict:
+    from app.game_logic import simulate_bot_game
+    from app.spectators import SpectatorHub
+
+    state, _ = simulate_bot_game("walls", random.Random(0), max_ticks=300)
+    full = state.to_game_state()
+    hub = SpectatorHub(max_queue=32, keyframe_interval=50)
+    hub.publish("p1", full)
+    subscribers = [hub.subscribe("p1") for _ in range(SUBSCRIBERS)]
+    fast = subscribers[: SUBSCRIBERS // 2]
+
+    started = time.perf_counter()
+    for i in range(UPDATES):
+        hub.publish("p1", full, delta={"head": full["snake"][0], "score": full["score"] + i})
+        # Half the watchers keep up; the other half never read and must stay bounded
+        for subscriber in fast:
+            subscriber.queue.clear()
+    elapsed = time.perf_counter() - started
+
+    ns_per_delivery = elapsed / (UPDATES * SUBSCRIBERS) * 1e9
+    stats = hub.stats()["perChannel"]["p1"]
+    metrics = {
+        "subscribers": SUBSCRIBERS,
+        "updates": UPDATES,
+        "ns_per_delivery": round(ns_per_delivery, 1),
+        "max_queued_frames": max(len(subscriber.queue) for subscriber in subscribers),
+        "drop_rate": stats["dropRate"],
+    }
+    check_budget("fanout_ns_per_delivery", ns_per_delivery, budget("fanout_ns_per_delivery", 2000))
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
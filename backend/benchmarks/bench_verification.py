@@ -0,0 +1,55 @@
+"""Score verification throughput: games replayed per second per core."""
+import asyncio
+import os
+import random
+import time
+
+from benchmarks import budget, check_budget
+
+GAMES = int(os.getenv("BENCH_VERIFY_GAMES", "500"))
+WORKERS = int(os.getenv("BENCH_VERIFY_WORKERS", str(os.cpu_count() or 1)))
+
+
+def run() -> dict:
+    from app.game_logic import simulate_bot_game
+    from app.verification import VerificationPipeline, verify_batch
+
+    rng = random.Random(0)
+    games = [simulate_bot_game("walls" if i % 2 else "pass-through", rng) for i in range(GAMES)]
+    jobs = [(str(i), state.score, state.mode, replay) for i, (state, replay) in enumerate(games)]
+    ticks = sum(replay["ticks"] for _, replay in games)
+
+    started = time.perf_counter()
+    outcomes = verify_batch(jobs)
+    single = time.perf_counter() - started
+    assert all(ok for _, ok, _ in outcomes)
+
+    async def pooled() -> float:
+        pipeline = VerificationPipeline(workers=WORKERS, batch_size=GAMES)
+        pipeline_jobs = [(entry_id, "bench", score, mode, "2024-11-28", replay)
+                         for entry_id, score, mode, replay in jobs]
+        try:
+            await pipeline.verify(pipeline_jobs[:WORKERS])  # start the workers
+            started = time.perf_counter()
+            await pipeline.verify(pipeline_jobs)
+            return time.perf_counter() - started
+        finally:
+            await pipeline.stop()
+
+    pool = asyncio.run(pooled())
+
+    ms_per_game = single / GAMES * 1000
+    metrics = {
+        "games": GAMES,
+        "mean_ticks": round(ticks / GAMES, 1),
+        "games_per_second_per_core": round(GAMES / single, 1),
+        "verify_ms_per_game": round(ms_per_game, 3),
+        "workers": WORKERS,
+        "pool_games_per_second": round(GAMES / pool, 1),
+    }
+    check_budget("verify_ms_per_game", ms_per_game, budget("verify_ms_per_game", 5))
+    return metrics
+
+
+if __name__ == "__main__":
+    print(run())
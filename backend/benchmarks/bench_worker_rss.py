@@ -0,0 +1,122 @@
+"""Per-worker memory with private leaderboard copies vs the shared snapshot.
+
+Seeds a SQLite database with BENCH_RSS_ENTRIES leaderboard entries, then runs
+BENCH_WORKERS uvicorn workers at once, twice: loading the in-memory
+leaderboard from the database ("private"), and in shared mode after the
+preload step, serving it from the mapped snapshot ("shared"). Once every
+worker is ready and has served a leaderboard page, RSS, PSS (RSS with shared
+pages divided between the processes mapping them) and private memory are read
+from /proc/<pid>/smaps_rollup while all workers are alive.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+from benchmarks import budget, check_budget
+from benchmarks.bench_cold_start import _free_port, _seed, _wait_for
+from benchmarks.importtime import BACKEND_DIR
+
+WORKERS = int(os.getenv("BENCH_WORKERS", "4"))
+ENTRIES = int(os.getenv("BENCH_RSS_ENTRIES", "50000"))
+
+
+def _memory_kb(pid: int) -> dict:
+    """Return Rss, Pss and private memory of process `pid` in kB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _rows(count: int) -> list[dict]:
+    return [
+        {"id": str(uuid.UUID(int=i + 1)), "username": f"player{i % 5000}", "score": (i * 7919) % 100000,
+         "mode": "walls" if i % 2 else "pass-through", "date": "2024-11-28"}
+        for i in range(count)
+    ]
+
+
+async def _seed_entries(database_url: str) -> None:
+    """Seed the sample data, then ENTRIES leaderboard entries."""
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.db_models import LeaderboardEntry
+
+    await _seed(database_url)
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.execute(insert(LeaderboardEntry), _rows(ENTRIES))
+    await engine.dispose()
+
+
+def measure(env: dict) -> list[dict]:
+    """Run WORKERS workers with `env` and return their memory reports once all are serving."""
+    ports = [_free_port() for _ in range(WORKERS)]
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+             "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env={**os.environ, **env},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+    try:
+        started = time.perf_counter()
+        for port in ports:
+            _wait_for(f"http://127.0.0.1:{port}/ready", started)
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/leaderboard?mode=walls&limit=100"):
+                pass
+        # Read every worker while all of them are alive, so PSS reflects the sharing
+        return [_memory_kb(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+def run() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite+aiosqlite:///{tmp}/bench.db"
+        asyncio.run(_seed_entries(database_url))
+        private = measure({"DATABASE_URL": database_url})
+        shared_dir = os.path.join(tmp, "shared")
+        shared_env = {"DATABASE_URL": database_url, "SHARED_DATA_DIR": shared_dir}
+        subprocess.run(
+            [sys.executable, "-m", "app.preload"], cwd=BACKEND_DIR, env={**os.environ, **shared_env},
+            stdout=subprocess.DEVNULL, check=True,
+        )
+        shared = measure(shared_env)
+
+    def summary(reports: list[dict], key: str) -> list[float]:
+        return [round(r[key] / 1024, 1) for r in reports]
+
+    metrics = {
+        "workers": WORKERS,
+        "entries": ENTRIES,
+        "private_rss_mb": summary(private, "rss"),
+        "private_pss_mb": summary(private, "pss"),
+        "private_private_mb": summary(private, "private"),
+        "shared_rss_mb": summary(shared, "rss"),
+        "shared_pss_mb": summary(shared, "pss"),
+        "shared_private_mb": summary(shared, "private"),
+    }
+    # What sharing saves per worker, against the private copies
+    saved = min(metrics["private_private_mb"]) - max(metrics["shared_private_mb"])
+    metrics["saved_private_mb"] = round(saved, 1)
+    check_budget(
+        "shared_private_mb", max(metrics["shared_private_mb"]), budget("shared_private_mb", 128)
+    )
+    return metrics
@@ -0,0 +1,41 @@
+"""Import-time profile report for `main`.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and prints
+the slowest modules by cumulative and self time.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def profile(module: str = "main") -> list[tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for every import made by `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(rows: list[tuple[str, int, int]], top: int = 20) -> str:
+    """Format the slowest imports as a plain-text table."""
+    total_us = max((cumulative for _, _, cumulative in rows), default=0)
+    lines = [f"total: {total_us / 1000:.1f} ms", "", "by cumulative time:"]
+    for name, _, cumulative in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        lines.append(f"  {cumulative / 1000:8.1f} ms  {name}")
+    lines += ["", "by self time:"]
+    for name, self_us, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        lines.append(f"  {self_us / 1000:8.1f} ms  {name}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(report(profile(sys.argv[1] if len(sys.argv) > 1 else "main")))
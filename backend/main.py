@@ -1,12 +1,99 @@
 """Main FastAPI application for Snake Arena Live API."""
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.config import (
+    ADMISSION_ENABLED, ARCHIVE_HORIZON_DAYS, CORS_ORIGINS, API_V1_PREFIX, EVENT_BUS, IDEMPOTENCY_ENABLED,
+    INGEST_MODE, LAZY_ROUTERS, LEADERBOARD_CHECKPOINT_DIR, QUERY_DEBUG_ENABLED, QUERY_STATS_ENABLED, REAPER_ENABLED, SCORE_LOG_DIR,
+    VERIFY_ENABLED
+)
+from app.lazy_routers import LazyRouterMiddleware, RouterLoader
+from app.warmup import warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the warm-up stages in the background while the server starts accepting probes."""
+    if EVENT_BUS != "memory":
+        from app import events
+        events.event_bus = events.create_event_bus(EVENT_BUS)
+        await events.event_bus.start()
+    if SCORE_LOG_DIR:
+        from app import score_log
+        score_log.score_log = score_log.ScoreEventLog()
+        score_log.score_log.open()
+    if IDEMPOTENCY_ENABLED:
+        from app import idempotency
+        idempotency.store = idempotency.IdempotencyStore()
+    # Leaderboard reads join these whether or not verification and archiving run
+    from app.database import create_leaderboard_tables
+    await create_leaderboard_tables()
+    if SCORE_LOG_DIR:
+        # Entries committed by a worker that died before appending them
+        from app.database import backfill_score_log
+        await backfill_score_log()
+    if INGEST_MODE == "write-behind":
+        # Replays the journal before warm-up loads the leaderboard from the DB
+        from app import ingest
+        ingest.ingestor = ingest.ScoreIngestor(ingest.commit_to_database)
+        await ingest.ingestor.start()
+    if VERIFY_ENABLED:
+        from app import verification
+        verification.pipeline = verification.VerificationPipeline()
+        await verification.pipeline.start()
+    if REAPER_ENABLED:
+        from app import reaper
+        reaper.reaper = reaper.ActivePlayerReaper()
+        await reaper.reaper.start()
+    if LEADERBOARD_CHECKPOINT_DIR:
+        # Warm-up restores the leaderboard from it; the worker holding its lock writes checkpoints
+        from app import checkpoint
+        checkpoint.checkpointer = checkpoint.LeaderboardCheckpointer()
+        await checkpoint.checkpointer.start()
+    if ARCHIVE_HORIZON_DAYS is not None:
+        from app import archive
+        archive.compactor = archive.ArchiveCompactor()
+        archive.compactor.start()
+    from app.game_states import game_states
+    await game_states.start()
+    task = asyncio.create_task(warmup.run())
+    yield
+    task.cancel()
+    if ARCHIVE_HORIZON_DAYS is not None:
+        await archive.compactor.stop()
+        archive.compactor = None
+    if LEADERBOARD_CHECKPOINT_DIR:
+        await checkpoint.checkpointer.stop()
+        checkpoint.checkpointer = None
+    await game_states.stop()
+    from app.arena import arena
+    await arena.stop()
+    if REAPER_ENABLED:
+        await reaper.reaper.stop()
+        reaper.reaper = None
+    if VERIFY_ENABLED:
+        await verification.pipeline.stop()
+        verification.pipeline = None
+    if EVENT_BUS != "memory":
+        await events.event_bus.stop()
+    if INGEST_MODE == "write-behind":
+        await ingest.ingestor.stop()
+        ingest.ingestor = None
+    if SCORE_LOG_DIR:
+        score_log.score_log.close()
+        score_log.score_log = None
+    if IDEMPOTENCY_ENABLED:
+        idempotency.store.close()
+        idempotency.store = None
 
-from app.config import CORS_ORIGINS, API_V1_PREFIX
-from app.routers import auth, leaderboard, players
 
 # Create FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="Snake Arena Live API",
     description="Backend API for the Snake Arena Live game application",
     version="1.0.0",
@@ -15,6 +102,16 @@ app = FastAPI(
     }
 )
 
+# Count the statements of each request for N+1 detection
+if QUERY_STATS_ENABLED:
+    from app.query_stats import QueryCountMiddleware
+    app.add_middleware(QueryCountMiddleware)
+
+# Shed low-priority requests first under overload (inside CORS, so 503s carry its headers)
+if ADMISSION_ENABLED:
+    from app.admission import AdmissionMiddleware
+    app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -24,17 +121,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create API v1 router
-from fastapi import APIRouter
-api_v1_router = APIRouter(prefix=API_V1_PREFIX)
-
-# Include routers
-api_v1_router.include_router(auth.router)
-api_v1_router.include_router(leaderboard.router)
-api_v1_router.include_router(players.router)
-
-# Add API v1 router to app
-app.include_router(api_v1_router)
+# Include API v1 routers, deferred until first use unless LAZY_ROUTERS is off
+router_loader = RouterLoader(app, API_V1_PREFIX, {
+    "/auth": "app.routers.auth",
+    "/leaderboard": "app.routers.leaderboard",
+    "/players": "app.routers.players",
+    "/arena": "app.routers.arena",
+})
+if LAZY_ROUTERS:
+    app.add_middleware(LazyRouterMiddleware, loader=router_loader)
+else:
+    router_loader.load_all()
 
 
 @app.get("/")
@@ -53,6 +150,73 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint. Returns 200 with per-stage timings only once warm-up has finished."""
+    report = warmup.report()
+    status_code = status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(report, status_code=status_code)
+
+
+@app.get("/stats/reads")
+async def read_stats():
+    """Coalescing and cache counters of the hot database reads in this worker."""
+    from app.database import game_state_reads, leaderboard_reads
+    return {"leaderboard": leaderboard_reads.report(), "gameState": game_state_reads.report()}
+
+
+@app.get("/stats/admission")
+async def admission_stats():
+    """Admitted, queued and shed requests per route class in this worker."""
+    from app.admission import admission
+    return admission.report()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Database statement latency, rows, slow queries and N+1 requests of this worker, for Prometheus."""
+    from app.query_stats import query_stats
+    return PlainTextResponse(query_stats.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/queries")
+async def query_debug():
+    """Per-function statement table, slow-query log with EXPLAIN plans and N+1 requests of this worker."""
+    # Statement text and plans describe the schema; hidden unless explicitly turned on
+    if not (QUERY_STATS_ENABLED and QUERY_DEBUG_ENABLED):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    from app.query_stats import query_stats
+    return query_stats.report()
+
+
+@app.get("/stats/idempotency")
+async def idempotency_stats():
+    """Idempotency-Key outcomes of submits in this worker."""
+    from app import idempotency
+    if idempotency.store is None:
+        return {"enabled": False}
+    return {"enabled": True, **idempotency.store.report()}
+
+
+@app.get("/stats/archive")
+async def archive_stats():
+    """Leaderboard archive compaction counters of this worker."""
+    from app import archive
+    if archive.compactor is None:
+        return {"enabled": False}
+    return {"enabled": True, **archive.compactor.report()}
+
+
+async def warm_openapi() -> None:
+    """Build the OpenAPI schema ahead of the first /docs request."""
+    app.openapi()
+
+
+# Deferred routers stay unloaded until a request needs them (loading them also drops the schema)
+if not LAZY_ROUTERS:
+    warmup.register("openapi", warm_openapi)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -1,37 +1,59 @@
 """Pytest configuration and fixtures."""
+import asyncio
+from datetime import datetime, UTC
+import os
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
+
+# Point the app at a throwaway database before app.config reads the environment
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/snake_arena_test.db")
+
 from main import app
-from app.database import (
-    users_db, email_to_user_id, username_to_user_id,
-    leaderboard_db, active_players_db, sessions_db,
-    initialize_sample_data
-)
-from app.auth import create_access_token, get_password_hash
+from app.database import async_session, engine, initialize_sample_data, sessions_db
+from app.db_models import ActivePlayer, Base
+from app.auth import create_access_token
+
+
+# Players in a game, for the spectator endpoints
+SAMPLE_ACTIVE_PLAYERS = [
+    {
+        "id": "ap1", "username": "SnakeMaster", "score": 120, "mode": "walls",
+        "game_state": {
+            "snake": [{"x": 10, "y": 10}, {"x": 9, "y": 10}, {"x": 8, "y": 10}],
+            "food": {"x": 15, "y": 12}, "direction": "RIGHT", "score": 120,
+        },
+    },
+    {
+        "id": "ap2", "username": "SpeedySnake", "score": 80, "mode": "pass-through",
+        "game_state": {
+            "snake": [{"x": 5, "y": 7}, {"x": 5, "y": 8}],
+            "food": {"x": 2, "y": 3}, "direction": "UP", "score": 80,
+        },
+    },
+]
+
+
+async def _reset_database() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        await initialize_sample_data(db)
+        started_at = datetime.now(UTC)
+        db.add_all(ActivePlayer(started_at=started_at, **player) for player in SAMPLE_ACTIVE_PLAYERS)
+        await db.commit()
+    # Connections belong to this event loop; the test client runs its own
+    await engine.dispose()
 
 
 @pytest.fixture(scope="function", autouse=True)
 def reset_database():
-    """Reset the database before each test."""
-    # Clear all databases
-    users_db.clear()
-    email_to_user_id.clear()
-    username_to_user_id.clear()
-    leaderboard_db.clear()
-    active_players_db.clear()
+    """Reset the database to the sample data before each test."""
     sessions_db.clear()
-    
-    # Reinitialize sample data
-    initialize_sample_data()
-    
+    asyncio.run(_reset_database())
     yield
-    
-    # Cleanup after test
-    users_db.clear()
-    email_to_user_id.clear()
-    username_to_user_id.clear()
-    leaderboard_db.clear()
-    active_players_db.clear()
     sessions_db.clear()
 
 
@@ -0,0 +1,71 @@
+"""Tests for the live-games index behind the active players list."""
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from app.active_index import ActivePlayerIndex, active_player_index
+from app.events import GAME_TICK, PLAYER_JOINED, PLAYER_LEFT, InProcessBus, connect_handlers
+from app.models import ActivePlayer, ActivePlayerSort
+
+START = datetime(2024, 11, 28, 15, 0, tzinfo=UTC)
+
+
+@pytest.fixture
+def index():
+    index = ActivePlayerIndex()
+    index.load([
+        ActivePlayer(id=f"p{i}", username=f"P{i}", score=i * 10, mode="walls" if i % 2 else "pass-through",
+                     startedAt=START + timedelta(minutes=i))
+        for i in range(10)
+    ])
+    return index
+
+
+def test_sorted_by_score_and_mode(index):
+    """Test that players come highest score first, optionally for one mode."""
+    players, _ = index.page()
+    assert [player.score for player in players] == [90, 80, 70, 60, 50, 40, 30, 20, 10, 0]
+    players, _ = index.page("walls")
+    assert [player.id for player in players] == ["p9", "p7", "p5", "p3", "p1"]
+
+
+def test_sorted_by_started_at(index):
+    """Test that sort=startedAt returns the most recent games first."""
+    players, _ = index.page(sort=ActivePlayerSort.STARTED_AT, limit=3)
+    assert [player.id for player in players] == ["p9", "p8", "p7"]
+
+
+def test_cursor_pages_stay_stable_across_updates(index):
+    """Test that a cursor resumes after the last player even when scores change in between."""
+    first, cursor = index.page(limit=4)
+    assert [player.id for player in first] == ["p9", "p8", "p7", "p6"]
+    index.update_score("p0", 1000)
+    index.remove("p5")
+    second, cursor = index.page(limit=4, cursor=cursor)
+    # p0 moved above the first page and p5 left
+    assert [player.id for player in second] == ["p4", "p3", "p2", "p1"]
+    assert cursor is None
+
+
+def test_invalid_cursor(index):
+    """Test that a malformed cursor raises ValueError."""
+    with pytest.raises(ValueError):
+        index.page(cursor="nope")
+
+
+def test_index_follows_player_events():
+    """Test that join, tick and leave events keep the index current."""
+    bus = InProcessBus()
+    connect_handlers(bus)
+    active_player_index.load([])
+    try:
+        state = {"snake": [{"x": 10, "y": 10}], "food": {"x": 1, "y": 1}, "direction": "RIGHT", "score": 0}
+        bus.publish(PLAYER_JOINED, {"id": "live1", "username": "L", "mode": "walls",
+                                    "startedAt": START.isoformat(), "gameState": state})
+        bus.publish(GAME_TICK, {"id": "live1", "gameState": {**state, "score": 30}})
+        players, _ = active_player_index.page()
+        assert [(player.id, player.score) for player in players] == [("live1", 30)]
+        bus.publish(PLAYER_LEFT, {"id": "live1"})
+        assert len(active_player_index) == 0
+    finally:
+        active_player_index.clear()
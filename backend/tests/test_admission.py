@@ -0,0 +1,125 @@
+"""Tests for priority-aware admission control."""
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionMiddleware, RouteClass, Shed
+
+
+def test_classify_routes():
+    """Test that routes map to their class and streams and health checks are left alone."""
+    controller = AdmissionController()
+    assert controller.classify("POST", "/api/v1/leaderboard/submit").name == "critical"
+    assert controller.classify("PATCH", "/api/v1/players/p1/game-state").name == "critical"
+    assert controller.classify("GET", "/api/v1/players/p1/game-state").name == "read"
+    assert controller.classify("POST", "/api/v1/auth/login").name == "auth"
+    assert controller.classify("GET", "/api/v1/players/active").name == "read"
+    # Other state changes are writes whatever their path
+    assert controller.classify("POST", "/api/v1/arena/rooms").name == "write"
+    assert controller.classify("GET", "/api/v1/arena/rooms").name == "read"
+    assert controller.classify("POST", "/api/v1/auth/logout").name == "write"
+    assert controller.classify("DELETE", "/api/v1/leaderboard/distribution").name == "write"
+    assert controller.classify("GET", "/api/v1/players/p1/watch") is None
+    assert controller.classify("GET", "/api/v1/leaderboard/stream") is None
+    assert controller.classify("GET", "/health") is None
+
+
+def test_slots_are_handed_to_waiters_in_order():
+    """Test that requests over the limit queue and get freed slots first come, first served."""
+    async def main():
+        route_class = RouteClass("read", 2, limit=1, max_queue=10, timeout_ms=1000)
+        await route_class.acquire()
+        order = []
+
+        async def request(name):
+            await route_class.acquire()
+            order.append(name)
+
+        waiting = [asyncio.create_task(request(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert len(route_class.waiters) == 3
+        for _ in range(3):
+            route_class.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiting)
+        assert order == ["a", "b", "c"]
+        route_class.release()
+        assert route_class.active == 0
+    asyncio.run(main())
+
+
+def test_full_queue_and_timeouts_shed():
+    """Test that arrivals beyond the queue bound or past their deadline are shed."""
+    async def main():
+        route_class = RouteClass("read", 2, limit=1, max_queue=1, timeout_ms=10)
+        await route_class.acquire()
+        waiter = asyncio.create_task(route_class.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Shed) as shed:
+            await route_class.acquire()
+        assert shed.value.reason == "shedQueueFull"
+        with pytest.raises(Shed) as shed:
+            await waiter
+        assert shed.value.reason == "shedTimeout"
+        assert not route_class.waiters and route_class.active == 1
+    asyncio.run(main())
+
+
+def test_standing_queue_shortens_the_deadline():
+    """Test that CoDel marks a class overloaded after an interval whose shortest wait was above target."""
+    now = [0.0]
+    route_class = RouteClass("read", 2, limit=1, max_queue=10, timeout_ms=1000,
+                             target_ms=5, interval_ms=100, clock=lambda: now[0])
+    route_class._record(0.020)
+    route_class._record(0.010)
+    assert route_class.deadline() == 1.0
+    now[0] = 0.1
+    assert route_class.overloaded and route_class.deadline() == 0.005
+    # One wait under target in the next interval ends it
+    route_class._record(0.001)
+    now[0] = 0.2
+    assert not route_class.overloaded
+    # Critical classes keep queueing up to their timeout
+    critical = RouteClass("critical", 0, limit=1, max_queue=10, timeout_ms=2000, codel=False, clock=lambda: now[0])
+    critical._overloaded = True
+    assert critical.deadline() == 2.0
+
+
+def test_lower_priorities_shed_while_a_higher_one_is_overloaded():
+    """Test that reads that would queue are shed at once while submits are overloaded, then get 503."""
+    async def main():
+        controller = AdmissionController({
+            "critical": RouteClass("critical", 0, limit=10, max_queue=10, timeout_ms=1000, codel=False),
+            "read": RouteClass("read", 2, limit=1, max_queue=10, timeout_ms=1000, retry_after=3),
+        })
+        controller.classes["critical"]._overloaded = True
+        controller.classes["critical"]._interval_end = float("inf")
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        middleware = AdmissionMiddleware(app, controller)
+        sent = {}
+
+        def collect(name):
+            async def send(message):
+                sent.setdefault(name, []).append(message)
+            return send
+
+        scope = {"type": "http", "method": "GET", "path": "/api/v1/players/active"}
+        first = asyncio.create_task(middleware(scope, None, collect("first")))
+        await asyncio.sleep(0)
+        # The read slot is taken and submits are overloaded: shed without queueing
+        await middleware(scope, None, collect("second"))
+        start = sent["second"][0]
+        assert start["status"] == 503
+        assert (b"retry-after", b"3") in start["headers"]
+        assert controller.report()["read"]["shedPriority"] == 1
+        release.set()
+        await first
+        assert sent["first"][0]["status"] == 200
+        assert controller.classes["read"].active == 0
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""Tests for the leaderboard archive partitions."""
+import asyncio
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import delete, func, insert, select
+
+from app import database
+from app.archive import (
+    ArchiveCompactor, archive_partitions, archived_checksum, archived_count_at_least, compact_batch,
+    decode_partition, encode_partition, merge_rows, partition_row
+)
+from app.database import async_session, get_leaderboard
+from app.db_models import LeaderboardEntry as DBLeaderboardEntry
+from app.verification import PENDING, REJECTED, VERIFIED, verifications
+
+
+ROWS = [
+    ("a", "ProGamer", 1200, "walls", "2024-01-03"),
+    ("b", "Snäke", 3400, "walls", "2024-01-01"),
+    ("c", "Viper", 800, "walls", "2024-02-11"),
+]
+
+
+def test_partition_round_trip():
+    """Test that a partition decodes to its rows, best score first, and its header summarises them."""
+    row = partition_row("walls", ROWS)
+    assert decode_partition(row["data"], "walls") == sorted(ROWS, key=lambda r: r[2], reverse=True)
+    assert (row["first_date"], row["last_date"]) == ("2024-01-01", "2024-02-11")
+    assert (row["entry_count"], row["score_sum"]) == (3, 5400)
+    assert (row["min_score"], row["max_score"]) == (800, 3400)
+
+
+def test_partition_is_compressed():
+    """Test that repetitive partitions take much less space than their JSON."""
+    rows = [(f"id-{i:06d}", f"player{i % 50}", i % 5000, "walls", "2024-01-01") for i in range(5000)]
+    assert len(encode_partition(rows)) < 5000 * 10
+
+
+def test_merge_rows_keeps_score_order():
+    """Test that the hot rows and several partitions merge into one list sorted by score."""
+    hot = [("h1", "A", 900, "walls", "2025-01-01"), ("h2", "B", 300, "walls", "2025-01-02")]
+    first = decode_partition(encode_partition(ROWS), "walls")
+    second = [("d", "C", 500, "walls", "2023-05-05")]
+    assert [row[2] for row in merge_rows(hot, first, second)] == [3400, 1200, 900, 800, 500, 300]
+
+
+def test_cutoff_is_the_horizon_day():
+    """Test that the compactor archives entries dated before today minus the horizon."""
+    compactor = ArchiveCompactor(horizon_days=30)
+    expected = (datetime.now(UTC) - timedelta(days=30)).strftime("%Y-%m-%d")
+    assert compactor.cutoff() == expected
+    assert compactor.report()["lastRunMs"] is None
+
+
+# (id, score, mode, date, verification status)
+ENTRIES = [
+    ("top1", 1000, "walls", "2024-01-01", None),
+    ("top2", 900, "walls", "2024-01-02", None),
+    ("old1", 800, "walls", "2024-01-03", None),
+    ("old2", 700, "walls", "2024-01-04", VERIFIED),
+    ("old3", 650, "walls", "2024-01-05", None),
+    ("new1", 600, "walls", "2024-07-01", None),
+    ("pending", 500, "walls", "2024-01-06", PENDING),
+    ("rejected", 400, "walls", "2024-01-07", REJECTED),
+    ("other", 300, "pass-through", "2024-01-01", None),
+]
+
+
+def test_compaction_and_merged_reads(monkeypatch):
+    """Test that compaction moves only settled old entries below the top, and reads merge them back in rank order."""
+    monkeypatch.setattr(database, "ARCHIVE_KEEP_TOP", 2)
+
+    async def main():
+        async with async_session() as db:
+            await db.execute(delete(DBLeaderboardEntry))
+            await db.execute(insert(DBLeaderboardEntry), [
+                {"id": entry_id, "username": "SnakeMaster", "score": score, "mode": mode, "date": day}
+                for entry_id, score, mode, day, _ in ENTRIES
+            ])
+            await db.execute(insert(verifications), [
+                {"entry_id": entry_id, "status": status, "reason": None, "replay": None,
+                 "updated_at": datetime.now(UTC)}
+                for entry_id, _, _, _, status in ENTRIES if status is not None
+            ])
+            await db.commit()
+        moved = []
+        async with async_session() as db:
+            moved.append(await compact_batch(db, "walls", "2024-06-01", keep_top=2, batch_size=2))
+        async with async_session() as db:
+            moved.append(await compact_batch(db, "walls", "2024-06-01", keep_top=2, batch_size=2))
+        async with async_session() as db:
+            moved.append(await compact_batch(db, "walls", "2024-06-01", keep_top=2, batch_size=2))
+        async with async_session() as db:
+            hot = set((await db.execute(select(DBLeaderboardEntry.id))).scalars().all())
+            statuses = dict((await db.execute(select(verifications.c.entry_id, verifications.c.status))).all())
+            partitions = await db.scalar(select(func.count()).select_from(archive_partitions))
+            checksum = await archived_checksum(db)
+            at_least = await archived_count_at_least(db, "walls", 700)
+            top = await get_leaderboard(db, "walls", 2)
+            page = await get_leaderboard(db, "walls", 4)
+            everything = await get_leaderboard(db, "walls")
+            all_modes = await get_leaderboard(db)
+        return moved, hot, statuses, partitions, checksum, at_least, top, page, everything, all_modes
+    moved, hot, statuses, partitions, checksum, at_least, top, page, everything, all_modes = asyncio.run(main())
+
+    # Oldest first, in batches; the top 2, new, unsettled and other-mode entries stay hot
+    assert moved == [2, 1, 0]
+    assert hot == {"top1", "top2", "new1", "pending", "rejected", "other"}
+    # The archived entry's verification went with it
+    assert "old2" not in statuses and statuses["pending"] == PENDING
+    assert partitions == 2
+    assert checksum == {"walls": (3, 2150)}
+    assert at_least == 2
+    # The top of the hot table needs no archive; longer reads merge it back in by score
+    assert [entry.id for entry in top] == ["top1", "top2"]
+    assert [entry.id for entry in page] == ["top1", "top2", "old1", "old2"]
+    assert [entry.id for entry in everything] == ["top1", "top2", "old1", "old2", "old3", "new1", "pending"]
+    assert [entry.score for entry in all_modes] == sorted((entry.score for entry in all_modes), reverse=True)
+    assert len(all_modes) == 8
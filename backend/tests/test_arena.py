@@ -0,0 +1,178 @@
+"""Tests for the multiplayer arena room engine."""
+import asyncio
+from collections import deque
+import random
+
+import pytest
+
+import app.arena as arena_module
+from app.arena import ArenaManager, ArenaRoom, ArenaSnake, ArenaUnavailable, TooManyRooms
+from app.spectators import SpectatorHub
+
+
+def place(room, player_id, segments, direction="RIGHT"):
+    """Put a snake on given (x, y) segments, head first."""
+    body = deque(room._cell(x, y) for x, y in segments)
+    for cell in body:
+        room._occupy(cell)
+    room.snakes[player_id] = ArenaSnake(player_id, player_id.upper(), body, direction)
+    return room.snakes[player_id]
+
+
+def empty_room(mode="walls", size=16):
+    return ArenaRoom("r1", mode, size, food_count=0, seed=1)
+
+
+def test_move_and_eat():
+    """Test that snakes move forward and grow and score when they eat."""
+    room = empty_room()
+    snake = place(room, "a", [(5, 5), (4, 5), (3, 5)])
+    room.food.add(room._cell(6, 5))
+    delta = room.tick()
+    assert delta["moves"] == [["a", 6, 5, True]]
+    assert len(snake.body) == 4 and snake.score == 10
+    # The eaten food respawned elsewhere
+    assert len(room.food) == 1 and len(delta["food"]) == 1
+    room.food.clear()
+    room.tick()
+    assert [room._position(cell) for cell in snake.body][0] == {"x": 7, "y": 5}
+    assert len(snake.body) == 4
+
+
+def test_head_into_body_kills_only_the_mover():
+    """Test that running into another snake's body kills the runner, not the other snake."""
+    room = empty_room()
+    mover = place(room, "a", [(5, 4), (4, 4), (3, 4)], "DOWN")
+    wall = place(room, "b", [(6, 5), (5, 5), (4, 5)], "RIGHT")
+    delta = room.tick()
+    assert delta["died"] == ["a"]
+    assert not mover.alive and wall.alive
+    assert sum(room.cells) == len(wall.body)
+
+
+def test_head_on_collision_kills_both():
+    """Test that heads entering the same cell both die."""
+    room = empty_room()
+    place(room, "a", [(4, 5), (3, 5), (2, 5)], "RIGHT")
+    place(room, "b", [(6, 5), (7, 5), (8, 5)], "LEFT")
+    delta = room.tick()
+    assert sorted(delta["died"]) == ["a", "b"]
+    assert sum(room.cells) == 0
+
+
+def test_following_a_tail_is_safe():
+    """Test that a head may enter the cell another snake's tail leaves this tick."""
+    room = empty_room()
+    place(room, "a", [(6, 5), (5, 5), (4, 5)], "RIGHT")
+    follower = place(room, "b", [(3, 5), (2, 5), (1, 5)], "RIGHT")
+    room.tick()
+    assert follower.alive
+    assert room.snakes["a"].alive
+
+
+def test_walls_and_wrap():
+    """Test that leaving the grid kills in walls mode and wraps in pass-through mode."""
+    walls = empty_room("walls")
+    place(walls, "a", [(15, 5), (14, 5), (13, 5)])
+    assert walls.tick()["died"] == ["a"]
+    wrap = empty_room("pass-through")
+    snake = place(wrap, "a", [(15, 5), (14, 5), (13, 5)])
+    wrap.tick()
+    assert snake.alive and wrap._position(snake.body[0]) == {"x": 0, "y": 5}
+
+
+def test_reversing_is_ignored():
+    """Test that a requested reversal keeps the current direction."""
+    room = empty_room()
+    snake = place(room, "a", [(5, 5), (4, 5), (3, 5)])
+    room.change_direction("a", "LEFT")
+    room.tick()
+    assert snake.alive and snake.direction == "RIGHT"
+    room.change_direction("a", "UP")
+    room.tick()
+    assert room._position(snake.body[0]) == {"x": 6, "y": 4}
+
+
+def test_occupancy_grid_stays_consistent():
+    """Test that the shared grid always counts exactly the live segments over a long random game."""
+    room = ArenaRoom("r1", "walls", 32, food_count=16, seed=3)
+    rng = random.Random(3)
+    for i in range(40):
+        room.join(f"p{i}", f"P{i}")
+    for _ in range(300):
+        for player_id, snake in list(room.snakes.items()):
+            if not snake.alive:
+                room.join(player_id, player_id)
+            elif rng.random() < 0.3:
+                room.change_direction(player_id, rng.choice(["UP", "DOWN", "LEFT", "RIGHT"]))
+        room.tick()
+        expected = bytearray(len(room.cells))
+        for snake in room.snakes.values():
+            for cell in snake.body:
+                expected[cell] += 1
+        assert room.cells == expected
+        assert max(room.cells) <= 1
+        assert not any(room.cells[cell] for cell in room.food)
+        # Free means neither snake nor food
+        assert len(room.free) == len(room.cells) - sum(room.cells) - len(room.food)
+        assert all((cell in room.free) == (not room.cells[cell] and cell not in room.food)
+                   for cell in range(len(room.cells)))
+
+
+def test_spawning_on_food_moves_the_food():
+    """Test that food under a new snake respawns elsewhere instead of vanishing."""
+    room = ArenaRoom("r1", "walls", 16, food_count=0, seed=1)
+    room.food.update(range(len(room.cells)))
+    for cell in room.food:
+        room.free.occupy(cell)
+    # Leave a few free cells for the displaced food
+    for cell in range(8):
+        room.food.discard(cell)
+        room.free.release(cell)
+    before = len(room.food)
+    snake = room.join("a", "A")
+    assert len(room.food) == before
+    assert not any(cell in room.food for cell in snake.body)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_room_limits_and_idle_expiry():
+    """Test the per-user and per-worker room caps and that rooms with no live snake are closed."""
+    clock = Clock()
+    hub = SpectatorHub()
+    manager = ArenaManager(hub=hub, max_rooms=3, max_rooms_per_user=2, idle_seconds=60, clock=clock)
+
+    async def main():
+        first = manager.create("walls", 16, "u1")
+        manager.create("walls", 16, "u1")
+        with pytest.raises(TooManyRooms):
+            manager.create("walls", 16, "u1")
+        busy = manager.create("walls", 16, "u2")
+        with pytest.raises(TooManyRooms):
+            manager.create("walls", 16, "u3")
+        busy.join("p1", "P1")
+        hub.publish(manager.channel_id(first.room_id), first.state())
+        clock.now = 59
+        manager.tick()
+        assert len(manager.rooms) == 3
+        clock.now = 60
+        manager.tick()
+        assert list(manager.rooms) == [busy.room_id]
+        assert manager.channel_id(first.room_id) not in hub.channels
+        assert manager.report()["expired"] == 2
+        await manager.stop()
+    asyncio.run(main())
+
+
+def test_rooms_need_a_single_worker(monkeypatch):
+    """Test that rooms can't be opened when requests are spread over several workers."""
+    monkeypatch.setattr(arena_module, "WORKERS", 4)
+    with pytest.raises(ArenaUnavailable):
+        ArenaManager().create("walls")
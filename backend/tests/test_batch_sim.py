@@ -0,0 +1,74 @@
+"""Tests for the NumPy batch simulator."""
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.batch_sim import DIRECTION_CODES, NO_MOVE, BatchSimulator, verify_replays
+from app.game_logic import FOOD_POINTS, simulate_bot_game
+from app.models import GameState
+from app.verification import replay_game
+
+
+def test_game_states_match_model():
+    """Test that every simulated game serializes as a valid GameState."""
+    sim = BatchSimulator(50, "walls", seed=1)
+    sim.run(200)
+    for state in sim.game_states():
+        GameState.model_validate(state)
+
+
+def test_bot_games_stay_consistent():
+    """Test that occupancy grids and lengths agree after many steps in both modes."""
+    for mode in ("walls", "pass-through"):
+        sim = BatchSimulator(100, mode, seed=2)
+        sim.run(300)
+        assert (sim.grid.sum(axis=(1, 2)) == sim.length).all()
+        assert (sim.score == (sim.length - 3) * FOOD_POINTS).all()
+        assert sim.score.max() > 0
+        for game in range(sim.count):
+            assert len({tuple(segment) for segment in sim.snake(game).tolist()}) == sim.length[game]
+
+
+def test_walls_kill_and_pass_through_wraps():
+    """Test that running right hits the wall in walls mode and wraps in pass-through mode."""
+    walls = BatchSimulator(1, "walls", seed=3)
+    wrap = BatchSimulator(1, "pass-through", seed=3)
+    for sim in (walls, wrap):
+        sim.food[:] = (0, 0)
+        for _ in range(20):
+            sim.step()
+    assert walls.game_over[0]
+    assert not wrap.game_over[0]
+    assert wrap.snake(0)[0].tolist() == [10, 10]
+
+
+def test_reverse_direction_is_ignored():
+    """Test that requesting the opposite direction keeps the snake going."""
+    sim = BatchSimulator(2, "walls", seed=4)
+    sim.change_direction(np.array([DIRECTION_CODES["LEFT"], NO_MOVE], dtype=np.int8))
+    assert (sim.direction == DIRECTION_CODES["RIGHT"]).all()
+
+
+def test_verify_replays_matches_scalar_replay():
+    """Test that batch verification agrees with the scalar replay on honest and tampered games."""
+    rng = random.Random(5)
+    for mode in ("walls", "pass-through"):
+        scores, replays = [], []
+        for i in range(40):
+            state, replay = simulate_bot_game(mode, rng, max_ticks=400)
+            score = state.score
+            if i % 4 == 1:
+                score += FOOD_POINTS
+            elif i % 4 == 2 and len(replay["foods"]) > 1:
+                replay["foods"][1] = replay["foods"][0]
+            elif i % 4 == 3:
+                replay["ticks"] += 5
+            scores.append(score)
+            replays.append(replay)
+
+        batch = verify_replays(mode, scores, replays)
+        scalar = [replay_game(score, mode, replay) for score, replay in zip(scores, replays)]
+        assert [ok for ok, _ in batch] == [ok for ok, _ in scalar]
+        assert any(ok for ok, _ in batch) and not all(ok for ok, _ in batch)
@@ -0,0 +1,109 @@
+"""Tests for the bulk import readers, row validators and import."""
+import asyncio
+import io
+
+from sqlalchemy import select
+
+from app import score_log
+from app.bulk_import import (
+    UNKNOWN_USER_ID, chunked, generate_entries, generate_users, import_rows, leaderboard_validator, read_rows,
+    user_validator
+)
+from app.database import async_session, get_user_by_username
+from app.db_models import LeaderboardEntry as DBLeaderboardEntry
+from app.models import ExportFormat
+from app.verification import PENDING, verifications
+
+REPLAY = {"ticks": 1, "moves": [], "foods": [{"x": 3, "y": 3}]}
+
+
+def test_leaderboard_validator_accepts_and_maps_row():
+    """Test that a valid row gets an id and maps to table columns."""
+    validator = leaderboard_validator()
+    columns = validator.validate(1, {"username": "ProGamer", "score": 3200, "mode": "walls", "date": "2024-11-28"})
+
+    assert columns["username"] == "ProGamer"
+    assert columns["mode"] == "walls"
+    assert columns["id"]
+    assert validator.errors == []
+
+
+def test_leaderboard_validator_records_errors():
+    """Test that invalid rows are rejected with their line number."""
+    validator = leaderboard_validator()
+
+    assert validator.validate(1, {"username": "X", "score": -5, "mode": "walls", "date": "2024-11-28"}) is None
+    assert validator.validate(2, {"username": "X", "score": 5, "mode": "nope", "date": "2024-11-28"}) is None
+    assert validator.validate(3, {"username": "X", "score": 5, "mode": "walls", "date": "28/11/2024"}) is None
+    assert validator.validate(4, "not json") is None
+    assert [line for line, _ in validator.errors] == [1, 2, 3, 4]
+
+
+def test_user_validator_requires_password_hash():
+    """Test that user rows need a password hash and a valid email."""
+    validator = user_validator()
+
+    assert validator.validate(1, {"username": "A", "email": "a@example.com"}) is None
+    assert validator.validate(2, {"username": "B", "email": "nope", "password_hash": "h"}) is None
+    columns = validator.validate(3, {"username": "C", "email": "c@example.com", "password_hash": "h"})
+    assert columns["high_score"] == 0
+    assert columns["password_hash"] == "h"
+    assert len(validator.errors) == 2
+
+
+def test_read_rows_ndjson_and_csv():
+    """Test that both formats yield rows with source line numbers."""
+    ndjson = io.StringIO('{"username": "A"}\n\n{"username": "B"}\nbroken\n')
+    assert list(read_rows(ndjson, ExportFormat.NDJSON)) == [
+        (1, {"username": "A"}), (3, {"username": "B"}), (4, "broken\n")
+    ]
+
+    text = io.StringIO("username,score,mode,date\nA,10,walls,2024-11-28\nB,,walls,2024-11-28\n")
+    rows = list(read_rows(text, ExportFormat.CSV))
+    assert rows[0] == (2, {"username": "A", "score": "10", "mode": "walls", "date": "2024-11-28"})
+    assert "score" not in rows[1][1]
+
+
+def test_chunked():
+    """Test chunking of an iterator."""
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_generated_seed_rows_validate():
+    """Test that generated seed rows pass validation."""
+    users, entries = user_validator(), leaderboard_validator()
+
+    assert all(users.validate(line, row) for line, row in generate_users(20))
+    assert all(entries.validate(line, row) for line, row in generate_entries(200, users=20))
+
+
+def test_import_goes_through_verification_and_score_log(tmp_path):
+    """Test that imported entries get pending verifications, score log records and high scores."""
+    rows = [
+        (1, {"username": "SnakeMaster", "score": 9000, "mode": "walls", "date": "2024-11-28", "replay": REPLAY}),
+        (2, {"username": "Nobody", "score": 50, "mode": "walls", "date": "2024-11-28"}),
+        (3, {"username": "SnakeMaster", "score": 10, "mode": "walls", "date": "2024-11-28", "replay": {"ticks": 1}}),
+    ]
+    score_log.score_log = score_log.ScoreEventLog(str(tmp_path))
+    score_log.score_log.open()
+
+    async def main():
+        async with async_session() as db:
+            report = await import_rows(db, DBLeaderboardEntry.__table__, rows, leaderboard_validator())
+            statuses = (await db.execute(select(verifications.c.status))).scalars().all()
+            user = await get_user_by_username(db, "SnakeMaster")
+            pending = (await db.execute(select(score_log.pending))).all()
+        return report, statuses, user, pending
+    try:
+        report, statuses, user, pending = asyncio.run(main())
+    finally:
+        score_log.score_log.close()
+        score_log.score_log = None
+
+    assert report["inserted"] == 2 and [line for line, _ in report["errors"]] == [3]
+    assert statuses == [PENDING]
+    assert user["highScore"] == 9000
+    events = list(score_log.ScoreLogReader(str(tmp_path)).scan())
+    assert [(event.user_id, event.score) for event in events] == [(user["id"], 9000), (UNKNOWN_USER_ID, 50)]
+    # Appended, so nothing is left for a backfill
+    assert pending == []
@@ -0,0 +1,118 @@
+"""Tests for the leaderboard checkpoint and tail log."""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from app import events
+from app.checkpoint import (
+    LeaderboardCheckpointer, checkpoint_sections, load_checkpoint, store_checksum, write_checkpoint
+)
+from app.leaderboard_store import LeaderboardStore
+
+
+def _id(n: int) -> str:
+    return str(uuid.UUID(int=n))
+
+
+def _store() -> LeaderboardStore:
+    store = LeaderboardStore()
+    store.load([
+        (_id(1), "ProGamer", 3200, "walls", "2024-11-28"),
+        (_id(2), "Snäke", 2450, "walls", "2024-11-27"),
+        (_id(3), "ProGamer", 2800, "pass-through", "2024-11-28"),
+    ])
+    return store
+
+
+def _rows(store: LeaderboardStore) -> list:
+    return [entry.model_dump() for entry in store.entries()]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    """Test that a checkpoint restores the columns, usernames and histograms exactly."""
+    store = _store()
+    path = str(tmp_path / "leaderboard.7.ckpt")
+    write_checkpoint(path, 7, checkpoint_sections(store))
+
+    restored = LeaderboardStore()
+    assert load_checkpoint(path, restored) == 7
+    assert restored.loaded
+    assert _rows(restored) == _rows(store)
+    assert restored.usernames == store.usernames
+    for mode, histogram in store.histograms.items():
+        assert restored.histograms[mode].tree == histogram.tree
+    assert store_checksum(restored) == {"walls": (2, 5650), "pass-through": (1, 2800)}
+    # Still a working store
+    assert restored.add(_id(4), "New", 3000, "walls", "2024-11-29") == 2
+
+
+def test_corrupt_checkpoint_is_rejected(tmp_path):
+    """Test that a checkpoint whose bytes changed fails its CRC check."""
+    path = str(tmp_path / "leaderboard.1.ckpt")
+    write_checkpoint(path, 1, checkpoint_sections(_store()))
+    with open(path, "r+b") as f:
+        f.seek(40)
+        byte = f.read(1)
+        f.seek(40)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    with pytest.raises(ValueError):
+        load_checkpoint(path, LeaderboardStore())
+
+
+def test_restore_replays_the_tail_log(tmp_path, monkeypatch):
+    """Test that changes after a checkpoint are logged, replayed on restore and folded into the next checkpoint."""
+    monkeypatch.setattr(events, "event_bus", events.InProcessBus())
+    directory = str(tmp_path)
+
+    async def main():
+        store = _store()
+        owner = LeaderboardCheckpointer(directory, interval=3600)
+        await owner.start()
+        other = LeaderboardCheckpointer(directory)
+        await other.start()
+        assert owner.owner and not other.owner
+
+        owner.resume(store, restored=False)
+        assert sorted(os.listdir(directory)) == ["checkpoint.lock", "leaderboard.1.ckpt", "leaderboard.1.log"]
+        store.add(_id(4), "New", 3000, "walls", "2024-11-29")
+        events.event_bus.publish(events.LEADERBOARD_CHANGED, events.leaderboard_change(
+            "add", _id(4), "New", 3000, "walls", "2024-11-29"
+        ))
+        store.remove(_id(3), 2800, "pass-through")
+        events.event_bus.publish(events.LEADERBOARD_CHANGED, events.leaderboard_change(
+            "remove", _id(3), "ProGamer", 2800, "pass-through", "2024-11-28"
+        ))
+        # A torn final line from a crash is ignored
+        with open(owner.path(1, "log"), "a") as f:
+            f.write('{"op":"add","entr')
+
+        restored = LeaderboardStore()
+        assert other.restore(restored)
+        assert other.stats["replayed"] == 2 and other.generation == 1
+        assert _rows(restored) == _rows(store)
+
+        await owner.checkpoint()
+        assert sorted(os.listdir(directory)) == ["checkpoint.lock", "leaderboard.2.ckpt", "leaderboard.2.log"]
+        restored = LeaderboardStore()
+        assert other.restore(restored) and other.stats["replayed"] == 0
+        assert _rows(restored) == _rows(store)
+
+        await owner.stop()
+        await other.stop()
+        assert not events.event_bus.handlers[events.LEADERBOARD_CHANGED]
+    asyncio.run(main())
+
+
+def test_restore_without_checkpoint(tmp_path):
+    """Test that an empty directory has nothing to restore, and a new owner numbers past stale files."""
+    async def main():
+        checkpointer = LeaderboardCheckpointer(str(tmp_path))
+        await checkpointer.start()
+        assert not checkpointer.restore(LeaderboardStore())
+        (tmp_path / "leaderboard.5.log").write_text("")
+        checkpointer.resume(_store(), restored=False)
+        assert (tmp_path / "leaderboard.6.ckpt").exists() and not (tmp_path / "leaderboard.5.log").exists()
+        await checkpointer.stop()
+    asyncio.run(main())
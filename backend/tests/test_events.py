@@ -0,0 +1,194 @@
+"""Tests for the event bus."""
+import asyncio
+import os
+import socket
+import uuid
+
+from app import events
+from app.events import Event, InProcessBus, LeaderboardResync, UnixSocketBus, connect_handlers, leaderboard_change
+from app.leaderboard_store import LeaderboardStore, leaderboard_store
+from app.spectators import spectator_hub
+
+
+def test_in_process_delivery_and_remote_only():
+    """Test that local events reach normal handlers but skip remote-only ones."""
+    bus = InProcessBus()
+    seen, remote = [], []
+    unsubscribe = bus.subscribe("t", lambda event: seen.append(event.payload))
+    bus.subscribe("t", lambda event: remote.append(event.payload), remote_only=True)
+
+    bus.publish("t", {"n": 1})
+    unsubscribe()
+    bus.publish("t", {"n": 2})
+
+    assert seen == [{"n": 1}]
+    assert remote == []
+
+
+def test_failing_handler_does_not_stop_delivery():
+    """Test that one handler raising does not keep the others from running."""
+    bus = InProcessBus()
+    seen = []
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    bus.subscribe("t", broken)
+    bus.subscribe("t", lambda event: seen.append(event.topic))
+    bus.publish("t", {})
+    assert seen == ["t"]
+    assert bus.report()["handlerErrors"] == 1
+
+
+def test_unix_socket_bus_delivers_to_other_workers(tmp_path):
+    """Test that an event published by one worker reaches the other worker's handlers."""
+    directory = str(tmp_path)
+
+    async def scenario():
+        first = UnixSocketBus(directory, name="w1")
+        second = UnixSocketBus(directory, name="w2")
+        await first.start()
+        await second.start()
+        received = []
+        second.subscribe(events.GAME_TICK, lambda event: received.append((event.origin, event.local, event.payload)))
+        first.publish(events.GAME_TICK, {"id": "p1", "score": 10})
+        for _ in range(50):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        await first.stop()
+        await second.stop()
+        return received
+
+    received = asyncio.run(scenario())
+    assert received == [("w1", False, {"id": "p1", "score": 10})]
+    assert os.listdir(directory) == []
+
+
+def test_unix_socket_bus_forgets_dead_workers(tmp_path):
+    """Test that sockets left behind by exited workers are removed."""
+    directory = str(tmp_path)
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    stale.bind(os.path.join(directory, "dead.sock"))
+    stale.close()
+
+    async def scenario():
+        bus = UnixSocketBus(directory, name="w1")
+        await bus.start()
+        bus.publish(events.PLAYER_LEFT, {"id": "p1"})
+        await bus.stop()
+
+    asyncio.run(scenario())
+    assert not os.path.exists(os.path.join(directory, "dead.sock"))
+
+
+def test_default_handlers():
+    """Test that bus events update the spectator hub and, from other workers, the leaderboard."""
+    bus = InProcessBus()
+    connect_handlers(bus)
+    leaderboard_store.load([])
+    try:
+        state = {"snake": [{"x": 10, "y": 10}], "food": {"x": 1, "y": 1}, "direction": "RIGHT", "score": 0}
+        bus.publish(events.PLAYER_JOINED, {"id": "p-events", "gameState": state})
+        assert spectator_hub.channels["p-events"].state == state
+        bus.publish(events.PLAYER_LEFT, {"id": "p-events"})
+        assert "p-events" not in spectator_hub.channels
+
+        change = leaderboard_change("add", str(uuid.uuid4()), "A", 50, "walls", "2024-11-28")
+        bus.publish(events.LEADERBOARD_CHANGED, change)
+        assert len(leaderboard_store) == 0
+        bus.dispatch(Event(events.LEADERBOARD_CHANGED, change, "other", False))
+        assert len(leaderboard_store) == 1
+    finally:
+        leaderboard_store.clear()
+
+
+def test_unix_socket_bus_reports_missed_events(tmp_path):
+    """Test that a gap in a worker's sequence numbers is announced before the next event is applied."""
+    directory = str(tmp_path)
+
+    async def scenario():
+        first = UnixSocketBus(directory, name="w1")
+        second = UnixSocketBus(directory, name="w2")
+        await first.start()
+        await second.start()
+        received = []
+        second.subscribe(events.EVENTS_MISSED, lambda event: received.append(("missed", event.payload)))
+        second.subscribe(events.GAME_TICK, lambda event: received.append(("tick", event.payload["id"])))
+        first.publish(events.GAME_TICK, {"id": "p1"})
+        # As if the datagram of the second publish had been dropped
+        first._seq += 1
+        first.publish(events.GAME_TICK, {"id": "p3"})
+        for _ in range(50):
+            if len(received) == 3:
+                break
+            await asyncio.sleep(0.01)
+        await first.stop()
+        await second.stop()
+        return received, second.report()
+
+    received, report = asyncio.run(scenario())
+    assert received == [("tick", "p1"), ("missed", {"origin": "w1", "after": 1, "next": 3}), ("tick", "p3")]
+    assert report["missed"] == 1
+
+
+def test_missed_events_reload_the_leaderboard():
+    """Test that a worker that missed changes serves reads from the database until it has reloaded."""
+    store = LeaderboardStore()
+    store.load([])
+    resync = LeaderboardResync(store)
+    late = leaderboard_change("add", str(uuid.uuid4()), "Late", 99999, "walls", "2024-11-28")
+
+    async def scenario():
+        resync.on_missed(Event(events.EVENTS_MISSED, {}, "w1", False))
+        stale = not store.is_current()
+        # Arrives while the database is read
+        resync.on_change(Event(events.LEADERBOARD_CHANGED, late, "w1", False))
+        while resync._task is not None:
+            await asyncio.sleep(0.01)
+        return stale
+
+    assert asyncio.run(scenario())
+    assert not store.stale and store.is_current()
+    assert len(store) > 1
+    assert store.entries("walls")[0].username == "Late"
+    assert resync.stats == {"resyncs": 1, "failures": 0}
+
+
+def test_reload_keeps_local_and_uncommitted_entries(monkeypatch):
+    """Test that a reload re-applies this worker's submits made during the read and uncommitted write-behind entries."""
+    from types import SimpleNamespace
+    from app import database, ingest
+
+    journaled = leaderboard_change("add", str(uuid.uuid4()), "Journaled", 88888, "walls", "2024-11-28")["entry"]
+    local = leaderboard_change("add", str(uuid.uuid4()), "Local", 99999, "walls", "2024-11-28")
+    read_started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def rows(db):
+        read_started.set()
+        await release.wait()
+        return [("550e8400-e29b-41d4-a716-446655440010", "ProGamer", 3200, "walls", "2024-11-28")]
+
+    monkeypatch.setattr(database, "get_leaderboard_rows", rows)
+    monkeypatch.setattr(ingest, "ingestor", SimpleNamespace(uncommitted={journaled["id"]: journaled}))
+    bus = InProcessBus()
+    connect_handlers(bus)
+    leaderboard_store.load([])
+
+    async def scenario():
+        bus.publish(events.EVENTS_MISSED, {"origin": "w1", "after": 1, "next": 3})
+        await read_started.wait()
+        # A submit on this worker, committed after the read began
+        entry = local["entry"]
+        leaderboard_store.add(entry["id"], entry["username"], entry["score"], entry["mode"], entry["date"])
+        bus.publish(events.LEADERBOARD_CHANGED, local)
+        release.set()
+        while leaderboard_store.stale:
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(scenario())
+        assert [entry.username for entry in leaderboard_store.entries("walls")] == ["Local", "Journaled", "ProGamer"]
+    finally:
+        leaderboard_store.clear()
@@ -0,0 +1,54 @@
+"""Tests for the streaming leaderboard export encoders."""
+import asyncio
+import csv
+import gzip
+import io
+import json
+
+from app.export import encode_csv, encode_ndjson, gzip_stream
+
+
+BATCHES = [
+    [("e1", "ProGamer", 3200, "walls", "2024-11-28"), ("e2", "SnakeMaster", 2450, "walls", "2024-11-27")],
+    [("e3", "Speedy, Snake", 1800, "walls", "2024-11-26")],
+]
+
+
+async def _batches():
+    for batch in BATCHES:
+        yield batch
+
+
+def _collect(stream) -> list[bytes]:
+    async def collect():
+        return [chunk async for chunk in stream]
+    return asyncio.run(collect())
+
+
+def test_ndjson_one_object_per_row():
+    """Test that every row becomes one JSON object line."""
+    chunks = _collect(encode_ndjson(_batches()))
+
+    assert len(chunks) == len(BATCHES)
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line) for line in lines][0] == {
+        "id": "e1", "username": "ProGamer", "score": 3200, "mode": "walls", "date": "2024-11-28"
+    }
+    assert len(lines) == 3
+
+
+def test_csv_header_and_quoting():
+    """Test that CSV output has a header and quotes embedded commas."""
+    data = b"".join(_collect(encode_csv(_batches()))).decode()
+    rows = list(csv.reader(io.StringIO(data)))
+
+    assert rows[0] == ["id", "username", "score", "mode", "date"]
+    assert rows[3] == ["e3", "Speedy, Snake", "1800", "walls", "2024-11-26"]
+
+
+def test_gzip_stream_round_trip():
+    """Test that the gzipped stream decompresses to the plain stream."""
+    plain = b"".join(_collect(encode_ndjson(_batches())))
+    compressed = b"".join(_collect(gzip_stream(encode_ndjson(_batches()))))
+
+    assert gzip.decompress(compressed) == plain
@@ -0,0 +1,58 @@
+"""Tests for the free-cell index used to place food."""
+from collections import Counter
+import random
+
+from app.game_logic import FreeCells, SnakeState, free_cell_food, move_snake, simulate_bot_game
+
+
+def test_occupy_and_release():
+    """Test that occupying and releasing keep the free set exact, and repeats are no-ops."""
+    free = FreeCells(4)
+    for cell in (0, 5, 5, 15):
+        free.occupy(cell)
+    assert len(free) == 13
+    assert 5 not in free and 6 in free
+    free.release(5)
+    free.release(5)
+    assert len(free) == 14 and 5 in free
+    assert sorted(free.cells[:len(free)]) == [cell for cell in range(16) if cell not in (0, 15)]
+
+
+def test_take_is_uniform_and_exhausts():
+    """Test that draws cover every free cell evenly and None is returned once the grid is full."""
+    rng = random.Random(0)
+    counts = Counter()
+    for _ in range(4000):
+        free = FreeCells(2)
+        free.occupy(0)
+        counts[free.take(rng)] += 1
+    assert set(counts) == {1, 2, 3}
+    assert all(1200 < count < 1500 for count in counts.values())
+    free = FreeCells(2)
+    assert sorted(free.take(rng) for _ in range(4)) == [0, 1, 2, 3]
+    assert free.take(rng) is None
+
+
+def test_free_cells_follow_the_snake():
+    """Test that moves keep the index equal to the cells covered by neither the snake nor the food."""
+    rng = random.Random(1)
+    state, _ = simulate_bot_game("pass-through", rng, max_ticks=500)
+    occupied = {state.free.cell(segment) for segment in state.snake} | {state.free.cell(state.food)}
+    assert len(state.free) == 400 - len(occupied)
+    assert not any(cell in state.free for cell in occupied)
+
+
+def test_seeded_placement_is_reproducible():
+    """Test that the same seed places the same food."""
+    runs = [simulate_bot_game("walls", random.Random(7), max_ticks=300)[1]["foods"] for _ in range(2)]
+    assert runs[0] == runs[1] and len(runs[0]) > 1
+
+
+def test_full_grid_ends_the_game():
+    """Test that eating the food on the last free cell ends the game instead of looping forever."""
+    free = FreeCells(2)
+    state = SnakeState([(0, 0), (0, 1), (1, 1)], (1, 0), "RIGHT", "pass-through", 2, free=free)
+    for cell in range(4):
+        free.occupy(cell)
+    assert move_snake(state, free_cell_food(free, random.Random(0)))
+    assert state.is_game_over and len(state.snake) == 4
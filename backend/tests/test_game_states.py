@@ -0,0 +1,141 @@
+"""Tests for live game states updated by deltas and saved in batches."""
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from app.events import GAME_TICK, PLAYER_LEFT, Event, InProcessBus, connect_handlers
+from app.game_states import GameStateStore, game_states
+from app.models import GameStateDelta
+
+STATE = {
+    "snake": [{"x": 10, "y": 10}, {"x": 9, "y": 10}, {"x": 8, "y": 10}],
+    "food": {"x": 15, "y": 12},
+    "direction": "RIGHT",
+    "score": 0,
+}
+
+
+@pytest.fixture
+def store():
+    store = GameStateStore(interval_ms=1000)
+    store.load("p1", STATE)
+    return store
+
+
+def test_move_and_eat(store):
+    """Test that a head plus a tail pop moves the snake and eating grows it."""
+    state = store.apply("p1", GameStateDelta(head={"x": 11, "y": 10}, tailPops=1))
+    assert state["snake"] == [{"x": 11, "y": 10}, {"x": 10, "y": 10}, {"x": 9, "y": 10}]
+    state = store.apply("p1", GameStateDelta(head={"x": 11, "y": 11}, food={"x": 3, "y": 4},
+                                             direction="DOWN", score=10))
+    assert len(state["snake"]) == 4
+    assert state["food"] == {"x": 3, "y": 4}
+    assert state["direction"] == "DOWN"
+    assert state["score"] == 10
+
+
+def test_invalid_deltas_are_rejected(store):
+    """Test that positions and directions are validated and the snake can't be emptied."""
+    with pytest.raises(ValidationError):
+        GameStateDelta(head={"x": -1, "y": 0})
+    with pytest.raises(ValidationError):
+        GameStateDelta(direction="SIDEWAYS")
+    with pytest.raises(ValueError):
+        store.apply("p1", GameStateDelta(tailPops=3))
+    assert len(store.get("p1")["snake"]) == 3
+
+
+def test_updates_are_coalesced(store):
+    """Test that many updates to several games are saved once per game in one call."""
+    store.load("p2", STATE)
+    for x in range(11, 20):
+        store.apply("p1", GameStateDelta(head={"x": x, "y": 10}, tailPops=1))
+    store.apply("p2", GameStateDelta(score=10))
+    saved = []
+
+    async def save(rows):
+        saved.append(dict(rows))
+
+    assert asyncio.run(store.flush(save)) == 2
+    assert len(saved) == 1
+    assert saved[0]["p1"]["snake"][0] == {"x": 19, "y": 10}
+    assert saved[0]["p2"]["score"] == 10
+    # Nothing changed since
+    assert asyncio.run(store.flush(save)) == 0
+    assert len(saved) == 1
+
+
+def test_failed_save_is_retried(store):
+    """Test that games whose save failed are saved on the next flush."""
+    store.apply("p1", GameStateDelta(score=10))
+
+    async def fail(rows):
+        raise RuntimeError("database is locked")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(store.flush(fail))
+    assert store.dirty == {"p1"}
+
+
+def test_remote_ticks_are_adopted_not_saved():
+    """Test that a state applied by another worker replaces ours and is left for that worker to save."""
+    bus = InProcessBus()
+    connect_handlers(bus)
+    game_states.load("remote1", STATE)
+    game_states.apply("remote1", GameStateDelta(score=10))
+    try:
+        newer = {**STATE, "score": 20}
+        bus.dispatch(Event(GAME_TICK, {"id": "remote1", "gameState": newer, "delta": {"score": 20}}, "other", False))
+        assert game_states.get("remote1")["score"] == 20
+        assert "remote1" not in game_states.dirty
+        bus.publish(PLAYER_LEFT, {"id": "remote1"})
+        assert "remote1" not in game_states
+    finally:
+        game_states.discard("remote1")
+
+
+def test_patch_needs_the_players_own_game(client, auth_headers):
+    """Test that game-state updates are authenticated and limited to the player's own game."""
+    from app.database import add_active_player, async_session
+
+    async def setup():
+        async with async_session() as db:
+            await add_active_player(db, "mine", "SnakeMaster", "walls")
+            await add_active_player(db, "theirs", "ProGamer", "walls")
+    asyncio.run(setup())
+    delta = {"head": {"x": 11, "y": 10}, "tailPops": 1}
+    try:
+        assert client.patch("/api/v1/players/mine/game-state", json=delta).status_code in (401, 403)
+        assert client.patch("/api/v1/players/theirs/game-state", json=delta, headers=auth_headers).status_code == 403
+        assert client.patch("/api/v1/players/gone/game-state", json=delta, headers=auth_headers).status_code == 404
+        assert client.patch("/api/v1/players/mine/game-state", json=delta, headers=auth_headers).status_code == 204
+        assert game_states.owner("mine") == "SnakeMaster"
+        # The owner is checked against the loaded game too
+        assert client.patch("/api/v1/players/mine/game-state", json=delta,
+                            headers=auth_headers).status_code == 204
+    finally:
+        game_states.discard("mine")
+        game_states.discard("theirs")
+
+
+def test_patch_saves_at_once_when_events_miss_workers(client, auth_headers, monkeypatch):
+    """Test that without a bus reaching every worker, deltas apply to the database row, not a worker's copy."""
+    from app import events
+    from app.database import DBActivePlayer, add_active_player, async_session
+
+    async def setup():
+        async with async_session() as db:
+            await add_active_player(db, "mine", "SnakeMaster", "walls")
+    asyncio.run(setup())
+    monkeypatch.setattr(events, "WORKERS", 4)
+    for x in (11, 12):
+        response = client.patch("/api/v1/players/mine/game-state", json={"head": {"x": x, "y": 10}, "tailPops": 1},
+                                headers=auth_headers)
+        assert response.status_code == 204
+
+    async def saved():
+        async with async_session() as db:
+            return (await db.get(DBActivePlayer, "mine")).game_state
+    assert asyncio.run(saved())["snake"] == [{"x": 12, "y": 10}]
+    assert "mine" not in game_states
@@ -0,0 +1,96 @@
+"""Tests for the shared Idempotency-Key store."""
+from app import idempotency
+from app.idempotency import (
+    FULL, IN_PROGRESS, MISMATCH, NEW, REPLAY, WAYS, IdempotencyStore, fingerprint
+)
+
+
+BODY = fingerprint('{"score":1500,"mode":"walls","replay":null}')
+RESPONSE = b'{"success":true,"rank":5,"percentile":93.4}'
+
+
+def test_retry_replays_the_response(tmp_path):
+    """Test that a completed key replays its response, and only for the same user and request."""
+    store = IdempotencyStore(str(tmp_path / "keys.shm"), capacity=64)
+    assert store.begin("user-1", "key-1", BODY) == (NEW, None)
+    assert store.begin("user-1", "key-1", BODY) == (IN_PROGRESS, None)
+    store.complete("user-1", "key-1", BODY, RESPONSE)
+    assert store.begin("user-1", "key-1", BODY) == (REPLAY, RESPONSE)
+    assert store.begin("user-1", "key-1", fingerprint("{}")) == (MISMATCH, None)
+    assert store.begin("user-2", "key-1", BODY) == (NEW, None)
+    assert store.stats["replayed"] == 1 and store.stats["new"] == 2
+    store.close()
+
+
+def test_workers_share_the_table(tmp_path):
+    """Test that a second mapping of the file sees reservations and responses of the first."""
+    path = str(tmp_path / "keys.shm")
+    first = IdempotencyStore(path, capacity=64)
+    second = IdempotencyStore(path, capacity=1024)
+    assert second.buckets == first.buckets
+    assert first.begin("user-1", "key-1", BODY)[0] == NEW
+    assert second.begin("user-1", "key-1", BODY)[0] == IN_PROGRESS
+    first.complete("user-1", "key-1", BODY, RESPONSE)
+    assert second.begin("user-1", "key-1", BODY) == (REPLAY, RESPONSE)
+    first.close()
+    second.close()
+
+
+def test_released_and_expired_keys_run_again(tmp_path, monkeypatch):
+    """Test that a failed submit's reservation is dropped and that entries expire after the TTL."""
+    store = IdempotencyStore(str(tmp_path / "keys.shm"), capacity=64, ttl=60)
+    store.begin("user-1", "failed", BODY)
+    store.release("user-1", "failed")
+    assert store.begin("user-1", "failed", BODY)[0] == NEW
+
+    now = 1_000_000.0
+    monkeypatch.setattr(idempotency.time, "time", lambda: now)
+    store.begin("user-1", "done", BODY)
+    store.complete("user-1", "done", BODY, RESPONSE)
+    now += 59
+    assert store.begin("user-1", "done", BODY)[0] == REPLAY
+    now += 2
+    assert store.begin("user-1", "done", BODY)[0] == NEW
+    store.close()
+
+
+def test_full_bucket_evicts_the_oldest(tmp_path, monkeypatch):
+    """Test that a key hashing to a full bucket replaces the entry closest to expiry."""
+    store = IdempotencyStore(str(tmp_path / "keys.shm"), capacity=WAYS)
+    assert store.buckets == 1
+    now = 1_000_000.0
+    monkeypatch.setattr(idempotency.time, "time", lambda: now)
+    for i in range(WAYS + 1):
+        now += 1
+        store.begin("user-1", f"key-{i}", BODY)
+        store.complete("user-1", f"key-{i}", BODY, RESPONSE)
+    assert store.stats["evicted"] == 1
+    assert store.begin("user-1", "key-0", BODY)[0] == NEW
+    assert store.begin("user-1", f"key-{WAYS}", BODY)[0] == REPLAY
+    store.close()
+
+
+def test_oversized_response_is_not_stored(tmp_path):
+    """Test that a response too large for a slot releases the key instead of being cut off."""
+    store = IdempotencyStore(str(tmp_path / "keys.shm"), capacity=64)
+    store.begin("user-1", "key-1", BODY)
+    store.complete("user-1", "key-1", BODY, b"x" * (idempotency.MAX_RESPONSE + 1))
+    assert store.begin("user-1", "key-1", BODY)[0] == NEW
+    store.close()
+
+
+def test_reservations_are_never_evicted(tmp_path, monkeypatch):
+    """Test that a bucket full of submits in progress turns new keys away instead of evicting one."""
+    store = IdempotencyStore(str(tmp_path / "keys.shm"), capacity=WAYS)
+    now = 1_000_000.0
+    monkeypatch.setattr(idempotency.time, "time", lambda: now)
+    for i in range(WAYS):
+        assert store.begin("user-1", f"key-{i}", BODY)[0] == NEW
+    assert store.begin("user-1", "one-more", BODY) == (FULL, None)
+    assert store.stats["full"] == 1 and store.stats["evicted"] == 0
+    # Every reservation is intact; a completed one can then make way
+    assert store.begin("user-1", "key-0", BODY)[0] == IN_PROGRESS
+    store.complete("user-1", "key-0", BODY, RESPONSE)
+    assert store.begin("user-1", "one-more", BODY)[0] == NEW
+    assert store.begin("user-1", "key-1", BODY)[0] == IN_PROGRESS
+    store.close()
@@ -0,0 +1,164 @@
+"""Tests for write-behind score ingestion."""
+import asyncio
+import uuid
+
+import pytest
+
+from app.ingest import IngestBackpressure, ScoreIngestor, SpillJournal, claim_journal
+from app.leaderboard_store import leaderboard_store
+
+
+@pytest.fixture(autouse=True)
+def loaded_store():
+    """Give the ingestor an empty, loaded in-memory leaderboard."""
+    leaderboard_store.load([])
+    yield
+    leaderboard_store.clear()
+
+
+def test_submits_are_group_committed(tmp_path):
+    """Test that concurrent submits are acknowledged with ranks and committed in batches."""
+    batches = []
+
+    async def commit(entries):
+        batches.append(list(entries))
+
+    async def scenario():
+        ingestor = ScoreIngestor(commit, str(tmp_path / "journal"), batch_size=50, interval_ms=20)
+        await ingestor.start()
+        ranks = await asyncio.gather(*(
+            ingestor.submit("u1", "ProGamer", score, "walls") for score in range(100, 0, -1)
+        ))
+        await ingestor.stop()
+        return ranks, ingestor.report(), ingestor.uncommitted
+
+    ranks, report, uncommitted = asyncio.run(scenario())
+
+    assert sorted(ranks) == list(range(1, 101))
+    assert uncommitted == {}
+    assert sum(len(batch) for batch in batches) == 100
+    assert len(batches) <= 4
+    assert report["accepted"] == 100
+    assert report["committed"] == 100
+
+
+def test_uncommitted_journal_entries_are_replayed(tmp_path):
+    """Test that entries acknowledged but never committed in a pre-slot journal are committed on restart."""
+    path = str(tmp_path / "journal")
+    journal = SpillJournal(path)
+    journal.open()
+    entry = {"id": str(uuid.uuid4()), "user_id": "u1", "username": "A", "score": 5,
+             "mode": "walls", "date": "2024-11-28"}
+    through = journal.append([entry])
+    journal.append([{**entry, "id": str(uuid.uuid4())}])
+    journal.mark_committed(through)
+    journal.close()
+
+    committed = []
+
+    async def commit(entries):
+        committed.extend(entries)
+
+    async def restart():
+        ingestor = ScoreIngestor(commit, path)
+        await ingestor.start()
+        await ingestor.stop()
+
+    asyncio.run(restart())
+
+    assert len(committed) == 1
+    assert committed[0]["id"] != entry["id"]
+
+
+def test_full_queue_applies_backpressure(tmp_path):
+    """Test that submits are rejected once the queue stays full."""
+    release = asyncio.Event()
+
+    async def slow_commit(entries):
+        await release.wait()
+
+    async def scenario():
+        ingestor = ScoreIngestor(
+            slow_commit, str(tmp_path / "journal"), max_queue=2, batch_size=1,
+            interval_ms=1, enqueue_timeout_ms=10
+        )
+        await ingestor.start()
+        # One batch blocked in the writer, two waiting in the queue
+        pending = [asyncio.create_task(ingestor.submit("u1", "A", i, "walls")) for i in range(3)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(IngestBackpressure):
+            await ingestor.submit("u1", "A", 99, "walls")
+        release.set()
+        await asyncio.gather(*pending)
+        await ingestor.stop()
+        return ingestor.report()
+
+    report = asyncio.run(scenario())
+
+    assert report["rejected"] == 1
+    assert report["committed"] == 3
+
+
+def test_workers_keep_separate_journals(tmp_path):
+    """Test that each worker claims its own journal slot and orphaned journals are replayed and emptied."""
+    base = str(tmp_path / "journal")
+    first, second = claim_journal(base), claim_journal(base)
+    assert (first.path, second.path) == (base + ".0", base + ".1")
+    for journal, score in ((first, 1), (second, 2)):
+        journal.open()
+        journal.append([{"id": str(uuid.uuid4()), "user_id": "u1", "username": "A", "score": score,
+                         "mode": "walls", "date": "2024-11-28"}])
+    # The second worker dies; the first keeps running
+    second.close()
+
+    committed = []
+
+    async def commit(entries):
+        committed.extend(entries)
+
+    async def restart():
+        ingestor = ScoreIngestor(commit, base)
+        await ingestor.start()
+        claimed = ingestor.journal.path
+        await ingestor.stop()
+        return claimed
+
+    claimed = asyncio.run(restart())
+    first.close()
+
+    assert claimed == base + ".1"
+    assert [entry["score"] for entry in committed] == [2]
+    assert SpillJournal(base + ".1").open() == []
+
+
+def test_failed_journal_write_is_not_published(tmp_path, monkeypatch):
+    """Test that a submit whose journal write fails never reaches the in-memory leaderboard."""
+    async def commit(entries):
+        pass
+
+    async def scenario():
+        ingestor = ScoreIngestor(commit, str(tmp_path / "journal"), interval_ms=1)
+        await ingestor.start()
+
+        def broken(entries):
+            raise OSError("disk full")
+        monkeypatch.setattr(ingestor.journal, "append", broken)
+        with pytest.raises(OSError):
+            await ingestor.submit("u1", "A", 10, "walls")
+        await ingestor.stop()
+
+    asyncio.run(scenario())
+
+    assert len(leaderboard_store.partitions["walls"]) == 0
+
+
+def test_ingestor_refuses_to_start_when_ranks_miss_workers(monkeypatch, tmp_path):
+    """Test that write-behind does not start on the in-process bus with several workers."""
+    from app import events
+
+    async def commit(entries):
+        pass
+
+    monkeypatch.setattr(events, "WORKERS", 4)
+    with pytest.raises(RuntimeError, match="EVENT_BUS=unix"):
+        asyncio.run(ScoreIngestor(commit, str(tmp_path / "journal")).start())
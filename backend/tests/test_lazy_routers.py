@@ -0,0 +1,77 @@
+"""Tests for deferred router loading."""
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+
+from app.lazy_routers import LazyRouterMiddleware, RouterLoader
+
+
+@pytest.fixture
+def lazy_app():
+    """Create an app whose routers are loaded on first use."""
+    app = FastAPI()
+    loader = RouterLoader(app, "/api/v1", {
+        "/leaderboard": "app.routers.leaderboard",
+        "/players": "app.routers.players",
+    })
+    app.add_middleware(LazyRouterMiddleware, loader=loader)
+    return app, loader
+
+
+def test_routers_not_loaded_at_startup(lazy_app):
+    """Test that no router is included before a request needs it."""
+    app, loader = lazy_app
+
+    assert loader.loaded == set()
+    assert loader.pending is True
+
+
+def test_router_loaded_on_first_request(lazy_app):
+    """Test that only the router matching the request path is loaded."""
+    app, loader = lazy_app
+
+    loader.load_for_path("/api/v1/players/active")
+
+    assert loader.loaded == {"/players"}
+    paths = app.openapi()["paths"]
+    assert "/api/v1/players/active" in paths
+    assert "/api/v1/leaderboard" not in paths
+
+
+def test_unrelated_path_does_not_load(lazy_app):
+    """Test that paths outside the API prefix, or prefix look-alikes, load nothing."""
+    app, loader = lazy_app
+
+    loader.load_for_path("/health")
+    loader.load_for_path("/api/v1/playersfoo")
+
+    assert loader.loaded == set()
+
+
+def test_openapi_loads_all_routers(lazy_app):
+    """Test that requesting the OpenAPI schema includes every router."""
+    app, loader = lazy_app
+    client = TestClient(app)
+
+    response = client.get("/openapi.json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert loader.pending is False
+    assert "/api/v1/leaderboard" in response.json()["paths"]
+
+
+def test_main_import_stays_light():
+    """Test that importing main neither imports SQLAlchemy nor builds the models holding an e-mail address."""
+    code = (
+        "import sys, main; from app import models; "
+        "print('sqlalchemy' in sys.modules, models.LoginResponse.__pydantic_complete__)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.split() == ["False", "False"]
@@ -1,6 +1,33 @@
 """Tests for leaderboard endpoints."""
+import asyncio
+from datetime import datetime, UTC
+import json
+
 import pytest
 from fastapi import status
+from sqlalchemy import insert
+
+from app import verification
+from app.database import async_session
+from app.db_models import LeaderboardEntry
+from app.verification import PENDING, REJECTED, verifications
+
+
+def _add_unsettled_entries() -> None:
+    """A rejected and a pending high score in walls mode, both above every sample score."""
+    async def main():
+        async with async_session() as db:
+            await db.execute(insert(LeaderboardEntry), [
+                {"id": "rejected", "username": "SnakeMaster", "score": 9000, "mode": "walls", "date": "2024-11-28"},
+                {"id": "pending", "username": "SpeedySnake", "score": 8000, "mode": "walls", "date": "2024-11-28"},
+            ])
+            await db.execute(insert(verifications), [
+                {"entry_id": entry_id, "status": status_, "reason": None, "replay": None,
+                 "updated_at": datetime.now(UTC)}
+                for entry_id, status_ in (("rejected", REJECTED), ("pending", PENDING))
+            ])
+            await db.commit()
+    asyncio.run(main())
 
 
 def test_get_leaderboard_all(client):
@@ -157,3 +184,28 @@ def test_submit_score_negative_score(client, auth_headers):
     )
     
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+def test_export_hides_rejected_and_pending_entries(client, monkeypatch):
+    """Test that the export leaves out rejected scores and high scores awaiting verification."""
+    monkeypatch.setattr(verification, "VERIFY_SCORE_THRESHOLD", 5000)
+    _add_unsettled_entries()
+
+    response = client.get("/api/v1/leaderboard/export?mode=walls")
+
+    assert response.status_code == status.HTTP_200_OK
+    ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert len(ids) == 3
+    assert "rejected" not in ids and "pending" not in ids
+
+
+def test_submit_rank_ignores_hidden_entries(client, auth_headers, monkeypatch):
+    """Test that the database rank fallback only counts visible entries, like the in-memory leaderboard."""
+    monkeypatch.setattr(verification, "VERIFY_SCORE_THRESHOLD", 5000)
+    _add_unsettled_entries()
+
+    response = client.post("/api/v1/leaderboard/submit", headers=auth_headers, json={"score": 3000, "mode": "walls"})
+
+    assert response.status_code == status.HTTP_200_OK
+    # Only ProGamer's 3200 is shown above it
+    assert response.json()["rank"] == 2
@@ -0,0 +1,94 @@
+"""Tests for the live top-N leaderboard feed."""
+import json
+import uuid
+
+import pytest
+
+from app.events import LEADERBOARD_CHANGED, Event, leaderboard_change
+from app.leaderboard_feed import TopNFeed, diff
+from app.leaderboard_store import leaderboard_store
+
+
+@pytest.fixture(autouse=True)
+def loaded_store():
+    """Fill the in-memory leaderboard with walls scores 500, 400, 300, 200, 100."""
+    leaderboard_store.load([
+        (str(uuid.uuid4()), f"P{score}", score, "walls", "2024-11-28") for score in (500, 400, 300, 200, 100)
+    ])
+    yield
+    leaderboard_store.clear()
+
+
+def _add(feed: TopNFeed, score: int, mode: str = "walls") -> str:
+    entry_id = str(uuid.uuid4())
+    leaderboard_store.add(entry_id, "New", score, mode, "2024-11-29")
+    feed.on_change(Event(LEADERBOARD_CHANGED, leaderboard_change("add", entry_id, "New", score, mode, "2024-11-29"),
+                         "w1", True))
+    return entry_id
+
+
+def _events(subscriber) -> list[tuple[str, dict]]:
+    frames = list(subscriber.queue)
+    subscriber.queue.clear()
+    parsed = []
+    for frame in frames:
+        lines = frame.data.decode().split("\n")
+        parsed.append((lines[1].removeprefix("event: "), json.loads(lines[2].removeprefix("data: "))))
+    return parsed
+
+
+def test_initial_keyframe_then_insert_and_drop():
+    """Test that a new top-3 score is sent as an insert plus a tail drop."""
+    feed = TopNFeed()
+    subscriber = feed.subscribe("walls", 3)
+    [(event, data)] = _events(subscriber)
+    assert event == "keyframe"
+    assert [entry["score"] for entry in data["entries"]] == [500, 400, 300]
+
+    entry_id = _add(feed, 450)
+    [(event, data)] = _events(subscriber)
+    assert event == "delta"
+    assert data["ops"][0]["op"] == "insert"
+    assert data["ops"][0]["position"] == 1
+    assert data["ops"][0]["entry"]["id"] == entry_id
+    assert data["ops"][1] == {"op": "drop", "position": 3}
+
+
+def test_changes_outside_the_top_n_send_nothing():
+    """Test that submits below the top N or in another mode do not publish."""
+    feed = TopNFeed()
+    subscriber = feed.subscribe("walls", 3)
+    _events(subscriber)
+    _add(feed, 150)
+    _add(feed, 9999, mode="pass-through")
+    assert _events(subscriber) == []
+    assert feed.stats()["perChannel"]["walls:3"]["published"] == 1
+
+
+def test_views_are_shared_and_dropped_when_unwatched():
+    """Test that clients of the same (mode, N) share one view that goes away with the last one."""
+    feed = TopNFeed()
+    first = feed.subscribe("walls", 3)
+    second = feed.subscribe("walls", 3)
+    assert len(feed.views) == 1
+    feed.unsubscribe(first)
+    assert len(feed.views) == 1
+    feed.unsubscribe(second)
+    assert feed.views == {}
+
+
+def test_diff_removal_backfills_tail():
+    """Test that removing an entry from the top N shifts the next one into the last place."""
+    old = [{"id": i} for i in "abc"]
+    new = [{"id": i} for i in "acd"]
+    assert diff(old, new, 3) == [
+        {"op": "remove", "position": 1},
+        {"op": "insert", "position": 2, "entry": {"id": "d"}},
+    ]
+
+
+def test_diff_falls_back_to_keyframe():
+    """Test that unrelated lists produce no ops (a keyframe is sent instead)."""
+    old = [{"id": i} for i in "abc"]
+    new = [{"id": i} for i in "cax"]
+    assert diff(old, new, 3) is None
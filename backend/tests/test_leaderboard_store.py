@@ -0,0 +1,150 @@
+"""Tests for the columnar in-memory leaderboard."""
+import random
+import uuid
+
+import pytest
+
+from app import events
+from app.leaderboard_store import LeaderboardStore, SnapshotColumns, cursor_at, cursor_offset
+from app.shared_data import SharedSnapshot, write_snapshot
+from app.models import LeaderboardEntry
+
+
+def _id(n: int) -> str:
+    return str(uuid.UUID(int=n))
+
+
+@pytest.fixture
+def store():
+    """Create a store with a few entries in both modes."""
+    store = LeaderboardStore()
+    store.load([
+        (_id(1), "ProGamer", 3200, "walls", "2024-11-28"),
+        (_id(2), "SnakeMaster", 2450, "walls", "2024-11-27"),
+        (_id(3), "SpeedySnake", 1800, "walls", "2024-11-26"),
+        (_id(4), "ProGamer", 2800, "pass-through", "2024-11-28"),
+        (_id(5), "SnakeMaster", 2100, "pass-through", "2024-11-27"),
+    ])
+    return store
+
+
+def test_entries_sorted_and_converted(store):
+    """Test that a mode comes back as API models sorted by score descending."""
+    entries = store.entries("walls")
+
+    assert all(isinstance(entry, LeaderboardEntry) for entry in entries)
+    assert [entry.score for entry in entries] == [3200, 2450, 1800]
+    assert entries[0].id == _id(1)
+    assert entries[0].username == "ProGamer"
+    assert entries[0].date == "2024-11-28"
+
+
+def test_all_modes_merged(store):
+    """Test that the unfiltered view merges the modes by score."""
+    entries = store.entries(limit=3)
+
+    assert [entry.score for entry in entries] == [3200, 2800, 2450]
+    assert [entry.mode.value for entry in entries] == ["walls", "pass-through", "walls"]
+
+
+def test_usernames_interned(store):
+    """Test that each username is stored once across modes."""
+    assert sorted(store.usernames) == ["ProGamer", "SnakeMaster", "SpeedySnake"]
+
+
+def test_add_returns_rank(store):
+    """Test that adding an entry returns its rank within the mode."""
+    assert store.add(_id(6), "NewPlayer", 5000, "walls", "2024-12-01") == 1
+    assert store.add(_id(7), "NewPlayer", 100, "walls", "2024-12-01") == 5
+    # Ties sort after existing equal scores
+    assert store.add(_id(8), "NewPlayer", 2450, "walls", "2024-12-01") == 4
+    assert store.rank_of(2450, "walls") == 5
+
+
+def test_page_is_zero_copy_until_released(store):
+    """Test that a slice views the arrays and blocks growth until converted."""
+    page = store.top("walls", 2)
+    assert list(page.scores) == [3200, 2450]
+
+    with pytest.raises(BufferError):
+        store.add(_id(9), "NewPlayer", 10, "walls", "2024-12-01")
+
+    page.to_models()
+    store.add(_id(9), "NewPlayer", 10, "walls", "2024-12-01")
+
+
+def test_cursor_pages_cover_mode_once(store):
+    """Test that cursor pages walk the mode without gaps or repeats, even across inserts."""
+    first = store.page("walls", 0, 2)
+    seen = [entry.id for entry in first.to_models()]
+    cursor = store.cursor_after("walls", 2)
+
+    # A higher score inserted between pages must not shift the cursor
+    store.add(_id(10), "Latecomer", 9000, "walls", "2024-12-01")
+
+    offset = store.cursor_position("walls", cursor)
+    seen += [entry.id for entry in store.page("walls", offset, 2).to_models()]
+
+    assert seen == [_id(1), _id(2), _id(3)]
+    assert store.cursor_after("walls", offset + 1) is None
+
+
+def test_cursor_with_negative_tie_is_rejected(store):
+    """Test that a cursor cannot point before the first entry with its score."""
+    with pytest.raises(ValueError):
+        store.cursor_position("walls", "2450:-1")
+    assert cursor_offset([3200, 2450, 2450, 1800], "2450:1") == 2
+    assert cursor_at([3200, 2450, 2450, 1800], 2) == "2450:1"
+
+
+def test_store_serves_reads_only_when_every_worker_reaches_it(store, monkeypatch):
+    """Test that with several workers the store is only current on the cross-worker event bus."""
+    assert store.is_current()
+    monkeypatch.setattr(events, "WORKERS", 4)
+    assert not store.is_current()
+    monkeypatch.setattr(events, "event_bus", events.UnixSocketBus())
+    assert store.is_current()
+
+
+def test_snapshot_backed_store_matches_a_private_copy(tmp_path):
+    """Test that a store serving a mapped snapshot plus changes reads the same as one holding private arrays."""
+    rng = random.Random(7)
+    rows = [
+        (_id(i), f"player{i % 7}", rng.randrange(50), rng.choice(["walls", "pass-through"]), "2024-11-28")
+        for i in range(1, 200)
+    ]
+    path = str(tmp_path / "leaderboard.snap")
+    write_snapshot(path, rows)
+    snapshot = SharedSnapshot(path)
+    shared, private = LeaderboardStore(), LeaderboardStore()
+    shared.load_snapshot(snapshot)
+    private.load(rows)
+    assert isinstance(shared.partitions["walls"], SnapshotColumns)
+    assert shared.nbytes() < private.nbytes()
+
+    live = [row[0] for row in rows]
+    for n in range(1000, 1150):
+        if rng.random() < 0.3:
+            entry_id = live.pop(rng.randrange(len(live)))
+            row = next(r for r in rows if r[0] == entry_id)
+            assert shared.remove(entry_id, row[2], row[3]) == private.remove(entry_id, row[2], row[3])
+        else:
+            row = (_id(n), f"new{n % 5}", rng.randrange(50), rng.choice(["walls", "pass-through"]), "2024-12-01")
+            rows.append(row)
+            live.append(row[0])
+            assert shared.add(*row) == private.add(*row)
+
+    for mode in ("walls", "pass-through"):
+        assert shared.entries(mode) == private.entries(mode)
+        for _ in range(30):
+            offset, limit = rng.randrange(len(private.partitions[mode]) + 2), rng.randrange(1, 20)
+            assert shared.page(mode, offset, limit).to_models() == private.page(mode, offset, limit).to_models()
+            cursor = private.cursor_after(mode, offset)
+            assert shared.cursor_after(mode, offset) == cursor
+            if cursor is not None:
+                assert shared.cursor_position(mode, cursor) == offset
+        for score in range(0, 52, 5):
+            assert shared.rank_of(score, mode) == private.rank_of(score, mode)
+        assert shared.partitions[mode].to_columns().scores == private.partitions[mode].scores
+    assert shared.histograms[None].tree == private.histograms[None].tree
+    assert shared.intern("player3") == snapshot.find_username("player3")
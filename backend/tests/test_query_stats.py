@@ -0,0 +1,118 @@
+"""Tests for the database query instrumentation."""
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.query_stats import QueryCountMiddleware, QueryStats
+
+
+def _app_function(source: str, module: str = "app.database"):
+    """A coroutine function that looks as if it was defined in `module`."""
+    namespace = {"__name__": module, "text": text}
+    exec(source, namespace)
+    return next(value for name, value in namespace.items() if name.startswith("load_"))
+
+
+LOAD_ITEMS = _app_function("""
+async def load_items(conn):
+    result = await conn.execute(text("SELECT id FROM items WHERE id <= 3"))
+    return result.all()
+""")
+
+
+async def _engine(stats: QueryStats):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    stats.instrument(engine)
+    return engine
+
+
+async def _setup(conn) -> None:
+    await conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+    await conn.execute(text("INSERT INTO items (id) VALUES (1), (2), (3), (4)"))
+
+
+def test_statements_are_tagged_by_calling_function():
+    """Test that statements count under the app function that issued them, with their rows."""
+    stats = QueryStats(slow_ms=10_000)
+
+    async def main():
+        engine = await _engine(stats)
+        async with engine.connect() as conn:
+            await _setup(conn)
+            assert len(await LOAD_ITEMS(conn)) == 3
+            await LOAD_ITEMS(conn)
+        await engine.dispose()
+    asyncio.run(main())
+
+    load = stats.operations["load_items"]
+    assert load.calls == 2 and load.rows == 6 and load.slow == 0
+    assert sum(load.buckets) == 2
+    assert stats.operations["other"].calls == 2
+    assert stats.report()["operations"]["load_items"]["calls"] == 2
+
+
+def test_slow_queries_keep_their_plan():
+    """Test that a statement over the threshold is logged with its EXPLAIN plan, without parameters."""
+    stats = QueryStats(slow_ms=0)
+
+    async def main():
+        engine = await _engine(stats)
+        async with engine.connect() as conn:
+            await _setup(conn)
+            assert len(await LOAD_ITEMS(conn)) == 3
+        await engine.dispose()
+    asyncio.run(main())
+
+    slow = stats.slow_queries[-1]
+    assert slow["operation"] == "load_items" and slow["rows"] == 3
+    assert slow["statement"].startswith("SELECT id FROM items")
+    assert any("items" in line for line in slow["plan"])
+    assert stats.operations["load_items"].slow == 1
+
+
+def test_n_plus_one_requests_are_flagged():
+    """Test that a request issuing more statements than the threshold is logged with its most repeated one."""
+    stats = QueryStats(slow_ms=10_000, n_plus_one_threshold=3)
+
+    async def main():
+        engine = await _engine(stats)
+        async with engine.connect() as conn:
+            await _setup(conn)
+
+            async def endpoint(scope, receive, send):
+                for _ in range(4):
+                    await LOAD_ITEMS(conn)
+
+            async def quiet(scope, receive, send):
+                await LOAD_ITEMS(conn)
+
+            await QueryCountMiddleware(endpoint, stats)({"type": "http", "path": "/items"}, None, None)
+            await QueryCountMiddleware(quiet, stats)({"type": "http", "path": "/items"}, None, None)
+        await engine.dispose()
+    asyncio.run(main())
+
+    assert len(stats.n_plus_one) == 1
+    flagged = stats.n_plus_one[0]
+    assert flagged["queries"] == 4 and flagged["repeats"] == 4 and flagged["operations"] == {"load_items": 4}
+    assert stats.n_plus_one_routes == {"unmatched": 1}
+
+
+def test_metrics_render_as_prometheus_text():
+    """Test that the counters render as a cumulative histogram and counters per function."""
+    stats = QueryStats(slow_ms=50)
+    stats.record("get_leaderboard", "SELECT 1", 0.002, 10)
+    stats.record("get_leaderboard", "SELECT 1", 0.2, 5)
+    stats.record_slow("get_leaderboard", "SELECT 1", 0.2, 5, None)
+    lines = stats.render().splitlines()
+    assert 'snake_db_query_duration_seconds_bucket{operation="get_leaderboard",le="0.001"} 0' in lines
+    assert 'snake_db_query_duration_seconds_bucket{operation="get_leaderboard",le="0.0025"} 1' in lines
+    assert 'snake_db_query_duration_seconds_bucket{operation="get_leaderboard",le="+Inf"} 2' in lines
+    assert 'snake_db_query_duration_seconds_count{operation="get_leaderboard"} 2' in lines
+    assert 'snake_db_query_rows_total{operation="get_leaderboard"} 15' in lines
+    assert 'snake_db_slow_queries_total{operation="get_leaderboard"} 1' in lines
+
+
+def test_debug_endpoint_is_hidden_by_default(client):
+    """Test that the statement table is not served unless QUERY_DEBUG_ENABLED is on."""
+    assert client.get("/debug/queries").status_code == 404
@@ -0,0 +1,127 @@
+"""Tests for heartbeat tracking and the stale active-player reaper."""
+import asyncio
+
+import pytest
+
+from app.events import GAME_TICK, PLAYER_HEARTBEAT, PLAYER_JOINED, PLAYER_LEFT, InProcessBus
+from app.reaper import ActivePlayerReaper, ExpiryWheel
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_wheel_expires_in_deadline_order():
+    """Test that keys expire once their deadline has passed, never before."""
+    wheel = ExpiryWheel(1.0, now=0.0)
+    wheel.touch("a", 2.5)
+    wheel.touch("b", 5.0)
+    assert wheel.expired(2.9) == []
+    assert wheel.expired(3.0) == ["a"]
+    assert wheel.expired(5.9) == []
+    assert wheel.expired(6.0) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_wheel_reschedules_and_limits():
+    """Test that touching moves a key to its new slot and `limit` leaves the rest for later."""
+    wheel = ExpiryWheel(1.0, now=0.0)
+    for key in "abcde":
+        wheel.touch(key, 1.0)
+    wheel.touch("e", 10.0)
+    first = wheel.expired(5.0, limit=3)
+    second = wheel.expired(5.0, limit=3)
+    assert len(first) == 3 and sorted(first + second) == ["a", "b", "c", "d"]
+    assert "e" in wheel
+    # A long idle gap jumps straight to the next bucket
+    assert wheel.expired(1_000_000.0) == ["e"]
+
+
+def test_reaper_follows_player_events():
+    """Test that joins, ticks and heartbeats extend a player's deadline and leaves stop tracking."""
+    clock = Clock()
+    bus = InProcessBus()
+    reaper = ActivePlayerReaper(ttl=30, interval=1, batch_size=10, clock=clock)
+    reaper.attach(bus)
+    bus.publish(PLAYER_JOINED, {"id": "p1"})
+    bus.publish(PLAYER_JOINED, {"id": "p2"})
+    clock.now += 20
+    bus.publish(GAME_TICK, {"id": "p1"})
+    bus.publish(PLAYER_HEARTBEAT, {"id": "p2"})
+    clock.now += 20
+    assert reaper.wheel.expired(clock.now) == []
+    bus.publish(PLAYER_LEFT, {"id": "p2"})
+    assert "p1" in reaper and "p2" not in reaper
+    reaper.detach()
+    assert not any(bus.handlers.values())
+
+
+def test_sweep_deletes_in_batches():
+    """Test that a sweep removes only expired players, one call per batch."""
+    clock = Clock()
+    reaper = ActivePlayerReaper(ttl=30, interval=1, batch_size=4, clock=clock)
+    reaper.track(f"ghost{i}" for i in range(10))
+    clock.now += 15
+    reaper.seen("alive")
+    clock.now += 20
+    calls = []
+
+    async def remove(player_ids):
+        calls.append(player_ids)
+        return player_ids
+
+    assert asyncio.run(reaper.sweep(remove)) == 10
+    assert [len(batch) for batch in calls] == [4, 4, 2]
+    assert list(reaper.wheel.slots) == ["alive"]
+    assert reaper.report()["reaped"] == 10
+
+
+def test_failed_delete_is_retried():
+    """Test that players whose delete failed are swept again."""
+    clock = Clock()
+    reaper = ActivePlayerReaper(ttl=5, interval=1, batch_size=10, clock=clock)
+    reaper.track(["p1"])
+    clock.now += 10
+
+    async def fail(player_ids):
+        raise RuntimeError("database is locked")
+
+    async def remove(player_ids):
+        return player_ids
+
+    try:
+        asyncio.run(reaper.sweep(fail))
+    except RuntimeError:
+        pass
+    assert "p1" in reaper
+    clock.now += 1
+    assert asyncio.run(reaper.sweep(remove)) == 1
+
+
+def test_heartbeat_needs_the_players_own_game(client, auth_headers):
+    """Test that heartbeats are authenticated, checked against the database row and limited to the owner."""
+    from app.database import add_active_player, async_session
+
+    async def setup():
+        async with async_session() as db:
+            await add_active_player(db, "mine", "SnakeMaster", "walls")
+            await add_active_player(db, "theirs", "ProGamer", "walls")
+    asyncio.run(setup())
+
+    assert client.post("/api/v1/players/mine/heartbeat").status_code in (401, 403)
+    assert client.post("/api/v1/players/mine/heartbeat", headers=auth_headers).status_code == 204
+    assert client.post("/api/v1/players/theirs/heartbeat", headers=auth_headers).status_code == 403
+    assert client.post("/api/v1/players/gone/heartbeat", headers=auth_headers).status_code == 404
+
+
+def test_reaper_refuses_to_start_when_heartbeats_miss_workers(monkeypatch):
+    """Test that the reaper does not start on the in-process bus with several workers."""
+    from app import events
+
+    monkeypatch.setattr(events, "WORKERS", 4)
+    with pytest.raises(RuntimeError, match="EVENT_BUS=unix"):
+        asyncio.run(ActivePlayerReaper().start())
@@ -0,0 +1,107 @@
+"""Tests for the per-mode score histograms."""
+import random
+import uuid
+
+from app.leaderboard_store import LeaderboardStore
+from app.score_histogram import BUCKETS, MAX_SCORE, SUB_BUCKETS, ScoreHistogram, bucket_floor, bucket_of
+
+
+def test_buckets_are_exact_then_within_one_percent():
+    """Test that small scores get exact buckets and larger ones buckets under 1% wide."""
+    for score in range(2 * SUB_BUCKETS):
+        assert bucket_floor(bucket_of(score)) == score
+    rng = random.Random(0)
+    for score in [rng.randrange(MAX_SCORE) for _ in range(1000)] + [MAX_SCORE]:
+        floor = bucket_floor(bucket_of(score))
+        assert floor <= score and score - floor <= score / SUB_BUCKETS
+    assert bucket_of(MAX_SCORE) == BUCKETS - 1
+
+
+def test_percentile_and_quantiles_match_the_sorted_scores():
+    """Test that ranks and quantiles agree with the sorted scores within the bucket error."""
+    rng = random.Random(1)
+    scores = sorted(int(rng.expovariate(1 / 400)) for _ in range(5000))
+    histogram = ScoreHistogram()
+    for score in scores:
+        histogram.add(score)
+
+    assert len(histogram) == 5000
+    assert abs(histogram.mean() - sum(scores) / 5000) < 1e-9
+    for q in (0.0, 0.5, 0.9, 0.99, 1.0):
+        exact = scores[min(4999, int(q * 5000))]
+        assert bucket_floor(bucket_of(exact)) == histogram.quantile(q)
+    for score in (0, 100, 250, 1000, 3000):
+        below = sum(1 for s in scores if bucket_of(s) < bucket_of(score))
+        assert histogram.percentile(score) == 100 * below / 5000
+    assert histogram.percentile(MAX_SCORE) == 100.0
+
+
+def test_load_merge_and_remove():
+    """Test that a bulk load equals adding one by one, merges add up and removals undo adds."""
+    scores = [5, 300, 300, 70000, 12]
+    loaded, added = ScoreHistogram(), ScoreHistogram()
+    loaded.load(scores)
+    for score in scores:
+        added.add(score)
+    assert loaded.tree == added.tree and loaded.total == added.total
+
+    merged = ScoreHistogram()
+    merged.merge(loaded)
+    merged.merge(added)
+    assert len(merged) == 10 and merged.quantile(0.5) == 300
+
+    for score in scores:
+        added.remove(score)
+    assert len(added) == 0 and not any(added.tree)
+    assert added.percentile(10) is None and added.quantile(0.5) is None and added.bins(5) == []
+
+
+def test_bins_count_every_score():
+    """Test that equal-width bins cover the range and hold every score once."""
+    histogram = ScoreHistogram()
+    histogram.load(range(100))
+    bins = histogram.bins(4)
+    assert bins == [(0, 25), (25, 25), (50, 25), (75, 25)]
+
+    histogram.load([1800, 2000, 2450, 3200])
+    assert sum(count for _, count in histogram.bins(4)) == 4
+
+
+def test_store_keeps_histograms_in_step():
+    """Test that the leaderboard store updates its mode and all-modes histograms on every change."""
+    store = LeaderboardStore()
+    store.load([
+        (str(uuid.UUID(int=1)), "a", 100, "walls", "2024-11-28"),
+        (str(uuid.UUID(int=2)), "b", 200, "walls", "2024-11-28"),
+        (str(uuid.UUID(int=3)), "c", 50, "pass-through", "2024-11-28"),
+    ])
+    assert len(store.histograms["walls"]) == 2 and len(store.histograms[None]) == 3
+
+    entry_id = str(uuid.UUID(int=4))
+    store.add(entry_id, "d", 150, "walls", "2024-11-29")
+    # 100 is below 150; 150 itself and 200 are not
+    assert store.percentile(150, "walls") == 100 / 3
+    assert store.percentile(150) == 50.0
+
+    assert store.remove(entry_id, 150, "walls")
+    assert not store.remove(entry_id, 150, "walls")
+    assert len(store.histograms["walls"]) == 2 and len(store.histograms[None]) == 3
+
+
+def test_distribution_extremes_are_exact():
+    """Test that min and max are the exact scores, not the lower bounds of their buckets."""
+    store = LeaderboardStore()
+    store.load([
+        (str(uuid.UUID(int=1)), "a", 1001, "walls", "2024-11-28"),
+        (str(uuid.UUID(int=2)), "b", 3333, "walls", "2024-11-28"),
+        (str(uuid.UUID(int=3)), "c", 77777, "pass-through", "2024-11-28"),
+    ])
+    # Both land in buckets wider than one score
+    assert store.histograms["walls"].quantile(1.0) != 3333
+    assert store.score_range("walls") == (1001, 3333)
+    assert store.score_range() == (1001, 77777)
+    store.remove(str(uuid.UUID(int=2)), 3333, "walls")
+    assert store.score_range("walls") == (1001, 1001)
+    assert LeaderboardStore().score_range("walls") == (None, None)
+    bins = store.histograms[None].bins(2, *store.score_range())
+    assert bins[0][0] == 1001 and sum(count for _, count in bins) == 2
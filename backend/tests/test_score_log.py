@@ -0,0 +1,166 @@
+"""Tests for the append-only score event log."""
+import os
+import uuid
+
+from app.score_log import ScoreEventLog, ScoreLogReader, encode, segment_bases
+
+
+def _id(n: int) -> str:
+    return str(uuid.UUID(int=n))
+
+
+def _records(start: int, n: int) -> list[bytes]:
+    return [
+        encode(_id(i), _id(1000 + i % 3), 100 * i, "walls" if i % 2 else "pass-through", timestamp_us=1_000 * i)
+        for i in range(start, start + n)
+    ]
+
+
+def test_append_and_scan(tmp_path):
+    """Test that appended records read back in order, from any offset and with a limit."""
+    log = ScoreEventLog(str(tmp_path))
+    log.open()
+    assert log.append(_records(0, 3)) == 0
+    assert log.append(_records(3, 2)) == 3
+    log.close()
+
+    reader = ScoreLogReader(str(tmp_path))
+    events = list(reader.scan())
+    assert [event.offset for event in events] == [0, 1, 2, 3, 4]
+    assert events[3].entry_id == _id(3) and events[3].user_id == _id(1000)
+    assert events[3].mode == "walls" and events[3].score == 300 and events[3].timestamp_us == 3000
+    assert [event.score for event in reader.scan(2, limit=2)] == [200, 300]
+    assert reader.end_offset() == 5
+
+
+def test_segments_rotate_and_writers_share_the_log(tmp_path):
+    """Test that full segments rotate, offsets continue across writers and reads span segments."""
+    first = ScoreEventLog(str(tmp_path), segment_records=4)
+    second = ScoreEventLog(str(tmp_path), segment_records=4)
+    first.open()
+    second.open()
+    assert first.append(_records(0, 6)) == 0
+    assert second.append(_records(6, 3)) == 6
+    assert first.append(_records(9, 1)) == 9
+    first.close()
+    second.close()
+
+    assert segment_bases(str(tmp_path)) == [0, 4, 8]
+    reader = ScoreLogReader(str(tmp_path))
+    assert [event.score // 100 for event in reader.scan(3)] == list(range(3, 10))
+    assert [first for first, _ in reader.batches(5, chunk_records=2)] == [5, 7, 8]
+
+
+def test_torn_record_is_dropped(tmp_path):
+    """Test that a half-written record is invisible to readers and cut off by the next append."""
+    log = ScoreEventLog(str(tmp_path))
+    log.open()
+    log.append(_records(0, 2))
+    with open(os.path.join(str(tmp_path), f"{0:020d}.seg"), "ab") as f:
+        f.write(_records(2, 1)[0][:20])
+
+    reader = ScoreLogReader(str(tmp_path))
+    assert reader.end_offset() == 2 and len(list(reader.scan())) == 2
+    assert log.append(_records(2, 1)) == 2
+    assert [event.score for event in reader.scan()] == [0, 100, 200]
+    log.close()
+
+
+def test_offset_for_time(tmp_path):
+    """Test that the sparse index finds an offset at or before the first record of a time."""
+    log = ScoreEventLog(str(tmp_path), segment_records=8, index_interval=4)
+    log.open()
+    log.append(_records(0, 20))
+    log.close()
+
+    reader = ScoreLogReader(str(tmp_path))
+    assert reader.offset_for_time(0) == 0
+    assert reader.offset_for_time(9_000) == 8
+    assert reader.offset_for_time(9_500) == 8
+    assert reader.offset_for_time(13_000) == 12
+    assert reader.offset_for_time(10 ** 9) == 16
+
+
+def test_records_are_stamped_under_the_lock_and_never_go_back(tmp_path, monkeypatch):
+    """Test that unstamped records get the append time, no earlier than the record before them."""
+    import app.score_log as module
+
+    log = ScoreEventLog(str(tmp_path))
+    log.open()
+    monkeypatch.setattr(module.time, "time_ns", lambda: 5_000_000)
+    log.append([encode(_id(1), _id(2), 10, "walls")])
+    # Another worker's clock is behind
+    monkeypatch.setattr(module.time, "time_ns", lambda: 3_000_000)
+    log.append([encode(_id(3), _id(2), 20, "walls")])
+    log.close()
+    assert [event.timestamp_us for event in ScoreLogReader(str(tmp_path)).scan()] == [5_000, 5_000]
+
+
+def test_backfill_appends_entries_of_dead_writers(tmp_path):
+    """Test that pending entries of a writer that died after its commit are appended once, at startup."""
+    import asyncio
+
+    from sqlalchemy import func, insert, select
+
+    from app import score_log
+    from app.database import async_session, backfill_score_log
+
+    dead = ScoreEventLog(str(tmp_path))
+    dead.open()
+    live = ScoreEventLog(str(tmp_path))
+    live.open()
+    rows = [dead.pending_row(_id(i), _id(100), 10 * i, "walls") for i in (1, 2)]
+    # The first one made it to the log before the crash, the second did not
+    dead.append([encode(_id(1), _id(100), 10, "walls")])
+    running = live.pending_row(_id(3), _id(100), 30, "walls")
+    os.close(dead._writer_fd)
+    dead._writer_fd = None
+    dead.close()
+
+    async def main():
+        async with async_session() as db:
+            await db.execute(insert(score_log.pending), [*rows, running])
+            await db.commit()
+        score_log.score_log = live
+        try:
+            appended = await backfill_score_log()
+        finally:
+            score_log.score_log = None
+        async with async_session() as db:
+            left = await db.scalar(select(func.count()).select_from(score_log.pending))
+        return appended, left
+    appended, left = asyncio.run(main())
+    live.close()
+
+    assert appended == 1
+    # The live writer's row is still its own to append
+    assert left == 1
+    assert [event.entry_id for event in ScoreLogReader(str(tmp_path)).scan()] == [_id(1), _id(2)]
+
+
+def test_failed_append_keeps_the_submit_and_its_pending_row(tmp_path, client, auth_headers, monkeypatch):
+    """Test that a score log write error after the commit still answers the submit, leaving the row to backfill."""
+    import asyncio
+
+    from sqlalchemy import func, select
+
+    from app import score_log
+    from app.database import async_session
+
+    log = ScoreEventLog(str(tmp_path))
+    log.open()
+
+    async def failing_append(records):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(log, "append_async", failing_append)
+    monkeypatch.setattr(score_log, "score_log", log)
+    response = client.post("/api/v1/leaderboard/submit", headers=auth_headers, json={"score": 100, "mode": "walls"})
+    log.close()
+
+    async def pending_rows():
+        async with async_session() as db:
+            return await db.scalar(select(func.count()).select_from(score_log.pending))
+
+    assert response.status_code == 200 and response.json()["rank"] > 0
+    assert asyncio.run(pending_rows()) == 1
@@ -0,0 +1,92 @@
+"""Tests for the shared leaderboard snapshot and sessions segment."""
+import time
+
+import pytest
+
+from app.shared_data import SharedSessions, SharedSnapshot, write_snapshot
+
+
+ROWS = [
+    ("550e8400-e29b-41d4-a716-446655440010", "SpeedySnake", 1800, "walls", "2024-11-26"),
+    ("550e8400-e29b-41d4-a716-446655440011", "ProGamer", 3200, "walls", "2024-11-28"),
+    ("550e8400-e29b-41d4-a716-446655440012", "ProGamer", 2800, "pass-through", "2024-11-28"),
+]
+USERS = [("ProGamer", "550e8400-e29b-41d4-a716-446655440002"), ("Lurker", "550e8400-e29b-41d4-a716-446655440003")]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """Write and map a small snapshot."""
+    path = str(tmp_path / "leaderboard.snap")
+    write_snapshot(path, ROWS, USERS)
+    snap = SharedSnapshot(path)
+    yield snap
+    snap.close()
+
+
+def test_snapshot_round_trip_sorted_by_score(snapshot):
+    """Test that entries come back intact, grouped by mode and sorted by score descending within it."""
+    assert len(snapshot) == 3
+    assert list(snapshot.scores) == [3200, 1800, 2800]
+    assert snapshot.entry(0) == ROWS[1]
+    assert snapshot.entry(1) == ROWS[0]
+    assert snapshot.entry(2) == ROWS[2]
+    assert snapshot.mode_range("walls") == (0, 2)
+    assert snapshot.mode_range("pass-through") == (2, 3)
+
+
+def test_snapshot_username_index(snapshot):
+    """Test username lookups, including names with and without an account."""
+    assert snapshot.user_id_for("ProGamer") == "550e8400-e29b-41d4-a716-446655440002"
+    assert snapshot.user_id_for("Lurker") == "550e8400-e29b-41d4-a716-446655440003"
+    assert snapshot.find_username("SpeedySnake") is not None
+    assert snapshot.user_id_for("SpeedySnake") is None
+    assert snapshot.find_username("Nobody") is None
+
+
+def test_snapshot_rejects_foreign_file(tmp_path):
+    """Test that a file without the snapshot header is refused."""
+    path = tmp_path / "bogus.snap"
+    path.write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError):
+        SharedSnapshot(str(path))
+
+
+def test_shared_sessions_visible_across_handles(tmp_path):
+    """Test that a session written through one mapping is seen by another."""
+    path = str(tmp_path / "sessions.shm")
+    writer = SharedSessions(path, capacity=16)
+    reader = SharedSessions(path, capacity=16)
+
+    writer["token-a"] = "550e8400-e29b-41d4-a716-446655440000"
+
+    assert reader.get("token-a") == "550e8400-e29b-41d4-a716-446655440000"
+    assert "token-b" not in reader
+    assert len(reader) == 1
+
+    del reader["token-a"]
+    assert writer.get("token-a") is None
+    assert len(writer) == 0
+    writer.close()
+    reader.close()
+
+
+def test_shared_sessions_reuse_expired_slots(tmp_path):
+    """Test that inserting past capacity reuses expired sessions, then evicts the one closest to expiry."""
+    sessions = SharedSessions(str(tmp_path / "sessions.shm"), capacity=8)
+    now = time.time()
+    for i in range(8):
+        sessions.set(f"old-{i}", str(i), expires_at=now - 1)
+    assert sessions.get("old-0") is None
+
+    for i in range(8):
+        sessions[f"new-{i}"] = str(i)
+    assert len(sessions) == 8 and sessions.evicted == 0
+    assert all(sessions[f"new-{i}"] == str(i) for i in range(8))
+
+    sessions.set("soon", "soon", expires_at=now + 60)
+    sessions["late"] = "late"
+    assert sessions.evicted == 2 and len(sessions) == 8
+    assert sessions["late"] == "late" and "soon" not in sessions
+    sessions.close()
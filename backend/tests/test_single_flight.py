@@ -0,0 +1,144 @@
+"""Tests for coalesced, stale-while-revalidate reads."""
+import asyncio
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Loader:
+    """Counts calls and blocks until released."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await self.release.wait()
+        return self.calls
+
+
+def test_concurrent_reads_share_one_load():
+    """Test that concurrent identical reads run the loader once and all get its result."""
+    async def main():
+        flight = SingleFlight(ttl_ms=1000)
+        loader = Loader()
+        readers = [asyncio.create_task(flight.do("walls", loader)) for _ in range(100)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        assert await asyncio.gather(*readers) == [1] * 100
+        assert loader.calls == 1
+        assert flight.report()["coalesced"] == 99
+        # Other keys load separately
+        assert await flight.do("pass-through", loader) == 2
+    asyncio.run(main())
+
+
+def test_fresh_stale_and_expired():
+    """Test that a stale value is returned while one refresh runs, and an expired one is reloaded."""
+    async def main():
+        clock = Clock()
+        flight = SingleFlight(ttl_ms=1000, stale_ms=5000, clock=clock)
+        loader = Loader()
+        loader.release.set()
+        assert await flight.do("k", loader) == 1
+        clock.now = 0.5
+        assert await flight.do("k", loader) == 1
+        assert loader.calls == 1
+        clock.now = 2
+        loader.release.clear()
+        # Stale: answered at once, refreshed once in the background
+        assert await flight.do("k", loader) == 1
+        assert await flight.do("k", loader) == 1
+        loader.release.set()
+        await asyncio.sleep(0.01)
+        assert loader.calls == 2
+        assert await flight.do("k", loader) == 2
+        clock.now = 100
+        assert await flight.do("k", loader) == 3
+        assert flight.report()["staleHits"] == 2
+    asyncio.run(main())
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    """Test that a failing load raises for all coalesced callers and the next call retries."""
+    async def main():
+        flight = SingleFlight(ttl_ms=1000)
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0)
+            raise RuntimeError("database is locked")
+
+        results = await asyncio.gather(*(flight.do("k", failing) for _ in range(5)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(attempts) == 1
+        with pytest.raises(RuntimeError):
+            await flight.do("k", failing)
+        assert len(attempts) == 2
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_load():
+    """Test that a caller going away leaves the shared load running for the others."""
+    async def main():
+        flight = SingleFlight(ttl_ms=1000)
+        loader = Loader()
+        first = asyncio.create_task(flight.do("k", loader))
+        second = asyncio.create_task(flight.do("k", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        loader.release.set()
+        assert await second == 1
+        assert loader.calls == 1
+    asyncio.run(main())
+
+
+def test_invalidate_skips_reads_in_flight():
+    """Test that a read started before an invalidation is not cached."""
+    async def main():
+        flight = SingleFlight(ttl_ms=1000, max_entries=2)
+        loader = Loader()
+        reader = asyncio.create_task(flight.do("k", loader))
+        await asyncio.sleep(0)
+        flight.invalidate()
+        loader.release.set()
+        assert await reader == 1
+        assert "k" not in flight.cache
+        # The oldest entries make way past max_entries
+        for key in "abc":
+            await flight.do(key, loader)
+        assert list(flight.cache) == ["b", "c"]
+    asyncio.run(main())
+
+
+def test_callers_after_invalidate_do_not_join_an_older_read():
+    """Test that a read retired by invalidate() only serves its own callers and later ones start afresh."""
+    async def main():
+        flight = SingleFlight(ttl_ms=1000)
+        old, new = Loader(), Loader()
+        before = asyncio.create_task(flight.do("k", old))
+        await asyncio.sleep(0)
+        flight.invalidate("k")
+        after = asyncio.create_task(flight.do("k", new))
+        await asyncio.sleep(0.01)
+        assert old.calls == 1 and new.calls == 1
+        # The retired read finishing first neither caches nor unregisters the new one
+        old.release.set()
+        assert await before == 1
+        assert "k" not in flight.cache and "k" in flight.inflight
+        new.release.set()
+        assert await after == 1
+        assert flight.cache["k"][0] == 1 and "k" not in flight.inflight
+        assert flight.report()["retired"] == 1
+    asyncio.run(main())
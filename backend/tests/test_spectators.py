@@ -0,0 +1,91 @@
+"""Tests for the spectator broadcast hub."""
+import asyncio
+
+from app.spectators import SpectatorHub
+
+
+def _state(score: int) -> dict:
+    return {"snake": [{"x": 10, "y": 10}], "food": {"x": 1, "y": 1}, "direction": "RIGHT", "score": score}
+
+
+def _drain(subscriber) -> list[bytes]:
+    frames = list(subscriber.queue)
+    subscriber.queue.clear()
+    return [frame.data for frame in frames]
+
+
+def test_update_is_serialized_once_for_all_subscribers():
+    """Test that every subscriber queues the same encoded bytes object."""
+    hub = SpectatorHub(max_queue=8, keyframe_interval=100)
+    hub.publish("p1", _state(0))
+    subscribers = [hub.subscribe("p1") for _ in range(3)]
+    for subscriber in subscribers:
+        _drain(subscriber)
+
+    hub.publish("p1", _state(10), delta={"score": 10})
+    frames = [subscriber.queue[0] for subscriber in subscribers]
+    assert all(frame is frames[0] for frame in frames)
+    assert frames[0].data.startswith(b"id: 2\nevent: delta\n")
+
+
+def test_lagging_subscriber_resyncs_from_keyframe():
+    """Test that a full queue drops its deltas and keeps the latest keyframe."""
+    hub = SpectatorHub(max_queue=3, keyframe_interval=100)
+    subscriber = hub.subscribe("p1", _state(0))
+    for score in range(10, 60, 10):
+        hub.publish("p1", _state(score), delta={"score": score})
+
+    frames = _drain(subscriber)
+    assert len(frames) <= 3
+    assert any(b"event: keyframe" in frame and b'"score":30' in frame for frame in frames)
+    assert frames[-1].startswith(b"id: 5\n")
+    stats = hub.stats()["perChannel"]["p1"]
+    assert stats["dropped"] > 0
+    assert 0 < stats["dropRate"] <= 1
+
+
+def test_keyframe_interval():
+    """Test that a keyframe is sent every `keyframe_interval` updates."""
+    hub = SpectatorHub(max_queue=100, keyframe_interval=3)
+    subscriber = hub.subscribe("p1", _state(0))
+    _drain(subscriber)
+    events = []
+    for score in range(1, 7):
+        hub.publish("p1", _state(score), delta={"score": score})
+        events.extend(frame.split(b"\n")[1] for frame in _drain(subscriber))
+    assert events == [b"event: delta", b"event: delta", b"event: keyframe"] * 2
+
+
+def test_keyframe_supersedes_pending_deltas():
+    """Test that a keyframe replaces deltas still queued before it."""
+    hub = SpectatorHub(max_queue=100, keyframe_interval=3)
+    subscriber = hub.subscribe("p1", _state(0))
+    for score in range(1, 4):
+        hub.publish("p1", _state(score), delta={"score": score})
+    frames = _drain(subscriber)
+    assert len(frames) == 1
+    assert frames[0].startswith(b"id: 3\nevent: keyframe\n")
+
+
+def test_close_ends_streams():
+    """Test that closing a channel ends its subscribers' streams."""
+    hub = SpectatorHub()
+
+    async def scenario():
+        subscriber = hub.subscribe("p1", _state(0))
+        received = []
+
+        async def consume():
+            async for frame in subscriber.frames():
+                received.append(frame)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        hub.publish("p1", _state(10), delta={"score": 10})
+        hub.close("p1")
+        await asyncio.wait_for(task, 1)
+        return received
+
+    received = asyncio.run(scenario())
+    assert len(received) == 2
+    assert hub.stats()["channels"] == 0
@@ -0,0 +1,114 @@
+"""Tests for replay-based score verification."""
+import asyncio
+import random
+import uuid
+
+from sqlalchemy import select
+
+from app.database import add_leaderboard_entry, async_session, get_user_by_username
+from app.game_logic import FOOD_POINTS, create_initial_state, move_snake, simulate_bot_game
+from app.leaderboard_store import LeaderboardStore
+from app.verification import VERIFYING, VerificationPipeline, replay_game, verifications
+
+
+def test_bot_games_verify():
+    """Test that replays recorded from real games verify in both modes."""
+    rng = random.Random(7)
+    for mode in ("walls", "pass-through"):
+        for _ in range(10):
+            state, replay = simulate_bot_game(mode, rng, max_ticks=500)
+            assert replay_game(state.score, mode, replay) == (True, None)
+
+
+def test_inflated_score_is_rejected():
+    """Test that a score higher than the replay produces is rejected."""
+    state, replay = simulate_bot_game("walls", random.Random(1), max_ticks=500)
+    ok, reason = replay_game(state.score + FOOD_POINTS, "walls", replay)
+    assert not ok
+    assert "submitted" in reason
+
+
+def test_food_on_snake_is_rejected():
+    """Test that food placed on the snake's body is rejected."""
+    replay = {"ticks": 1, "moves": [], "foods": [{"x": 9, "y": 10}]}
+    ok, reason = replay_game(0, "walls", replay)
+    assert not ok
+    assert "food 0" in reason
+
+
+def test_moves_after_game_over_are_rejected():
+    """Test that a log running past a wall collision is rejected."""
+    state = create_initial_state("walls", lambda snake: (0, 0))
+    ticks = 0
+    while not state.is_game_over:
+        move_snake(state)
+        ticks += 1
+    replay = {"ticks": ticks + 5, "moves": [], "foods": [{"x": 0, "y": 0}]}
+    ok, reason = replay_game(0, "walls", replay)
+    assert not ok
+    assert "game ended" in reason
+
+
+def test_unused_food_is_rejected():
+    """Test that food positions the game never reached are rejected."""
+    replay = {"ticks": 1, "moves": [], "foods": [{"x": 0, "y": 0}, {"x": 1, "y": 1}]}
+    assert replay_game(0, "walls", replay) == (False, "unused food positions")
+
+
+def test_store_remove():
+    """Test removing a rejected entry from the in-memory leaderboard."""
+    store = LeaderboardStore()
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    for entry_id in ids:
+        store.add(entry_id, "A", 100, "walls", "2024-11-28")
+
+    assert store.remove(ids[1], 100, "walls")
+    assert not store.remove(ids[1], 100, "walls")
+    assert [entry.id for entry in store.entries("walls")] == [ids[0], ids[2]]
+
+
+def test_pipeline_verifies_across_processes():
+    """Test that the process pool returns one outcome per job."""
+    rng = random.Random(3)
+    jobs = []
+    for i in range(8):
+        state, replay = simulate_bot_game("walls", rng, max_ticks=300)
+        score = state.score if i % 2 == 0 else state.score + FOOD_POINTS
+        jobs.append((str(i), "A", score, "walls", "2024-11-28", replay))
+
+    async def scenario():
+        pipeline = VerificationPipeline(workers=2)
+        try:
+            return await pipeline.verify(jobs)
+        finally:
+            await pipeline.stop()
+
+    outcomes = asyncio.run(scenario())
+    assert [(entry_id, ok) for entry_id, ok, _ in outcomes] == [(str(i), i % 2 == 0) for i in range(8)]
+
+
+def test_replayed_submit_is_claimed_once_and_defers_the_high_score():
+    """Test that a replayed submit leaves the high score alone until verified and is claimed by one worker only."""
+    replay = {"ticks": 1, "moves": [], "foods": [{"x": 3, "y": 3}]}
+
+    async def scenario():
+        async with async_session() as db:
+            user = await get_user_by_username(db, "SnakeMaster")
+            await add_leaderboard_entry(db, user["id"], 9000, "walls", replay)
+            entry_id = (await db.execute(select(verifications.c.entry_id))).scalar_one()
+            pending_high_score = (await get_user_by_username(db, "SnakeMaster"))["highScore"]
+        job = (entry_id, "SnakeMaster", 9000, "walls", "2024-11-28", replay)
+        first, second = await VerificationPipeline.claim([job]), await VerificationPipeline.claim([job])
+        async with async_session() as db:
+            status = (await db.execute(select(verifications.c.status))).scalar_one()
+            await VerificationPipeline._raise_high_scores(db, [job], [(entry_id, True, None)])
+            await db.commit()
+            verified_high_score = (await get_user_by_username(db, "SnakeMaster"))["highScore"]
+        return pending_high_score, first, second, status, verified_high_score
+
+    pending_high_score, first, second, status, verified_high_score = asyncio.run(scenario())
+
+    assert pending_high_score == 2450
+    assert len(first) == 1 and second == []
+    assert status == VERIFYING
+    assert verified_high_score == 9000
@@ -0,0 +1,105 @@
+"""Tests for the startup warm-up stages and readiness endpoint."""
+import asyncio
+
+from fastapi import status
+
+import main
+from app.warmup import WarmupState
+
+
+def test_warmup_runs_stages_in_order():
+    """Test that stages run in registration order and are timed."""
+    calls = []
+    state = WarmupState()
+
+    async def first():
+        calls.append("first")
+
+    async def second():
+        calls.append("second")
+
+    state.register("first", first)
+    state.register("second", second)
+    asyncio.run(state.run())
+
+    assert calls == ["first", "second"]
+    assert state.ready is True
+    report = state.report()
+    assert report["status"] == "ready"
+    assert list(report["stages"]) == ["first", "second"]
+    assert all(ms >= 0 for ms in report["stages"].values())
+    assert report["totalMs"] is not None
+
+
+def test_warmup_failed_stage_is_not_ready():
+    """Test that a failing stage keeps the state unready but still runs later stages."""
+    calls = []
+    state = WarmupState()
+
+    async def broken():
+        raise RuntimeError("db down")
+
+    async def after():
+        calls.append("after")
+
+    state.register("broken", broken)
+    state.register("after", after)
+    asyncio.run(state.run())
+
+    assert state.ready is False
+    assert calls == ["after"]
+    report = state.report()
+    assert report["status"] == "failed"
+    assert "db down" in report["errors"]["broken"]
+
+
+def test_ready_before_warmup(client, monkeypatch):
+    """Test that /ready returns 503 until warm-up has finished."""
+    monkeypatch.setattr(main, "warmup", WarmupState())
+    response = client.get("/ready")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["status"] == "pending"
+
+
+def test_ready_after_warmup(client, monkeypatch):
+    """Test that /ready returns 200 with stage timings once warm."""
+    state = WarmupState()
+
+    async def noop():
+        return None
+
+    state.register("noop", noop)
+    asyncio.run(state.run())
+    monkeypatch.setattr(main, "warmup", state)
+    response = client.get("/ready")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["ready"] is True
+    assert "noop" in data["stages"]
+
+
+def test_leaderboard_warmup_fills_what_requests_read(monkeypatch):
+    """Test that warm-up loads the store, and also fills the database read cache when the store is not served."""
+    from app import events
+    from app.database import engine, leaderboard_reads
+    from app.leaderboard_store import leaderboard_store
+    from app.warmup import warm_leaderboard
+
+    async def warm():
+        await warm_leaderboard()
+        await engine.dispose()
+
+    try:
+        asyncio.run(warm())
+        assert leaderboard_store.is_current()
+        assert [entry.score for entry in leaderboard_store.entries("walls")] == [3200, 2450, 1800]
+
+        monkeypatch.setattr(events, "WORKERS", 4)
+        loads = leaderboard_reads.stats["loads"]
+        asyncio.run(warm())
+        assert leaderboard_reads.stats["loads"] == loads + 3
+    finally:
+        leaderboard_store.clear()
+        leaderboard_reads.invalidate()